@@ -0,0 +1,18 @@
+"""
+Offline end-to-end benchmarks.
+
+A local media farm (benchmarks.farm) serves synthetic progressive MP4s,
+HLS and DASH streams and playlist pages with configurable latency,
+bandwidth and injected errors. The suite (benchmarks.suite) downloads them
+with VideoDownloader through yt-dlp's generic extractor, as it would any
+site without a dedicated extractor, and records throughput,
+time-to-first-byte, peak RSS and CPU time per job. Results are JSON files
+that benchmarks.compare checks against a baseline. benchmarks.memory
+measures the bytes a queued job and a kept video cost, and
+benchmarks.components times single code paths.
+
+    python -m benchmarks run -o results.json
+    python -m benchmarks compare baseline.json results.json
+    python -m benchmarks memory
+    python -m benchmarks components -b postprocess
+"""
@@ -0,0 +1,122 @@
+"""
+Command line entry point: python -m benchmarks {run,compare,list,memory,components}.
+
+Exit codes: 0 success, 1 a benchmark job failed (run) or a metric
+regressed (compare), 2 usage error.
+"""
+import argparse
+import json
+import os
+import sys
+from typing import List, Optional
+
+# Allow running from a source checkout
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from benchmarks.compare import compare, format_report
+from benchmarks.components import BENCHMARKS, run_components
+from benchmarks.memory import run_memory
+from benchmarks.suite import SCENARIOS, run_suite
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog='python -m benchmarks',
+                                     description='Offline end-to-end download benchmarks.')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run = commands.add_parser('run', help='Run the benchmarks and write JSON results')
+    run.add_argument('-o', '--output', metavar='FILE', help='Write results to FILE (default: stdout)')
+    run.add_argument('-s', '--scenario', action='append', default=[], metavar='NAME',
+                     help='Run only this scenario; repeatable')
+    run.add_argument('-n', '--repeat', type=int, default=3, metavar='N',
+                     help='Measured jobs per scenario (default: 3)')
+    run.add_argument('--warmup', type=int, default=1, metavar='N',
+                     help='Unmeasured jobs before them (default: 1)')
+    run.add_argument('--scale', type=float, default=1.0,
+                     help='Multiply media sizes, e.g. 0.1 for a quick run (default: 1)')
+    run.add_argument('--baseline', metavar='FILE',
+                     help='Compare with these results afterwards, failing on regressions')
+    run.add_argument('--tolerance', type=float, default=0.15,
+                     help='Allowed relative change for the worse (default: 0.15)')
+
+    check = commands.add_parser('compare', help='Compare results with a baseline')
+    check.add_argument('baseline', metavar='BASELINE')
+    check.add_argument('current', metavar='CURRENT')
+    check.add_argument('--tolerance', type=float, default=0.15,
+                       help='Allowed relative change for the worse (default: 0.15)')
+
+    commands.add_parser('list', help='List the scenarios')
+
+    memory = commands.add_parser('memory', help='Measure bytes per queued job and per kept video')
+    memory.add_argument('--jobs', type=int, default=10000, metavar='N',
+                        help='Jobs to queue (default: 10000)')
+    memory.add_argument('--videos', type=int, default=50, metavar='N',
+                        help='Info dicts and records to build (default: 50)')
+
+    components = commands.add_parser('components', help='Time single code paths')
+    components.add_argument('-b', '--benchmark', action='append', default=[], metavar='NAME',
+                            choices=sorted(BENCHMARKS), help='Run only this benchmark; repeatable')
+    return parser
+
+
+def _load(path: str) -> dict:
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _gate(baseline: dict, current: dict, tolerance: float) -> int:
+    comparisons = compare(baseline, current, tolerance)
+    print(format_report(comparisons), file=sys.stderr)
+    return 1 if any(item.regressed for item in comparisons) else 0
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = build_parser()
+    args = parser.parse_args(argv)
+
+    if args.command == 'list':
+        for scenario in SCENARIOS:
+            print(scenario.name)
+        return 0
+
+    if args.command == 'memory':
+        if args.jobs < 1 or args.videos < 1:
+            parser.error('--jobs and --videos must be at least 1')
+        print(json.dumps(run_memory(args.jobs, args.videos), indent=2))
+        return 0
+
+    if args.command == 'components':
+        results = run_components(args.benchmark, log=lambda line: print(line, file=sys.stderr))
+        print(json.dumps(results, indent=2))
+        return 0
+
+    if args.command == 'compare':
+        return _gate(_load(args.baseline), _load(args.current), args.tolerance)
+
+    scenarios = SCENARIOS
+    if args.scenario:
+        known = {scenario.name: scenario for scenario in SCENARIOS}
+        unknown = [name for name in args.scenario if name not in known]
+        if unknown:
+            parser.error(f"unknown scenario: {', '.join(unknown)}")
+        scenarios = [known[name] for name in args.scenario]
+    if args.repeat < 1 or args.warmup < 0 or args.scale <= 0:
+        parser.error('--repeat must be at least 1, --warmup at least 0 and --scale positive')
+    baseline = _load(args.baseline) if args.baseline else None
+
+    results = run_suite(scenarios, repeat=args.repeat, warmup=args.warmup, scale=args.scale,
+                        log=lambda line: print(line, file=sys.stderr))
+    text = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+    failed = any(s['summary']['failures'] for s in results['scenarios'].values())
+    if baseline is not None and _gate(baseline, results, args.tolerance):
+        return 1
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
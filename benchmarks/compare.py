@@ -0,0 +1,84 @@
+"""
+Comparison of benchmark results against a baseline.
+
+A scenario metric regresses when it is worse than the baseline by more
+than the relative tolerance and by more than the metric's absolute slack,
+which keeps millisecond jitter in small numbers from failing a run.
+"""
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+# metric -> (higher is better, absolute slack)
+METRICS = {
+    'throughput': (True, 0.0),
+    'ttfb': (False, 0.05),
+    'cpu_seconds': (False, 0.05),
+    'peak_rss': (False, 16 * 1024 * 1024),
+}
+
+
+@dataclass
+class Comparison:
+    """One metric of one scenario in two runs."""
+    scenario: str
+    metric: str
+    baseline: Optional[float]
+    current: Optional[float]
+    regressed: bool
+
+    @property
+    def change(self) -> Optional[float]:
+        """Relative change from the baseline, e.g. -0.1 for 10% lower."""
+        if not self.baseline or self.current is None:
+            return None
+        return self.current / self.baseline - 1
+
+
+def compare(baseline: Dict[str, Any], current: Dict[str, Any],
+            tolerance: float = 0.15) -> List[Comparison]:
+    """Compare the scenarios two runs have in common.
+
+    Jobs that failed in the current run but not in the baseline always
+    count as a regression.
+
+    Args:
+        baseline: Results of the reference run
+        current: Results of the run being checked
+        tolerance: Allowed relative change for the worse
+
+    Returns:
+        List[Comparison]: One entry per scenario and metric
+    """
+    comparisons = []
+    for name, scenario in current['scenarios'].items():
+        reference = baseline['scenarios'].get(name)
+        if reference is None:
+            continue
+        old, new = reference['summary'], scenario['summary']
+        comparisons.append(Comparison(name, 'failures', old['failures'], new['failures'],
+                                      new['failures'] > old['failures']))
+        for metric, (higher_is_better, slack) in METRICS.items():
+            before, after = old.get(metric), new.get(metric)
+            regressed = False
+            if before is not None and after is not None:
+                worse = before - after if higher_is_better else after - before
+                regressed = worse > tolerance * before and worse > slack
+            comparisons.append(Comparison(name, metric, before, after, regressed))
+    return comparisons
+
+
+def format_report(comparisons: List[Comparison]) -> str:
+    """A table of the comparisons, regressions marked."""
+    lines = [f"{'scenario':24} {'metric':12} {'baseline':>14} {'current':>14} {'change':>8}"]
+    for item in comparisons:
+        change = f'{item.change:+.1%}' if item.change is not None else ''
+        lines.append(f'{item.scenario:24} {item.metric:12} {_number(item.baseline):>14} '
+                     f'{_number(item.current):>14} {change:>8}'
+                     + ('  REGRESSION' if item.regressed else ''))
+    return '\n'.join(lines)
+
+
+def _number(value: Optional[float]) -> str:
+    if value is None:
+        return '-'
+    return f'{value:.4g}'
@@ -0,0 +1,467 @@
+"""
+Component benchmarks: timings of single code paths.
+
+The suite measures whole downloads; these time the pieces a download or
+the window is built from, where a change shows up in one number rather
+than in the noise of a transfer. Each benchmark returns a dict of figures
+(seconds unless the name says otherwise):
+
+    postprocess   A batch of jobs that are half network and half CPU on
+                  one download slot, post-processed inline and in a
+                  PostProcessPool
+    progress      Qt signals and CPU seconds for the progress of a 1 GiB
+                  download, a signal per yt-dlp hook call against
+                  ProgressAggregator batches
+    archive       Milliseconds to check a playlist of 100,000 videos
+                  against an archive of 200,000 downloads
+    bandwidth     Bytes per second an interactive and a bulk download get
+                  from one cap, and a capped download's throughput
+    queue         Jobs per second DownloadQueue gets through with one and
+                  with four workers when every job waits on the network
+    event_loop    Milliseconds between the ticks of a 5 ms Qt timer while
+                  DownloadEngine runs a 32 MiB download
+    extractor_index
+                  Microseconds per warm ExtractorIndex.match() for
+                  2,000 of yt-dlp's test URLs
+    history       Milliseconds to open a history of 500,000 downloads in
+                  its table model and to search it
+    classify      URLs per second classify_many() gets through in a
+                  pasted list of 100,000
+    startup       Milliseconds to import the main window and to the
+                  window's first paint
+    ydl_pool      Seconds per short clip with a fresh YoutubeDL per job
+                  and with instances kept warm in the pool
+"""
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from PyQt6.QtCore import QCoreApplication, QEventLoop, QObject, Qt, QTimer, pyqtSignal
+
+from benchmarks.farm import MediaFarm, NetworkProfile
+from src.core.archive import DownloadArchive
+from src.core.bandwidth import BULK, INTERACTIVE, BandwidthLimiter
+from src.core.download_queue import DownloadQueue, JobState
+from src.core.downloader import VideoDownloader
+from src.core.engine import DownloadEngine
+from src.core.extractor_index import ExtractorIndex
+from src.core.history import DownloadHistory
+from src.core.postprocess import PostProcessPool
+from src.core.progress import ProgressAggregator
+from src.gui.history_model import HistoryTableModel
+from src.gui.qt_downloader import QtVideoDownloader
+from src.utils.startup import measure_imports, run_first_paint_probe
+from src.utils.url_utils import classify_many
+
+MIB = 1024 * 1024
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+# Stand-in for an ffmpeg conversion: burns CPU for a while, then writes a
+# digest of the downloaded media next to it
+_TRANSCODE = '''
+import hashlib, sys, time
+deadline = time.process_time() + float(sys.argv[1])
+while time.process_time() < deadline:
+    pass
+with open(sys.argv[2], 'rb') as f:
+    digest = hashlib.sha1(f.read()).hexdigest()
+with open(sys.argv[2] + '.sha1', 'w') as f:
+    f.write(digest)
+'''
+
+BENCHMARKS: Dict[str, Callable[[], Dict[str, Any]]] = {}
+
+
+def benchmark(name: str) -> Callable:
+    """Register a function as the component benchmark name."""
+    def register(function: Callable[[], Dict[str, Any]]) -> Callable[[], Dict[str, Any]]:
+        BENCHMARKS[name] = function
+        return function
+    return register
+
+
+def _run_batch(downloader: VideoDownloader, urls: List[str], output: str) -> float:
+    """Seconds a queue with one download slot takes for the URLs."""
+    queue = DownloadQueue(downloader.run_job, max_concurrent=1)
+    started = time.perf_counter()
+    jobs = [queue.add(url, output) for url in urls]
+    queue.wait()
+    seconds = time.perf_counter() - started
+    failed = [job.error for job in jobs if job.state != JobState.DONE]
+    if failed:
+        raise RuntimeError(f'Benchmark download failed: {failed[0]}')
+    return seconds
+
+
+@benchmark('postprocess')
+def postprocess(jobs: int = 4, latency: float = 0.4, cpu_seconds: float = 0.3) -> Dict[str, Any]:
+    """With a PostProcessPool the next download runs while the previous
+    one is converted.
+
+    Args:
+        jobs: Measured downloads per mode
+        latency: Seconds before each response starts
+        cpu_seconds: CPU time of each conversion
+    """
+    workdir = tempfile.mkdtemp(prefix='vidleech-bench-')
+    script = os.path.join(workdir, 'transcode.py')
+    with open(script, 'w', encoding='utf-8') as f:
+        f.write(_TRANSCODE)
+    postprocessors = [{'key': 'Exec', 'when': 'post_process',
+                       'exec_cmd': f'"{sys.executable}" "{script}" {cpu_seconds} {{}}'}]
+    pool = PostProcessPool(workers=1)
+    pool.start(wait=True)
+    results: Dict[str, Any] = {'jobs': jobs}
+    try:
+        with MediaFarm(NetworkProfile(latency=latency)) as farm:
+            for mode, options in (('inline', {}), ('pipelined', {'postprocess': pool})):
+                downloader = VideoDownloader(postprocessors=postprocessors, **options)
+                urls = [farm.add_progressive(f'{mode}{index}', 64 * 1024)
+                        for index in range(jobs + 1)]
+                output = os.path.join(workdir, mode)
+                # The first job warms the YoutubeDL instance up
+                _run_batch(downloader, urls[:1], output)
+                results[f'{mode}_seconds'] = _run_batch(downloader, urls[1:], output)
+                downloader.close()
+    finally:
+        pool.close()
+        shutil.rmtree(workdir, ignore_errors=True)
+    return results
+
+
+class _Clock:
+    """Simulated time of a download, advanced by the hook calls."""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class _Emitter(QObject):
+    progress = pyqtSignal(float, str)
+    batch = pyqtSignal(list)
+
+
+def _hooks(total: int, chunk: int, rate: float, clock: _Clock) -> Iterator[Dict[str, Any]]:
+    """yt-dlp progress dicts of a download at a constant rate."""
+    downloaded = 0
+    while downloaded < total:
+        downloaded = min(total, downloaded + chunk)
+        clock.now = downloaded / rate
+        yield {'status': 'downloading', 'downloaded_bytes': downloaded, 'total_bytes': total,
+               '_percent_str': f'{100 * downloaded / total:5.1f}%'}
+    yield {'status': 'finished', 'downloaded_bytes': total, 'total_bytes': total,
+           'filename': 'video.mp4'}
+
+
+@benchmark('progress')
+def progress(total: int = 1024 * MIB, chunk: int = 64 * 1024,
+             rate: float = 100 * MIB) -> Dict[str, Any]:
+    """Progress reporting of one download: a queued signal per hook call,
+    parsed from _percent_str as the window did before, against the
+    ProgressAggregator's batches at 10 Hz.
+
+    Args:
+        total: Bytes downloaded
+        chunk: Bytes per hook call
+        rate: Simulated bytes per second
+    """
+    app = QCoreApplication.instance() or QCoreApplication([])
+    emitter = _Emitter()
+    emitter.progress.connect(lambda *args: None, Qt.ConnectionType.QueuedConnection)
+    emitter.batch.connect(lambda *args: None, Qt.ConnectionType.QueuedConnection)
+
+    started, signals = time.process_time(), 0
+    for d in _hooks(total, chunk, rate, _Clock()):
+        if d['status'] == 'downloading':
+            emitter.progress.emit(float(d['_percent_str'].replace('%', '')), 'Downloading...')
+        else:
+            emitter.progress.emit(100, 'Download complete!')
+        signals += 1
+    app.processEvents()
+    results: Dict[str, Any] = {'per_hook_signals': signals,
+                               'per_hook_cpu_seconds': time.process_time() - started}
+
+    clock, batches = _Clock(), []
+    aggregator = ProgressAggregator(lambda batch: (batches.append(batch), emitter.batch.emit(batch)),
+                                    rate_hz=10, clock=clock)
+    started = time.process_time()
+    for d in _hooks(total, chunk, rate, clock):
+        aggregator.update('job', d)
+    app.processEvents()
+    results['batched_signals'] = len(batches)
+    results['batched_cpu_seconds'] = time.process_time() - started
+    return results
+
+
+@benchmark('archive')
+def archive(entries: int = 200_000, playlist: int = 100_000) -> Dict[str, Any]:
+    """One contains_many() call for a playlist, half of it archived.
+
+    Args:
+        entries: Downloads in the archive
+        playlist: Keys checked
+    """
+    workdir = tempfile.mkdtemp(prefix='vidleech-bench-')
+    path = os.path.join(workdir, 'archive.sqlite')
+    try:
+        store = DownloadArchive(path)
+        with store._lock:
+            store._db.execute(f"""
+                INSERT INTO archive (key)
+                WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < {entries})
+                SELECT 'youtube:' || i FROM n
+            """)
+        store.close()
+        store = DownloadArchive(path)
+        first = entries - playlist // 2
+        keys = [f'youtube:{i}' for i in range(first, first + playlist)]
+        started = time.perf_counter()
+        found = store.contains_many(keys)
+        check_ms = (time.perf_counter() - started) * 1000
+        store.close()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return {'entries': entries, 'playlist': playlist, 'found': len(found), 'check_ms': check_ms}
+
+
+@benchmark('bandwidth')
+def bandwidth(rate: float = 400 * 1024, seconds: float = 1.5) -> Dict[str, Any]:
+    """Two priority classes competing for a cap, then a download of two
+    seconds' worth of bytes under it.
+
+    Args:
+        rate: Cap in bytes per second
+        seconds: How long the classes compete
+    """
+    limiter = BandwidthLimiter(rate=rate, burst=0.05)
+    moved = {INTERACTIVE: 0, BULK: 0}
+    stop = threading.Event()
+
+    def pull(priority: str) -> None:
+        while not stop.is_set():
+            limiter.acquire(8 * 1024, priority)
+            moved[priority] += 8 * 1024
+
+    workers = [threading.Thread(target=pull, args=(priority,)) for priority in moved]
+    for worker in workers:
+        worker.start()
+    time.sleep(seconds)
+    stop.set()
+    for worker in workers:
+        worker.join()
+    results: Dict[str, Any] = {'rate': rate,
+                               'interactive_rate': moved[INTERACTIVE] / seconds,
+                               'bulk_rate': moved[BULK] / seconds}
+
+    workdir = tempfile.mkdtemp(prefix='vidleech-bench-')
+    try:
+        with MediaFarm() as farm:
+            url = farm.add_progressive('capped', int(rate * 2))
+            downloader = VideoDownloader(bandwidth=BandwidthLimiter(rate=rate, burst=0.1))
+            started = time.perf_counter()
+            filename = downloader.fetch(url, workdir)
+            elapsed = time.perf_counter() - started
+            downloader.close()
+        results['download_rate'] = os.path.getsize(os.path.join(workdir, filename)) / elapsed
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return results
+
+
+@benchmark('queue')
+def queue(jobs: int = 16, latency: float = 0.2) -> Dict[str, Any]:
+    """Latency-bound jobs overlap, so N workers finish about N times faster.
+
+    Args:
+        jobs: Jobs per run
+        latency: Seconds each job waits
+    """
+    results: Dict[str, Any] = {'jobs': jobs}
+    for workers in (1, 4):
+        download_queue = DownloadQueue(lambda job, report: time.sleep(latency),
+                                       max_concurrent=workers, max_per_host=workers)
+        started = time.perf_counter()
+        for index in range(jobs):
+            download_queue.add(f'https://example.org/{index}', tempfile.gettempdir())
+        download_queue.wait()
+        results[f'jobs_per_second_{workers}'] = jobs / (time.perf_counter() - started)
+    return results
+
+
+@benchmark('event_loop')
+def event_loop(size: int = 32 * MIB) -> Dict[str, Any]:
+    """How late the GUI thread's timer events run while a download is on
+    the engine's thread pool; the GUI target is 16 ms.
+
+    Args:
+        size: Bytes downloaded
+    """
+    # Referenced until the end; an unreferenced application is destroyed at once
+    app = QCoreApplication.instance() or QCoreApplication([])
+    workdir = tempfile.mkdtemp(prefix='vidleech-bench-')
+    ticks: List[float] = []
+    try:
+        with MediaFarm() as farm:
+            url = farm.add_progressive('stream', size)
+            downloader = QtVideoDownloader(VideoDownloader())
+            engine = DownloadEngine(downloader)
+            loop = QEventLoop()
+            downloader.complete.connect(lambda filename: loop.quit())
+            downloader.error.connect(lambda message: loop.quit())
+            timer = QTimer()
+            timer.setInterval(5)
+            timer.timeout.connect(lambda: ticks.append(time.perf_counter()))
+            timer.start()
+            engine.submit(url, workdir)
+            loop.exec()
+            timer.stop()
+            engine.wait_for_done(5000)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    gaps = sorted((b - a) * 1000 for a, b in zip(ticks, ticks[1:]))
+    return {'ticks': len(ticks),
+            'max_gap_ms': gaps[-1] if gaps else None,
+            'p99_gap_ms': gaps[int(len(gaps) * 0.99)] if gaps else None}
+
+
+@benchmark('extractor_index')
+def extractor_index(count: int = 2000) -> Dict[str, Any]:
+    """Warm lookups in an index of all of yt-dlp's extractors.
+
+    Args:
+        count: Test URLs of the extractors looked up
+    """
+    from yt_dlp.extractor import gen_extractor_classes
+    ie_classes = list(gen_extractor_classes())
+    index = ExtractorIndex.build(ie_classes)
+    urls = [case['url'] for ie in ie_classes
+            for case in ie.get_testcases(include_onlymatching=True) if 'url' in case][:count]
+    for url in urls:
+        index.match(url)
+    started = time.perf_counter()
+    for url in urls:
+        index.match(url)
+    return {'urls': len(urls), 'us_per_url': (time.perf_counter() - started) / len(urls) * 1e6}
+
+
+@benchmark('history')
+def history(rows: int = 500_000) -> Dict[str, Any]:
+    """Opening the history with its first page of 100 rows, and a search.
+
+    Args:
+        rows: Downloads in the history
+    """
+    app = QCoreApplication.instance() or QCoreApplication([])  # Kept for the models' lifetime
+    workdir = tempfile.mkdtemp(prefix='vidleech-bench-')
+    path = os.path.join(workdir, 'history.sqlite')
+    try:
+        store = DownloadHistory(path)
+        # Generated inside SQLite; inserting from Python would take minutes
+        store._db.execute(f"""
+            INSERT INTO downloads (url, path, title, video_id, extractor, platform,
+                                   format_selection, completed)
+            WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < {rows})
+            SELECT 'https://example.com/watch/' || i, '/downloads/' || i || '.mp4',
+                   'clip ' || i || CASE i % 4 WHEN 0 THEN ' music live' WHEN 1 THEN ' cat video'
+                                              WHEN 2 THEN ' tutorial' ELSE ' news' END,
+                   'v' || i, 'Generic', CASE i % 3 WHEN 0 THEN 'youtube' ELSE 'vimeo' END,
+                   'best', 1.7e9 + i
+            FROM n
+        """)
+        store.close()
+
+        started = time.perf_counter()
+        store = DownloadHistory(path)
+        model = HistoryTableModel(store, page_size=100)
+        open_ms = (time.perf_counter() - started) * 1000
+        started = time.perf_counter()
+        model.set_query('cat vid')
+        search_ms = (time.perf_counter() - started) * 1000
+        store.close()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return {'rows': rows, 'open_ms': open_ms, 'search_ms': search_ms}
+
+
+@benchmark('classify')
+def classify(count: int = 100_000) -> Dict[str, Any]:
+    """Classifying a pasted list in this process.
+
+    Args:
+        count: URLs in the list, over a few video sites and many CDN hosts
+    """
+    rng = random.Random(1)
+    hosts = ['www.youtube.com', 'youtu.be', 'vimeo.com', 'www.tiktok.com', 'cdn{}.example.net']
+    urls = [f'https://{rng.choice(hosts).format(rng.randrange(500))}/watch?v={index}'
+            for index in range(count)]
+    started = time.perf_counter()
+    classify_many(urls, processes=1)
+    return {'urls': count, 'urls_per_second': count / (time.perf_counter() - started)}
+
+
+@benchmark('startup')
+def startup() -> Dict[str, Any]:
+    """Import time of src.gui.main_window in a fresh interpreter and the
+    time from starting src/main.py to the window's first paint."""
+    modules = measure_imports('src.gui.main_window', cwd=ROOT)
+    report = run_first_paint_probe(ROOT)
+    return {'import_ms': modules['src.gui.main_window'][1] / 1000,
+            'imported_modules': len(modules),
+            'first_paint_ms': report['first_paint_ms']}
+
+
+@benchmark('ydl_pool')
+def ydl_pool(jobs: int = 8) -> Dict[str, Any]:
+    """Short clips through the real extractor set: warm instances skip the
+    per-job YoutubeDL construction.
+
+    Args:
+        jobs: Measured clips per mode
+    """
+    workdir = tempfile.mkdtemp(prefix='vidleech-bench-')
+    results: Dict[str, Any] = {'jobs': jobs}
+    try:
+        with MediaFarm() as farm:
+            for mode, pool_size in (('fresh', 0), ('pooled', 8)):
+                downloader = VideoDownloader(pool_size=pool_size)
+                urls = [farm.add_progressive(f'{mode}{index}', 2048) for index in range(jobs + 1)]
+                output = os.path.join(workdir, mode)
+                # Imports and extractor regexes are warmed up by the first clip
+                downloader.fetch(urls[0], output)
+                started = time.perf_counter()
+                for url in urls[1:]:
+                    downloader.fetch(url, output)
+                results[f'{mode}_seconds_per_job'] = (time.perf_counter() - started) / jobs
+                downloader.close()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return results
+
+
+def run_components(names: Optional[List[str]] = None,
+                   log: Optional[Callable[[str], None]] = None) -> Dict[str, Any]:
+    """Run component benchmarks.
+
+    Args:
+        names: Benchmarks to run; defaults to all of BENCHMARKS
+        log: Receives a line per finished benchmark
+
+    Returns:
+        Dict[str, Any]: JSON-serializable figures per benchmark
+    """
+    results = {}
+    for name in names or list(BENCHMARKS):
+        results[name] = BENCHMARKS[name]()
+        if log is not None:
+            log(f'{name}: ' + ', '.join(
+                f'{key} {value:.4g}' if isinstance(value, float) else f'{key} {value}'
+                for key, value in results[name].items()))
+    return results
@@ -0,0 +1,342 @@
+"""
+Local HTTP media farm for the benchmarks.
+
+Serves synthetic media from memory: progressive MP4 files, HLS and DASH
+streams of MP4/TS segments, and HTML pages embedding several videos.
+Network conditions are simulated per request (latency) and per
+connection (bandwidth), and a seeded share of media requests fail with a
+503 or a connection reset halfway through the body, so runs are
+repeatable. Manifests and pages are never failed. yt-dlp does not retry
+the generic extractor's check of a direct link's type, so progressive
+media that should see failures is embedded in a page.
+"""
+import functools
+import multiprocessing
+import os
+import random
+import re
+import struct
+import threading
+import time
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+
+_CHUNK_SIZE = 16 * 1024
+
+
+@dataclass
+class NetworkProfile:
+    """Simulated network conditions.
+
+    Attributes:
+        latency: Seconds before each response starts
+        bandwidth: Bytes per second per connection; None is unthrottled
+        error_rate: Share of media requests answered with a 503
+        reset_rate: Share of media requests cut off halfway through the body
+        seed: Seeds the choice of failing requests
+    """
+    latency: float = 0.0
+    bandwidth: Optional[float] = None
+    error_rate: float = 0.0
+    reset_rate: float = 0.0
+    seed: int = 0
+
+
+@dataclass
+class RequestRecord:
+    """One request served by the farm."""
+    path: str
+    status: int
+    body_bytes: int = 0
+    injected: Optional[str] = None
+
+
+@dataclass
+class _Resource:
+    payload: bytes
+    content_type: str
+    # Manifests and pages are never throttled or failed
+    media: bool = True
+
+
+def synthetic_mp4(size: int) -> bytes:
+    """Random bytes behind an ISO BMFF 'ftyp' box, so the payload sniffs as MP4."""
+    ftyp = struct.pack('>I4s4sI4s4s', 24, b'ftyp', b'isom', 512, b'isom', b'mp41')
+    return ftyp + os.urandom(max(0, size - len(ftyp)))
+
+
+class MediaFarm:
+    """Serves synthetic media with simulated network conditions.
+
+    Attributes:
+        profile: Network conditions, changeable between requests
+        requests: Log of served requests
+    """
+
+    def __init__(self, profile: Optional[NetworkProfile] = None):
+        self.profile = profile or NetworkProfile()
+        self.requests: List[RequestRecord] = []
+        self._resources: Dict[str, _Resource] = {}
+        self._lock = threading.Lock()
+        self._random = random.Random(self.profile.seed)
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), self._make_handler())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, name='media-farm',
+                                        daemon=True)
+
+    def __enter__(self) -> 'MediaFarm':
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def set_profile(self, profile: NetworkProfile) -> None:
+        """Switch network conditions and reseed the injected failures."""
+        with self._lock:
+            self.profile = profile
+            self._random = random.Random(profile.seed)
+
+    def url(self, path: str) -> str:
+        host, port = self._server.server_address
+        return f'http://{host}:{port}{path}'
+
+    def add(self, path: str, payload: bytes, content_type: str, media: bool = True) -> str:
+        """Serve a payload.
+
+        Args:
+            path: URL path
+            payload: Response body
+            content_type: Content-Type header
+            media: Subject to bandwidth limits and injected failures
+
+        Returns:
+            str: Its URL
+        """
+        self._resources[path] = _Resource(payload, content_type, media)
+        return self.url(path)
+
+    def add_progressive(self, name: str, size: int) -> str:
+        """Serve a single MP4 file; returns its URL."""
+        return self.add(f'/{name}.mp4', synthetic_mp4(size), 'video/mp4')
+
+    def add_hls(self, name: str, segments: int, segment_size: int) -> str:
+        """Serve an HLS media playlist of MPEG-TS segments; returns its URL."""
+        lines = ['#EXTM3U', '#EXT-X-VERSION:3', '#EXT-X-TARGETDURATION:2', '#EXT-X-MEDIA-SEQUENCE:0']
+        for index in range(segments):
+            # 0x47 is the MPEG-TS sync byte
+            self.add(f'/{name}/seg{index}.ts', b'\x47' + os.urandom(segment_size - 1), 'video/mp2t')
+            lines += ['#EXTINF:2.0,', f'seg{index}.ts']
+        lines.append('#EXT-X-ENDLIST')
+        return self.add(f'/{name}/index.m3u8', '\n'.join(lines).encode(),
+                        'application/vnd.apple.mpegurl', media=False)
+
+    def add_dash(self, name: str, segments: int, segment_size: int) -> str:
+        """Serve a static DASH manifest with one video representation;
+        returns its URL."""
+        self.add(f'/{name}/init.mp4', synthetic_mp4(1024), 'video/mp4')
+        for index in range(1, segments + 1):
+            self.add(f'/{name}/seg{index}.m4s', os.urandom(segment_size), 'video/iso.segment')
+        bandwidth = segment_size * 8 // 2
+        manifest = f'''<?xml version="1.0" encoding="UTF-8"?>
+<MPD xmlns="urn:mpeg:dash:schema:mpd:2011" type="static" minBufferTime="PT2S"
+     mediaPresentationDuration="PT{segments * 2}S" profiles="urn:mpeg:dash:profile:isoff-live:2011">
+  <Period id="0">
+    <AdaptationSet mimeType="video/mp4" contentType="video" segmentAlignment="true">
+      <Representation id="video" bandwidth="{bandwidth}" codecs="avc1.4d401f" width="640" height="360">
+        <SegmentTemplate timescale="1" duration="2" startNumber="1"
+                         initialization="init.mp4" media="seg$Number$.m4s"/>
+      </Representation>
+    </AdaptationSet>
+  </Period>
+</MPD>
+'''
+        return self.add(f'/{name}/manifest.mpd', manifest.encode(), 'application/dash+xml', media=False)
+
+    def add_page(self, name: str, videos: int, size: int) -> str:
+        """Serve an HTML page embedding MP4 videos; returns its URL.
+
+        yt-dlp's generic extractor turns a page with several videos into a
+        playlist.
+        """
+        tags = []
+        for index in range(videos):
+            self.add_progressive(f'{name}/video{index}', size)
+            tags.append(f'<video controls><source src="video{index}.mp4" type="video/mp4"></video>')
+        page = (f'<!DOCTYPE html><html><head><title>{name}</title></head>'
+                f'<body>{"".join(tags)}</body></html>')
+        return self.add(f'/{name}/index.html', page.encode(), 'text/html; charset=utf-8', media=False)
+
+    def take_requests(self) -> List[RequestRecord]:
+        """Return the requests served since the last call and clear the log."""
+        with self._lock:
+            records, self.requests = self.requests, []
+        return records
+
+    def _inject(self, resource: _Resource) -> Optional[str]:
+        if not resource.media:
+            return None
+        with self._lock:
+            roll = self._random.random()
+            if roll < self.profile.error_rate:
+                return 'error'
+            if roll < self.profile.error_rate + self.profile.reset_rate:
+                return 'reset'
+        return None
+
+    def _make_handler(self):
+        farm = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, *args):
+                pass
+
+            def do_HEAD(self):
+                self._serve(head=True)
+
+            def do_GET(self):
+                self._serve(head=False)
+
+            def _serve(self, head: bool) -> None:
+                path = self.path.split('?', 1)[0]
+                record = RequestRecord(path, 200)
+                with farm._lock:
+                    farm.requests.append(record)
+                profile = farm.profile
+                if profile.latency:
+                    time.sleep(profile.latency)
+                resource = farm._resources.get(path)
+                if resource is None:
+                    record.status = 404
+                    self._empty(404)
+                    return
+                if not head:
+                    record.injected = farm._inject(resource)
+                if record.injected == 'error':
+                    record.status = 503
+                    self._empty(503)
+                    return
+                start, end = self._range(len(resource.payload))
+                if start is None:
+                    record.status = 416
+                    self._empty(416, {'Content-Range': f'bytes */{len(resource.payload)}'})
+                    return
+                partial = end - start + 1 < len(resource.payload)
+                record.status = 206 if partial else 200
+                self.send_response(record.status)
+                self.send_header('Content-Type', resource.content_type)
+                self.send_header('Content-Length', str(end - start + 1))
+                self.send_header('Accept-Ranges', 'bytes')
+                if partial:
+                    self.send_header('Content-Range', f'bytes {start}-{end}/{len(resource.payload)}')
+                self.end_headers()
+                if head:
+                    return
+                if record.injected == 'reset':
+                    end = start + (end - start) // 2
+                try:
+                    self._send_body(resource.payload, start, end, profile.bandwidth, record)
+                except (BrokenPipeError, ConnectionResetError):
+                    return
+                if record.injected == 'reset':
+                    self.close_connection = True
+
+            def _range(self, size: int) -> Tuple[Optional[int], int]:
+                match = re.match(r'bytes=(\d+)-(\d*)', self.headers.get('Range') or '')
+                if not match:
+                    return 0, size - 1
+                start = int(match.group(1))
+                end = min(int(match.group(2)), size - 1) if match.group(2) else size - 1
+                return (start, end) if start <= end else (None, 0)
+
+            def _send_body(self, payload: bytes, start: int, end: int,
+                           bandwidth: Optional[float], record: RequestRecord) -> None:
+                offset = start
+                began = time.perf_counter()
+                while offset <= end:
+                    chunk = payload[offset:min(offset + _CHUNK_SIZE, end + 1)]
+                    self.wfile.write(chunk)
+                    offset += len(chunk)
+                    record.body_bytes += len(chunk)
+                    if bandwidth:
+                        # Paced against the start, so sleep overshoot evens out
+                        delay = began + record.body_bytes / bandwidth - time.perf_counter()
+                        if delay > 0:
+                            time.sleep(delay)
+
+            def _empty(self, status: int, headers: Optional[Dict[str, str]] = None) -> None:
+                self.send_response(status)
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+
+        return Handler
+
+
+class RemoteFarm:
+    """A MediaFarm in a child process.
+
+    Serving then costs the benchmarked process neither CPU time nor memory
+    for the payloads. Has the same methods for adding media, set_profile()
+    and take_requests().
+    """
+
+    def __init__(self, profile: Optional[NetworkProfile] = None):
+        context = multiprocessing.get_context('spawn')
+        self._conn, child = context.Pipe()
+        self._process = context.Process(target=_serve, args=(child, profile), name='media-farm',
+                                        daemon=True)
+        self._process.start()
+        child.close()
+        self._call('start')
+
+    def __enter__(self) -> 'RemoteFarm':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+    def stop(self) -> None:
+        if self._process.is_alive():
+            self._call('stop')
+        self._process.join()
+        self._conn.close()
+
+    def _call(self, method: str, *args):
+        self._conn.send((method, args))
+        ok, value = self._conn.recv()
+        if not ok:
+            raise value
+        return value
+
+    def __getattr__(self, name: str):
+        if name not in _REMOTE_METHODS:
+            raise AttributeError(name)
+        return functools.partial(self._call, name)
+
+
+_REMOTE_METHODS = ('url', 'add', 'add_progressive', 'add_hls', 'add_dash', 'add_page',
+                   'set_profile', 'take_requests')
+
+
+def _serve(conn, profile: Optional[NetworkProfile]) -> None:
+    farm = MediaFarm(profile)
+    while True:
+        method, args = conn.recv()
+        try:
+            conn.send((True, getattr(farm, method)(*args)))
+        except Exception as e:
+            conn.send((False, e))
+        if method == 'stop':
+            break
@@ -0,0 +1,135 @@
+"""
+Memory benchmark: bytes per queued job and per kept video.
+
+Measured with tracemalloc, so only Python allocations count and the
+numbers do not depend on the allocator or on what else the process holds:
+
+    bytes_per_job     A DownloadJob in a paused DownloadQueue, URL included
+    info_dict_bytes   A yt-dlp info dict of a video with DASH formats,
+                      signed URLs, headers and fragment lists
+    record_bytes      The VideoRecord kept of the same info dict
+"""
+import gc
+import tracemalloc
+from typing import Any, Callable, Dict, List
+
+from src.core.download_queue import DownloadQueue
+from src.core.records import VideoRecord
+
+_CODECS = [('avc1.640028', 'none', 'mp4'), ('vp9', 'none', 'webm'), ('none', 'mp4a.40.2', 'm4a'),
+           ('none', 'opus', 'webm')]
+_HEIGHTS = (144, 240, 360, 480, 720, 1080, 1440, 2160)
+
+
+def synthetic_info(index: int, formats: int = 32, fragments: int = 40) -> Dict[str, Any]:
+    """An info dict shaped like a large site's: adaptive formats with
+    signed URLs, request headers and fragment lists."""
+    video_id = f'v{index:010d}'
+    signature = 'x' * 400
+    headers = {
+        'User-Agent': 'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) '
+                      'Chrome/120.0 Safari/537.36',
+        'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
+        'Accept-Language': 'en-us,en;q=0.5',
+        'Sec-Fetch-Mode': 'navigate',
+    }
+    entries = []
+    for number in range(formats):
+        vcodec, acodec, ext = _CODECS[number % len(_CODECS)]
+        height = _HEIGHTS[number % len(_HEIGHTS)] if vcodec != 'none' else None
+        base = f'https://media.example.com/videoplayback/{video_id}/itag/{number}'
+        entries.append({
+            'format_id': str(100 + number),
+            'format_note': f'{height}p' if height else 'medium',
+            'ext': ext,
+            'protocol': 'https',
+            'url': f'{base}?expire=1700000000&sig={signature}{number}',
+            'manifest_url': f'https://media.example.com/manifest/{video_id}.mpd?sig={signature}',
+            'width': height * 16 // 9 if height else None,
+            'height': height,
+            'fps': 30 if height else None,
+            'vcodec': vcodec,
+            'acodec': acodec,
+            'tbr': 100.0 + number * 37.5,
+            'filesize': 1_000_000 + number * 123_457,
+            'http_headers': dict(headers),
+            'fragments': [{'url': f'{base}/sq/{sq}?sig={signature}', 'duration': 5.0}
+                          for sq in range(fragments)],
+            'downloader_options': {'http_chunk_size': 10485760},
+        })
+    return {
+        'id': video_id,
+        'title': f'Synthetic video {index}',
+        'description': 'A description of a synthetic video. ' * 20,
+        'webpage_url': f'https://www.example.com/watch?v={video_id}',
+        'original_url': f'https://www.example.com/watch?v={video_id}',
+        'extractor': 'example',
+        'extractor_key': 'Example',
+        'duration': 600,
+        'uploader': 'Synthetic channel',
+        'thumbnail': f'https://img.example.com/{video_id}/hq.jpg',
+        'thumbnails': [{'url': f'https://img.example.com/{video_id}/{size}.jpg', 'id': str(size)}
+                       for size in range(20)],
+        'tags': [f'tag{tag}' for tag in range(15)],
+        'formats': entries,
+        'requested_formats': [entries[5], entries[2]],
+        'format_id': f"{entries[5]['format_id']}+{entries[2]['format_id']}",
+        'http_headers': dict(headers),
+    }
+
+
+def _allocated(build: Callable[[], Any]) -> int:
+    """Bytes still allocated by build() while its result is alive."""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        kept = build()
+        gc.collect()
+        size = tracemalloc.get_traced_memory()[0] - before
+        del kept
+    finally:
+        tracemalloc.stop()
+    return size
+
+
+def bytes_per_job(count: int = 10000) -> float:
+    """Average memory of a job waiting in a queue."""
+    queue = DownloadQueue(lambda job, report: None)
+    queue.pause()
+
+    def build() -> None:
+        for index in range(count):
+            queue.add(f'https://www.example.com/watch?v=v{index:010d}', '/downloads')
+
+    return _allocated(build) / count
+
+
+def bytes_per_video(count: int = 50) -> Dict[str, float]:
+    """Average memory of a kept info dict and of its VideoRecord."""
+    def infos() -> List[Dict[str, Any]]:
+        return [synthetic_info(index) for index in range(count)]
+
+    def records() -> List[VideoRecord]:
+        return [VideoRecord.from_info(synthetic_info(index)) for index in range(count)]
+
+    return {'info_dict_bytes': _allocated(infos) / count,
+            'record_bytes': _allocated(records) / count}
+
+
+def run_memory(jobs: int = 10000, videos: int = 50) -> Dict[str, Any]:
+    """Run the memory benchmark.
+
+    Args:
+        jobs: Jobs queued for the per-job figure
+        videos: Videos built for the per-video figures
+
+    Returns:
+        Dict[str, Any]: JSON-serializable results
+    """
+    return {
+        'jobs': jobs,
+        'videos': videos,
+        'bytes_per_job': bytes_per_job(jobs),
+        **bytes_per_video(videos),
+    }
@@ -0,0 +1,295 @@
+"""
+Benchmark scenarios and the per-job measurements.
+
+Every scenario publishes its media on a RemoteFarm and downloads it with
+VideoDownloader a number of times, one job after another, so process-wide
+counters can be attributed to the job running:
+
+    throughput   Bytes of output files per second of the whole job,
+                 extraction included
+    ttfb         Seconds from the start of the job to the first media byte
+                 reaching the downloader
+    peak_rss     Highest resident set size sampled during the job
+    cpu_seconds  User and system CPU time of the process and its children
+"""
+import datetime
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from dataclasses import asdict, dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+
+from benchmarks.farm import NetworkProfile, RemoteFarm
+from src.core.downloader import VideoDownloader, preload_backend
+
+RESULTS_FORMAT = 1
+MIB = 1024 * 1024
+
+
+@dataclass
+class Scenario:
+    """A kind of media served under some network conditions.
+
+    Attributes:
+        name: Identifies the scenario in results
+        kind: 'progressive' (a direct link), 'hls', 'dash' or 'page' (a
+            web page embedding progressive videos)
+        size: Bytes per video
+        segments: Segments of HLS/DASH streams
+        videos: Videos on a page
+        profile: Network conditions
+        options: Keyword arguments for VideoDownloader.fetch(), e.g.
+            connections or concurrent_fragments
+    """
+    name: str
+    kind: str
+    size: int
+    segments: int = 0
+    videos: int = 1
+    profile: NetworkProfile = field(default_factory=NetworkProfile)
+    options: Dict[str, Any] = field(default_factory=dict)
+
+    def publish(self, farm: RemoteFarm, scale: float = 1.0) -> str:
+        """Add the scenario's media to a farm.
+
+        Returns:
+            str: URL to download
+        """
+        size = max(1024, int(self.size * scale))
+        if self.kind == 'progressive':
+            return farm.add_progressive(self.name, size)
+        if self.kind == 'hls':
+            return farm.add_hls(self.name, self.segments, max(188, size // self.segments))
+        if self.kind == 'dash':
+            return farm.add_dash(self.name, self.segments, max(188, size // self.segments))
+        if self.kind == 'page':
+            return farm.add_page(self.name, self.videos, size)
+        raise ValueError(f'Unknown scenario kind: {self.kind}')
+
+
+SCENARIOS = [
+    Scenario('progressive', 'progressive', 32 * MIB),
+    Scenario('progressive-throttled', 'progressive', 4 * MIB,
+             profile=NetworkProfile(latency=0.05, bandwidth=2 * MIB)),
+    Scenario('progressive-segmented', 'progressive', 4 * MIB,
+             profile=NetworkProfile(latency=0.05, bandwidth=2 * MIB), options={'connections': 4}),
+    Scenario('hls', 'hls', 8 * MIB, segments=64, profile=NetworkProfile(latency=0.02),
+             options={'concurrent_fragments': 1}),
+    Scenario('hls-parallel', 'hls', 8 * MIB, segments=64, profile=NetworkProfile(latency=0.02),
+             options={'concurrent_fragments': 4}),
+    Scenario('dash', 'dash', 8 * MIB, segments=64, profile=NetworkProfile(latency=0.02),
+             options={'concurrent_fragments': 1}),
+    Scenario('playlist', 'page', 2 * MIB, videos=5, profile=NetworkProfile(latency=0.02)),
+    # Only HLS fragments are retried; a failed progressive or DASH init
+    # request fails the job
+    Scenario('flaky-hls', 'hls', 4 * MIB, segments=32,
+             profile=NetworkProfile(error_rate=0.1, reset_rate=0.1, seed=7),
+             options={'concurrent_fragments': 1}),
+]
+
+
+@dataclass
+class JobResult:
+    """Measurements of one download."""
+    ok: bool
+    seconds: float
+    bytes: int
+    throughput: float
+    ttfb: Optional[float]
+    peak_rss: Optional[int]
+    cpu_seconds: float
+    requests: int
+    injected_failures: int
+    error: Optional[str] = None
+
+
+class _TimedDownloader(VideoDownloader):
+    """Records when the first media byte arrives."""
+    first_byte: Optional[float] = None
+
+    def _progress_hook(self, d: Dict[str, Any], job=None) -> None:
+        if self.first_byte is None and d.get('downloaded_bytes'):
+            self.first_byte = time.perf_counter()
+        super()._progress_hook(d, job)
+
+
+class _PeakRss:
+    """Samples the resident set size on a thread while a job runs."""
+
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.peak = _rss()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._sample, name='rss-sampler', daemon=True)
+
+    def __enter__(self) -> '_PeakRss':
+        if self.peak is not None:
+            self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self._stop.set()
+        if self._thread.is_alive():
+            self._thread.join()
+        if self.peak is None:
+            self.peak = _max_rss()
+
+    def _sample(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, _rss() or 0)
+
+
+def _rss() -> Optional[int]:
+    """Current resident set size, where /proc exposes it."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def _max_rss() -> Optional[int]:
+    """Peak resident set size of the whole process so far."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes everywhere but macOS
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def _cpu_seconds() -> float:
+    times = os.times()
+    return times.user + times.system + times.children_user + times.children_system
+
+
+def _directory_size(path: str) -> int:
+    return sum(entry.stat().st_size for entry in os.scandir(path) if entry.is_file())
+
+
+def run_job(downloader: _TimedDownloader, farm: RemoteFarm, url: str, output: str,
+            options: Dict[str, Any]) -> JobResult:
+    """Download a URL into an empty directory and measure it."""
+    farm.take_requests()
+    downloader.first_byte = None
+    error = None
+    cpu = _cpu_seconds()
+    with _PeakRss() as rss:
+        started = time.perf_counter()
+        try:
+            downloader.fetch(url, output, **options)
+        except Exception as e:
+            error = str(e)
+        seconds = time.perf_counter() - started
+    cpu = _cpu_seconds() - cpu
+    size = _directory_size(output)
+    requests = farm.take_requests()
+    return JobResult(
+        ok=error is None,
+        seconds=seconds,
+        bytes=size,
+        throughput=size / seconds if seconds > 0 else 0.0,
+        ttfb=downloader.first_byte - started if downloader.first_byte is not None else None,
+        peak_rss=rss.peak,
+        cpu_seconds=cpu,
+        requests=len(requests),
+        injected_failures=sum(1 for record in requests if record.injected),
+        error=error,
+    )
+
+
+def summarize(jobs: List[JobResult]) -> Dict[str, Any]:
+    """Scenario figures compared between runs: medians of the successful
+    jobs, the highest peak RSS and the number of failed jobs."""
+    done = [job for job in jobs if job.ok]
+
+    def median(name: str) -> Optional[float]:
+        values = [getattr(job, name) for job in done if getattr(job, name) is not None]
+        return statistics.median(values) if values else None
+
+    peaks = [job.peak_rss for job in done if job.peak_rss is not None]
+    return {
+        'jobs': len(jobs),
+        'failures': len(jobs) - len(done),
+        'throughput': median('throughput'),
+        'ttfb': median('ttfb'),
+        'cpu_seconds': median('cpu_seconds'),
+        'peak_rss': max(peaks) if peaks else None,
+    }
+
+
+def environment() -> Dict[str, Any]:
+    """What a run's numbers depend on besides the code."""
+    from yt_dlp.version import __version__ as yt_dlp_version
+    return {
+        'python': platform.python_version(),
+        'yt_dlp': yt_dlp_version,
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'cpus': os.cpu_count(),
+    }
+
+
+def run_suite(scenarios: Optional[List[Scenario]] = None, repeat: int = 3, warmup: int = 1,
+              scale: float = 1.0, workdir: Optional[str] = None,
+              log: Optional[Callable[[str], None]] = None) -> Dict[str, Any]:
+    """Run scenarios and collect their results.
+
+    Args:
+        scenarios: Defaults to SCENARIOS
+        repeat: Measured jobs per scenario
+        warmup: Unmeasured jobs first, which warm the yt-dlp instances
+        scale: Multiplies every media size, e.g. 0.1 for a quick run
+        workdir: Downloads go here; defaults to a temporary directory
+        log: Receives a line per finished job
+
+    Returns:
+        Dict[str, Any]: JSON-serializable results
+    """
+    scenarios = SCENARIOS if scenarios is None else scenarios
+    # Importing yt-dlp is not part of any job
+    preload_backend().join()
+    results = {
+        'format': RESULTS_FORMAT,
+        'created': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+        'environment': environment(),
+        'settings': {'repeat': repeat, 'warmup': warmup, 'scale': scale},
+        'scenarios': {},
+    }
+    root = tempfile.mkdtemp(prefix='vidleech-bench-', dir=workdir)
+    try:
+        with RemoteFarm() as farm:
+            for scenario in scenarios:
+                farm.set_profile(scenario.profile)
+                url = scenario.publish(farm, scale)
+                downloader = _TimedDownloader(pool_size=1)
+                jobs = []
+                for index in range(warmup + repeat):
+                    output = os.path.join(root, f'{scenario.name}-{index}')
+                    os.makedirs(output)
+                    job = run_job(downloader, farm, url, output, scenario.options)
+                    shutil.rmtree(output, ignore_errors=True)
+                    if index < warmup:
+                        continue
+                    jobs.append(job)
+                    if log is not None:
+                        log(f'{scenario.name} #{len(jobs)}: ' + (
+                            f'{job.throughput / MIB:.1f} MiB/s, ttfb {job.ttfb or 0:.3f} s, '
+                            f'cpu {job.cpu_seconds:.2f} s' if job.ok else f'failed: {job.error}'))
+                downloader.close()
+                config = asdict(scenario)
+                config.pop('name')
+                results['scenarios'][scenario.name] = {
+                    'config': config,
+                    'jobs': [asdict(job) for job in jobs],
+                    'summary': summarize(jobs),
+                }
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+    return results
@@ -5,6 +5,7 @@ Build script for creating the Vidleech standalone executable.
 import os
 import shutil
 import subprocess
+import sys
 from pathlib import Path
 
 def clean_build():
@@ -20,6 +21,11 @@ def clean_build():
     if os.path.exists(spec_file):
         os.remove(spec_file)
 
+def build_extractor_index():
+    """Index yt-dlp's extractors so the app can check URLs without loading them."""
+    print("Building extractor index...")
+    subprocess.run([sys.executable, '-m', 'src.core.extractor_index'], check=True)
+
 def build_executable():
     """Build the standalone executable."""
     print("Building Vidleech executable...")
@@ -32,6 +38,7 @@ def build_executable():
         '--noconsole',
         '--clean',
         '--add-data=LICENSE;.',
+        '--add-data=src/resources/extractor_index.json;src/resources',
         '--hidden-import=PyQt6.sip',
         'src/main.py'
     ]
@@ -59,6 +66,7 @@ def main():
     clean_build()
     
     # Create build
+    build_extractor_index()
     if build_executable():
         print("\nBuild completed successfully!")
     else:
@@ -0,0 +1,432 @@
+#!/usr/bin/env python3
+"""
+Vidleech command line interface - headless batch and daemon downloads.
+
+URLs come from arguments, a file (--input FILE) or stdin (--input -, or
+piped input when no URLs are given). One JSON object per line is written to
+stdout for every job event:
+
+    {"event": "queued", "id": 1, "url": "..."}
+    {"event": "progress", "id": 1, "percent": 42.0, "status": "...", "speed": ..., "eta": ...}
+    {"event": "processing", "id": 1, "url": "..."}  (downloaded; merging or converting)
+    {"event": "done", "id": 1, "url": "...", "filename": "..."}
+    {"event": "expanded", "id": 2, "url": "..."}  (playlist; entries follow as jobs)
+    {"event": "skipped", "id": 3, "url": "..."}  (already in the download archive)
+    {"event": "deferred", "id": 4, "url": "...", "status": "..."}  (not enough disk space yet)
+    {"event": "unsupported", "url": "..."}  (--supported-only; not queued)
+    {"event": "failed", "id": 1, "url": "...", "error": "..."}
+    {"event": "summary", "total": 2, "done": 1, "failed": 1, ...}
+
+Unfinished jobs are kept in a journal. SIGTERM or SIGINT pause running
+jobs, keeping their partial files, and --resume picks up jobs left over by
+an interrupted or crashed run from their last offset. Finished downloads
+are added to the download history shared with the GUI, and videos already
+in the download archive are skipped unless --no-archive is given.
+
+A download whose estimated size does not fit in the free disk space is
+deferred and retried when other downloads finish or space frees up; jobs
+still deferred at the end of a batch count as failed and stay in the
+journal for --resume.
+
+With --stream the media is written to stdout, a named pipe or an open
+file descriptor instead of files, one download after another and without
+temporary files; events then go to stderr if the media goes to stdout.
+
+--metrics FILE appends a JSON line per finished job with its phase
+timings (extract, select, download, rename, postprocess, finalize), bytes,
+retries, HTTP status classes and error type. --prometheus FILE keeps
+aggregate metrics in the Prometheus text format up to date and
+--metrics-port PORT serves them at http://127.0.0.1:PORT/metrics.
+
+--max-size SIZE downloads the best formats of the chosen -f selection
+whose predicted size fits in SIZE, planned from the format list of the
+video's extraction; videos with no such formats fail. --prefer-copy ranks
+formats that merge into MP4 or WebM without re-encoding first.
+
+With --daemon the process keeps running after the initial URLs finish,
+reading new URLs from stdin and from *.urls files dropped into --watch
+directories (processed files are renamed to *.urls.done). The daemon always
+resumes leftover jobs and exits cleanly on SIGTERM or SIGINT.
+
+Exit codes: 0 all downloads succeeded, 1 all failed, 2 usage error,
+3 some failed, 130 interrupted.
+"""
+import argparse
+import glob
+import json
+import multiprocessing
+import os
+import signal
+import sys
+import threading
+from typing import IO, Dict, Iterable, List, Optional, Tuple
+
+# Allow running as a script from a source checkout
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.core.download_queue import DownloadJob, DownloadQueue, JobState
+from src.core.archive import DownloadArchive
+from src.core.audio import AUDIO_FORMATS, parse_audio_quality
+from src.core.bandwidth import BandwidthLimiter, parse_rate, parse_schedule_rule
+from src.core.downloader import VideoDownloader
+from src.core.extractor_index import default_index
+from src.core.fragment_tuner import FragmentTuner
+from src.core.history import DownloadHistory
+from src.core.journal import JobJournal
+from src.core.metadata_cache import MetadataCache
+from src.core.metrics import JsonLinesExporter, Metrics, PrometheusFileExporter
+from src.core.playlist import PlaylistExpander
+from src.core.postprocess import PostProcessPool
+from src.core.storage import DEFAULT_BUFFER_SIZE, Storage
+from src.core.stream import StreamSink
+
+EXIT_OK = 0
+EXIT_FAILED = 1
+EXIT_USAGE = 2
+EXIT_PARTIAL = 3
+EXIT_INTERRUPTED = 130
+
+FORMATS = ('best', 'hd', 'sd', 'audio')
+WATCH_INTERVAL = 1.0
+
+
+def read_urls(lines: Iterable[str]) -> List[str]:
+    """Extract URLs from text lines, skipping blanks and '#' comments."""
+    urls = []
+    for line in lines:
+        line = line.strip()
+        if line and not line.startswith('#'):
+            urls.append(line)
+    return urls
+
+
+class JsonLinesReporter:
+    """Queue listener that writes job events to a stream as JSON lines.
+
+    Listeners are called for every change, including repeated progress
+    updates, so only transitions and new progress values are written.
+    """
+
+    def __init__(self, stream: IO[str]):
+        self.stream = stream
+        self._lock = threading.Lock()
+        self._last: Dict[int, Tuple] = {}
+
+    def write(self, event: str, **fields) -> None:
+        """Write a single event line."""
+        line = json.dumps({'event': event, **fields})
+        with self._lock:
+            self.stream.write(line + '\n')
+            self.stream.flush()
+
+    def __call__(self, job: DownloadJob) -> None:
+        key = (job.state, round(job.progress, 1), job.status)
+        with self._lock:
+            if self._last.get(job.id) == key:
+                return
+            previous = self._last.get(job.id, (None,))[0]
+            self._last[job.id] = key
+        if job.state == JobState.RUNNING:
+            if previous == JobState.RUNNING:
+                self.write('progress', id=job.id, percent=round(job.progress, 1), status=job.status,
+                           speed=job.speed, eta=job.eta)
+            else:
+                self.write('started', id=job.id, url=job.url)
+        elif job.state == previous:
+            return
+        elif job.state == JobState.QUEUED:
+            self.write('queued', id=job.id, url=job.url)
+        elif job.state == JobState.PROCESSING:
+            self.write('processing', id=job.id, url=job.url)
+        elif job.state == JobState.DONE and job.playlist:
+            self.write('expanded', id=job.id, url=job.url)
+        elif job.state == JobState.DONE:
+            self.write('done', id=job.id, url=job.url, filename=job.filename)
+        elif job.state == JobState.SKIPPED:
+            self.write('skipped', id=job.id, url=job.url)
+        elif job.state == JobState.FAILED:
+            self.write('failed', id=job.id, url=job.url, error=job.error)
+        elif job.state == JobState.CANCELLED:
+            self.write('cancelled', id=job.id, url=job.url)
+        elif job.state == JobState.PAUSED:
+            self.write('paused', id=job.id, url=job.url)
+        elif job.state == JobState.DEFERRED:
+            self.write('deferred', id=job.id, url=job.url, status=job.status)
+
+    def summary(self, jobs: List[DownloadJob]) -> Dict[str, int]:
+        """Write and return per-state job counts."""
+        counts = {'total': len(jobs)}
+        for state in JobState:
+            counts[state.value] = sum(1 for job in jobs if job.state == state)
+        self.write('summary', **counts)
+        return counts
+
+
+def exit_code(jobs: List[DownloadJob]) -> int:
+    """Exit status for a finished batch."""
+    failed = sum(1 for job in jobs if job.state in (JobState.FAILED, JobState.DEFERRED))
+    if not failed:
+        return EXIT_OK
+    if failed == len(jobs):
+        return EXIT_FAILED
+    return EXIT_PARTIAL
+
+
+def parse_size(text: str) -> int:
+    """Parse a byte count such as '512K' or '4M'."""
+    size = parse_rate(text)
+    if not size or size < 1:
+        raise argparse.ArgumentTypeError(f'invalid size: {text!r}')
+    return int(size)
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog='vidleech-cli',
+        description='Download videos without the GUI, reporting progress as JSON lines.'
+    )
+    parser.add_argument('urls', nargs='*', metavar='URL', help='Video URLs to download')
+    parser.add_argument('-i', '--input', metavar='FILE',
+                        help="Read URLs from FILE, one per line ('-' for stdin)")
+    parser.add_argument('-o', '--output', default='.', metavar='DIR',
+                        help='Output directory (default: current directory)')
+    parser.add_argument('-f', '--format', default='best', choices=FORMATS,
+                        help='Format to download (default: best)')
+    parser.add_argument('--audio-format', default='best', choices=AUDIO_FORMATS,
+                        help="Codec for -f audio; 'best' keeps the source codec (default: best)")
+    parser.add_argument('--audio-quality', type=parse_audio_quality, metavar='Q',
+                        help='Bitrate such as 192K, or VBR level 0 (best) to 10, for converted audio')
+    parser.add_argument('--max-size', type=parse_size, metavar='SIZE',
+                        help='Download the best formats predicted to fit in SIZE, e.g. 500M')
+    parser.add_argument('--prefer-copy', action='store_true',
+                        help='Prefer formats that merge into MP4 or WebM without re-encoding')
+    parser.add_argument('--stream', metavar='TARGET',
+                        help="Write the media to TARGET instead of files: '-' for stdout, a named "
+                             "pipe, or fd:N; downloads run one at a time")
+    parser.add_argument('-j', '--jobs', type=int, default=3, metavar='N',
+                        help='Maximum concurrent downloads (default: 3)')
+    parser.add_argument('--per-host', type=int, default=2, metavar='N',
+                        help='Maximum concurrent downloads per host (default: 2)')
+    parser.add_argument('-c', '--connections', type=int, default=1, metavar='N',
+                        help='Ranged connections per progressive HTTP download (default: 1)')
+    parser.add_argument('--fragments', type=int, metavar='N',
+                        help='HLS/DASH fragments fetched in parallel (default: tuned per host)')
+    parser.add_argument('--write-buffer', type=parse_size, default=DEFAULT_BUFFER_SIZE, metavar='SIZE',
+                        help='Write buffer per downloaded file, e.g. 4M (default: 1M)')
+    parser.add_argument('--no-cache', action='store_true',
+                        help='Do not use the on-disk metadata cache')
+    parser.add_argument('--limit-rate', type=parse_rate, metavar='RATE',
+                        help='Total bandwidth for all downloads, e.g. 500K or 2M (bytes/s)')
+    parser.add_argument('--schedule', type=parse_schedule_rule, action='append', default=[],
+                        metavar='HH:MM-HH:MM=RATE',
+                        help='Bandwidth for a daily time window, e.g. 09:00-18:00=1M; repeatable')
+    parser.add_argument('--supported-only', action='store_true',
+                        help='Only queue URLs a site-specific extractor recognises, checked '
+                             'offline; others are reported as unsupported')
+    parser.add_argument('--no-archive', action='store_true',
+                        help='Download videos even if they were downloaded before')
+    parser.add_argument('--resume', action='store_true',
+                        help='Also resume jobs left unfinished by a previous run')
+    parser.add_argument('--metrics', metavar='FILE',
+                        help='Append per-job timings and counters to FILE as JSON lines')
+    parser.add_argument('--prometheus', metavar='FILE',
+                        help='Keep metrics in the Prometheus text format in FILE')
+    parser.add_argument('--metrics-port', type=int, metavar='PORT',
+                        help='Serve Prometheus metrics at http://127.0.0.1:PORT/metrics')
+    parser.add_argument('--daemon', action='store_true',
+                        help='Keep running and accept new URLs until SIGTERM/SIGINT')
+    parser.add_argument('--watch', action='append', default=[], metavar='DIR',
+                        help='In daemon mode, queue URLs from *.urls files dropped into DIR')
+    return parser
+
+
+class _Interrupt:
+    """Records SIGINT/SIGTERM so the main loop can shut down cleanly."""
+
+    def __init__(self):
+        self.event = threading.Event()
+        self._previous = {}
+
+    def install(self) -> None:
+        if threading.current_thread() is not threading.main_thread():
+            return
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            self._previous[signum] = signal.signal(signum, self._handle)
+
+    def restore(self) -> None:
+        for signum, handler in self._previous.items():
+            signal.signal(signum, handler)
+        self._previous.clear()
+
+    def _handle(self, signum, frame) -> None:
+        self.event.set()
+
+
+def _follow(stream: IO[str], add) -> None:
+    """Queue URLs from a stream line by line until EOF (daemon mode)."""
+    for line in stream:
+        for url in read_urls([line]):
+            add(url)
+
+
+def _scan_watch_dirs(directories: List[str], add) -> None:
+    """Queue URLs from new *.urls files and mark the files as processed."""
+    for directory in directories:
+        for path in sorted(glob.glob(os.path.join(directory, '*.urls'))):
+            try:
+                with open(path, encoding='utf-8') as f:
+                    urls = read_urls(f)
+                os.replace(path, path + '.done')
+            except OSError:
+                continue
+            for url in urls:
+                add(url)
+
+
+def _pause_all(queue: DownloadQueue) -> None:
+    """Stop the queue, keeping partial files so --resume can continue them.
+
+    Jobs already post-processing are left to finish.
+    """
+    queue.pause()
+    for job in queue.running():
+        queue.pause_job(job.id)
+    queue.wait()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Command line entry point.
+
+    Args:
+        argv: Arguments excluding the program name; defaults to sys.argv[1:]
+
+    Returns:
+        int: Process exit code
+    """
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if min(args.jobs, args.per_host, args.connections, args.fragments or 1) < 1:
+        parser.error('--jobs, --per-host, --connections and --fragments must be at least 1')
+    if args.watch and not args.daemon:
+        parser.error('--watch requires --daemon')
+
+    urls = list(args.urls)
+    follow_stream = None
+    resume = args.resume or args.daemon
+    if args.input == '-' or (args.input is None and not urls and not resume and not sys.stdin.isatty()):
+        if args.daemon:
+            follow_stream = sys.stdin
+        else:
+            urls.extend(read_urls(sys.stdin))
+    elif args.input:
+        try:
+            with open(args.input, encoding='utf-8') as f:
+                urls.extend(read_urls(f))
+        except OSError as e:
+            parser.error(f"cannot read {args.input}: {e}")
+    if not urls and not resume:
+        parser.error('no URLs given')
+
+    os.makedirs(args.output, exist_ok=True)
+    for directory in args.watch:
+        os.makedirs(directory, exist_ok=True)
+
+    metrics = Metrics()
+    exporter = server = None
+    try:
+        if args.metrics:
+            exporter = JsonLinesExporter(args.metrics)
+            metrics.add_sink(exporter)
+        if args.prometheus:
+            metrics.add_sink(PrometheusFileExporter(metrics, args.prometheus))
+        if args.metrics_port is not None:
+            server = metrics.serve(args.metrics_port)
+    except OSError as e:
+        if exporter is not None:
+            exporter.close()
+        parser.error(f'cannot export metrics: {e}')
+
+    postprocess = PostProcessPool()
+    try:
+        stream = StreamSink(args.stream) if args.stream else None
+    except ValueError:
+        parser.error(f'invalid --stream target: {args.stream}')
+    downloader = VideoDownloader(
+        metadata_cache=None if args.no_cache else MetadataCache.default(),
+        fragment_tuner=None if args.fragments else FragmentTuner.default(),
+        archive=None if args.no_archive else DownloadArchive.default(),
+        bandwidth=(BandwidthLimiter(args.limit_rate, args.schedule)
+                   if args.limit_rate or args.schedule else None),
+        postprocess=postprocess,
+        stream=stream,
+        storage=Storage(buffer_size=args.write_buffer),
+        metrics=metrics,
+        max_size=args.max_size,
+        prefer_copy=args.prefer_copy
+    )
+    # Streamed downloads must not interleave
+    queue = DownloadQueue(downloader.run_job, max_concurrent=1 if stream else args.jobs,
+                          max_per_host=args.per_host)
+    downloader.playlist_expander = PlaylistExpander(queue, archive=downloader.archive)
+    reporter = JsonLinesReporter(sys.stderr if args.stream == '-' else sys.stdout)
+    queue.add_listener(reporter)
+    journal = JobJournal.default('cli-jobs.sqlite')
+    journal.attach(queue)
+    history = DownloadHistory.default()
+    history.attach(queue)
+
+    def add(url: str) -> None:
+        if args.supported_only and not default_index().is_supported(url):
+            reporter.write('unsupported', url=url)
+            return
+        queue.add(url, args.output, args.format, connections=args.connections,
+                  concurrent_fragments=args.fragments, audio_format=args.audio_format,
+                  audio_quality=args.audio_quality)
+
+    interrupt = _Interrupt()
+    interrupt.install()
+    try:
+        if resume:
+            journal.restore(queue, resume_paused=True)
+        for url in urls:
+            add(url)
+
+        if args.daemon:
+            if follow_stream is not None:
+                threading.Thread(target=_follow, args=(follow_stream, add), daemon=True).start()
+            while not interrupt.event.wait(WATCH_INTERVAL):
+                _scan_watch_dirs(args.watch, add)
+            _pause_all(queue)
+            reporter.summary(queue.jobs())
+            return EXIT_OK
+
+        while not queue.wait(timeout=0.2):
+            if interrupt.event.is_set():
+                _pause_all(queue)
+                reporter.summary(queue.jobs())
+                return EXIT_INTERRUPTED
+        jobs = queue.jobs()
+        reporter.summary(jobs)
+        return exit_code(jobs)
+    finally:
+        interrupt.restore()
+        # Jobs still post-processing report back to the journal and history
+        postprocess.close()
+        journal.close()
+        history.close()
+        downloader.close()
+        if downloader.metadata_cache is not None:
+            downloader.metadata_cache.close()
+        if downloader.archive is not None:
+            downloader.archive.close()
+        if exporter is not None:
+            exporter.close()
+        if server is not None:
+            server.shutdown()
+            server.server_close()
+
+
+if __name__ == '__main__':
+    # Post-processing workers are spawned processes; frozen builds need this
+    multiprocessing.freeze_support()
+    sys.exit(main())
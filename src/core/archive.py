@@ -0,0 +1,261 @@
+"""
+Download archive for cross-run duplicate detection.
+
+Every finished download is recorded under an 'extractor:id' key, e.g.
+'youtube:dQw4w9WgXcQ', so the same video is recognised whatever URL,
+query parameters or playlist it comes from. Keys live in SQLite. A Bloom
+filter held in memory answers almost every "not downloaded yet" question
+without touching the disk, which keeps checking long playlists against a
+multi-million-entry archive cheap. The filter is saved next to the
+database and caught up with rows added since it was written, and with rows
+other processes add while it is open whenever SQLite's data_version shows
+the database changed.
+"""
+import hashlib
+import math
+import os
+import sqlite3
+import struct
+import threading
+from pathlib import Path
+from typing import Any, Dict, Iterable, Optional, Set, Tuple, Union
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS archive (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    key TEXT NOT NULL UNIQUE
+);
+"""
+
+# magic, id of the last row in the filter, capacity, error rate
+_BLOOM_HEADER = struct.Struct('<4sQQd')
+_BLOOM_MAGIC = b'VLBF'
+
+# Keys per IN (...) query; below SQLite's bound parameter limit
+_QUERY_CHUNK = 500
+
+
+class AlreadyDownloaded(Exception):
+    """Raised for a job whose video is already in the archive."""
+
+    def __init__(self, key: str):
+        super().__init__(f'{key} has already been downloaded')
+        self.key = key
+
+
+def _key(extractor: Optional[str], video_id: Any) -> Optional[str]:
+    # The generic extractor names videos after their file, which is not
+    # unique across sites
+    if not extractor or video_id is None or extractor.lower() == 'generic':
+        return None
+    return f'{extractor.lower()}:{video_id}'
+
+
+def archive_key(info: Dict[str, Any]) -> Optional[str]:
+    """Archive key for an info dict or an unresolved url_result entry."""
+    return _key(info.get('extractor_key') or info.get('ie_key'), info.get('id'))
+
+
+def url_archive_key(ydl: 'yt_dlp.YoutubeDL', url: str) -> Optional[str]:
+    """Archive key derived from the URL alone, without network I/O.
+
+    Mirrors YoutubeDL.extract_info: the first suitable extractor decides,
+    and extractors that cannot read an ID from the URL yield None.
+    """
+    for key, ie in ydl._ies.items():
+        if ie.suitable(url):
+            return _key(key, ie.get_temp_id(url))
+    return None
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over strings.
+
+    Bit positions come from double hashing one BLAKE2b digest, so they are
+    stable across processes and the filter can be saved.
+    """
+
+    def __init__(self, capacity: int, error_rate: float = 0.001, bits: Optional[bytes] = None):
+        """
+        Args:
+            capacity: Number of keys the error rate is sized for
+            error_rate: False positive rate at capacity
+            bits: Saved filter contents from to_bytes()
+        """
+        self.capacity = capacity
+        self.error_rate = error_rate
+        size = max(64, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.size = size - size % 8
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        if bits is not None and len(bits) != self.size // 8:
+            raise ValueError('Saved filter does not match its parameters')
+        self._bits = bytearray(bits) if bits is not None else bytearray(self.size // 8)
+
+    def _probe(self, key: str) -> Tuple[int, int]:
+        """First bit position of a key and the distance between its positions."""
+        h = int.from_bytes(hashlib.blake2b(key.encode('utf-8'), digest_size=16).digest(), 'little')
+        return (h & 0xFFFFFFFFFFFFFFFF) % self.size, (h >> 64) % (self.size - 1) + 1
+
+    def add(self, key: str) -> None:
+        bits, size = self._bits, self.size
+        position, step = self._probe(key)
+        for _ in range(self.hashes):
+            bits[position >> 3] |= 1 << (position & 7)
+            position = (position + step) % size
+
+    def __contains__(self, key: str) -> bool:
+        bits, size = self._bits, self.size
+        position, step = self._probe(key)
+        for _ in range(self.hashes):
+            if not bits[position >> 3] >> (position & 7) & 1:
+                return False
+            position = (position + step) % size
+        return True
+
+    def to_bytes(self) -> bytes:
+        return bytes(self._bits)
+
+
+class DownloadArchive:
+    """Set of downloaded videos keyed by 'extractor:id'. Thread safe."""
+
+    def __init__(self, path: Union[str, Path] = ':memory:', capacity: int = 1_000_000,
+                 error_rate: float = 0.001):
+        """
+        Args:
+            path: SQLite database file, or ':memory:'; the Bloom filter is
+                saved beside a file database with the suffix .bloom
+            capacity: Initial Bloom filter capacity; doubled as the archive
+                outgrows it
+            error_rate: Bloom filter false positive rate, i.e. the share of
+                new keys that still need a database lookup
+        """
+        self.error_rate = error_rate
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(str(path), check_same_thread=False, isolation_level=None)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('PRAGMA synchronous=NORMAL')
+        self._db.executescript(_SCHEMA)
+        self._bloom_path = Path(path).with_suffix('.bloom') if str(path) != ':memory:' else None
+        # Rows are never deleted, so the largest id is the number of keys
+        self._count = self._db.execute('SELECT COALESCE(MAX(id), 0) FROM archive').fetchone()[0]
+        # Every row up to this id is in the Bloom filter
+        self._last_id = 0
+        self._bloom = self._load_bloom(max(capacity, self._count))
+        # Changes when another connection commits to the database
+        self._data_version = self._read_data_version()
+
+    @classmethod
+    def default(cls, name: str = 'archive.sqlite') -> 'DownloadArchive':
+        """Open the archive in the per-user data directory."""
+        from src.utils.paths import app_data_dir
+        return cls(app_data_dir() / name)
+
+    def __contains__(self, key: str) -> bool:
+        with self._lock:
+            self._catch_up_external()
+            if key not in self._bloom:
+                return False
+            return self._db.execute('SELECT 1 FROM archive WHERE key = ?', (key,)).fetchone() is not None
+
+    def contains_many(self, keys: Iterable[str]) -> Set[str]:
+        """Return the keys that are in the archive.
+
+        Keys the Bloom filter rules out are never looked up; the rest are
+        checked in batches.
+        """
+        with self._lock:
+            self._catch_up_external()
+            candidates = [key for key in keys if key in self._bloom]
+            found = set()
+            for start in range(0, len(candidates), _QUERY_CHUNK):
+                chunk = candidates[start:start + _QUERY_CHUNK]
+                found.update(row[0] for row in self._db.execute(
+                    f"SELECT key FROM archive WHERE key IN ({', '.join('?' * len(chunk))})", chunk
+                ))
+            return found
+
+    def add(self, key: str) -> bool:
+        """Record a key.
+
+        Returns:
+            bool: False if it was already recorded
+        """
+        with self._lock:
+            cursor = self._db.execute('INSERT OR IGNORE INTO archive (key) VALUES (?)', (key,))
+            if not cursor.rowcount:
+                return False
+            self._count += 1
+            if self._count > self._bloom.capacity:
+                self._bloom = self._rebuild(self._bloom.capacity * 2)
+            else:
+                self._bloom.add(key)
+            return True
+
+    def save(self) -> None:
+        """Write the Bloom filter so the next open does not rebuild it."""
+        if self._bloom_path is None:
+            return
+        with self._lock:
+            # Also covers rows other processes added to the same database
+            self._catch_up()
+            header = _BLOOM_HEADER.pack(_BLOOM_MAGIC, self._last_id, self._bloom.capacity,
+                                        self.error_rate)
+            tmp = self._bloom_path.with_suffix('.bloom.tmp')
+            try:
+                with open(tmp, 'wb') as f:
+                    f.write(header)
+                    f.write(self._bloom.to_bytes())
+                os.replace(tmp, self._bloom_path)
+            except OSError:
+                pass
+
+    def close(self) -> None:
+        self.save()
+        with self._lock:
+            self._db.close()
+
+    def _load_bloom(self, capacity: int) -> BloomFilter:
+        """Load the saved filter and add rows written after it, or rebuild it."""
+        if self._bloom_path is not None:
+            try:
+                with open(self._bloom_path, 'rb') as f:
+                    magic, last_id, saved_capacity, error_rate = _BLOOM_HEADER.unpack(
+                        f.read(_BLOOM_HEADER.size))
+                    if (magic == _BLOOM_MAGIC and error_rate == self.error_rate
+                            and saved_capacity >= capacity):
+                        bloom = BloomFilter(saved_capacity, error_rate, f.read())
+                        self._last_id = last_id
+                        self._catch_up(bloom)
+                        return bloom
+            except (OSError, struct.error, ValueError):
+                pass
+        return self._rebuild(capacity)
+
+    def _rebuild(self, capacity: int) -> BloomFilter:
+        bloom = BloomFilter(capacity, self.error_rate)
+        self._last_id = 0
+        self._catch_up(bloom)
+        return bloom
+
+    def _read_data_version(self) -> int:
+        return self._db.execute('PRAGMA data_version').fetchone()[0]
+
+    def _catch_up_external(self) -> None:
+        """Add rows other processes committed since the last check.
+
+        Costs no query on the archive table unless the database changed.
+        """
+        version = self._read_data_version()
+        if version != self._data_version:
+            self._data_version = version
+            self._catch_up()
+
+    def _catch_up(self, bloom: Optional[BloomFilter] = None) -> None:
+        """Add rows written since the filter was last brought up to date."""
+        bloom = bloom or self._bloom
+        cursor = self._db.execute('SELECT id, key FROM archive WHERE id > ? ORDER BY id',
+                                  (self._last_id,))
+        for row_id, key in cursor:
+            bloom.add(key)
+            self._last_id = row_id
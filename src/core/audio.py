@@ -0,0 +1,92 @@
+"""
+Audio extraction for "Audio only" downloads.
+
+The download picks the best audio stream, preferring one already in the
+target codec, and yt-dlp's FFmpegExtractAudio post-processor then writes
+the target format. When the stream's codec matches it is copied into the
+new container; only other codecs are transcoded, at the requested
+quality. With a PostProcessPool the conversions run in worker processes,
+one per core, so a long album keeps every core busy while later tracks
+are still downloading.
+"""
+import functools
+import re
+from typing import Any, Dict, Optional
+
+AUDIO_FORMATS = ('best', 'mp3', 'm4a', 'opus', 'vorbis', 'flac', 'aac', 'alac', 'wav')
+
+# Stream codecs (yt-dlp acodec prefixes) each format can be copied from
+_COPYABLE = {
+    'mp3': 'mp3',
+    'm4a': 'mp4a',
+    'aac': 'mp4a',
+    'opus': 'opus',
+    'vorbis': 'vorbis',
+    'flac': 'flac',
+    'alac': 'alac',
+}
+
+_QUALITY = re.compile(r'^\s*(\d+(?:\.\d+)?)\s*(k(?:bps)?)?\s*$', re.IGNORECASE)
+
+
+class FFmpegNotFound(Exception):
+    """Raised when an audio conversion is requested but ffmpeg is missing."""
+
+
+def parse_audio_quality(text: str) -> Optional[str]:
+    """Parse a bitrate such as '192K' or '192', or a VBR level from 0 (best)
+    to 10, into yt-dlp's preferredquality.
+
+    Returns:
+        Optional[str]: None for 'best' or ''
+
+    Raises:
+        ValueError: If the text is neither
+    """
+    if text.strip().lower() in ('', 'best'):
+        return None
+    match = _QUALITY.match(text)
+    if not match:
+        raise ValueError(f'Invalid audio quality: {text!r}')
+    value = float(match.group(1))
+    # yt-dlp reads values up to 10 as VBR levels and larger ones as kbps
+    is_kbps = bool(match.group(2)) or value > 10
+    if is_kbps and (value <= 10 or not value.is_integer()):
+        raise ValueError(f'Invalid audio quality: {text!r}')
+    return f'{value:g}'
+
+
+def audio_format_selector(audio_format: str = 'best') -> str:
+    """yt-dlp format selection for an audio download.
+
+    Streams already in the target codec come first so they can be copied;
+    a slightly better stream is not worth a lossy re-encode.
+    """
+    prefix = _COPYABLE.get(audio_format)
+    if prefix is None:
+        return 'bestaudio/best'
+    return f'bestaudio[acodec^={prefix}]/bestaudio/best'
+
+
+def audio_postprocessor(audio_format: str = 'best', quality: Optional[str] = None) -> Dict[str, Any]:
+    """yt-dlp post-processor definition that extracts the audio track.
+
+    Args:
+        audio_format: One of AUDIO_FORMATS; 'best' keeps the stream's codec
+            and only changes the container when it is not an audio one
+        quality: Bitrate in kbps, or a VBR level from 0 (best) to 10, as
+            returned by parse_audio_quality()
+    """
+    if audio_format not in AUDIO_FORMATS:
+        raise ValueError(f'Unsupported audio format: {audio_format!r}')
+    return {'key': 'FFmpegExtractAudio', 'preferredcodec': audio_format, 'preferredquality': quality}
+
+
+@functools.lru_cache(maxsize=None)
+def ffmpeg_available(location: Optional[str] = None) -> bool:
+    """Whether yt-dlp finds ffmpeg, on PATH or at location."""
+    from yt_dlp import YoutubeDL
+    from yt_dlp.postprocessor import FFmpegPostProcessor
+
+    with YoutubeDL({'ffmpeg_location': location, 'quiet': True}, auto_init=False) as ydl:
+        return FFmpegPostProcessor(ydl).available
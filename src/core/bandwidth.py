@@ -0,0 +1,189 @@
+"""
+Global bandwidth limit shared by every download.
+
+BandwidthLimiter is a token bucket that all jobs draw from, whichever
+downloader reads the bytes (plain HTTP, segmented or fragmented). When the
+cap is reached, waiting reads are served by start-time fair queuing, so
+priority classes get bandwidth in proportion to their weights: with the
+default weights an interactive download gets four times the rate of a bulk
+one while both are running, and all of it when running alone.
+
+The cap can change at runtime and can depend on the time of day, e.g. to
+slow backfills down during business hours.
+"""
+import heapq
+import itertools
+import re
+import threading
+import time
+from datetime import datetime, time as clock_time
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional
+
+INTERACTIVE = 'interactive'
+NORMAL = 'normal'
+BULK = 'bulk'
+
+DEFAULT_WEIGHTS = {INTERACTIVE: 4.0, NORMAL: 2.0, BULK: 1.0}
+
+_UNITS = {'': 1, 'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3}
+_RATE = re.compile(r'^\s*(\d+(?:\.\d+)?)\s*([KMG]?)(?:i?B)?(?:/s)?\s*$', re.IGNORECASE)
+
+
+class ScheduleRule(NamedTuple):
+    """A bandwidth cap for a daily time window; end before start wraps midnight."""
+    start: clock_time
+    end: clock_time
+    rate: Optional[float]
+
+    def covers(self, moment: clock_time) -> bool:
+        if self.start <= self.end:
+            return self.start <= moment < self.end
+        return moment >= self.start or moment < self.end
+
+
+def parse_rate(text: str) -> Optional[float]:
+    """Parse a rate such as '500K', '2.5M' or '1MB/s' into bytes per second.
+
+    Returns:
+        Optional[float]: None for '0', 'none' or 'unlimited'
+
+    Raises:
+        ValueError: If the text is not a rate
+    """
+    if text.strip().lower() in ('0', 'none', 'unlimited'):
+        return None
+    match = _RATE.match(text)
+    if not match:
+        raise ValueError(f'Invalid rate: {text!r}')
+    return float(match.group(1)) * _UNITS[match.group(2).upper()]
+
+
+def parse_schedule_rule(text: str) -> ScheduleRule:
+    """Parse 'HH:MM-HH:MM=RATE', e.g. '09:00-18:00=1M'.
+
+    Raises:
+        ValueError: If the text is not a rule
+    """
+    window, _, rate = text.partition('=')
+    start, _, end = window.partition('-')
+    try:
+        return ScheduleRule(clock_time.fromisoformat(start.strip()),
+                            clock_time.fromisoformat(end.strip()), parse_rate(rate))
+    except ValueError:
+        raise ValueError(f'Invalid schedule rule: {text!r}') from None
+
+
+def priority_class(priority: int) -> str:
+    """Bandwidth class of a queue priority: raised is interactive, lowered is bulk."""
+    if priority > 0:
+        return INTERACTIVE
+    if priority < 0:
+        return BULK
+    return NORMAL
+
+
+class BandwidthLimiter:
+    """Token bucket with weighted fair sharing between priority classes. Thread safe."""
+
+    def __init__(self, rate: Optional[float] = None, schedule: Iterable[ScheduleRule] = (),
+                 weights: Optional[Dict[str, float]] = None, burst: float = 0.5,
+                 now: Callable[[], datetime] = datetime.now):
+        """
+        Args:
+            rate: Cap in bytes per second outside scheduled windows; None is
+                unlimited
+            schedule: Caps for daily time windows; the first matching rule wins
+            weights: Share of each priority class while several compete
+            burst: Seconds of traffic the bucket can save up
+            now: Wall clock used for the schedule
+        """
+        self.weights = dict(DEFAULT_WEIGHTS if weights is None else weights)
+        self.burst = burst
+        self._rate = rate
+        self._schedule: List[ScheduleRule] = list(schedule)
+        self._now = now
+        self._cond = threading.Condition()
+        self._tokens = 0.0
+        self._refilled = time.monotonic()
+        # Start-time fair queuing state: virtual time, last finish tag per
+        # class and the heap of (finish tag, ticket) of waiting reads
+        self._vtime = 0.0
+        self._finish: Dict[str, float] = {}
+        self._waiting: List[tuple] = []
+        self._tickets = itertools.count()
+
+    @property
+    def rate(self) -> Optional[float]:
+        """Cap outside scheduled windows, in bytes per second."""
+        return self._rate
+
+    def set_rate(self, rate: Optional[float]) -> None:
+        """Change the cap; running downloads pick it up on their next read."""
+        with self._cond:
+            self._rate = rate
+            self._cond.notify_all()
+
+    def set_schedule(self, schedule: Iterable[ScheduleRule]) -> None:
+        with self._cond:
+            self._schedule = list(schedule)
+            self._cond.notify_all()
+
+    def current_rate(self) -> Optional[float]:
+        """Cap in force right now, in bytes per second."""
+        if self._schedule:
+            moment = self._now().time()
+            for rule in self._schedule:
+                if rule.covers(moment):
+                    return rule.rate
+        return self._rate
+
+    def acquire(self, size: int, priority: str = NORMAL) -> None:
+        """Block until size bytes may be transferred.
+
+        The bucket may go into debt by one read, so reads larger than the
+        burst still pass; the debt delays the reads after it.
+
+        Args:
+            size: Bytes just read or about to be read
+            priority: Priority class of the download
+        """
+        if size <= 0:
+            return
+        with self._cond:
+            if not self._waiting and self.current_rate() is None:
+                return
+            start = max(self._vtime, self._finish.get(priority, 0.0))
+            finish = start + size / self.weights.get(priority, 1.0)
+            self._finish[priority] = finish
+            entry = (finish, next(self._tickets))
+            heapq.heappush(self._waiting, entry)
+            try:
+                while True:
+                    rate = self._refill()
+                    if self._waiting[0] == entry and (rate is None or self._tokens > 0):
+                        break
+                    if self._waiting[0] != entry or rate is None:
+                        # Another read goes first; it wakes us when done
+                        self._cond.wait(1.0)
+                    else:
+                        self._cond.wait(max(0.001, -self._tokens / rate))
+            except BaseException:
+                self._waiting.remove(entry)
+                heapq.heapify(self._waiting)
+                self._cond.notify_all()
+                raise
+            heapq.heappop(self._waiting)
+            if rate is not None:
+                self._tokens -= size
+            self._vtime = start
+            self._cond.notify_all()
+
+    def _refill(self) -> Optional[float]:
+        now = time.monotonic()
+        rate = self.current_rate()
+        if rate is None:
+            self._tokens = 0.0
+        else:
+            self._tokens = min(self._tokens + (now - self._refilled) * rate, rate * self.burst)
+        self._refilled = now
+        return rate
@@ -0,0 +1,34 @@
+"""
+Cooperative cancellation primitives shared by the download engines.
+"""
+
+
+class DownloadCancelled(Exception):
+    """Raised from the progress hook to abort a cancelled download."""
+
+
+class CancelToken:
+    """Cooperative cancellation flag shared between the GUI and a worker.
+
+    Workers poll the flag and nothing waits on it, so every queued job
+    carries a plain attribute rather than a threading.Event.
+    """
+    __slots__ = ('_cancelled', 'discard_partial')
+
+    def __init__(self):
+        self._cancelled = False
+        self.discard_partial = True
+
+    def cancel(self, discard_partial: bool = True) -> None:
+        """Request cancellation; the worker aborts on its next chunk.
+
+        Args:
+            discard_partial: Remove partial files once the worker stops.
+                Pausing passes False so the download can resume later.
+        """
+        self.discard_partial = discard_partial
+        self._cancelled = True
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled
@@ -0,0 +1,499 @@
+"""
+Multi-job download queue with global and per-host concurrency limits.
+
+The queue is plain Python so it can be driven from tests, a CLI or the GUI.
+Jobs are executed by a runner callable on whatever executor the caller
+provides (a QThreadPool in the GUI, plain threads otherwise).
+
+A job whose runner raises InsufficientSpace is deferred rather than failed:
+it is retried when another job finishes, and periodically, once the disk
+has room for it.
+"""
+import itertools
+import sys
+import threading
+from concurrent.futures import Future
+from functools import partial
+from dataclasses import dataclass, field
+from enum import Enum
+from typing import Callable, Dict, List, Optional, Union
+from urllib.parse import urlparse
+
+from src.core.archive import AlreadyDownloaded
+from src.core.cancel import CancelToken, DownloadCancelled
+from src.core.storage import InsufficientSpace
+from src.utils.url_utils import classify_url
+
+
+class JobState(str, Enum):
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    # Downloaded; merging and conversions run without holding a download slot
+    PROCESSING = 'processing'
+    PAUSED = 'paused'
+    # Waiting for free disk space; retried automatically
+    DEFERRED = 'deferred'
+    DONE = 'done'
+    FAILED = 'failed'
+    CANCELLED = 'cancelled'
+    # Not downloaded because the video is in the download archive
+    SKIPPED = 'skipped'
+
+
+FINISHED_STATES = (JobState.DONE, JobState.FAILED, JobState.CANCELLED, JobState.SKIPPED)
+
+_job_ids = itertools.count(1)
+
+
+def host_key(url: str) -> str:
+    """Group URLs by platform name, falling back to the host."""
+    result = classify_url(url)
+    if result is None:
+        # Shared by every job from the host
+        return sys.intern(urlparse(url).netloc.lower())
+    return sys.intern(result.platform or result.host)
+
+
+@dataclass(slots=True)
+class DownloadJob:
+    """A single queued download and its live status.
+
+    Slotted, as queues can hold tens of thousands of jobs; what is known
+    about the video is kept in a few fields rather than its info dict.
+    """
+    url: str
+    output_path: str
+    format_selection: str = 'best'
+    priority: int = 0
+    connections: int = 1
+    concurrent_fragments: Optional[int] = None
+    # Codec and quality of 'audio' downloads
+    audio_format: str = 'best'
+    audio_quality: Optional[str] = None
+    id: int = field(default_factory=lambda: next(_job_ids))
+    host: str = ''
+    state: JobState = JobState.QUEUED
+    progress: float = 0.0
+    status: str = 'Queued'
+    speed: Optional[float] = None
+    eta: Optional[float] = None
+    # Resume information, filled in from progress reports
+    downloaded_bytes: int = 0
+    total_bytes: Optional[int] = None
+    fragment_index: Optional[int] = None
+    fragment_count: Optional[int] = None
+    part_file: Optional[str] = None
+    format_ids: Optional[str] = None
+    filename: Optional[str] = None
+    # What was downloaded, known once the download has finished
+    title: Optional[str] = None
+    video_id: Optional[str] = None
+    extractor: Optional[str] = None
+    error: Optional[str] = None
+    # Set when the URL turned out to be a playlist whose entries are queued
+    # as separate jobs
+    playlist: bool = False
+    cancel_token: CancelToken = field(default_factory=CancelToken, repr=False)
+
+    def __post_init__(self):
+        if not self.host:
+            self.host = host_key(self.url)
+
+
+# runner(job, report) downloads the job and returns the output filename, or
+# a Future of it when post-processing continues elsewhere; report(percent,
+# status, **details) publishes progress back to the queue, where details are
+# PROGRESS_DETAILS fields of the job.
+Runner = Callable[[DownloadJob, Callable[..., None]], Union[Optional[str], Future]]
+Listener = Callable[[DownloadJob], None]
+
+PROGRESS_DETAILS = ('speed', 'eta', 'downloaded_bytes', 'total_bytes', 'fragment_index',
+                    'fragment_count', 'part_file', 'format_ids')
+
+
+def _thread_submit(fn: Callable[[], None]) -> None:
+    threading.Thread(target=fn, daemon=True).start()
+
+
+class DownloadQueue:
+    """Holds download jobs and runs them under concurrency limits.
+
+    Pending jobs are started highest priority first, in queue order within a
+    priority. A job is skipped (not blocked) while its host is at the
+    per-host limit, so other hosts keep the global slots busy. A job whose
+    runner returns a Future gives up its slot and stays PROCESSING until
+    the future completes.
+    """
+
+    def __init__(self, runner: Runner, max_concurrent: int = 3, max_per_host: int = 2,
+                 submit: Optional[Callable[[Callable[[], None]], None]] = None,
+                 defer_interval: float = 60.0):
+        """
+        Args:
+            runner: Callable that performs one download
+            max_concurrent: Maximum number of jobs running at once
+            max_per_host: Maximum number of running jobs per host
+            submit: Executes a zero-argument callable on a worker; defaults to
+                a new daemon thread per job
+            defer_interval: Seconds between retries of jobs deferred for
+                lack of disk space
+        """
+        self.runner = runner
+        self.max_concurrent = max_concurrent
+        self.max_per_host = max_per_host
+        self._submit = submit or _thread_submit
+        self._jobs: Dict[int, DownloadJob] = {}
+        self._pending: List[int] = []
+        self._running: Dict[int, DownloadJob] = {}
+        self._processing: Dict[int, Future] = {}
+        self._listeners: List[Listener] = []
+        self._lock = threading.RLock()
+        self._idle = threading.Condition(self._lock)
+        self._paused = False
+        # Producers still adding jobs, such as playlist expansions
+        self._feeders = 0
+        self.defer_interval = defer_interval
+        self._retry_timer: Optional[threading.Timer] = None
+
+    # Listeners
+
+    def add_listener(self, listener: Listener) -> None:
+        """Register a callback invoked (from any thread) when a job changes."""
+        self._listeners.append(listener)
+
+    def _notify(self, job: DownloadJob) -> None:
+        for listener in list(self._listeners):
+            listener(job)
+
+    # Job management
+
+    def add(self, url: str, output_path: str, format_selection: str = 'best',
+            priority: int = 0, connections: int = 1,
+            concurrent_fragments: Optional[int] = None, audio_format: str = 'best',
+            audio_quality: Optional[str] = None) -> DownloadJob:
+        """Queue a new download.
+
+        Args:
+            url: Video URL
+            output_path: Output directory
+            format_selection: Format to download ('best', 'hd', 'sd', 'audio')
+            priority: Higher values start first
+            connections: Parallel ranged connections per download
+            concurrent_fragments: Parallel HLS/DASH fragment downloads; None
+                lets the downloader tune it
+            audio_format: Codec for the 'audio' format selection
+            audio_quality: Bitrate or VBR level for transcoded audio
+
+        Returns:
+            DownloadJob: The queued job
+        """
+        return self.add_job(DownloadJob(url, output_path, format_selection, priority, connections,
+                                        concurrent_fragments, audio_format, audio_quality))
+
+    def add_job(self, job: DownloadJob) -> DownloadJob:
+        """Queue a prepared job, e.g. one restored from the job journal."""
+        with self._lock:
+            self._jobs[job.id] = job
+            self._pending.append(job.id)
+        self._notify(job)
+        self._dispatch()
+        return job
+
+    def get(self, job_id: int) -> Optional[DownloadJob]:
+        """Look up a job by id."""
+        return self._jobs.get(job_id)
+
+    def jobs(self) -> List[DownloadJob]:
+        """All jobs in the order they were added."""
+        with self._lock:
+            return list(self._jobs.values())
+
+    def pending(self) -> List[DownloadJob]:
+        """Queued jobs in the order they will be started."""
+        with self._lock:
+            return [self._jobs[job_id] for job_id in self._ordered_pending()]
+
+    def running(self) -> List[DownloadJob]:
+        """Jobs currently being downloaded."""
+        with self._lock:
+            return list(self._running.values())
+
+    def processing(self) -> List[DownloadJob]:
+        """Downloaded jobs whose post-processing has not finished."""
+        with self._lock:
+            return [self._jobs[job_id] for job_id in self._processing]
+
+    def set_priority(self, job_id: int, priority: int) -> None:
+        """Change a job's priority; higher values start first."""
+        with self._lock:
+            job = self._jobs[job_id]
+            job.priority = priority
+        self._notify(job)
+        self._dispatch()
+
+    def move(self, job_id: int, index: int) -> None:
+        """Move a queued job to a new position among jobs of equal priority."""
+        with self._lock:
+            if job_id not in self._pending:
+                return
+            self._pending.remove(job_id)
+            index = max(0, min(index, len(self._pending)))
+            self._pending.insert(index, job_id)
+        self._dispatch()
+
+    def cancel(self, job_id: int) -> None:
+        """Cancel a job, discarding any partial download."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None and job.playlist:
+                # Stops an expansion that outlives the finished playlist job
+                job.cancel_token.cancel()
+            if job is None or job.state in FINISHED_STATES:
+                return
+            if job.state == JobState.RUNNING:
+                job.cancel_token.cancel()
+                job.status = 'Cancelling...'
+            elif job.state == JobState.PROCESSING:
+                # Post-processing that has already started runs to the end
+                job.cancel_token.cancel()
+                self._processing[job_id].cancel()
+                return
+            else:
+                if job_id in self._pending:
+                    self._pending.remove(job_id)
+                job.state = JobState.CANCELLED
+                job.status = 'Cancelled'
+        self._notify(job)
+
+    def cancel_all(self) -> None:
+        """Cancel every job that has not finished."""
+        for job in self.jobs():
+            self.cancel(job.id)
+
+    def pause_job(self, job_id: int) -> None:
+        """Hold a job back; a running job stops but keeps its partial file."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job.state in FINISHED_STATES or job.state in (JobState.PAUSED,
+                                                                            JobState.PROCESSING):
+                return
+            if job.state == JobState.RUNNING:
+                job.cancel_token.cancel(discard_partial=False)
+                job.status = 'Pausing...'
+            else:
+                job.state = JobState.PAUSED
+                job.status = 'Paused'
+        self._notify(job)
+
+    def resume_job(self, job_id: int) -> None:
+        """Put a paused job back in the queue; yt-dlp resumes the .part file."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job.state != JobState.PAUSED:
+                return
+            job.state = JobState.QUEUED
+            job.status = 'Queued'
+            job.cancel_token = CancelToken()
+            if job_id not in self._pending:
+                self._pending.append(job_id)
+        self._notify(job)
+        self._dispatch()
+
+    def retry_deferred(self) -> None:
+        """Queue jobs deferred for lack of disk space again."""
+        with self._lock:
+            retried = [job for job in self._jobs.values() if job.state == JobState.DEFERRED]
+            for job in retried:
+                job.state, job.status = JobState.QUEUED, 'Queued'
+        for job in retried:
+            self._notify(job)
+        if retried:
+            self._dispatch()
+
+    def _schedule_retry(self) -> None:
+        with self._lock:
+            if self._retry_timer is not None:
+                return
+            self._retry_timer = threading.Timer(self.defer_interval, self._retry_timer_fired)
+            self._retry_timer.daemon = True
+            self._retry_timer.start()
+
+    def _retry_timer_fired(self) -> None:
+        with self._lock:
+            self._retry_timer = None
+        self.retry_deferred()
+
+    def pause(self) -> None:
+        """Stop starting new jobs; running jobs continue."""
+        self._paused = True
+
+    def resume(self) -> None:
+        """Start dispatching queued jobs again."""
+        self._paused = False
+        self._dispatch()
+
+    @property
+    def paused(self) -> bool:
+        return self._paused
+
+    def clear_finished(self) -> None:
+        """Forget jobs that are done, failed or cancelled."""
+        with self._lock:
+            for job_id in [j.id for j in self._jobs.values() if j.state in FINISHED_STATES]:
+                del self._jobs[job_id]
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Block until no job is queued, running or post-processing.
+
+        Deferred jobs are not waited for: each was retried when the last
+        running job finished and still did not fit.
+
+        Returns:
+            bool: False if the timeout expired first
+        """
+        with self._idle:
+            return self._idle.wait_for(
+                lambda: not self._running and not self._processing and (
+                    self._paused or not (self._runnable_pending() or self._feeders)),
+                timeout
+            )
+
+    def begin_feed(self) -> None:
+        """Mark the start of a producer that will add more jobs.
+
+        wait() does not return while a feed is open, so jobs added after
+        the queue ran dry are still waited for. Call end_feed() when done.
+        """
+        with self._lock:
+            self._feeders += 1
+
+    def end_feed(self) -> None:
+        """Mark the end of a producer started with begin_feed()."""
+        with self._idle:
+            self._feeders -= 1
+            self._idle.notify_all()
+
+    def wait_for_room(self, max_pending: int, timeout: Optional[float] = None) -> bool:
+        """Block until fewer than max_pending jobs are waiting to start.
+
+        Returns:
+            bool: False if the timeout expired first
+        """
+        with self._idle:
+            return self._idle.wait_for(lambda: len(self._runnable_pending()) < max_pending, timeout)
+
+    def report_progress(self, job_id: int, percent: float, status: str, **details) -> None:
+        """Record progress for a running job and notify listeners.
+
+        Args:
+            job_id: Job to update
+            percent: Completion percentage
+            status: Human readable status line
+            **details: Values for PROGRESS_DETAILS fields; None leaves resume
+                information already recorded in place
+        """
+        job = self._jobs.get(job_id)
+        if job is None:
+            return
+        job.progress = percent
+        job.status = status
+        for name in PROGRESS_DETAILS:
+            value = details.get(name)
+            if value is not None or name in ('speed', 'eta'):
+                setattr(job, name, value)
+        self._notify(job)
+
+    # Scheduling
+
+    def _ordered_pending(self) -> List[int]:
+        # sorted() is stable, so queue order breaks ties within a priority
+        return sorted(self._pending, key=lambda job_id: -self._jobs[job_id].priority)
+
+    def _runnable_pending(self) -> List[int]:
+        return [job_id for job_id in self._pending
+                if self._jobs[job_id].state == JobState.QUEUED]
+
+    def _dispatch(self) -> None:
+        started = []
+        with self._lock:
+            if self._paused:
+                return
+            per_host: Dict[str, int] = {}
+            for job in self._running.values():
+                per_host[job.host] = per_host.get(job.host, 0) + 1
+            for job_id in self._ordered_pending():
+                if len(self._running) >= self.max_concurrent:
+                    break
+                job = self._jobs[job_id]
+                if job.state != JobState.QUEUED:
+                    continue
+                if per_host.get(job.host, 0) >= self.max_per_host:
+                    continue
+                per_host[job.host] = per_host.get(job.host, 0) + 1
+                self._pending.remove(job_id)
+                self._running[job_id] = job
+                job.state = JobState.RUNNING
+                job.status = 'Starting download...'
+                started.append(job)
+        for job in started:
+            self._notify(job)
+            self._submit(lambda job=job: self._execute(job))
+
+    def _execute(self, job: DownloadJob) -> None:
+        try:
+            result = self.runner(job, partial(self.report_progress, job.id))
+        except Exception as e:
+            self._finish(job, error=e)
+            return
+        if not isinstance(result, Future):
+            self._finish(job, result)
+            return
+        with self._lock:
+            self._running.pop(job.id, None)
+            self._processing[job.id] = result
+            job.state, job.status = JobState.PROCESSING, 'Post-processing...'
+        self._notify(job)
+        self._dispatch()
+        result.add_done_callback(partial(self._finish_processing, job))
+
+    def _finish_processing(self, job: DownloadJob, future: Future) -> None:
+        if future.cancelled():
+            self._finish(job, error=DownloadCancelled('Download cancelled by user'))
+        elif future.exception() is not None:
+            self._finish(job, error=future.exception())
+        else:
+            self._finish(job, future.result())
+
+    def _finish(self, job: DownloadJob, filename: Optional[str] = None,
+                error: Optional[Exception] = None) -> None:
+        if isinstance(error, AlreadyDownloaded):
+            job.state, job.status = JobState.SKIPPED, 'Already downloaded'
+        elif isinstance(error, InsufficientSpace):
+            job.state, job.status = JobState.DEFERRED, f'Deferred: {error}'
+        elif isinstance(error, DownloadCancelled):
+            if job.cancel_token.discard_partial:
+                job.state, job.status = JobState.CANCELLED, 'Cancelled'
+            else:
+                job.state, job.status = JobState.PAUSED, 'Paused'
+        elif error is not None:
+            job.state, job.status, job.error = JobState.FAILED, 'Error', str(error)
+        else:
+            job.state, job.filename = JobState.DONE, filename or None
+            if not job.playlist:
+                # A playlist job's status is kept up to date by its expander
+                job.status = 'Download complete!'
+            job.progress = 100.0
+        with self._lock:
+            self._running.pop(job.id, None)
+            self._processing.pop(job.id, None)
+            if job.state in (JobState.PAUSED, JobState.DEFERRED) and job.id not in self._pending:
+                self._pending.append(job.id)
+        self._notify(job)
+        if job.state == JobState.DEFERRED:
+            self._schedule_retry()
+        elif job.state in FINISHED_STATES:
+            # Its reservation is released, and space may have been freed
+            self.retry_deferred()
+        self._dispatch()
+        with self._idle:
+            self._idle.notify_all()
@@ -1,17 +1,166 @@
+"""
+Video downloading on top of yt-dlp.
+
+VideoDownloader has no Qt dependency so it can run headless (see src/cli.py);
+the GUI wraps it in src.gui.qt_downloader.QtVideoDownloader.
+"""
+import contextlib
+import glob
 import os
 import sys
-from typing import Optional, Dict, Any
-from PyQt6.QtCore import QObject, pyqtSignal
-import yt_dlp
+import threading
+from concurrent.futures import Future
+from functools import partial
+from typing import Optional, Dict, Any, Set, Callable, List, Union
+
+from src.core.archive import AlreadyDownloaded, DownloadArchive, archive_key, url_archive_key
+from src.core.audio import (FFmpegNotFound, audio_format_selector, audio_postprocessor,
+                            ffmpeg_available)
+from src.core.bandwidth import BandwidthLimiter, NORMAL, priority_class
+from src.core.cancel import CancelToken, DownloadCancelled
+from src.core.events import Event
+from src.core.format_planner import FormatPlan, NoFormatFits, choose_format, plan_formats
+from src.core.fragment_tuner import FragmentTuner
+from src.core.metadata_cache import MetadataCache
+from src.core.metrics import (CANCELLED, COMPLETED, DEFERRED, FAILED, SKIPPED, JobTrace,
+                              Metrics)
+from src.core.playlist import PlaylistExpander
+from src.core.postprocess import PostProcessPool, find_deferred
+from src.core.progress import ProgressAggregator, ProgressSnapshot
+from src.core.records import VideoRecord
+from src.core.storage import InsufficientSpace, Reservation, Storage
+from src.core.stream import StreamSink, StreamTarget, can_mux
+from src.core.ydl import create_ydl
+from src.core.ydl_pool import YDLPool
+
+
+def preload_backend() -> threading.Thread:
+    """Load the extractor index and yt-dlp on a background thread so the
+    first lookup and download start warm.
+
+    Returns:
+        threading.Thread: The started loader thread
+    """
+    def load():
+        # The URL box looks URLs up in the extractor index as soon as the
+        # user types, so it comes first
+        from src.core.extractor_index import default_index
+        default_index()
+        import yt_dlp  # noqa: F401
+        from yt_dlp.extractor import gen_extractor_classes
+        gen_extractor_classes()
+
+    thread = threading.Thread(target=load, name='yt-dlp-preload', daemon=True)
+    thread.start()
+    return thread
+
+
+class _JobContext:
+    """Per-download state, kept off the downloader so jobs can run concurrently."""
+
+    def __init__(self, trace: JobTrace, cancel_token: Optional[CancelToken] = None,
+                 report: Optional[Callable[[ProgressSnapshot], None]] = None,
+                 stream: Optional[StreamSink] = None):
+        self.trace = trace
+        self.cancel_token = cancel_token or CancelToken()
+        self.report = report
+        self.stream = stream
+        self.last_filename = ""
+        self.partial_files: Set[str] = set()
+        # Resume information recorded by the job journal
+        self.format_ids: Optional[str] = None
+        self.part_file: Optional[str] = None
+        # Disk space admitted for the job's videos, latest last
+        self.reservations: List[Reservation] = []
+
+    def release_space(self) -> None:
+        """Give the job's admitted disk space back to the storage."""
+        for reservation in self.reservations:
+            reservation.release()
+
+    def cleanup(self) -> None:
+        """Remove the temporary files yt-dlp left behind for this job."""
+        candidates = set()
+        for name in self.partial_files:
+            candidates.update({name, f"{name}.part", f"{name}.ytdl"})
+            candidates.update(glob.glob(f"{glob.escape(name)}.part-Frag*"))
+        for path in candidates:
+            if path.endswith(('.part', '.ytdl')) or '.part-Frag' in path:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
 
-class VideoDownloader(QObject):
-    progress = pyqtSignal(float, str)
-    error = pyqtSignal(str)
-    complete = pyqtSignal(str)  # Now emits the filename
 
-    def __init__(self):
-        super().__init__()
+class VideoDownloader:
+    """Facade over yt-dlp.
+
+    Events are emitted on the thread doing the download:
+        progress(percent, status), error(message), complete(filename),
+        cancelled(), progress_batch(list of ProgressSnapshot)
+    """
+
+    def __init__(self, metadata_cache: Optional[MetadataCache] = None, progress_rate: float = 10.0,
+                 fragment_tuner: Optional[FragmentTuner] = None,
+                 archive: Optional[DownloadArchive] = None,
+                 bandwidth: Optional[BandwidthLimiter] = None, pool_size: int = 8,
+                 postprocess: Optional[PostProcessPool] = None,
+                 postprocessors: Optional[List[Dict[str, Any]]] = None,
+                 ffmpeg_location: Optional[str] = None, stream: Optional[StreamTarget] = None,
+                 storage: Optional[Storage] = None, metrics: Optional[Metrics] = None,
+                 max_size: Optional[int] = None, prefer_copy: bool = False):
+        """
+        Args:
+            metadata_cache: Optional cache of extraction results
+            progress_rate: Maximum progress updates per second
+            fragment_tuner: Picks the HLS/DASH fragment concurrency per host
+                when a download does not set concurrent_fragments
+            archive: Videos already downloaded; fetch() raises
+                AlreadyDownloaded for them and records new ones
+            bandwidth: Limiter shared by all downloads
+            pool_size: YoutubeDL instances kept warm between jobs; 0 creates
+                a fresh one for every job
+            postprocess: Runs merging and conversions off the download
+                worker; without it they run inline
+            postprocessors: yt-dlp post-processor definitions applied to
+                every download, e.g. {'key': 'FFmpegMetadata'}
+            ffmpeg_location: ffmpeg binary or its directory; defaults to the
+                bundled copy in frozen builds and PATH otherwise
+            stream: Write every download to this StreamSink or target (see
+                StreamSink) instead of to files; downloads must then run
+                one at a time
+            storage: Writes the downloaded files and admits downloads by
+                free disk space; defaults to Storage()
+            metrics: Receives a JobTrace of every fetch() with its phase
+                timings and request counters; defaults to Metrics()
+            max_size: Default size budget of downloads in bytes; see fetch()
+            prefer_copy: Default for preferring formats that need no
+                re-encoding; see fetch()
+        """
+        self.progress = Event()
+        self.error = Event()
+        self.complete = Event()  # Emits the filename
+        self.cancelled = Event()
+        self.progress_batch = Event()  # ProgressSnapshot objects, one batch per interval
         self.ydl_opts = None
+        self.metadata_cache = metadata_cache
+        self.fragment_tuner = fragment_tuner
+        self.archive = archive
+        self.bandwidth = bandwidth
+        self.postprocess = postprocess
+        self.postprocessors = postprocessors or []
+        if ffmpeg_location is None and getattr(sys, 'frozen', False):
+            ffmpeg_location = os.path.join(sys._MEIPASS, 'ffmpeg.exe')
+        self.ffmpeg_location = ffmpeg_location
+        self.stream = stream if stream is None or isinstance(stream, StreamSink) else StreamSink(stream)
+        self.storage = storage or Storage()
+        self.metrics = metrics or Metrics()
+        self.max_size = max_size
+        self.prefer_copy = prefer_copy
+        self.ydl_pool = YDLPool(self._create_ydl, max_idle=pool_size, reusable=_is_job_error)
+        # Set by frontends to queue playlist entries as separate jobs
+        self.playlist_expander: Optional[PlaylistExpander] = None
+        self.progress_engine = ProgressAggregator(self._deliver_progress, rate_hz=progress_rate)
         self._setup_ffmpeg_path()
 
     def _setup_ffmpeg_path(self):
@@ -24,73 +173,474 @@ class VideoDownloader(QObject):
             if os.path.exists(ffmpeg_path) and os.path.exists(ffprobe_path):
                 os.environ["PATH"] = f"{bundle_dir};{os.environ['PATH']}"
 
-    def _progress_hook(self, d: Dict[str, Any]) -> None:
-        if d['status'] == 'downloading':
-            p = d.get('_percent_str', '0%').replace('%', '')
-            try:
-                percentage = float(p)
-                self.progress.emit(percentage, 'Downloading...')
-            except ValueError:
-                self.progress.emit(0, 'Starting download...')
-        elif d['status'] == 'finished':
-            self.progress.emit(100, 'Download complete!')
-            # Store the filename for later use
-            self.last_filename = os.path.basename(d['filename'])
-
-    def download(self, url: str, output_path: str, format_selection: str = 'best') -> None:
+    def _progress_hook(self, d: Dict[str, Any], job: Optional[_JobContext] = None) -> None:
+        if job is not None:
+            # Streamed downloads leave no files behind
+            if job.stream is None:
+                for key in ('tmpfilename', 'filename'):
+                    if d.get(key):
+                        job.partial_files.add(d[key])
+                if d.get('tmpfilename'):
+                    job.part_file = d['tmpfilename']
+                if job.reservations:
+                    job.reservations[-1].progress(d)
+            if job.format_ids is None and d.get('info_dict'):
+                info = d['info_dict']
+                requested = info.get('requested_formats')
+                job.format_ids = ('+'.join(f['format_id'] for f in requested)
+                                  if requested else info.get('format_id'))
+            # yt-dlp calls the hook once per chunk, so this bounds the abort latency
+            if job.cancel_token.cancelled:
+                raise DownloadCancelled('Download cancelled by user')
+            if d['status'] == 'finished':
+                # Store the filename for later use
+                job.last_filename = os.path.basename(d['filename'])
+
+        # Cheap per-chunk bookkeeping; delivery is throttled by the engine
+        self.progress_engine.update(job, d)
+
+    def _deliver_progress(self, batch: List[ProgressSnapshot]) -> None:
+        """Forward a coalesced progress batch to per-job callbacks and signals."""
+        latest = None
+        for snapshot in batch:
+            job = snapshot.job
+            if job is not None and job.report is not None:
+                job.report(snapshot)
+            else:
+                latest = snapshot
+        if latest is not None:
+            self.progress.emit(latest.percent, latest.describe())
+        self.progress_batch.emit(batch)
+
+    def download(self, url: str, output_path: str, format_selection: str = 'best',
+                 cancel_token: Optional[CancelToken] = None, connections: int = 1) -> None:
         """
         Download video from URL.
-        
+
+        Results are reported through the complete/error/cancelled events.
+
         Args:
             url: Video URL
             output_path: Output directory
             format_selection: Format to download ('best', 'hd', 'sd', 'audio')
+            cancel_token: Optional token used to abort the download
+            connections: Parallel ranged connections for progressive HTTP
+                formats; 1 uses a single stream
         """
+        try:
+            filename = self.fetch(url, output_path, format_selection, cancel_token,
+                                  connections=connections)
+            # Emit the complete signal with the filename
+            self.complete.emit(filename)
+        except DownloadCancelled:
+            self.cancelled.emit()
+        except Exception as e:
+            self.error.emit(str(e))
+
+    def fetch(self, url: str, output_path: str, format_selection: str = 'best',
+              cancel_token: Optional[CancelToken] = None,
+              progress_callback: Optional[Callable[[ProgressSnapshot], None]] = None,
+              connections: int = 1, concurrent_fragments: Optional[int] = None,
+              format_ids: Optional[str] = None,
+              expand_playlist: Optional[Callable[[Dict[str, Any], Any], None]] = None,
+              on_info: Optional[Callable[[Dict[str, Any]], None]] = None,
+              bandwidth_class: str = NORMAL, wait: bool = True, audio_format: str = 'best',
+              audio_quality: Optional[str] = None,
+              stream: Optional[StreamTarget] = None,
+              job_id: Optional[int] = None, max_size: Optional[int] = None,
+              prefer_copy: Optional[bool] = None) -> Union[str, Future]:
+        """
+        Download video from URL, raising instead of emitting events.
+
+        Used by the download queue, which tracks many jobs at once and needs
+        per-job results rather than the shared events.
+
+        Args:
+            url: Video URL
+            output_path: Output directory
+            format_selection: Format to download ('best', 'hd', 'sd', 'audio')
+            cancel_token: Optional token used to abort the download
+            progress_callback: Receives throttled ProgressSnapshot updates;
+                defaults to the progress event
+            connections: Parallel ranged connections for progressive HTTP
+                formats; 1 uses a single stream
+            concurrent_fragments: Fragments of HLS/DASH formats fetched in
+                parallel; None lets the fragment tuner decide
+            format_ids: Exact yt-dlp format IDs (e.g. '137+140') overriding
+                format_selection; used to resume a partial download
+            expand_playlist: Receives (ie_result, ydl) for playlist URLs
+                instead of downloading every entry here; it takes over
+                closing ydl
+            on_info: Receives the processed info dict once the download
+                has finished
+            bandwidth_class: Priority class for the bandwidth limiter
+            wait: With a PostProcessPool, block until post-processing has
+                finished; False returns a Future as soon as the download
+                itself is done
+            audio_format: Codec of 'audio' downloads, one of AUDIO_FORMATS;
+                'best' keeps the stream's codec
+            audio_quality: Bitrate or VBR level for transcoded audio, see
+                parse_audio_quality()
+            stream: Write the media to this StreamSink or target instead of
+                output_path; overrides the downloader's stream. Merged
+                formats are muxed on the fly, or replaced by single-file
+                ones where ffmpeg cannot mux; nothing is post-processed.
+            job_id: Queue job ID recorded in the job's trace
+            max_size: Download the best plan of format_selection predicted
+                to fit in this many bytes (see format_planner); defaults to
+                the downloader's max_size
+            prefer_copy: Prefer formats that need no re-encoding, such as
+                streams that merge into MP4 or WebM; defaults to the
+                downloader's prefer_copy
+
+        Returns:
+            str: Name of the downloaded file, or '' for an expanded playlist;
+                a Future of the name while post-processing when wait is False;
+                the sink's name for a streamed download
+
+        Raises:
+            DownloadCancelled: If the token was cancelled mid-download
+            AlreadyDownloaded: If the video is in the archive
+            InsufficientSpace: If the video's estimated size does not fit
+                in the free disk space
+            FFmpegNotFound: If audio_format needs a conversion and ffmpeg
+                is missing
+            ValueError: If audio_format needs a conversion and the download
+                is streamed
+            NoFormatFits: If no format combination is predicted to fit in
+                max_size
+        """
+        if stream is None:
+            sink = self.stream
+        else:
+            sink = stream if isinstance(stream, StreamSink) else StreamSink(stream)
         format_opts = {
             'best': 'best',
             'hd': 'bestvideo[height<=1080]+bestaudio/best[height<=1080]',
             'sd': 'bestvideo[height<=480]+bestaudio/best[height<=480]',
-            'audio': 'bestaudio/best'
+            'audio': audio_format_selector(audio_format)
         }
+        max_size = self.max_size if max_size is None else max_size
+        prefer_copy = self.prefer_copy if prefer_copy is None else prefer_copy
+        postprocessors = list(self.postprocessors)
+        if sink is not None:
+            if format_selection == 'audio' and audio_format != 'best':
+                raise ValueError('Audio cannot be converted while streaming')
+            if not can_mux(self.ffmpeg_location):
+                format_opts.update({'hd': 'best[height<=1080]', 'sd': 'best[height<=480]'})
+            # yt-dlp does not post-process the '-' output
+            postprocessors = []
+        elif format_selection == 'audio':
+            if ffmpeg_available(self.ffmpeg_location):
+                postprocessors.append(audio_postprocessor(audio_format, audio_quality))
+            elif audio_format != 'best':
+                raise FFmpegNotFound(f'Converting audio to {audio_format} needs ffmpeg, which was not found')
 
-        self.ydl_opts = {
-            'format': format_opts.get(format_selection, 'best'),
-            'outtmpl': os.path.join(output_path, '%(title)s.%(ext)s'),
-            'progress_hooks': [self._progress_hook],
+        job = _JobContext(self.metrics.start(url, job_id), cancel_token, progress_callback, sink)
+        ydl_opts = {
+            'format': format_ids or format_opts.get(format_selection, 'best'),
+            'outtmpl': '-' if sink is not None else os.path.join(output_path, '%(title)s.%(ext)s'),
+            'progress_hooks': [partial(self._progress_hook, job=job)],
             'quiet': True,
             'no_warnings': True,
-            'ffmpeg_location': os.path.join(sys._MEIPASS, 'ffmpeg.exe') if getattr(sys, 'frozen', False) else None
+            'noprogress': True,
+            'segmented_connections': connections,
+            'bandwidth_class': bandwidth_class,
+            'postprocessors': postprocessors,
+            'defer_postprocessing': self.postprocess is not None,
+            'ffmpeg_location': self.ffmpeg_location
         }
+        if concurrent_fragments:
+            ydl_opts['concurrent_fragment_downloads'] = concurrent_fragments
+        self.ydl_opts = ydl_opts
 
+        result = None
+        error = None
         try:
-            # Initialize the filename
-            self.last_filename = ""
-            
-            with yt_dlp.YoutubeDL(self.ydl_opts) as ydl:
-                # Get video info first to get the title
-                info = ydl.extract_info(url, download=False)
-                title = info.get('title', 'video')
-                ext = info.get('ext', 'mp4')
-                if format_selection == 'audio':
-                    ext = 'mp3'
-                
-                # If we couldn't get the filename from the progress hook
-                if not hasattr(self, 'last_filename') or not self.last_filename:
-                    self.last_filename = f"{title}.{ext}"
-                
-                # Download the video
-                ydl.download([url])
-                
-            # Emit the complete signal with the filename
-            self.complete.emit(self.last_filename)
-        except Exception as e:
-            self.error.emit(str(e))
+            with contextlib.ExitStack() as stack:
+                ydl = stack.enter_context(self.ydl_pool.checkout(ydl_opts))
+                ydl.trace = job.trace
+                stack.callback(setattr, ydl, 'trace', None)
+                if sink is not None:
+                    # Per job, like the hooks, so pooled instances are shared
+                    ydl.stream_sink = sink
+                    stack.callback(setattr, ydl, 'stream_sink', None)
+                else:
+                    ydl.reservations = job.reservations
+                    stack.callback(setattr, ydl, 'reservations', None)
+                # Most URLs carry the video ID, so duplicates are caught
+                # before any network I/O
+                self._check_archive(url_archive_key(ydl, url))
+
+                # Extract once; the unprocessed result feeds the download stage
+                # directly instead of letting ydl.download() extract again
+                with job.trace.span('extract'):
+                    ie_result = self._extract(ydl, url)
+
+                if job.cancel_token.cancelled:
+                    raise DownloadCancelled('Download cancelled by user')
+
+                if ie_result.get('_type') == 'playlist' and expand_playlist is not None:
+                    # Entries become separate jobs; the expander keeps ydl to
+                    # fetch further pages and closes it
+                    stack.pop_all()
+                    ydl.trace = None
+                    expand_playlist(ie_result, ydl)
+                    return ''
+
+                self._check_archive(archive_key(ie_result))
+
+                if (max_size is not None or prefer_copy) and not format_ids \
+                        and ie_result.get('formats'):
+                    plan = choose_format(
+                        VideoRecord.from_info(ie_result, url), format_selection, max_size,
+                        prefer_copy, audio_format, merge=sink is None or can_mux(self.ffmpeg_location))
+                    if plan is None:
+                        raise NoFormatFits(f'No format of {url} fits in {max_size} bytes')
+                    # The pooled instance keeps the selector of its options
+                    stack.callback(setattr, ydl, 'format_selector', ydl.format_selector)
+                    ydl.format_selector = ydl.build_format_selector(plan.format_ids)
+
+                # Select formats and download from the already extracted info
+                info = ydl.process_ie_result(ie_result, download=True)
+                # Worked out now: a deferred finalize runs after ydl has gone
+                # back to the pool, possibly to another job
+                finalize = partial(self._finalize, info, job, on_info,
+                                   self._template_filename(ydl, info))
+                deferred = find_deferred(info)
+                if not deferred:
+                    return finalize()
+                # The files are on disk, so the worker can take the next job
+                # while they are merged and converted
+                postprocessing = job.trace.begin('postprocess')
+
+                def finalize_deferred():
+                    postprocessing.close()
+                    return finalize()
+
+                result = self.postprocess.submit(deferred, ydl_opts, finalize_deferred)
+        except DownloadCancelled as e:
+            error = e
+            if job.cancel_token.discard_partial:
+                job.cleanup()
+            raise
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            self.progress_engine.forget(job)
+            if isinstance(result, Future):
+                # Merges and conversions still need the space
+                result.add_done_callback(lambda done: self._job_done(job, _future_error(done)))
+            else:
+                self._job_done(job, error)
+            if stream is not None and sink is not stream:
+                sink.close()
+        return result.result() if wait else result
+
+    def _finalize(self, info: Dict[str, Any], job: _JobContext,
+                  on_info: Optional[Callable[[Dict[str, Any]], None]],
+                  template_filename: Optional[str]) -> str:
+        """Last stage of a job: record the download and name its output file."""
+        with job.trace.span('finalize'):
+            if on_info is not None:
+                on_info(info)
+            key = archive_key(info)
+            if self.archive is not None and key and info.get('_type', 'video') == 'video':
+                self.archive.add(key)
+            return self._output_filename(info, job, template_filename)
+
+    def _job_done(self, job: _JobContext, error: Optional[BaseException]) -> None:
+        """Release a finished job's disk space and record its trace."""
+        job.release_space()
+        if error is None:
+            outcome = COMPLETED
+        elif isinstance(error, DownloadCancelled):
+            outcome = CANCELLED
+        elif isinstance(error, AlreadyDownloaded):
+            outcome = SKIPPED
+        elif isinstance(error, InsufficientSpace):
+            outcome = DEFERRED
+        else:
+            outcome = FAILED
+        self.metrics.finish(job.trace, outcome, error)
+
+    def run_job(self, job: Any, report: Callable[..., None]) -> Union[str, Future]:
+        """DownloadQueue runner: download a queued job.
+
+        Args:
+            job: The DownloadJob to run
+            report: The queue's progress callback
+
+        Returns:
+            str: Name of the downloaded file, or a Future of it while the
+                PostProcessPool merges and converts the download
+        """
+        def progress(snapshot: ProgressSnapshot) -> None:
+            report(
+                snapshot.percent, snapshot.describe(), speed=snapshot.speed, eta=snapshot.eta,
+                downloaded_bytes=snapshot.downloaded, total_bytes=snapshot.total,
+                fragment_index=snapshot.fragment_index, fragment_count=snapshot.fragment_count,
+                part_file=snapshot.job.part_file, format_ids=snapshot.job.format_ids
+            )
+
+        def describe(info: Dict[str, Any]) -> None:
+            # Kept on the job for the download history
+            job.title, job.video_id = info.get('title'), info.get('id')
+            job.extractor = info.get('extractor_key')
+
+        return self.fetch(
+            job.url, job.output_path, job.format_selection,
+            cancel_token=job.cancel_token,
+            progress_callback=progress,
+            connections=job.connections,
+            concurrent_fragments=job.concurrent_fragments,
+            format_ids=job.format_ids,
+            expand_playlist=(partial(self.playlist_expander.expand, job)
+                             if self.playlist_expander is not None else None),
+            on_info=describe,
+            bandwidth_class=priority_class(job.priority),
+            wait=False,
+            audio_format=job.audio_format,
+            audio_quality=job.audio_quality,
+            job_id=job.id
+        )
+
+    def _check_archive(self, key: Optional[str]) -> None:
+        if self.archive is not None and key is not None and key in self.archive:
+            raise AlreadyDownloaded(key)
+
+    def _extract(self, ydl: 'yt_dlp.YoutubeDL', url: str, playable: bool = True) -> Dict[str, Any]:
+        """Return the unprocessed info dict for a URL, from the cache when fresh."""
+        if self.metadata_cache is not None:
+            cached = self.metadata_cache.get(url, playable=playable)
+            if cached is not None:
+                return cached
+        ie_result = ydl.extract_info(url, download=False, process=False)
+        if self.metadata_cache is not None:
+            self.metadata_cache.put(url, ie_result)
+        return ie_result
+
+    def close(self) -> None:
+        """Close the YoutubeDL instances kept for reuse and the stream."""
+        self.ydl_pool.close()
+        if self.stream is not None:
+            self.stream.close()
+
+    def _create_ydl(self, ydl_opts: Dict[str, Any]) -> 'yt_dlp.YoutubeDL':
+        """Create a YoutubeDL instance; jobs get them through the pool."""
+        return create_ydl(ydl_opts, fragment_tuner=self.fragment_tuner, bandwidth=self.bandwidth,
+                          storage=self.storage)
+
+    @staticmethod
+    def _first_video(info: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """The info dict a job's output file is named after."""
+        if info.get('_type') != 'playlist':
+            return info
+        return next((entry for entry in info.get('entries') or [] if entry), None)
+
+    @classmethod
+    def _template_filename(cls, ydl: 'yt_dlp.YoutubeDL', info: Dict[str, Any]) -> Optional[str]:
+        """Name the output template gives a processed info dict."""
+        video = cls._first_video(info)
+        return os.path.basename(ydl.prepare_filename(video)) if video is not None else None
+
+    @classmethod
+    def _output_filename(cls, info: Dict[str, Any], job: _JobContext,
+                         template_filename: Optional[str]) -> str:
+        """Name of the file a job produced, after merging and post-processing.
+
+        Args:
+            info: The processed info dict, updated by post-processing
+            job: The job
+            template_filename: _template_filename() of info, taken while the
+                job held its YoutubeDL instance
+        """
+        if job.stream is not None:
+            return job.stream.name
+        video = cls._first_video(info)
+        if video is None:
+            return job.last_filename
+        downloads = video.get('requested_downloads') or []
+        if downloads and downloads[-1].get('filepath'):
+            return os.path.basename(downloads[-1]['filepath'])
+        # The finished hook reports the last file yt-dlp wrote
+        if job.last_filename:
+            return job.last_filename
+        return template_filename
 
     def get_video_info(self, url: str) -> Optional[Dict[str, Any]]:
-        """Get video information without downloading."""
+        """Get video information without downloading.
+
+        A cached entry whose media URLs have expired is returned as is: its
+        metadata and format list are valid, but formats carry no URLs.
+        Callers that keep the result should keep get_video_record()'s
+        instead.
+        """
         try:
-            with yt_dlp.YoutubeDL({'quiet': True}) as ydl:
-                return ydl.extract_info(url, download=False)
+            with self.ydl_pool.checkout({'quiet': True}) as ydl:
+                info = self._extract(ydl, url, playable=False)
+                if not all(f.get('url') for f in info.get('formats') or []):
+                    return info
+                # Format selection runs locally on the extracted data
+                return ydl.process_ie_result(info, download=False)
         except Exception as e:
             self.error.emit(str(e))
             return None
+
+    def get_video_record(self, url: str) -> Optional[VideoRecord]:
+        """Get compact video information without downloading.
+
+        Returns:
+            Optional[VideoRecord]: The video with its formats and the ones
+                'best' selects, or None if extraction failed
+        """
+        info = self.get_video_info(url)
+        if info is None:
+            return None
+        return VideoRecord.from_info(info, url)
+
+    def plan_formats(self, url: str, format_selection: str = 'best',
+                     max_size: Optional[int] = None, prefer_copy: bool = False,
+                     audio_format: str = 'best') -> List[FormatPlan]:
+        """Rank the ways to download a video with their predicted sizes.
+
+        Planned locally on the formats of one extraction, so with a
+        metadata cache repeated calls (e.g. for another size budget) make
+        no requests. See format_planner.plan_formats().
+
+        Returns:
+            List[FormatPlan]: Candidates, best first; empty if extraction
+                failed or nothing fits
+        """
+        record = self.get_video_record(url)
+        if record is None:
+            return []
+        return plan_formats(record, format_selection, max_size, prefer_copy, audio_format)
+
+    def full_info(self, record: VideoRecord) -> Optional[Dict[str, Any]]:
+        """Rehydrate the full info dict of a record.
+
+        Comes from the metadata cache while it holds the video and from a
+        new extraction otherwise; see get_video_info().
+        """
+        return self.get_video_info(record.url)
+
+
+# Outcomes of a job rather than faults of the YoutubeDL instance running it
+_JOB_ERRORS = (AlreadyDownloaded, InsufficientSpace, NoFormatFits, DownloadCancelled)
+
+
+def _is_job_error(error: BaseException) -> bool:
+    """Whether a YoutubeDL instance can be reused after its job raised error."""
+    if isinstance(error, _JOB_ERRORS):
+        return True
+    # yt-dlp's own errors can only have been raised once it is loaded
+    utils = sys.modules.get('yt_dlp.utils')
+    return utils is not None and isinstance(error, (utils.DownloadError, utils.ExtractorError))
+
+
+def _future_error(future: Future) -> Optional[BaseException]:
+    if future.cancelled():
+        return DownloadCancelled('Post-processing cancelled')
+    return future.exception()
@@ -0,0 +1,106 @@
+"""
+Thread pool execution engine for download jobs.
+
+Runs a downloader's download() off the GUI thread so the event loop keeps
+painting while yt-dlp works. The GUI passes a QtVideoDownloader so results
+arrive as queued signals.
+"""
+import threading
+from functools import partial
+from typing import Callable, Dict, Optional
+from PyQt6.QtCore import QObject, QRunnable, QThreadPool
+
+from src.core.downloader import CancelToken, VideoDownloader
+
+
+class DownloadTask(QRunnable):
+    """A single download job executed on a QThreadPool worker."""
+
+    def __init__(self, downloader: VideoDownloader, url: str, output_path: str,
+                 format_selection: str, cancel_token: CancelToken,
+                 on_finished: Optional[Callable[[], None]] = None):
+        super().__init__()
+        self.downloader = downloader
+        self.url = url
+        self.output_path = output_path
+        self.format_selection = format_selection
+        self.cancel_token = cancel_token
+        self.on_finished = on_finished
+        self.setAutoDelete(True)
+
+    def run(self):
+        """Run the download; results arrive through the downloader's signals."""
+        try:
+            if self.cancel_token.cancelled:
+                self.downloader.cancelled.emit()
+                return
+            self.downloader.download(
+                self.url, self.output_path, self.format_selection,
+                cancel_token=self.cancel_token
+            )
+        finally:
+            if self.on_finished is not None:
+                self.on_finished()
+
+
+class DownloadEngine(QObject):
+    """Schedules download tasks on a thread pool and tracks their cancel tokens."""
+
+    def __init__(self, downloader: VideoDownloader, max_workers: Optional[int] = None,
+                 parent: Optional[QObject] = None):
+        super().__init__(parent)
+        self.downloader = downloader
+        self.pool = QThreadPool(self)
+        if max_workers:
+            self.pool.setMaxThreadCount(max_workers)
+        self._tokens: Dict[int, CancelToken] = {}
+        self._lock = threading.Lock()
+        self._next_id = 0
+
+    def submit(self, url: str, output_path: str, format_selection: str = 'best') -> int:
+        """Queue a download and return its job id.
+
+        Args:
+            url: Video URL
+            output_path: Output directory
+            format_selection: Format to download ('best', 'hd', 'sd', 'audio')
+
+        Returns:
+            int: Job id usable with cancel()
+        """
+        token = CancelToken()
+        with self._lock:
+            job_id = self._next_id
+            self._next_id += 1
+            self._tokens[job_id] = token
+        task = DownloadTask(self.downloader, url, output_path, format_selection, token,
+                            on_finished=partial(self._forget, job_id))
+        self.pool.start(task)
+        return job_id
+
+    def cancel(self, job_id: int) -> None:
+        """Ask a running or queued job to stop."""
+        with self._lock:
+            token = self._tokens.get(job_id)
+        if token is not None:
+            token.cancel()
+
+    def cancel_all(self) -> None:
+        """Cancel every job the engine knows about."""
+        with self._lock:
+            tokens = list(self._tokens.values())
+        for token in tokens:
+            token.cancel()
+
+    def active_count(self) -> int:
+        """Number of jobs that are queued or running."""
+        with self._lock:
+            return len(self._tokens)
+
+    def wait_for_done(self, msecs: int = -1) -> bool:
+        """Block until all workers have finished."""
+        return self.pool.waitForDone(msecs)
+
+    def _forget(self, job_id: int) -> None:
+        with self._lock:
+            self._tokens.pop(job_id, None)
@@ -0,0 +1,35 @@
+"""
+Minimal Qt-free event primitive for core components.
+
+Event mirrors the connect()/emit() interface of pyqtSignal so core classes
+can publish notifications without depending on Qt. Callbacks run on the
+emitting thread; the GUI wraps core objects in Qt adapters that re-emit
+them as real signals.
+"""
+import threading
+from typing import Callable, List
+
+
+class Event:
+    """A list of callbacks invoked in order by emit()."""
+
+    def __init__(self):
+        self._callbacks: List[Callable] = []
+        self._lock = threading.Lock()
+
+    def connect(self, callback: Callable) -> None:
+        """Register a callback."""
+        with self._lock:
+            self._callbacks.append(callback)
+
+    def disconnect(self, callback: Callable) -> None:
+        """Remove a previously registered callback."""
+        with self._lock:
+            self._callbacks.remove(callback)
+
+    def emit(self, *args) -> None:
+        """Call every registered callback with args."""
+        with self._lock:
+            callbacks = list(self._callbacks)
+        for callback in callbacks:
+            callback(*args)
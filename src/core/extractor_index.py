@@ -0,0 +1,507 @@
+"""
+Offline index of the URLs yt-dlp's extractors accept.
+
+yt-dlp picks an extractor by trying every extractor's _VALID_URL regex in
+turn, which means importing and compiling nearly two thousand patterns
+before the first answer. The index groups the patterns by the literal host
+suffix they require (youtube.com, youtu.be, ...), by a label of the host
+when only the suffix varies (dailymotion.<tld>) or, for pseudo-URLs such
+as 'ytsearch:cats', by their first character, so a lookup compiles and
+runs only the handful of regexes that can possibly match.
+
+The index is built from yt-dlp at build time (python -m
+src.core.extractor_index), shipped as JSON and loaded on first use. When
+the shipped file is missing or was built for another yt-dlp version, it is
+rebuilt once and cached in the data directory.
+
+Extractors that narrow their _VALID_URL with a custom suitable() are
+indexed by the regex alone, so match() may name one of them for a URL it
+would hand on to a more specific extractor. Generic, which accepts any
+URL, is left out: a URL only it would handle is reported as unknown.
+"""
+import json
+import os
+import re
+import sys
+import threading
+from pathlib import Path
+from re import _constants as sre_constants, _parser as sre_parser
+from typing import Any, Callable, Dict, Iterable, List, NamedTuple, Optional, Set, Tuple, Union
+
+FORMAT_VERSION = 1
+BUNDLED_PATH = Path(__file__).resolve().parent.parent / 'resources' / 'extractor_index.json'
+
+_LITERAL = sre_constants.LITERAL
+_IN = sre_constants.IN
+_AT = sre_constants.AT
+_ANY = sre_constants.ANY
+_AT_BEGINNING = (sre_constants.AT_BEGINNING, sre_constants.AT_BEGINNING_STRING)
+_SUBPATTERN = sre_constants.SUBPATTERN
+_RANGE = sre_constants.RANGE
+_CATEGORY = sre_constants.CATEGORY
+_COLONLESS_CATEGORIES = (sre_constants.CATEGORY_DIGIT, sre_constants.CATEGORY_WORD,
+                         sre_constants.CATEGORY_SPACE)
+_BRANCH = sre_constants.BRANCH
+_GROUPREF_EXISTS = sre_constants.GROUPREF_EXISTS
+_ASSERTS = (sre_constants.ASSERT, sre_constants.ASSERT_NOT)
+_REPEATS = (sre_constants.MAX_REPEAT, sre_constants.MIN_REPEAT, sre_constants.POSSESSIVE_REPEAT)
+_SLASH, _COLON, _DOT = ord('/'), ord(':'), ord('.')
+_HOST_END = {ord(c) for c in '/?#'}
+
+# Flattened variants tried per pattern before it is treated as matching anything
+_MAX_VARIANTS = 16384
+_HOST_KEY = re.compile(r'[a-z0-9-]+(?:\.[a-z0-9-]+)*')
+_URL_HOST = re.compile(r'[A-Za-z][A-Za-z0-9+.-]*:(?://)?(?:[^@/?#]*@)?([^:/?#]*)')
+_BARE_HOST = re.compile(r'[^:/?#]*')
+_CANDIDATE_CACHE_SIZE = 4096
+
+
+class ExtractorInfo(NamedTuple):
+    """An extractor as listed in the supported sites."""
+    key: str  # ie_key(), e.g. 'Youtube'
+    name: str  # IE_NAME, e.g. 'youtube:tab'
+    description: Optional[str]
+    working: bool
+
+
+def pattern_keys(pattern: str) -> Optional[Dict[str, Set[str]]]:
+    """Work out which URLs a _VALID_URL pattern can match.
+
+    Returns:
+        Optional[Dict[str, Set[str]]]: 'hosts': suffixes a matching URL's
+        host ends with, on label boundaries; 'labels': labels it contains
+        where the suffix varies, e.g. 'dailymotion' for dailymotion.<tld>;
+        'firsts': lowercase first characters of the URL otherwise; 'bare':
+        {''} if it also matches text without a scheme or host that cannot
+        be narrowed down, such as a bare YouTube video ID. None if the
+        pattern could match too many URLs to narrow down.
+    """
+    try:
+        parsed = sre_parser.parse(pattern)
+    except (re.error, RecursionError):
+        return None
+    keys = {'hosts': set(), 'labels': set(), 'firsts': set(), 'bare': set()}
+    variants = _flatten(list(parsed))
+    if variants is None:
+        return None
+    for flat in variants:
+        slashes = _find_slashes(flat)
+        # URL with a scheme, or a bare host name or pseudo-URL otherwise
+        host = _host_items(flat[slashes + 2:] if slashes is not None else flat)
+        key = _host_suffix(host)
+        if key is not None:
+            keys['hosts'].add(key)
+            continue
+        label = _host_label(host)
+        if label is not None:
+            keys['labels'].add(label)
+        elif _add_first_chars(keys['firsts'], flat):
+            # e.g. mms://.+ still rules out URLs starting with another letter
+            continue
+        elif slashes is None and not any(_may_match_colon(node) for node in flat):
+            # Cannot match the scheme of a URL: only text without one
+            keys['bare'].add('')
+        else:
+            return None
+    # www.example.com adds nothing once example.com is a key
+    hosts = keys['hosts']
+    keys['hosts'] = {host for host in hosts
+                     if not any(host.endswith('.' + other) for other in hosts)}
+    return keys
+
+
+def _flatten(items: List[Tuple]) -> Optional[List[List[Tuple]]]:
+    """Expand groups, alternatives and optional parts up to the end of the host.
+
+    Returns:
+        Optional[List[List[Tuple]]]: Sequences of simple items, each cut
+        where its host ends; None beyond _MAX_VARIANTS
+    """
+    done, stack = [], [([], items, frozenset())]
+    while stack:
+        flat, rest, groups = stack.pop()
+        if not rest or _past_host(flat):
+            done.append(flat)
+            if len(done) > _MAX_VARIANTS:
+                return None
+            continue
+        (op, av), rest = rest[0], rest[1:]
+        if op is _SUBPATTERN:
+            # Remember capturing groups taken, for (?(1)...) conditions
+            stack.append((flat, list(av[-1]) + rest, groups | {av[0]}))
+        elif op is _BRANCH:
+            stack.extend((flat, list(alt) + rest, groups) for alt in av[1])
+        elif op is _GROUPREF_EXISTS:
+            taken = av[1] if av[0] in groups else av[2]
+            stack.append((flat, list(taken or ()) + rest, groups))
+        elif op in _REPEATS and av[0] == 0 and av[1] == 1:
+            stack.append((flat, rest, groups))
+            stack.append((flat, list(av[2]) + rest, groups))
+        elif op in _ASSERTS or (op is _AT and av in _AT_BEGINNING):
+            # Zero-width
+            stack.append((flat, rest, groups))
+        else:
+            stack.append((flat + [(op, av)], rest, groups))
+        if len(stack) > _MAX_VARIANTS:
+            return None
+    return done
+
+
+def _find_slashes(flat: List[Tuple]) -> Optional[int]:
+    for i in range(len(flat) - 1):
+        if flat[i] == (_LITERAL, _SLASH) and flat[i + 1] == (_LITERAL, _SLASH):
+            return i
+    return None
+
+
+def _past_host(flat: List[Tuple]) -> bool:
+    slashes = _find_slashes(flat)
+    if slashes is not None:
+        return len(flat) > slashes + 2 and _ends_host(flat[-1])
+    if len(flat) > 256:
+        return True
+    # A slash may still turn out to start '//'
+    return bool(flat) and _ends_host(flat[-1]) and flat[-1] != (_LITERAL, _SLASH)
+
+
+def _ends_host(node: Tuple) -> bool:
+    op, av = node
+    if op is _LITERAL:
+        return av in _HOST_END
+    if op is _IN:
+        return any(kind is _LITERAL and value in _HOST_END for kind, value in av)
+    return op is _AT
+
+
+def _may_match_colon(node: Tuple) -> bool:
+    op, av = node
+    if op is _LITERAL:
+        return av == _COLON
+    if op is _IN:
+        for kind, value in av:
+            if kind is _LITERAL and value == _COLON:
+                return True
+            if kind is _RANGE and value[0] <= _COLON <= value[1]:
+                return True
+            if kind is _CATEGORY and value not in _COLONLESS_CATEGORIES:
+                return True
+            if kind not in (_LITERAL, _RANGE, _CATEGORY):
+                # Negated or otherwise unusual class
+                return True
+        return False
+    if op in _REPEATS:
+        return any(_may_match_colon(item) for item in av[2])
+    if op is _SUBPATTERN:
+        return any(_may_match_colon(item) for item in av[-1])
+    if op is _BRANCH:
+        return any(_may_match_colon(item) for alt in av[1] for item in alt)
+    return op is not _AT
+
+
+def _add_first_chars(firsts: Set[str], flat: List[Tuple]) -> bool:
+    """Add the characters a variant can start with, if it starts with a literal."""
+    if not flat:
+        return False
+    op, av = flat[0]
+    if op is _LITERAL:
+        chars = {chr(av)}
+    elif op is _IN and all(kind is _LITERAL for kind, _ in av):
+        chars = {chr(value) for _, value in av}
+    else:
+        return False
+    firsts.update(c.lower() for c in chars)
+    return True
+
+
+def _host_items(items: List[Tuple]) -> List[Tuple]:
+    """The items matching the host name, with a bare '.' taken as a literal dot."""
+    host = []
+    for node in items:
+        if node == (_LITERAL, _COLON) or _ends_host(node):
+            # Port or end of host
+            break
+        op, av = node
+        if op is _ANY:
+            # Patterns often leave dots in host names unescaped
+            node = (_LITERAL, _DOT)
+        elif op is _IN and len(av) == 2 and all(kind is _LITERAL for kind, _ in av) \
+                and chr(av[0][1]).lower() == chr(av[1][1]).lower():
+            # Case-insensitive letter such as [yY]
+            node = (_LITERAL, ord(chr(av[0][1]).lower()))
+        host.append(node)
+    return host
+
+
+def _host_suffix(host: List[Tuple]) -> Optional[str]:
+    """The literal, label-aligned suffix of every host the items match."""
+    start = len(host)
+    while start and host[start - 1][0] is _LITERAL:
+        start -= 1
+    text = ''.join(chr(value) for _, value in host[start:]).lower()
+    if start and not text.startswith('.'):
+        # Preceded by a pattern, e.g. [a-z]+tube\.com: only whole labels count
+        text = text.partition('.')[2]
+    text = text.lstrip('.')
+    return text if text and _HOST_KEY.fullmatch(text) else None
+
+
+def _host_label(host: List[Tuple]) -> Optional[str]:
+    """The longest literal label every host the items match contains."""
+    best, run, bounded = None, '', True
+    for node in host + [None]:
+        if node is not None and node[0] is _LITERAL:
+            run += chr(node[1])
+            continue
+        # A run is bounded by the start or end of the host or by dots
+        labels = run.lower().split('.')
+        if not bounded:
+            labels = labels[1:]
+        if node is not None:
+            labels = labels[:-1]
+        for label in labels:
+            if label and label != 'www' and _HOST_KEY.fullmatch(label) \
+                    and (best is None or len(label) > len(best)):
+                best = label
+        run, bounded = '', False
+    return best
+
+
+class ExtractorIndex:
+    """Extractor lookup by URL without network I/O or importing yt-dlp. Thread safe."""
+
+    def __init__(self, data: Dict[str, Any]):
+        """
+        Args:
+            data: Serialized index, as written by save()
+        """
+        if data.get('format') != FORMAT_VERSION:
+            raise ValueError('Unsupported extractor index format')
+        self.yt_dlp_version: str = data['yt_dlp_version']
+        self.extractors = [ExtractorInfo(*entry) for entry in data['extractors']]
+        # (extractor position, pattern) in yt-dlp's order, which decides ties
+        self._patterns: List[Tuple[int, str]] = [tuple(entry) for entry in data['patterns']]
+        self._hosts: Dict[str, List[int]] = data['hosts']
+        self._labels: Dict[str, List[int]] = data['labels']
+        self._firsts: Dict[str, List[int]] = data['firsts']
+        self._bare: List[int] = [position for positions in data['bare'].values()
+                                 for position in positions]
+        self._anywhere: List[int] = data['anywhere']
+        self._compiled: List[Optional[re.Pattern]] = [None] * len(self._patterns)
+        self._candidate_cache: Dict[Tuple[str, str, str, bool], List[int]] = {}
+        self._data = data
+        self._lock = threading.Lock()
+
+    @classmethod
+    def build(cls, ie_classes: Optional[Iterable[type]] = None) -> 'ExtractorIndex':
+        """Index extractors, by default all of yt-dlp's except Generic."""
+        if ie_classes is None:
+            from yt_dlp.extractor import gen_extractor_classes
+            ie_classes = gen_extractor_classes()
+        extractors, patterns = [], []
+        buckets: Dict[str, Dict[str, List[int]]] = {
+            'hosts': {}, 'labels': {}, 'firsts': {}, 'bare': {}
+        }
+        anywhere: List[int] = []
+        for ie in ie_classes:
+            if ie.ie_key() == 'Generic':
+                continue
+            description = ie.IE_DESC if isinstance(ie.IE_DESC, str) else None
+            extractors.append((ie.ie_key(), ie.IE_NAME, description, bool(ie.working())))
+            valid_url = ie._VALID_URL
+            for pattern in [valid_url] if isinstance(valid_url, str) else valid_url or ():
+                position = len(patterns)
+                patterns.append((len(extractors) - 1, pattern))
+                keys = pattern_keys(pattern)
+                if keys is None:
+                    anywhere.append(position)
+                    continue
+                for kind, values in keys.items():
+                    for value in values:
+                        buckets[kind].setdefault(value, []).append(position)
+        return cls({
+            'format': FORMAT_VERSION,
+            'yt_dlp_version': yt_dlp_version(),
+            'extractors': extractors,
+            'patterns': patterns,
+            **buckets,
+            'anywhere': anywhere,
+        })
+
+    @classmethod
+    def load(cls, path: Union[str, Path]) -> 'ExtractorIndex':
+        """Read an index written by save().
+
+        Raises:
+            OSError: If the file cannot be read
+            ValueError: If it is not an index
+        """
+        with open(path, encoding='utf-8') as f:
+            return cls(json.load(f))
+
+    def save(self, path: Union[str, Path]) -> None:
+        path = Path(path)
+        tmp = path.with_suffix('.tmp')
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(self._data, f, separators=(',', ':'))
+        os.replace(tmp, path)
+
+    def match(self, url: str) -> Optional[ExtractorInfo]:
+        """Return the extractor yt-dlp would use for a URL.
+
+        Returns:
+            Optional[ExtractorInfo]: None if only the generic extractor
+            would try the URL
+        """
+        for position in self._candidates(url):
+            compiled = self._compiled[position]
+            if compiled is None:
+                compiled = self._compile(position)
+            if compiled.match(url):
+                return self.extractors[self._patterns[position][0]]
+        return None
+
+    def is_supported(self, url: str) -> bool:
+        """Check whether a site-specific extractor accepts a URL."""
+        return self.match(url) is not None
+
+    def search(self, text: str, limit: Optional[int] = None) -> List[ExtractorInfo]:
+        """Extractors whose name or description contains text, ignoring case."""
+        text = text.strip().lower()
+        found = []
+        for info in self.extractors:
+            if text in info.name.lower() or (info.description and text in info.description.lower()):
+                found.append(info)
+                if limit is not None and len(found) >= limit:
+                    break
+        return found
+
+    def _candidates(self, url: str) -> List[int]:
+        """Positions of the patterns that can match a URL, in yt-dlp's order."""
+        match = _URL_HOST.match(url)
+        key = (url[:1].lower(), _BARE_HOST.match(url).group().lower(),
+               match.group(1).lower() if match else '', '://' in url)
+        candidates = self._candidate_cache.get(key)
+        if candidates is None:
+            candidates = self._collect(*key)
+            if len(self._candidate_cache) >= _CANDIDATE_CACHE_SIZE:
+                self._candidate_cache.clear()
+            self._candidate_cache[key] = candidates
+        return candidates
+
+    def _collect(self, first: str, bare_host: str, host: str, has_scheme: bool) -> List[int]:
+        candidates = list(self._anywhere)
+        candidates += self._firsts.get(first, ())
+        if not has_scheme:
+            # Text such as a bare video ID
+            candidates += self._bare
+        for suffix in {bare_host, host}:
+            # Walk the host's suffixes: m.youtube.com, youtube.com, com
+            while suffix:
+                candidates += self._hosts.get(suffix, ())
+                label, _, suffix = suffix.partition('.')
+                candidates += self._labels.get(label, ())
+        return sorted(set(candidates))
+
+    def _compile(self, position: int) -> re.Pattern:
+        with self._lock:
+            compiled = self._compiled[position]
+            if compiled is None:
+                compiled = self._compiled[position] = re.compile(self._patterns[position][1])
+            return compiled
+
+
+_default: Optional[ExtractorIndex] = None
+_default_lock = threading.Lock()
+
+
+def default_index() -> ExtractorIndex:
+    """The index for the installed yt-dlp, loaded on first use.
+
+    Uses the file shipped with the application, then the copy cached in the
+    data directory, and builds and caches a new one if neither matches.
+    """
+    global _default
+    with _default_lock:
+        if _default is None:
+            _default = _load_default()
+        return _default
+
+
+def loaded_index() -> Optional[ExtractorIndex]:
+    """The default index if it has been loaded, None without waiting for it.
+
+    For the GUI thread, where building the index for a yt-dlp version no
+    file matches takes seconds.
+    """
+    return _default
+
+
+def load_default_index(
+        on_loaded: Optional[Callable[[ExtractorIndex], None]] = None) -> threading.Thread:
+    """Load default_index() on a background thread.
+
+    Args:
+        on_loaded: Called with the index on that thread once it is loaded
+
+    Returns:
+        threading.Thread: The started loader thread
+    """
+    def load():
+        index = default_index()
+        if on_loaded is not None:
+            on_loaded(index)
+
+    thread = threading.Thread(target=load, name='extractor-index', daemon=True)
+    thread.start()
+    return thread
+
+
+def yt_dlp_version() -> str:
+    """Installed yt-dlp version, e.g. '2025.2.19', read without importing it."""
+    from importlib import metadata
+
+    try:
+        version = metadata.version('yt-dlp')
+    except metadata.PackageNotFoundError:
+        # Frozen builds carry the package but not its metadata
+        import yt_dlp.version
+        version = yt_dlp.version.__version__
+    try:
+        return '.'.join(str(int(part)) for part in version.split('.'))
+    except ValueError:
+        return version
+
+
+def _load_default() -> ExtractorIndex:
+    from src.utils.paths import app_data_dir
+
+    cached = app_data_dir() / 'extractor_index.json'
+    version = yt_dlp_version()
+    for path in (BUNDLED_PATH, cached):
+        try:
+            index = ExtractorIndex.load(path)
+        except (OSError, ValueError, KeyError, TypeError):
+            continue
+        if index.yt_dlp_version == version:
+            return index
+    index = ExtractorIndex.build()
+    try:
+        index.save(cached)
+    except OSError:
+        pass
+    return index
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Write the index for the installed yt-dlp, for bundling with a build."""
+    argv = sys.argv[1:] if argv is None else argv
+    path = Path(argv[0]) if argv else BUNDLED_PATH
+    index = ExtractorIndex.build()
+    index.save(path)
+    print(f"Indexed {len(index.extractors)} extractors for yt-dlp {index.yt_dlp_version} "
+          f"into {path}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
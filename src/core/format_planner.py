@@ -0,0 +1,203 @@
+"""
+Local format planning on the format list of one extraction.
+
+yt-dlp's format selectors pick from what a site offers, but cannot weigh
+the result's size or whether its streams fit a common container. The
+planner enumerates what a download could produce from a VideoRecord (a
+single file, or a video and an audio stream merged), predicts each
+candidate's size and ranks them by resolution, frame rate, codec and
+bitrate, so budget modes such as "best quality under 500 MB" or "prefer
+streams that merge into MP4/WebM by stream copy" are decided without
+another request. A plan's format_ids is an exact selector for
+VideoDownloader.fetch().
+
+Sizes come from the site's exact filesize, then its estimate, then the
+bitrate times the duration; a plan whose size cannot be predicted never
+fits a budget.
+"""
+from dataclasses import dataclass
+from typing import Iterable, List, Optional, Tuple
+
+from src.core.audio import _COPYABLE
+from src.core.records import FormatRecord, VideoRecord
+
+# Height limits of the format selections; 'audio' plans audio streams only
+HEIGHT_LIMITS = {'best': None, 'hd': 1080, 'sd': 480}
+
+# Codec families (yt-dlp codec strings without profile, lowercased) each
+# container takes by stream copy, as yt-dlp picks its merge container
+_CONTAINER_CODECS = {
+    'mp4': {'av01', 'av1', 'hev1', 'hvc1', 'hevc', 'h265', 'avc1', 'avc3', 'h264', 'mp4a',
+            'aac', 'ac-3', 'ec-3', 'ac-4'},
+    'webm': {'av01', 'av1', 'vp9', 'vp09', 'vp8', 'vp08', 'opus', 'vorbis'},
+}
+_CONTAINER_EXTS = {
+    'mp4': {'mp4', 'm4a', 'm4v', 'mov'},
+    'webm': {'webm', 'weba'},
+}
+
+# Higher ranks first; codecs not listed rank below these
+_VIDEO_CODEC_RANKS = {'av01': 4, 'av1': 4, 'vp09': 3, 'vp9': 3, 'hev1': 2, 'hvc1': 2, 'hevc': 2,
+                      'h265': 2, 'avc1': 1, 'avc3': 1, 'h264': 1}
+_AUDIO_CODEC_RANKS = {'flac': 6, 'alac': 6, 'opus': 5, 'vorbis': 4, 'mp4a': 3, 'aac': 3,
+                      'ec-3': 2, 'ac-3': 2, 'mp3': 1}
+
+
+class NoFormatFits(Exception):
+    """Raised when no format combination fits a download's size budget."""
+
+
+@dataclass(frozen=True, slots=True)
+class FormatPlan:
+    """One way to download a video.
+
+    Attributes:
+        formats: Formats downloaded, video first for merged plans
+        ext: Extension of the resulting file
+        size: Predicted size in bytes, None if unknown
+        size_exact: Whether size is the sum of exact file sizes
+        stream_copy: Whether the result needs no re-encoding: a single
+            file, streams that merge into MP4 or WebM rather than MKV, or
+            audio already in the requested codec
+    """
+    formats: Tuple[FormatRecord, ...]
+    ext: Optional[str]
+    size: Optional[int]
+    size_exact: bool
+    stream_copy: bool
+
+    @property
+    def format_ids(self) -> str:
+        """The plan as a yt-dlp format selector, e.g. '137+140'."""
+        return '+'.join(fmt.format_id for fmt in self.formats)
+
+    @property
+    def height(self) -> Optional[int]:
+        return next((fmt.height for fmt in self.formats if fmt.has_video), None)
+
+    @property
+    def merged(self) -> bool:
+        return len(self.formats) > 1
+
+
+def _codec(value: Optional[str]) -> str:
+    """Codec family of a yt-dlp codec string, e.g. 'avc1' for 'avc1.640028'."""
+    return (value or '').split('.')[0].lower()
+
+
+def predicted_size(fmt: FormatRecord, duration: Optional[float]) -> Optional[int]:
+    """Size of a format: its filesize, else bitrate × duration.
+
+    Args:
+        fmt: The format
+        duration: Video length in seconds
+
+    Returns:
+        Optional[int]: Bytes, None if neither is known
+    """
+    if fmt.filesize is not None:
+        return fmt.filesize
+    if fmt.tbr and duration:
+        # tbr is in KBit/s
+        return int(fmt.tbr * duration * 125)
+    return None
+
+
+def merge_ext(video: FormatRecord, audio: FormatRecord) -> str:
+    """Container yt-dlp merges a video and an audio stream into.
+
+    MP4 or WebM when both codecs (or, for unknown codecs, both
+    extensions) fit it, MKV otherwise.
+    """
+    codecs = {_codec(video.vcodec), _codec(audio.acodec)}
+    for ext, supported in _CONTAINER_CODECS.items():
+        if codecs <= supported:
+            return ext
+    for ext, supported in _CONTAINER_EXTS.items():
+        if {video.ext, audio.ext} <= supported:
+            return ext
+    return 'mkv'
+
+
+def _plan(formats: Tuple[FormatRecord, ...], ext: Optional[str], stream_copy: bool,
+          duration: Optional[float]) -> FormatPlan:
+    sizes = [predicted_size(fmt, duration) for fmt in formats]
+    return FormatPlan(
+        formats=formats,
+        ext=ext,
+        size=None if None in sizes else sum(sizes),
+        size_exact=all(fmt.filesize_exact for fmt in formats),
+        stream_copy=stream_copy,
+    )
+
+
+def _candidates(record: VideoRecord, format_selection: str, audio_format: str,
+                merge: bool) -> Iterable[FormatPlan]:
+    duration = record.duration
+    audio_only = [fmt for fmt in record.formats if fmt.has_audio and not fmt.has_video]
+    if format_selection == 'audio':
+        target = _COPYABLE.get(audio_format)
+        for fmt in audio_only:
+            copy = target is None or _codec(fmt.acodec).startswith(target)
+            yield _plan((fmt,), fmt.ext, audio_format == 'best' or copy, duration)
+        return
+
+    limit = HEIGHT_LIMITS.get(format_selection)
+    videos = [fmt for fmt in record.formats
+              if fmt.has_video and (limit is None or (fmt.height or 0) <= limit)]
+    for fmt in videos:
+        # Video-only streams stand alone only when there is no audio to add
+        if fmt.has_audio or not audio_only:
+            yield _plan((fmt,), fmt.ext, True, duration)
+        elif merge:
+            for audio in audio_only:
+                ext = merge_ext(fmt, audio)
+                yield _plan((fmt, audio), ext, ext != 'mkv', duration)
+
+
+def _rank(plan: FormatPlan, prefer_copy: bool) -> tuple:
+    """Sort key of a plan, best first when sorted in reverse."""
+    video = next((fmt for fmt in plan.formats if fmt.has_video), None)
+    audio = next((fmt for fmt in plan.formats if fmt.has_audio), None)
+    return (
+        plan.stream_copy if prefer_copy else True,
+        video.height or 0 if video else 0,
+        video.fps or 0 if video else 0,
+        _VIDEO_CODEC_RANKS.get(_codec(video.vcodec), 0) if video else 0,
+        audio is not None,
+        _AUDIO_CODEC_RANKS.get(_codec(audio.acodec), 0) if audio else 0,
+        sum(fmt.tbr or 0 for fmt in plan.formats),
+        plan.size or 0,
+    )
+
+
+def plan_formats(record: VideoRecord, format_selection: str = 'best',
+                 max_size: Optional[int] = None, prefer_copy: bool = False,
+                 audio_format: str = 'best', merge: bool = True) -> List[FormatPlan]:
+    """Rank the ways to download a video, best first.
+
+    Args:
+        record: The video with its format list
+        format_selection: 'best', 'hd', 'sd' or 'audio', as for downloads
+        max_size: Only plans predicted to be at most this many bytes
+        prefer_copy: Rank plans needing no re-encoding above all others
+        audio_format: Codec of 'audio' downloads; streams already in it
+            count as stream copies
+        merge: Whether separate video and audio streams can be merged
+
+    Returns:
+        List[FormatPlan]: Candidate plans; empty if none fits
+    """
+    plans = list(_candidates(record, format_selection, audio_format, merge))
+    if max_size is not None:
+        plans = [plan for plan in plans if plan.size is not None and plan.size <= max_size]
+    plans.sort(key=lambda plan: _rank(plan, prefer_copy), reverse=True)
+    return plans
+
+
+def choose_format(record: VideoRecord, format_selection: str = 'best',
+                  max_size: Optional[int] = None, prefer_copy: bool = False,
+                  audio_format: str = 'best', merge: bool = True) -> Optional[FormatPlan]:
+    """The best plan of plan_formats(), None if none fits."""
+    plans = plan_formats(record, format_selection, max_size, prefer_copy, audio_format, merge)
+    return plans[0] if plans else None
@@ -0,0 +1,111 @@
+"""
+Auto-tuned concurrency for fragmented (HLS/DASH) downloads.
+
+yt-dlp fetches the fragments of a stream with a fixed number of threads,
+chosen by the concurrent_fragment_downloads option. FragmentTuner picks
+that number per host with an AIMD rule: after each fragmented download the
+measured throughput is compared with the previous one, and the level goes
+up by one while throughput keeps rising. It is halved when the host
+answered 429 or fragments failed. Levels are saved to a JSON file so the
+next run starts from what worked last time.
+"""
+import json
+import math
+import os
+import threading
+from pathlib import Path
+from typing import Dict, Optional, Union
+
+
+class FragmentTuner:
+    """Per-host AIMD controller for concurrent fragment downloads.
+
+    Thread safe; shared by every job of a downloader.
+    """
+
+    def __init__(self, path: Optional[Union[str, Path]] = None, initial: int = 4,
+                 minimum: int = 1, maximum: int = 16, tolerance: float = 0.05):
+        """
+        Args:
+            path: JSON file the levels are persisted to; None keeps them in memory
+            initial: Level for hosts without history
+            minimum: Lowest level
+            maximum: Highest level
+            tolerance: Relative throughput change treated as noise
+        """
+        self.path = Path(path) if path is not None else None
+        self.initial = initial
+        self.minimum = minimum
+        self.maximum = maximum
+        self.tolerance = tolerance
+        self._hosts: Dict[str, Dict[str, float]] = {}
+        self._lock = threading.Lock()
+        self._load()
+
+    @classmethod
+    def default(cls) -> 'FragmentTuner':
+        """Tuner persisted in the per-user data directory."""
+        from src.utils.paths import app_data_dir
+        return cls(app_data_dir() / 'fragment_concurrency.json')
+
+    def level(self, host: str) -> int:
+        """Concurrency to use for the next fragmented download from a host."""
+        with self._lock:
+            state = self._hosts.get(host)
+            return int(state['level']) if state else self.initial
+
+    def record(self, host: str, level: int, throughput: float, errors: int = 0,
+               throttled: bool = False) -> int:
+        """Feed back the result of a download and return the host's next level.
+
+        Args:
+            host: Host or platform key
+            level: Concurrency the download ran with
+            throughput: Bytes per second achieved
+            errors: Number of fragment retries
+            throttled: Whether the host answered 429 Too Many Requests
+
+        Returns:
+            int: The new level
+        """
+        with self._lock:
+            state = self._hosts.get(host) or {'level': level, 'throughput': 0.0}
+            previous = state['throughput']
+            if throttled or errors:
+                # Multiplicative decrease
+                new_level = math.floor(level / 2)
+            elif throughput > previous * (1 + self.tolerance):
+                # Additive increase while more connections still help
+                new_level = level + 1
+            elif throughput < previous * (1 - self.tolerance):
+                # The last step made things worse; undo it
+                new_level = level - 1
+            else:
+                new_level = level
+            new_level = max(self.minimum, min(self.maximum, new_level))
+            self._hosts[host] = {'level': new_level, 'throughput': throughput}
+            self._save()
+        return new_level
+
+    def _load(self) -> None:
+        if self.path is None:
+            return
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if isinstance(data, dict):
+            self._hosts = {host: state for host, state in data.items()
+                           if isinstance(state, dict) and 'level' in state}
+
+    def _save(self) -> None:
+        if self.path is None:
+            return
+        tmp = self.path.with_suffix('.tmp')
+        try:
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump(self._hosts, f, indent=1, sort_keys=True)
+            os.replace(tmp, self.path)
+        except OSError:
+            pass
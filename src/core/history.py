@@ -0,0 +1,221 @@
+"""
+Persistent download history.
+
+Every finished download is stored in SQLite with indexes on URL, video ID,
+completion date and platform, and its title in an FTS5 full-text index.
+Reads are keyset-paginated on the row id (newest first), so showing the
+first page or the first page of a search costs the same with a few hundred
+or several hundred thousand rows.
+"""
+import os
+import re
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import List, Optional, Set, Union
+
+from src.core.download_queue import DownloadJob, DownloadQueue, JobState
+from src.utils.url_utils import get_platform
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS downloads (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    url TEXT NOT NULL,
+    path TEXT NOT NULL,
+    title TEXT,
+    video_id TEXT,
+    extractor TEXT,
+    platform TEXT,
+    format_selection TEXT,
+    completed REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS downloads_url ON downloads (url);
+CREATE INDEX IF NOT EXISTS downloads_video ON downloads (video_id, extractor);
+CREATE INDEX IF NOT EXISTS downloads_completed ON downloads (completed);
+CREATE INDEX IF NOT EXISTS downloads_platform ON downloads (platform, id);
+"""
+
+# External-content FTS table: titles are indexed, not stored twice. The
+# prefix indexes keep search-as-you-type queries such as "ca*" fast.
+_FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS downloads_fts USING fts5(
+    title, content='downloads', content_rowid='id', prefix='2 3'
+);
+CREATE TRIGGER IF NOT EXISTS downloads_fts_insert AFTER INSERT ON downloads BEGIN
+    INSERT INTO downloads_fts (rowid, title) VALUES (new.id, new.title);
+END;
+"""
+
+_COLUMNS = ('id', 'url', 'path', 'title', 'video_id', 'extractor', 'platform', 'format_selection',
+            'completed')
+
+
+@dataclass(frozen=True)
+class HistoryEntry:
+    """One finished download."""
+    id: int
+    url: str
+    path: str
+    title: Optional[str]
+    video_id: Optional[str]
+    extractor: Optional[str]
+    platform: Optional[str]
+    format_selection: Optional[str]
+    completed: float
+
+    @property
+    def filename(self) -> str:
+        return os.path.basename(self.path)
+
+
+class DownloadHistory:
+    """SQLite store of finished downloads. Thread safe."""
+
+    def __init__(self, path: Union[str, Path] = ':memory:'):
+        """
+        Args:
+            path: SQLite database file, or ':memory:'
+        """
+        self._lock = threading.Lock()
+        self._recorded: Set[int] = set()
+        self._db = sqlite3.connect(str(path), check_same_thread=False, isolation_level=None)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('PRAGMA synchronous=NORMAL')
+        self._db.executescript(_SCHEMA)
+        try:
+            self._db.executescript(_FTS_SCHEMA)
+            self.full_text = True
+        except sqlite3.OperationalError:
+            # SQLite built without FTS5; search falls back to LIKE
+            self.full_text = False
+
+    @classmethod
+    def default(cls, name: str = 'history.sqlite') -> 'DownloadHistory':
+        """Open the history in the per-user data directory."""
+        from src.utils.paths import app_data_dir
+        return cls(app_data_dir() / name)
+
+    def attach(self, queue: DownloadQueue) -> None:
+        """Record the queue's downloads as they finish."""
+        queue.add_listener(self.record)
+
+    def record(self, job: DownloadJob) -> None:
+        """Store a job once it is done; other states are ignored."""
+        if job.state != JobState.DONE or job.playlist or not job.filename:
+            return
+        with self._lock:
+            if job.id in self._recorded:
+                return
+            self._recorded.add(job.id)
+        self.add(job.url, os.path.join(job.output_path, job.filename), title=job.title,
+                 video_id=job.video_id, extractor=job.extractor,
+                 platform=get_platform(job.url) or job.host,
+                 format_selection=job.format_selection)
+
+    def add(self, url: str, path: str, title: Optional[str] = None,
+            video_id: Optional[str] = None, extractor: Optional[str] = None,
+            platform: Optional[str] = None, format_selection: Optional[str] = None,
+            completed: Optional[float] = None) -> HistoryEntry:
+        """Store a finished download.
+
+        Args:
+            url: URL the download was started from
+            path: Full path of the downloaded file
+            title: Video title
+            video_id: ID of the video on its site
+            extractor: yt-dlp extractor key, e.g. 'Youtube'
+            platform: Platform name for filtering
+            format_selection: Format selection used
+            completed: Completion time as a Unix timestamp; defaults to now
+
+        Returns:
+            HistoryEntry: The stored entry
+        """
+        values = (url, path, title, video_id, extractor, platform, format_selection,
+                  time.time() if completed is None else completed)
+        with self._lock:
+            cursor = self._db.execute(
+                f"INSERT INTO downloads ({', '.join(_COLUMNS[1:])}) "
+                f"VALUES ({', '.join('?' * len(values))})",
+                values
+            )
+            return HistoryEntry(cursor.lastrowid, *values)
+
+    def page(self, query: str = '', platform: Optional[str] = None,
+             before: Optional[int] = None, limit: int = 200) -> List[HistoryEntry]:
+        """Return entries newest first, optionally filtered.
+
+        Args:
+            query: Words the title must contain; the last one may be a prefix
+            platform: Only entries from this platform
+            before: Only entries with a smaller id, i.e. the id of the last
+                entry of the previous page
+            limit: Maximum number of entries
+
+        Returns:
+            List[HistoryEntry]: Matching entries
+        """
+        conditions, params = [], []
+        source, key = 'downloads d', 'd.id'
+        words = re.findall(r'\w+', query)
+        if words and self.full_text:
+            # Ordering on the FTS rowid lets FTS5 walk its index backwards and
+            # stop after one page instead of sorting every match
+            source, key = 'downloads_fts f JOIN downloads d ON d.id = f.rowid', 'f.rowid'
+            conditions.append('downloads_fts MATCH ?')
+            params.append(' '.join(f'"{word}"' for word in words) + '*')
+        elif words:
+            conditions += ['d.title LIKE ?'] * len(words)
+            params += [f'%{word}%' for word in words]
+        if platform is not None:
+            conditions.append('d.platform = ?')
+            params.append(platform)
+        if before is not None:
+            conditions.append(f'{key} < ?')
+            params.append(before)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+        return self._select(
+            f"SELECT {', '.join(f'd.{c}' for c in _COLUMNS)} FROM {source} {where} "
+            f"ORDER BY {key} DESC LIMIT ?",
+            (*params, limit)
+        )
+
+    def newer(self, after: int) -> List[HistoryEntry]:
+        """Entries added after the one with the given id, newest first."""
+        return self._select(
+            f"SELECT {', '.join(_COLUMNS)} FROM downloads WHERE id > ? ORDER BY id DESC", (after,)
+        )
+
+    def lookup(self, url: Optional[str] = None, video_id: Optional[str] = None,
+               extractor: Optional[str] = None) -> List[HistoryEntry]:
+        """Find earlier downloads of a URL or of a video ID, newest first."""
+        conditions, params = [], []
+        for column, value in (('url', url), ('video_id', video_id), ('extractor', extractor)):
+            if value is not None:
+                conditions.append(f'{column} = ?')
+                params.append(value)
+        if not conditions:
+            return []
+        return self._select(
+            f"SELECT {', '.join(_COLUMNS)} FROM downloads WHERE {' AND '.join(conditions)} "
+            "ORDER BY id DESC",
+            params
+        )
+
+    def since(self, timestamp: float, limit: int = 200) -> List[HistoryEntry]:
+        """Entries completed at or after a Unix timestamp, oldest first."""
+        return self._select(
+            f"SELECT {', '.join(_COLUMNS)} FROM downloads WHERE completed >= ? "
+            "ORDER BY completed LIMIT ?",
+            (timestamp, limit)
+        )
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+    def _select(self, sql: str, params) -> List[HistoryEntry]:
+        with self._lock:
+            return [HistoryEntry(*row) for row in self._db.execute(sql, params)]
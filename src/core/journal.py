@@ -0,0 +1,161 @@
+"""
+Crash-safe journal of unfinished download jobs.
+
+JobJournal listens to a DownloadQueue and records every job that has not
+finished in SQLite (WAL mode): URL, options, resolved format IDs, output
+path, .part file and byte/fragment offsets. Rows are removed when a job
+finishes. After a crash or reboot restore() puts the recorded jobs back in
+the queue with the same format IDs, and yt-dlp continues the .part file
+(or its .ytdl fragment state) instead of starting over.
+"""
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Union
+
+from src.core.download_queue import DownloadJob, DownloadQueue, FINISHED_STATES, JobState
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    url TEXT NOT NULL,
+    output_path TEXT NOT NULL,
+    format_selection TEXT NOT NULL,
+    priority INTEGER NOT NULL DEFAULT 0,
+    connections INTEGER NOT NULL DEFAULT 1,
+    concurrent_fragments INTEGER,
+    state TEXT NOT NULL,
+    format_ids TEXT,
+    part_file TEXT,
+    downloaded_bytes INTEGER NOT NULL DEFAULT 0,
+    total_bytes INTEGER,
+    fragment_index INTEGER,
+    fragment_count INTEGER,
+    audio_format TEXT NOT NULL DEFAULT 'best',
+    audio_quality TEXT,
+    created REAL NOT NULL,
+    updated REAL NOT NULL
+);
+"""
+
+_COLUMNS = ('url', 'output_path', 'format_selection', 'priority', 'connections',
+            'concurrent_fragments', 'state', 'format_ids', 'part_file', 'downloaded_bytes',
+            'total_bytes', 'fragment_index', 'fragment_count', 'audio_format', 'audio_quality')
+
+
+class JobJournal:
+    """Write-ahead record of queued and running downloads."""
+
+    def __init__(self, path: Union[str, Path] = ':memory:', checkpoint_interval: float = 1.0):
+        """
+        Args:
+            path: SQLite database file, or ':memory:'
+            checkpoint_interval: Minimum seconds between progress writes for a
+                job; state changes are always written immediately
+        """
+        self.checkpoint_interval = checkpoint_interval
+        self._lock = threading.Lock()
+        self._rows: Dict[int, int] = {}
+        # job id -> (state, time) of the last write
+        self._last_write: Dict[int, tuple] = {}
+        self._db = sqlite3.connect(str(path), check_same_thread=False, isolation_level=None)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        # WAL with synchronous=NORMAL survives application crashes and keeps
+        # commits cheap; a power cut may lose only the last checkpoints
+        self._db.execute('PRAGMA synchronous=NORMAL')
+        self._db.executescript(_SCHEMA)
+
+    @classmethod
+    def default(cls, name: str = 'jobs.sqlite') -> 'JobJournal':
+        """Open a journal in the per-user data directory."""
+        from src.utils.paths import app_data_dir
+        return cls(app_data_dir() / name)
+
+    def attach(self, queue: DownloadQueue) -> None:
+        """Record every change to the queue's jobs from now on."""
+        queue.add_listener(self.record)
+
+    def record(self, job: DownloadJob) -> None:
+        """Write a job's current state; finished jobs are removed."""
+        now = time.monotonic()
+        with self._lock:
+            row_id = self._rows.get(job.id)
+            if job.state in FINISHED_STATES:
+                if row_id is not None:
+                    self._db.execute('DELETE FROM jobs WHERE id = ?', (row_id,))
+                    del self._rows[job.id]
+                    self._last_write.pop(job.id, None)
+                return
+            values = self._values(job)
+            if row_id is None:
+                cursor = self._db.execute(
+                    f"INSERT INTO jobs ({', '.join(_COLUMNS)}, created, updated) "
+                    f"VALUES ({', '.join('?' * len(_COLUMNS))}, ?, ?)",
+                    (*values, time.time(), time.time())
+                )
+                self._rows[job.id] = cursor.lastrowid
+            else:
+                # Throttle progress checkpoints; transitions go straight through
+                state, written = self._last_write.get(job.id, (None, 0.0))
+                if state == job.state and now - written < self.checkpoint_interval:
+                    return
+                self._db.execute(
+                    f"UPDATE jobs SET {', '.join(f'{c} = ?' for c in _COLUMNS)}, updated = ? "
+                    "WHERE id = ?",
+                    (*values, time.time(), row_id)
+                )
+            self._last_write[job.id] = (job.state, now)
+
+    def unfinished(self) -> List[Dict[str, Any]]:
+        """Rows for every recorded job, oldest first."""
+        with self._lock:
+            cursor = self._db.execute(f"SELECT id, {', '.join(_COLUMNS)} FROM jobs ORDER BY id")
+            names = [column[0] for column in cursor.description]
+            return [dict(zip(names, row)) for row in cursor.fetchall()]
+
+    def restore(self, queue: DownloadQueue, resume_paused: bool = False) -> List[DownloadJob]:
+        """Queue the jobs left unfinished by a previous run.
+
+        Jobs that were queued or running are queued again; paused jobs stay
+        paused unless resume_paused is set.
+
+        Args:
+            queue: Queue to add the jobs to; should already be attached
+            resume_paused: Also restart jobs that were paused
+
+        Returns:
+            List[DownloadJob]: The restored jobs
+        """
+        jobs = []
+        for row in self.unfinished():
+            paused = row['state'] == JobState.PAUSED.value and not resume_paused
+            job = DownloadJob(
+                row['url'], row['output_path'], row['format_selection'], row['priority'],
+                row['connections'], row['concurrent_fragments'],
+                audio_format=row['audio_format'], audio_quality=row['audio_quality'],
+                state=JobState.PAUSED if paused else JobState.QUEUED,
+                status='Paused' if paused else 'Queued',
+                downloaded_bytes=row['downloaded_bytes'], total_bytes=row['total_bytes'],
+                fragment_index=row['fragment_index'], fragment_count=row['fragment_count'],
+                part_file=row['part_file'], format_ids=row['format_ids'],
+            )
+            if job.total_bytes:
+                job.progress = 100.0 * job.downloaded_bytes / job.total_bytes
+            with self._lock:
+                # Keep updating the existing row under the new job id
+                self._rows[job.id] = row['id']
+            jobs.append(job)
+            queue.add_job(job)
+        return jobs
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+    @staticmethod
+    def _values(job: DownloadJob) -> tuple:
+        return (job.url, job.output_path, job.format_selection, job.priority, job.connections,
+                job.concurrent_fragments, job.state.value, job.format_ids, job.part_file,
+                job.downloaded_bytes, job.total_bytes, job.fragment_index, job.fragment_count,
+                job.audio_format, job.audio_quality)
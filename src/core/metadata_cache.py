@@ -0,0 +1,292 @@
+"""
+Persistent cache for yt-dlp extraction results.
+
+Entries are stored in SQLite, keyed by canonical URL and extractor, with the
+info dict split into field classes that expire independently: signed media
+URLs go stale within hours, while titles and format lists stay valid for
+much longer. The URL class holds only the URL-bearing fields of each
+format, laid over the format list on a hit. Values that cannot be stored
+as JSON, such as lazily generated fragment lists, are left out together
+with the format or entry that holds them.
+"""
+import json
+import sqlite3
+import threading
+import time
+import zlib
+from pathlib import Path
+from typing import Any, Dict, Optional, Union
+
+from src.utils.url_utils import canonicalize_url
+
+# Fields that carry signed URLs or request headers tied to them
+URL_FIELDS = frozenset({
+    'url', 'manifest_url', 'fragment_base_url', 'fragments', 'http_headers',
+    'cookies', 'downloader_options', 'extra_param_to_segment_url',
+})
+# Top-level fields holding per-format data
+FORMAT_FIELDS = frozenset({'formats', 'subtitles', 'automatic_captions'})
+
+STABLE, FORMATS, URLS = 'stable', 'formats', 'urls'
+
+DEFAULT_TTLS = {
+    STABLE: 7 * 24 * 3600,   # title, duration, uploader, ...
+    FORMATS: 24 * 3600,      # format ids, codecs, sizes
+    URLS: 30 * 60,           # signed media URLs and headers
+}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    url TEXT NOT NULL,
+    extractor TEXT NOT NULL,
+    stable BLOB NOT NULL,
+    stable_expires REAL NOT NULL,
+    formats BLOB,
+    formats_expires REAL NOT NULL,
+    urls BLOB,
+    urls_expires REAL NOT NULL,
+    size INTEGER NOT NULL,
+    last_access REAL NOT NULL,
+    PRIMARY KEY (url, extractor)
+);
+CREATE INDEX IF NOT EXISTS entries_last_access ON entries (last_access);
+"""
+
+
+class _Unserializable(Exception):
+    """Raised for a value that has no JSON form."""
+
+
+def _jsonable(obj: Any) -> Any:
+    """Copy a value into JSON-safe values, dropping private '__' keys.
+
+    List items that cannot be copied are skipped; anything else that cannot
+    raises _Unserializable, so a format is never stored without, say, its
+    fragments.
+    """
+    if isinstance(obj, dict):
+        return {k: _jsonable(v) for k, v in obj.items() if not str(k).startswith('__')}
+    if isinstance(obj, (list, tuple, set)):
+        items = []
+        for value in obj:
+            try:
+                items.append(_jsonable(value))
+            except _Unserializable:
+                pass
+        return items
+    if obj is None or isinstance(obj, (str, int, float, bool)):
+        return obj
+    raise _Unserializable(type(obj).__name__)
+
+
+def _pack(obj: Any) -> bytes:
+    return zlib.compress(json.dumps(obj, separators=(',', ':')).encode('utf-8'))
+
+
+def _unpack(blob: Optional[bytes]) -> Any:
+    return json.loads(zlib.decompress(blob)) if blob is not None else None
+
+
+def _strip_urls(entries: Any) -> Any:
+    if isinstance(entries, list):
+        return [_strip_urls(e) for e in entries]
+    if isinstance(entries, dict):
+        return {k: _strip_urls(v) for k, v in entries.items() if k not in URL_FIELDS}
+    return entries
+
+
+def _only_urls(entries: Any) -> Any:
+    """The URL fields of nested entries, keeping list positions."""
+    if isinstance(entries, list):
+        return [_only_urls(e) for e in entries]
+    if isinstance(entries, dict):
+        urls = {}
+        for k, v in entries.items():
+            if k in URL_FIELDS:
+                urls[k] = v
+            elif isinstance(v, (list, dict)):
+                nested = _only_urls(v)
+                if nested:
+                    urls[k] = nested
+        return urls
+    return None
+
+
+def _add_urls(entries: Any, urls: Any) -> None:
+    """Lay URL fields from _only_urls() back over stripped entries."""
+    if isinstance(entries, list) and isinstance(urls, list):
+        for entry, entry_urls in zip(entries, urls):
+            _add_urls(entry, entry_urls)
+    elif isinstance(entries, dict) and isinstance(urls, dict):
+        for k, v in urls.items():
+            if k in URL_FIELDS or k not in entries:
+                entries[k] = v
+            else:
+                _add_urls(entries[k], v)
+
+
+def split_info(info: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+    """Split an info dict into its stable, format and URL field classes."""
+    copied = {}
+    for k, v in info.items():
+        if str(k).startswith('__'):
+            continue
+        try:
+            copied[k] = _jsonable(v)
+        except _Unserializable:
+            pass
+    stable = {k: v for k, v in copied.items() if k not in URL_FIELDS and k not in FORMAT_FIELDS}
+    formats = {k: _strip_urls(copied[k]) for k in FORMAT_FIELDS if k in copied}
+    urls = {k: v for k, v in copied.items() if k in URL_FIELDS}
+    urls.update((k, _only_urls(copied[k])) for k in FORMAT_FIELDS if k in copied)
+    return {STABLE: stable, FORMATS: formats, URLS: urls}
+
+
+class MetadataCache:
+    """On-disk LRU cache of extraction results with per-field-class TTLs.
+
+    Attributes:
+        hits: Lookups answered from the cache
+        misses: Lookups that need a fresh extraction
+    """
+
+    def __init__(self, path: Union[str, Path] = ':memory:', max_bytes: int = 64 * 1024 * 1024,
+                 ttls: Optional[Dict[str, float]] = None):
+        """
+        Args:
+            path: SQLite database file, or ':memory:'
+            max_bytes: Compressed size above which least recently used
+                entries are evicted
+            ttls: Overrides for DEFAULT_TTLS, in seconds
+        """
+        self.max_bytes = max_bytes
+        self.ttls = {**DEFAULT_TTLS, **(ttls or {})}
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(str(path), check_same_thread=False)
+        self._db.executescript(_SCHEMA)
+
+    @classmethod
+    def default(cls) -> 'MetadataCache':
+        """Open the cache in the per-user data directory."""
+        from src.utils.paths import app_data_dir
+        return cls(app_data_dir() / 'metadata.sqlite')
+
+    def get(self, url: str, playable: bool = True,
+            extractor: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Look up a cached info dict.
+
+        Args:
+            url: Video URL as entered by the user
+            playable: Require fresh media URLs so the result can be
+                downloaded; otherwise metadata and the format list suffice
+            extractor: Restrict the lookup to one extractor key
+
+        Returns:
+            Optional[Dict[str, Any]]: The info dict, or None on a miss. When
+            playable is False and URLs have expired, formats carry no URLs.
+            URLs are only returned while the format list is also fresh.
+        """
+        key = canonicalize_url(url)
+        now = time.time()
+        query = ('SELECT extractor, stable, stable_expires, formats, formats_expires, urls, urls_expires '
+                 'FROM entries WHERE url = ?')
+        params = [key]
+        if extractor:
+            query += ' AND extractor = ?'
+            params.append(extractor)
+        with self._lock:
+            row = self._db.execute(query + ' ORDER BY last_access DESC LIMIT 1', params).fetchone()
+            playable_now = row is not None and row[6] >= now and row[4] >= now
+            if row is None or row[2] < now or (playable and not playable_now):
+                self.misses += 1
+                return None
+            self._db.execute('UPDATE entries SET last_access = ? WHERE url = ? AND extractor = ?',
+                             (now, key, row[0]))
+            self._db.commit()
+            self.hits += 1
+
+        info = _unpack(row[1])
+        if row[4] >= now and row[3] is not None:
+            info.update(_unpack(row[3]))
+            if playable_now:
+                urls = _unpack(row[5])
+                for k in FORMAT_FIELDS:
+                    if k in urls and k in info:
+                        _add_urls(info[k], urls.pop(k))
+                info.update((k, v) for k, v in urls.items() if k not in FORMAT_FIELDS)
+        return info
+
+    def put(self, url: str, info: Dict[str, Any]) -> None:
+        """Store an extraction result under the URL and its canonical page URL."""
+        if info.get('_type', 'video') != 'video':
+            # Playlist entries can be lazy generators; only cache single videos
+            return
+        classes = split_info(info)
+        blobs = {name: _pack(data) for name, data in classes.items()}
+        now = time.time()
+        extractor = info.get('extractor_key') or info.get('extractor') or ''
+        size = sum(len(blob) for blob in blobs.values())
+        keys = {canonicalize_url(url)}
+        if info.get('webpage_url'):
+            keys.add(canonicalize_url(info['webpage_url']))
+        with self._lock:
+            for key in keys:
+                self._db.execute(
+                    'INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                    (key, extractor,
+                     blobs[STABLE], now + self.ttls[STABLE],
+                     blobs[FORMATS], now + self.ttls[FORMATS],
+                     blobs[URLS], now + self.ttls[URLS],
+                     size, now))
+            self._evict()
+            self._db.commit()
+
+    def invalidate(self, url: str) -> None:
+        """Drop every cached entry for a URL."""
+        with self._lock:
+            self._db.execute('DELETE FROM entries WHERE url = ?', (canonicalize_url(url),))
+            self._db.commit()
+
+    def clear(self) -> None:
+        """Drop all cached entries."""
+        with self._lock:
+            self._db.execute('DELETE FROM entries')
+            self._db.commit()
+
+    def total_bytes(self) -> int:
+        """Compressed size of all cached entries."""
+        with self._lock:
+            return self._total_bytes()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._db.execute('SELECT COUNT(*) FROM entries').fetchone()[0]
+
+    def stats(self) -> Dict[str, int]:
+        """Hit/miss counters and current size."""
+        return {'hits': self.hits, 'misses': self.misses,
+                'entries': len(self), 'bytes': self.total_bytes()}
+
+    def close(self) -> None:
+        """Close the database connection."""
+        self._db.close()
+
+    def _total_bytes(self) -> int:
+        return self._db.execute('SELECT COALESCE(SUM(size), 0) FROM entries').fetchone()[0]
+
+    def _evict(self) -> None:
+        self._db.execute('DELETE FROM entries WHERE stable_expires < ?', (time.time(),))
+        excess = self._total_bytes() - self.max_bytes
+        if excess <= 0:
+            return
+        freed = 0
+        victims = []
+        for url, extractor, size in self._db.execute(
+                'SELECT url, extractor, size FROM entries ORDER BY last_access'):
+            victims.append((url, extractor))
+            freed += size
+            if freed >= excess:
+                break
+        self._db.executemany('DELETE FROM entries WHERE url = ? AND extractor = ?', victims)
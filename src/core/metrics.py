@@ -0,0 +1,400 @@
+"""
+Per-job instrumentation: phase spans, counters and their export.
+
+Every job gets a JobTrace recording monotonic spans of the phases it goes
+through:
+
+    extract      Extracting video information, or reading the metadata cache
+    select       Choosing formats from the extracted information
+    download     Fetching media, retries included
+    rename       Moving finished .part files to their names; lies inside
+                 the download span of the file
+    postprocess  Merging, fixups, conversions and moves; for deferred
+                 post-processing this includes waiting for a worker
+    finalize     Recording the download and naming its output file
+
+together with the bytes received, the retries and the HTTP responses by
+status class. Metrics aggregates finished traces into process-wide
+counters and histograms, exported in the Prometheus text format (as a
+string, a file or an HTTP endpoint), and hands each finished trace to its
+sinks, such as a JsonLinesExporter.
+
+Recording costs a clock read per span and an integer add per response
+read, so instrumentation is always on.
+"""
+import contextlib
+import json
+import os
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+PHASES = ('extract', 'select', 'download', 'rename', 'postprocess', 'finalize')
+
+# Job outcomes
+COMPLETED = 'completed'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+SKIPPED = 'skipped'
+DEFERRED = 'deferred'
+
+# Upper bounds in seconds of the phase and job duration histograms
+DEFAULT_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0, 900.0)
+
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+class Span:
+    """A timed phase of a job, in time.monotonic() seconds."""
+    __slots__ = ('phase', 'start', 'end')
+
+    def __init__(self, phase: str):
+        self.phase = phase
+        self.start = time.monotonic()
+        self.end: Optional[float] = None
+
+    def close(self) -> None:
+        """End the span; later calls keep the first end."""
+        if self.end is None:
+            self.end = time.monotonic()
+
+    @property
+    def seconds(self) -> float:
+        return (self.end if self.end is not None else time.monotonic()) - self.start
+
+
+class JobTrace:
+    """Spans and counters of one job.
+
+    Attributes:
+        url: The job's URL
+        job_id: Queue job ID, if the job came from a queue
+        started: Wall-clock start time (time.time())
+        spans: Recorded spans, in the order they began
+        bytes: Response body bytes read, extraction included
+        retries: Retried requests
+        http: Responses per status class, e.g. {'2xx': 12, '5xx': 1}
+        outcome: One of the job outcomes once finished
+        error_type: Class name of the error a failed job raised; for
+            yt-dlp's DownloadError that of its cause
+        error: Its message
+        seconds: Job duration once finished
+    """
+
+    def __init__(self, url: str, job_id: Optional[Any] = None):
+        self.url = url
+        self.job_id = job_id
+        self.started = time.time()
+        self.spans: List[Span] = []
+        self.bytes = 0
+        self.retries = 0
+        self.http: Dict[str, int] = {}
+        self.outcome: Optional[str] = None
+        self.error_type: Optional[str] = None
+        self.error: Optional[str] = None
+        self.seconds: Optional[float] = None
+        self._start = time.monotonic()
+        self._lock = threading.Lock()
+
+    def begin(self, phase: str) -> Span:
+        """Start a span that the caller closes."""
+        span = Span(phase)
+        with self._lock:
+            self.spans.append(span)
+        return span
+
+    @contextlib.contextmanager
+    def span(self, phase: str) -> Iterator[Span]:
+        """Time the body of a with statement as a phase."""
+        span = self.begin(phase)
+        try:
+            yield span
+        finally:
+            span.close()
+
+    def add_bytes(self, count: int) -> None:
+        with self._lock:
+            self.bytes += count
+
+    def retry(self, count: int = 1) -> None:
+        with self._lock:
+            self.retries += count
+
+    def http_response(self, status: int) -> None:
+        key = f'{status // 100}xx'
+        with self._lock:
+            self.http[key] = self.http.get(key, 0) + 1
+
+    def finish(self, outcome: str, error: Optional[BaseException] = None) -> None:
+        """Close open spans and record how the job ended."""
+        with self._lock:
+            for span in self.spans:
+                span.close()
+            self.seconds = time.monotonic() - self._start
+        self.outcome = outcome
+        if error is not None:
+            exc_info = getattr(error, 'exc_info', None)
+            cause = exc_info[1] if exc_info and exc_info[1] is not None else error
+            self.error_type = type(cause).__name__
+            self.error = str(error)
+
+    def phase_seconds(self) -> Dict[str, float]:
+        """Total time per phase, in PHASES order."""
+        totals: Dict[str, float] = {}
+        with self._lock:
+            spans = list(self.spans)
+        for span in spans:
+            totals[span.phase] = totals.get(span.phase, 0.0) + span.seconds
+        return {phase: totals[phase] for phase in sorted(totals, key=_phase_order)}
+
+    def to_dict(self) -> Dict[str, Any]:
+        """JSON-serializable summary; span times are seconds from the job start."""
+        with self._lock:
+            spans = [(span.phase, span.start - self._start, span.seconds) for span in self.spans]
+            http = dict(self.http)
+        return {
+            'job_id': self.job_id,
+            'url': self.url,
+            'started': self.started,
+            'seconds': _round(self.seconds),
+            'outcome': self.outcome,
+            'error_type': self.error_type,
+            'error': self.error,
+            'bytes': self.bytes,
+            'retries': self.retries,
+            'http': http,
+            'phases': {phase: _round(seconds) for phase, seconds in self.phase_seconds().items()},
+            'spans': [{'phase': phase, 'start': _round(start), 'seconds': _round(seconds)}
+                      for phase, start, seconds in spans],
+        }
+
+
+class _Histogram:
+    """Cumulative Prometheus histogram."""
+
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[index] += 1
+        self.count += 1
+        self.sum += value
+
+
+class Metrics:
+    """Process-wide job metrics.
+
+    Counters only include finished jobs; jobs_running counts the others.
+    """
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        """
+        Args:
+            buckets: Upper bounds in seconds of the duration histograms
+        """
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._running = 0
+        self._jobs: Dict[str, int] = {}
+        self._errors: Dict[str, int] = {}
+        self._http: Dict[str, int] = {}
+        self._bytes = 0
+        self._retries = 0
+        self._job_seconds = _Histogram(self.buckets)
+        self._phases: Dict[str, _Histogram] = {}
+        self._sinks: List[Callable[[JobTrace], None]] = []
+
+    def start(self, url: str, job_id: Optional[Any] = None) -> JobTrace:
+        """Begin tracing a job; pass the trace to finish() when it ends."""
+        with self._lock:
+            self._running += 1
+        return JobTrace(url, job_id)
+
+    def finish(self, trace: JobTrace, outcome: str = COMPLETED,
+               error: Optional[BaseException] = None) -> None:
+        """Record a finished job and hand its trace to the sinks.
+
+        Args:
+            trace: The job's trace from start()
+            outcome: How the job ended, e.g. COMPLETED or FAILED
+            error: The exception the job ended with, if any
+        """
+        trace.finish(outcome, error)
+        phases = trace.phase_seconds()
+        with self._lock:
+            self._running -= 1
+            self._jobs[outcome] = self._jobs.get(outcome, 0) + 1
+            if trace.error_type is not None and outcome == FAILED:
+                self._errors[trace.error_type] = self._errors.get(trace.error_type, 0) + 1
+            for key, count in trace.http.items():
+                self._http[key] = self._http.get(key, 0) + count
+            self._bytes += trace.bytes
+            self._retries += trace.retries
+            self._job_seconds.observe(trace.seconds)
+            for phase, seconds in phases.items():
+                if phase not in self._phases:
+                    self._phases[phase] = _Histogram(self.buckets)
+                self._phases[phase].observe(seconds)
+            sinks = list(self._sinks)
+        for sink in sinks:
+            sink(trace)
+
+    def add_sink(self, sink: Callable[[JobTrace], None]) -> None:
+        """Call sink with every finished JobTrace, on the thread finishing it.
+
+        Sinks run inside the job, so they should not raise.
+        """
+        with self._lock:
+            self._sinks.append(sink)
+
+    def remove_sink(self, sink: Callable[[JobTrace], None]) -> None:
+        with self._lock:
+            if sink in self._sinks:
+                self._sinks.remove(sink)
+
+    def prometheus(self) -> str:
+        """The metrics in the Prometheus text exposition format."""
+        with self._lock:
+            lines = [
+                *_header('vidleech_jobs_running', 'gauge', 'Jobs started and not yet finished'),
+                f'vidleech_jobs_running {self._running}',
+                *_header('vidleech_jobs_total', 'counter', 'Finished jobs by outcome'),
+                *(f'vidleech_jobs_total{{outcome="{_escape(outcome)}"}} {count}'
+                  for outcome, count in sorted(self._jobs.items())),
+                *_header('vidleech_job_errors_total', 'counter', 'Failed jobs by error type'),
+                *(f'vidleech_job_errors_total{{type="{_escape(name)}"}} {count}'
+                  for name, count in sorted(self._errors.items())),
+                *_header('vidleech_received_bytes_total', 'counter',
+                         'Response body bytes read by finished jobs'),
+                f'vidleech_received_bytes_total {self._bytes}',
+                *_header('vidleech_retries_total', 'counter', 'Retried requests of finished jobs'),
+                f'vidleech_retries_total {self._retries}',
+                *_header('vidleech_http_responses_total', 'counter',
+                         'HTTP responses of finished jobs by status class'),
+                *(f'vidleech_http_responses_total{{class="{key}"}} {count}'
+                  for key, count in sorted(self._http.items())),
+                *_header('vidleech_job_seconds', 'histogram', 'Duration of finished jobs'),
+                *_histogram_lines('vidleech_job_seconds', '', self._job_seconds),
+                *_header('vidleech_phase_seconds', 'histogram', 'Time finished jobs spent per phase'),
+            ]
+            for phase in sorted(self._phases, key=_phase_order):
+                lines += _histogram_lines('vidleech_phase_seconds', f'phase="{_escape(phase)}"',
+                                          self._phases[phase])
+        return '\n'.join(lines) + '\n'
+
+    def write_prometheus(self, path: str) -> None:
+        """Write the metrics to a file atomically, e.g. for node_exporter's
+        textfile collector."""
+        directory = os.path.dirname(os.path.abspath(path))
+        fd, temp = tempfile.mkstemp(prefix='.metrics-', dir=directory)
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                f.write(self.prometheus())
+            os.replace(temp, path)
+        except BaseException:
+            with contextlib.suppress(OSError):
+                os.remove(temp)
+            raise
+
+    def serve(self, port: int, host: str = '127.0.0.1') -> ThreadingHTTPServer:
+        """Serve the metrics at /metrics on a daemon thread.
+
+        Returns:
+            ThreadingHTTPServer: The running server; shutdown() stops it
+        """
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                if self.path.split('?', 1)[0] != '/metrics':
+                    self.send_error(404)
+                    return
+                body = metrics.prometheus().encode()
+                self.send_response(200)
+                self.send_header('Content-Type', PROMETHEUS_CONTENT_TYPE)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, name='metrics-http', daemon=True).start()
+        return server
+
+
+class JsonLinesExporter:
+    """Metrics sink appending each finished job's trace to a file as a JSON line."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = open(path, 'a', encoding='utf-8')
+
+    def __call__(self, trace: JobTrace) -> None:
+        line = json.dumps(trace.to_dict())
+        with self._lock, contextlib.suppress(OSError):
+            if not self._file.closed:
+                self._file.write(line + '\n')
+                self._file.flush()
+
+    def close(self) -> None:
+        with self._lock, contextlib.suppress(OSError):
+            self._file.close()
+
+
+class PrometheusFileExporter:
+    """Metrics sink rewriting a Prometheus text file after every finished job."""
+
+    def __init__(self, metrics: Metrics, path: str):
+        """
+        Args:
+            metrics: The metrics to export
+            path: File to write; written once here, raising OSError if it
+                cannot be, and then after every job, ignoring errors
+        """
+        self.metrics = metrics
+        self.path = path
+        metrics.write_prometheus(path)
+
+    def __call__(self, trace: JobTrace) -> None:
+        with contextlib.suppress(OSError):
+            self.metrics.write_prometheus(self.path)
+
+
+def _phase_order(phase: str) -> Tuple[int, str]:
+    return (PHASES.index(phase) if phase in PHASES else len(PHASES), phase)
+
+
+def _round(value: Optional[float]) -> Optional[float]:
+    return None if value is None else round(value, 6)
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _header(name: str, kind: str, help_text: str) -> List[str]:
+    return [f'# HELP {name} {help_text}', f'# TYPE {name} {kind}']
+
+
+def _histogram_lines(name: str, labels: str, histogram: _Histogram) -> List[str]:
+    prefix = f'{labels},' if labels else ''
+    suffix = f'{{{labels}}}' if labels else ''
+    lines = [f'{name}_bucket{{{prefix}le="{bound:g}"}} {count}'
+             for bound, count in zip(histogram.buckets, histogram.counts)]
+    lines += [
+        f'{name}_bucket{{{prefix}le="+Inf"}} {histogram.count}',
+        f'{name}_sum{suffix} {histogram.sum:.6f}',
+        f'{name}_count{suffix} {histogram.count}',
+    ]
+    return lines
@@ -0,0 +1,135 @@
+"""
+Incremental playlist and channel expansion.
+
+Processing a playlist with yt-dlp resolves every entry into one info dict
+before the first download starts. Instead, a playlist job hands its
+unprocessed extraction result to PlaylistExpander, which walks the entries
+lazily on a background thread and queues each one as its own job as soon as
+it is discovered. Pagination pauses while enough jobs are waiting, so memory
+stays bounded however long the playlist is. Entries whose ID is already in
+the download archive are not queued at all; their keys are checked a batch
+of entries at a time, with one archive lookup per batch.
+"""
+import itertools
+import threading
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+from src.core.archive import DownloadArchive, archive_key
+from src.core.download_queue import DownloadJob, DownloadQueue
+
+# Entries whose archive keys are checked together
+ARCHIVE_BATCH = 50
+
+
+def iter_entries(ie_result: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+    """Yield the entries of an unprocessed playlist result one at a time.
+
+    Nested playlists are flattened. Paged entry lists are walked page by
+    page without keeping earlier pages.
+    """
+    entries = ie_result.get('entries') or []
+    if hasattr(entries, '_getslice'):
+        # yt-dlp PagedList: its public accessors cache every page
+        entries._use_cache = False
+        entries = entries._getslice(0, None)
+    for entry in entries:
+        if not entry:
+            continue
+        if entry.get('_type') == 'playlist':
+            yield from iter_entries(entry)
+        else:
+            yield entry
+
+
+def _batches(entries: Iterable[Dict[str, Any]], size: int) -> Iterator[List[Dict[str, Any]]]:
+    entries = iter(entries)
+    while True:
+        batch = list(itertools.islice(entries, size))
+        if not batch:
+            return
+        yield batch
+
+
+def entry_url(entry: Dict[str, Any]) -> Optional[str]:
+    """URL to queue for a playlist entry."""
+    if entry.get('_type') in ('url', 'url_transparent'):
+        return entry.get('url')
+    return entry.get('webpage_url') or entry.get('original_url') or entry.get('url')
+
+
+class PlaylistExpander:
+    """Queues playlist entries as separate jobs while pagination continues."""
+
+    def __init__(self, queue: DownloadQueue, max_pending: int = 20,
+                 archive: Optional[DownloadArchive] = None):
+        """
+        Args:
+            queue: Queue the entries are added to
+            max_pending: Pagination waits while this many jobs are queued
+            archive: Entries found in it are skipped
+        """
+        self.queue = queue
+        self.max_pending = max_pending
+        self.archive = archive
+
+    def expand(self, job: DownloadJob, ie_result: Dict[str, Any], ydl: 'yt_dlp.YoutubeDL') -> threading.Thread:
+        """Start queueing the entries of a playlist job.
+
+        Args:
+            job: The playlist job; entries inherit its options
+            ie_result: Unprocessed playlist extraction result
+            ydl: The instance that extracted it, needed to fetch further
+                pages; closed when expansion ends
+
+        Returns:
+            threading.Thread: The expansion thread
+        """
+        job.playlist = True
+        job.status = 'Expanding playlist...'
+        # Opened while the playlist job still runs, so the queue never looks
+        # idle between the job finishing and its last entry being queued
+        self.queue.begin_feed()
+        thread = threading.Thread(target=self._run, args=(job, ie_result, ydl),
+                                  name='playlist-expander', daemon=True)
+        thread.start()
+        return thread
+
+    def _run(self, job: DownloadJob, ie_result: Dict[str, Any], ydl) -> None:
+        count = skipped = 0
+        # Without an archive each entry is queued as soon as it is found
+        size = ARCHIVE_BATCH if self.archive is not None else 1
+        try:
+            for batch in _batches(iter_entries(ie_result), size):
+                archived = set()
+                if self.archive is not None:
+                    keys = [archive_key(entry) for entry in batch]
+                    archived = self.archive.contains_many(key for key in keys if key is not None)
+                for entry in batch:
+                    url = entry_url(entry)
+                    if not url:
+                        continue
+                    if archived and archive_key(entry) in archived:
+                        skipped += 1
+                        continue
+                    while not self.queue.wait_for_room(self.max_pending, timeout=0.5):
+                        if job.cancel_token.cancelled:
+                            return
+                    if job.cancel_token.cancelled:
+                        return
+                    self.queue.add(url, job.output_path, job.format_selection, job.priority,
+                                   connections=job.connections,
+                                   concurrent_fragments=job.concurrent_fragments,
+                                   audio_format=job.audio_format,
+                                   audio_quality=job.audio_quality)
+                    count += 1
+        except Exception as e:
+            job.error = str(e)
+        finally:
+            ydl.close()
+            status = f'Playlist: {count} entries queued'
+            if skipped:
+                status += f', {skipped} already downloaded'
+            if job.error:
+                status += f' (stopped: {job.error})'
+            self.queue.report_progress(job.id, 100.0, status)
+            self.queue.end_feed()
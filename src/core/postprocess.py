@@ -0,0 +1,230 @@
+"""
+Post-processing stage of the download pipeline.
+
+A download job moves through four stages:
+
+    extract -> fetch -> post-process -> finalize
+
+Extraction and fetching are network bound and run on the download queue's
+workers, which limit them globally and per host. Merging formats, fixups
+and conversions run ffmpeg and are CPU bound. With a PostProcessPool the
+fetch stage only records yt-dlp's post-processing (see VidleechYDL in
+src/core/ydl.py) and returns; the recorded work runs in a process pool
+sized to the CPU count, so the next job's network phase overlaps this
+job's merge. Finalizing (archive, history details, output name) runs on a
+single thread once a job's post-processing has finished.
+
+Each PostProcessTask is rebuilt in the worker process from picklable
+options, post-processor keys and a sanitized copy of the info dict; only
+the fields post-processing changed are copied back into the job's info.
+"""
+import copy
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Hashable, List, NamedTuple, Optional, Tuple
+
+from src.core.ydl_pool import options_profile
+
+# Info dict key under which the fetch stage records deferred post-processing
+DEFERRED_KEY = '__deferred_postprocess'
+
+# YoutubeDL instances kept by each worker process, by options profile
+_WORKER_CACHE_SIZE = 4
+
+
+class PostProcessTask(NamedTuple):
+    """Deferred post-processing of one downloaded file."""
+    params: Dict[str, Any]
+    filename: str
+    info: Dict[str, Any]
+    files_to_move: Dict[str, Any]
+    # Keys of the post-processors yt-dlp added for this download, such as
+    # FFmpegMerger; those configured in params are added by YoutubeDL itself
+    postprocessors: List[str]
+
+
+def find_deferred(info: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Downloads in a processed info dict whose post-processing was deferred."""
+    found = []
+    for entry in [info] + [entry for entry in info.get('entries') or [] if entry]:
+        found.extend(download for download in entry.get('requested_downloads') or []
+                     if DEFERRED_KEY in download)
+    return found
+
+
+def make_task(download: Dict[str, Any], params: Dict[str, Any]) -> PostProcessTask:
+    """Build the picklable task for a deferred download.
+
+    Args:
+        download: requested_downloads entry carrying DEFERRED_KEY
+        params: YoutubeDL options the download ran with
+    """
+    from yt_dlp import YoutubeDL
+
+    deferred = download[DEFERRED_KEY]
+    info = {key: value for key, value in download.items()
+            if key not in (DEFERRED_KEY, '__postprocessors')}
+    return PostProcessTask(
+        params={key: value for key, value in params.items() if not key.endswith('_hooks')},
+        filename=deferred['filename'],
+        # Values that do not pickle become their repr and are never copied back
+        info=YoutubeDL.sanitize_info(info),
+        files_to_move=dict(deferred['files_to_move']),
+        postprocessors=list(deferred['postprocessors'])
+    )
+
+
+def run_task(task: PostProcessTask) -> Tuple[Dict[str, Any], List[str]]:
+    """Worker process entry point: run one download's post-processing.
+
+    Returns:
+        Tuple[Dict[str, Any], List[str]]: Info fields that were added or
+            changed, and those that were removed
+    """
+    from yt_dlp.postprocessor import get_postprocessor
+
+    ydl = _worker_ydl(task.params)
+    info = dict(task.info)
+    before = copy.deepcopy(info)
+    info['__postprocessors'] = [get_postprocessor(key)(ydl) for key in task.postprocessors]
+    info = ydl.post_process(task.filename, info, dict(task.files_to_move))
+    info.pop('__postprocessors', None)
+    changed = {key: value for key, value in info.items() if key not in before or before[key] != value}
+    return changed, [key for key in before if key not in info]
+
+
+_worker_ydls: Dict[Hashable, Any] = {}
+
+
+def _worker_ydl(params: Dict[str, Any]) -> 'yt_dlp.YoutubeDL':
+    from yt_dlp import YoutubeDL
+
+    key = options_profile(params)
+    ydl = _worker_ydls.get(key)
+    if ydl is None:
+        if len(_worker_ydls) >= _WORKER_CACHE_SIZE:
+            _worker_ydls.pop(next(iter(_worker_ydls))).close()
+        # Post-processing needs no extractors
+        ydl = _worker_ydls[key] = YoutubeDL(params, auto_init=False)
+    return ydl
+
+
+def _warm_up() -> None:
+    import yt_dlp.postprocessor  # noqa: F401
+
+
+def _apply(download: Dict[str, Any], result: Tuple[Dict[str, Any], List[str]]) -> None:
+    changed, removed = result
+    del download[DEFERRED_KEY]
+    download.pop('__postprocessors', None)
+    for key in removed:
+        download.pop(key, None)
+    download.update(changed)
+
+
+class PostProcessPool:
+    """Runs deferred post-processing in worker processes and finalizes jobs
+    on a single thread. Thread safe."""
+
+    def __init__(self, workers: Optional[int] = None, max_pending: Optional[int] = None):
+        """
+        Args:
+            workers: Worker processes; defaults to the CPU count
+            max_pending: Tasks queued or running before submit() blocks the
+                download worker calling it; defaults to twice the workers
+        """
+        self.workers = workers or os.cpu_count() or 1
+        self._slots = threading.BoundedSemaphore(max_pending or 2 * self.workers)
+        self._processes: Optional[ProcessPoolExecutor] = None
+        self._finalizer = ThreadPoolExecutor(max_workers=1, thread_name_prefix='finalize')
+        self._lock = threading.Lock()
+
+    def start(self, wait: bool = False) -> None:
+        """Start the worker processes now instead of on the first job.
+
+        Args:
+            wait: Block until every worker has loaded yt-dlp
+        """
+        executor = self._executor()
+        futures = [executor.submit(_warm_up) for _ in range(self.workers)]
+        if wait:
+            for future in futures:
+                future.result()
+
+    def submit(self, downloads: List[Dict[str, Any]], params: Dict[str, Any],
+               finalize: Callable[[], Any]) -> Future:
+        """Post-process a job's downloads, then finalize the job.
+
+        Args:
+            downloads: Entries returned by find_deferred(); updated in place
+                with the post-processing results
+            params: YoutubeDL options the downloads ran with
+            finalize: Called on the finalizer thread once every download
+                was post-processed
+
+        Returns:
+            Future: finalize()'s result, or the first error. Cancelling it
+                drops post-processing that has not started.
+        """
+        outcome = Future()
+        futures = []
+        for download in downloads:
+            task = make_task(download, params)
+            # Holds the download worker back while the CPU stage is saturated
+            self._slots.acquire()
+            try:
+                future = self._executor().submit(run_task, task)
+            except BaseException:
+                self._slots.release()
+                raise
+            future.add_done_callback(lambda _: self._slots.release())
+            futures.append(future)
+
+        remaining = [len(futures)]
+        lock = threading.Lock()
+
+        def task_done(_: Future) -> None:
+            with lock:
+                remaining[0] -= 1
+                if remaining[0]:
+                    return
+            self._finalizer.submit(self._finalize, downloads, futures, finalize, outcome)
+
+        outcome.add_done_callback(
+            lambda done: [future.cancel() for future in futures] if done.cancelled() else None)
+        for future in futures:
+            future.add_done_callback(task_done)
+        if not futures:
+            self._finalizer.submit(self._finalize, downloads, futures, finalize, outcome)
+        return outcome
+
+    def close(self) -> None:
+        """Wait for submitted jobs to finish and stop the workers."""
+        with self._lock:
+            processes, self._processes = self._processes, None
+        if processes is not None:
+            processes.shutdown(wait=True)
+        self._finalizer.shutdown(wait=True)
+
+    @staticmethod
+    def _finalize(downloads: List[Dict[str, Any]], futures: List[Future],
+                  finalize: Callable[[], Any], outcome: Future) -> None:
+        if not outcome.set_running_or_notify_cancel():
+            return
+        try:
+            for download, future in zip(downloads, futures):
+                _apply(download, future.result())
+            outcome.set_result(finalize())
+        except BaseException as e:
+            outcome.set_exception(e)
+
+    def _executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._processes is None:
+                # Forking a process that runs download threads can copy held
+                # locks into the child
+                self._processes = ProcessPoolExecutor(
+                    self.workers, mp_context=multiprocessing.get_context('spawn'))
+            return self._processes
@@ -0,0 +1,226 @@
+"""
+Throttled progress pipeline for yt-dlp progress hooks.
+
+yt-dlp calls progress hooks once per written chunk. ProgressAggregator
+absorbs those calls with a time check and a sample of the byte counter,
+keeps a sliding-window speed estimate per job and hands coalesced snapshots
+to a sink at a bounded rate, so the GUI receives one batch per interval
+instead of one signal per chunk. Percentages are computed from byte counts
+only when a batch is flushed. Updates held back by the rate limit are
+flushed by a timer, so the last one before a stall is still shown.
+"""
+import threading
+import time
+from typing import Any, Callable, Dict, Hashable, List, Optional
+
+# Starts a call after a delay and returns an object with cancel()
+Timer = Callable[[float, Callable[[], None]], Any]
+
+
+class ProgressSnapshot:
+    """Point-in-time progress of one job."""
+    __slots__ = ('job', 'status', 'percent', 'downloaded', 'total', 'speed', 'eta',
+                 'fragment_index', 'fragment_count', 'filename')
+
+    def __init__(self, job: Hashable):
+        self.job = job
+        self.status = 'downloading'
+        self.percent = 0.0
+        self.downloaded = 0
+        self.total: Optional[int] = None
+        self.speed: Optional[float] = None
+        self.eta: Optional[float] = None
+        self.fragment_index: Optional[int] = None
+        self.fragment_count: Optional[int] = None
+        self.filename: Optional[str] = None
+
+    def copy(self) -> 'ProgressSnapshot':
+        clone = ProgressSnapshot(self.job)
+        for name in self.__slots__:
+            setattr(clone, name, getattr(self, name))
+        return clone
+
+    def describe(self) -> str:
+        """Human readable status line, e.g. 'Downloading... 2.1 MiB/s, ETA 0:42'."""
+        if self.status == 'finished':
+            return 'Download complete!'
+        if self.speed is None:
+            return 'Starting download...'
+        text = f"Downloading... {format_bytes(self.speed)}/s"
+        if self.eta is not None:
+            minutes, seconds = divmod(int(self.eta), 60)
+            text += f", ETA {minutes}:{seconds:02d}"
+        if self.fragment_count:
+            text += f" (frag {self.fragment_index or 0}/{self.fragment_count})"
+        return text
+
+
+def format_bytes(count: float) -> str:
+    """Format a byte count with binary units."""
+    for unit in ('B', 'KiB', 'MiB', 'GiB'):
+        if count < 1024:
+            return f"{count:.1f} {unit}"
+        count /= 1024
+    return f"{count:.1f} TiB"
+
+
+class ProgressTracker:
+    """Progress and sliding-window speed estimate for a single job.
+
+    Samples live in a fixed-size ring so the per-chunk path does not
+    allocate. The ring starts over when a new file begins, e.g. the audio
+    stream of a merged download, whose byte counter starts at zero.
+    """
+
+    def __init__(self, job: Hashable, window: float = 3.0, samples: int = 64):
+        self.snapshot = ProgressSnapshot(job)
+        self.window = window
+        self._times = [0.0] * samples
+        self._bytes = [0] * samples
+        self._step = window / samples
+        self._last: Dict[str, Any] = {}
+        self._head = -1
+        self._tail = 0
+        self._count = 0
+
+    def record(self, d: Dict[str, Any], now: float) -> None:
+        """Per-chunk fast path: keep the dict and sample the byte counter."""
+        self._last = d
+        downloaded = d.get('downloaded_bytes') or 0
+        if self._count and (downloaded < self._bytes[self._head]
+                            or d.get('filename') != self.snapshot.filename):
+            self._head, self._tail, self._count = -1, 0, 0
+            self.snapshot.speed = self.snapshot.eta = None
+        self.snapshot.filename = d.get('filename')
+        # Ring buffer of (time, bytes) samples, at most one per window slot
+        if self._count == 0 or now - self._times[self._head] >= self._step:
+            size = len(self._times)
+            self._head = (self._head + 1) % size
+            self._times[self._head] = now
+            self._bytes[self._head] = downloaded
+            if self._count == size:
+                self._tail = (self._tail + 1) % size
+            else:
+                self._count += 1
+
+    def update(self, d: Dict[str, Any], now: float) -> ProgressSnapshot:
+        """Record a progress dict and refresh the snapshot."""
+        self.record(d, now)
+        return self.refresh(now)
+
+    def refresh(self, now: float) -> ProgressSnapshot:
+        """Recompute the snapshot from the latest progress dict."""
+        d = self._last
+        snap = self.snapshot
+        snap.status = d.get('status', 'downloading')
+        downloaded = d.get('downloaded_bytes') or 0
+        total = d.get('total_bytes') or d.get('total_bytes_estimate')
+        snap.downloaded = downloaded
+        snap.total = total
+        snap.fragment_index = d.get('fragment_index')
+        snap.fragment_count = d.get('fragment_count')
+        snap.filename = d.get('filename')
+
+        if snap.status == 'finished':
+            snap.percent = 100.0
+            snap.eta = 0.0
+            return snap
+        if total:
+            snap.percent = min(100.0, 100.0 * downloaded / total)
+        elif snap.fragment_count:
+            snap.percent = 100.0 * (snap.fragment_index or 0) / snap.fragment_count
+
+        # Drop samples that fell out of the window, keeping at least one
+        size = len(self._times)
+        while self._count > 1 and now - self._times[self._tail] > self.window:
+            self._tail = (self._tail + 1) % size
+            self._count -= 1
+
+        elapsed = now - self._times[self._tail]
+        if elapsed > 0:
+            snap.speed = (downloaded - self._bytes[self._tail]) / elapsed
+            snap.eta = (total - downloaded) / snap.speed if total and snap.speed > 0 else None
+        return snap
+
+
+class ProgressAggregator:
+    """Coalesces progress hooks from many jobs into rate-limited batches.
+
+    Thread safe: hooks may be called concurrently from download workers.
+    """
+
+    def __init__(self, sink: Callable[[List[ProgressSnapshot]], None], rate_hz: float = 10.0,
+                 clock: Callable[[], float] = time.monotonic, timer: Optional[Timer] = None):
+        """
+        Args:
+            sink: Receives a list of changed snapshots at most rate_hz times
+                per second, on a download worker or the flush timer's thread
+            rate_hz: Maximum flushes per second
+            clock: Monotonic time source, replaceable in tests
+            timer: Schedules the flush of held back updates; defaults to a
+                daemon threading.Timer
+        """
+        self.sink = sink
+        self.interval = 1.0 / rate_hz if rate_hz > 0 else 0.0
+        self.clock = clock
+        self._trackers: Dict[Hashable, ProgressTracker] = {}
+        self._dirty: Dict[Hashable, ProgressTracker] = {}
+        self.timer = timer or _start_timer
+        self._lock = threading.Lock()
+        self._next_flush = 0.0
+        self._pending: Any = None
+
+    def update(self, job: Hashable, d: Dict[str, Any]) -> None:
+        """Record a progress hook call for a job; flushes when the interval elapsed."""
+        now = self.clock()
+        with self._lock:
+            tracker = self._trackers.get(job)
+            if tracker is None:
+                tracker = self._trackers[job] = ProgressTracker(job)
+            tracker.record(d, now)
+            self._dirty[job] = tracker
+            # Finished events are flushed right away so completion is never delayed
+            if now < self._next_flush and d['status'] == 'downloading':
+                if self._pending is None:
+                    self._pending = self.timer(self._next_flush - now, self._flush_pending)
+                return
+            batch = self._take_batch(now)
+        self.sink(batch)
+
+    def flush(self) -> None:
+        """Deliver pending snapshots immediately."""
+        with self._lock:
+            batch = self._take_batch(self.clock())
+        if batch:
+            self.sink(batch)
+
+    def _flush_pending(self) -> None:
+        with self._lock:
+            self._pending = None
+            if not self._dirty:
+                return
+            batch = self._take_batch(self.clock())
+        self.sink(batch)
+
+    def forget(self, job: Hashable) -> None:
+        """Drop a finished job's tracker."""
+        with self._lock:
+            self._trackers.pop(job, None)
+            self._dirty.pop(job, None)
+
+    def _take_batch(self, now: float) -> List[ProgressSnapshot]:
+        # Copies, so receivers on other threads never see a snapshot change
+        batch = [tracker.refresh(now).copy() for tracker in self._dirty.values()]
+        self._dirty.clear()
+        self._next_flush = now + self.interval
+        if self._pending is not None:
+            self._pending.cancel()
+            self._pending = None
+        return batch
+
+
+def _start_timer(delay: float, callback: Callable[[], None]) -> threading.Timer:
+    timer = threading.Timer(delay, callback)
+    timer.daemon = True
+    timer.start()
+    return timer
@@ -0,0 +1,162 @@
+"""
+Compact records of extraction results.
+
+A yt-dlp info dict carries every format with its signed URL, HTTP headers
+and fragment list, often hundreds of KB per video. VideoRecord and
+FormatRecord keep only the fields the app shows or decides on, in frozen
+slotted dataclasses whose strings are shared between records (extractor
+names, codecs, extensions). Anything that holds on to video information,
+such as a long queue or history, keeps these instead; the full dict is
+rehydrated from the metadata cache when needed (see
+VideoDownloader.full_info()).
+"""
+import sys
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Tuple
+
+
+def _shared(value: Any) -> Optional[str]:
+    """Interned copy of a repetitive string value, None for anything else."""
+    return sys.intern(value) if isinstance(value, str) else None
+
+
+def _number(value: Any) -> Optional[float]:
+    return float(value) if isinstance(value, (int, float)) and not isinstance(value, bool) else None
+
+
+def _integer(value: Any) -> Optional[int]:
+    return int(value) if isinstance(value, (int, float)) and not isinstance(value, bool) else None
+
+
+def _bitrate(fmt: Dict[str, Any]) -> Optional[float]:
+    """Total bitrate from the video and audio bitrates, for formats without tbr."""
+    rates = [rate for rate in (_number(fmt.get('vbr')), _number(fmt.get('abr'))) if rate]
+    return sum(rates) if rates else None
+
+
+@dataclass(frozen=True, slots=True)
+class FormatRecord:
+    """One format of a video, without its URLs and request details.
+
+    Attributes:
+        format_id: yt-dlp format ID, e.g. '137'
+        ext: File extension
+        protocol: Download protocol, e.g. 'https' or 'm3u8_native'
+        width: Video width in pixels
+        height: Video height in pixels
+        fps: Frame rate
+        vcodec: Video codec, 'none' for audio-only formats
+        acodec: Audio codec, 'none' for video-only formats
+        tbr: Total bitrate in KBit/s
+        filesize: Exact size in bytes, or yt-dlp's estimate
+        filesize_exact: Whether filesize is exact
+    """
+    format_id: str
+    ext: Optional[str] = None
+    protocol: Optional[str] = None
+    width: Optional[int] = None
+    height: Optional[int] = None
+    fps: Optional[float] = None
+    vcodec: Optional[str] = None
+    acodec: Optional[str] = None
+    tbr: Optional[float] = None
+    filesize: Optional[int] = None
+    filesize_exact: bool = False
+
+    @classmethod
+    def from_format(cls, fmt: Dict[str, Any]) -> 'FormatRecord':
+        """Build a record from a yt-dlp format (or single-format info) dict."""
+        size = _integer(fmt.get('filesize'))
+        return cls(
+            format_id=str(fmt.get('format_id') or ''),
+            ext=_shared(fmt.get('ext')),
+            protocol=_shared(fmt.get('protocol')),
+            width=_integer(fmt.get('width')),
+            height=_integer(fmt.get('height')),
+            fps=_number(fmt.get('fps')),
+            vcodec=_shared(fmt.get('vcodec')),
+            acodec=_shared(fmt.get('acodec')),
+            tbr=_number(fmt.get('tbr')) or _bitrate(fmt),
+            filesize=size if size is not None else _integer(fmt.get('filesize_approx')),
+            filesize_exact=size is not None,
+        )
+
+    @property
+    def has_video(self) -> bool:
+        return self.vcodec != 'none' and (self.vcodec is not None or self.height is not None)
+
+    @property
+    def has_audio(self) -> bool:
+        return self.acodec != 'none' and self.acodec is not None
+
+
+@dataclass(frozen=True, slots=True)
+class VideoRecord:
+    """What the app keeps of a video's extraction result.
+
+    Attributes:
+        url: URL the video was looked up by; the key for rehydration
+        id: Video ID on its site
+        title: Video title
+        extractor: yt-dlp extractor key, e.g. 'Youtube'
+        webpage_url: Canonical page URL
+        duration: Length in seconds
+        uploader: Channel or uploader name
+        thumbnail: Thumbnail URL
+        is_live: Whether the video is a live stream
+        formats: Every available format
+        chosen: The formats format selection picked, in download order;
+            empty before selection
+    """
+    url: str
+    id: Optional[str] = None
+    title: Optional[str] = None
+    extractor: Optional[str] = None
+    webpage_url: Optional[str] = None
+    duration: Optional[float] = None
+    uploader: Optional[str] = None
+    thumbnail: Optional[str] = None
+    is_live: bool = False
+    formats: Tuple[FormatRecord, ...] = ()
+    chosen: Tuple[FormatRecord, ...] = ()
+
+    @classmethod
+    def from_info(cls, info: Dict[str, Any], url: Optional[str] = None) -> 'VideoRecord':
+        """Build a record from an info dict, processed or not.
+
+        Args:
+            info: yt-dlp info dict of a single video
+            url: URL the info was looked up by; defaults to its page URL
+        """
+        formats = tuple(FormatRecord.from_format(fmt) for fmt in info.get('formats') or ())
+        # Records of the same format are shared between the two tuples
+        by_id = {record.format_id: record for record in formats}
+        requested = info.get('requested_formats') or ([info] if info.get('format_id') else [])
+        chosen = tuple(by_id.get(str(fmt.get('format_id'))) or FormatRecord.from_format(fmt)
+                       for fmt in requested)
+        return cls(
+            url=url or info.get('webpage_url') or info.get('original_url') or info.get('url') or '',
+            id=info.get('id'),
+            title=info.get('title'),
+            extractor=_shared(info.get('extractor_key') or info.get('extractor')),
+            webpage_url=info.get('webpage_url'),
+            duration=_number(info.get('duration')),
+            uploader=info.get('uploader') or info.get('channel'),
+            thumbnail=info.get('thumbnail'),
+            is_live=bool(info.get('is_live')),
+            formats=formats,
+            chosen=chosen,
+        )
+
+    @property
+    def format_ids(self) -> Optional[str]:
+        """IDs of the chosen formats as a format selector, e.g. '137+140'."""
+        return '+'.join(fmt.format_id for fmt in self.chosen) if self.chosen else None
+
+    @property
+    def filesize(self) -> Optional[int]:
+        """Size of the chosen formats, None if any is unknown."""
+        sizes = [fmt.filesize for fmt in self.chosen]
+        if not sizes or None in sizes:
+            return None
+        return sum(sizes)
@@ -0,0 +1,325 @@
+"""
+Multi-connection segmented HTTP downloads.
+
+A single HTTP connection is often throttled by CDNs well below the link
+speed. SegmentedDownload fetches one file over several connections with
+Range requests and writes each byte range at its offset in a preallocated
+file.
+
+Ranges are assigned by work stealing: the first request covers the whole
+file, and every idle connection splits the range with the most bytes left
+and takes its upper half. Slow connections therefore end up with less work
+and all connections finish at about the same time. Servers that ignore
+Range requests are read over the first connection only.
+
+When a download stops early the file is truncated to its complete prefix,
+so the .part file can be resumed by this class or by yt-dlp's own HTTP
+downloader.
+
+With a Storage the file is opened with its write buffer and its blocks are
+allocated up front instead of leaving a sparse file.
+"""
+import re
+import threading
+import time
+from typing import IO, Any, Callable, List, Optional
+
+from src.core.storage import Reservation, Storage
+
+# A response needs .status, .headers.get(), .read(n) and .close()
+OpenRange = Callable[[int, Optional[int]], Any]
+
+_CONTENT_RANGE = re.compile(r'bytes\s+(\d+)-(\d+)/(\d+|\*)')
+
+
+class SegmentError(Exception):
+    """Raised when a range request cannot be completed."""
+
+
+class Segment:
+    """A byte range [pos, end] still to be downloaded; end is inclusive."""
+    __slots__ = ('pos', 'end')
+
+    def __init__(self, start: int, end: int):
+        self.pos = start
+        self.end = end
+
+    @property
+    def remaining(self) -> int:
+        return self.end - self.pos + 1
+
+
+class SegmentScheduler:
+    """Hands out byte ranges to connections, splitting the largest one on demand.
+
+    Thread safe. Owners advance a segment with advance(), which also tells
+    them when another connection has taken over the rest of their range.
+    """
+
+    def __init__(self, min_split: int):
+        """
+        Args:
+            min_split: Smallest range worth giving to a new connection
+        """
+        self.min_split = min_split
+        self._active: List[Segment] = []
+        # Given up on; their bytes from pos on are missing from the file
+        self._failed: List[Segment] = []
+        self._lock = threading.Lock()
+
+    def add(self, segment: Segment) -> Segment:
+        """Track a segment that a connection is about to download."""
+        with self._lock:
+            self._active.append(segment)
+        return segment
+
+    def steal(self) -> Optional[Segment]:
+        """Split the segment with the most bytes left and return its upper half.
+
+        Returns:
+            Optional[Segment]: None when no segment is worth splitting
+        """
+        with self._lock:
+            victim = max(self._active, key=lambda s: s.remaining, default=None)
+            if victim is None or victim.remaining < 2 * self.min_split:
+                return None
+            # The split point stays at least min_split ahead of the owner's
+            # position, so bytes it is reading now never cross into the new range
+            middle = victim.pos + victim.remaining // 2
+            segment = Segment(middle, victim.end)
+            victim.end = middle - 1
+            self._active.append(segment)
+            return segment
+
+    def advance(self, segment: Segment, size: int) -> int:
+        """Claim up to size bytes at the segment position.
+
+        Returns:
+            int: Number of bytes the caller may write at the old position
+        """
+        with self._lock:
+            size = max(0, min(size, segment.end - segment.pos + 1))
+            segment.pos += size
+            if segment.pos > segment.end and segment in self._active:
+                self._active.remove(segment)
+            return size
+
+    def release(self, segment: Segment, failed: bool = False) -> None:
+        """Stop tracking a segment whose connection is done with it.
+
+        Args:
+            segment: The segment
+            failed: The connection gave up before the end of the range; its
+                position still bounds the complete prefix
+        """
+        with self._lock:
+            if segment in self._active:
+                self._active.remove(segment)
+                if failed and segment.pos <= segment.end:
+                    self._failed.append(segment)
+
+    def remaining(self) -> int:
+        """Bytes not yet downloaded by any connection."""
+        with self._lock:
+            return sum(s.remaining for s in self._active)
+
+    def contiguous(self, default: int) -> int:
+        """Length of the fully downloaded prefix of the file.
+
+        Every byte below the lowest position of an unfinished or failed
+        segment has been written, so that position is the resume offset.
+
+        Args:
+            default: Value returned when no segment is unfinished
+        """
+        with self._lock:
+            return min((s.pos for s in self._active + self._failed), default=default)
+
+
+class SegmentedDownload:
+    """Download one URL into a file over several connections."""
+
+    def __init__(self, open_range: OpenRange, path: str, connections: int = 4,
+                 min_split: int = 1024 * 1024, chunk_size: int = 64 * 1024, retries: int = 3,
+                 progress: Optional[Callable[[int, Optional[int]], None]] = None,
+                 report_interval: float = 0.1, storage: Optional[Storage] = None,
+                 reservation: Optional[Reservation] = None):
+        """
+        Args:
+            open_range: Opens a request for bytes start..end (end None means
+                to the end of the file) and returns the response
+            path: File to write
+            connections: Maximum parallel connections
+            min_split: Smallest range given to an extra connection; must be
+                at least chunk_size
+            chunk_size: Bytes read per call
+            retries: Attempts per range before the download fails
+            progress: Called as progress(downloaded, total) on the calling
+                thread; exceptions it raises abort the download
+            report_interval: Seconds between progress calls
+            storage: Opens and preallocates the file; without it the file
+                is written with default buffering and reserved sparsely
+            reservation: Admitted space the preallocation is credited to
+        """
+        self.open_range = open_range
+        self.path = path
+        self.connections = max(1, connections)
+        self.chunk_size = chunk_size
+        self.retries = retries
+        self.progress = progress
+        self.report_interval = report_interval
+        self.storage = storage
+        self.reservation = reservation
+        self.scheduler = SegmentScheduler(max(min_split, chunk_size))
+        self.total: Optional[int] = None
+        self.downloaded = 0
+        self.ranged = False
+        self.requests = 0
+        # Ranges reopened after transient errors
+        self.retried = 0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._errors: List[BaseException] = []
+
+    def run(self, resume_from: int = 0) -> int:
+        """Download the file.
+
+        Args:
+            resume_from: Length of an already downloaded prefix of the file
+
+        Returns:
+            int: Size of the file
+
+        Raises:
+            SegmentError: If a range could not be downloaded
+            InsufficientSpace: If the file does not fit on the disk
+        """
+        response = self._open(resume_from, None)
+        self.ranged, self.total = self._parse_probe(response, resume_from)
+        if not self.ranged:
+            # Either a fresh download or the server cannot resume
+            resume_from = 0
+
+        # Reserve the full size so ranges can be written at their offsets
+        mode = 'r+b' if resume_from else 'wb'
+        try:
+            if self.storage is not None:
+                self.storage.open(self.path, mode, self.total, self.reservation, extend=True).close()
+            else:
+                with open(self.path, mode) as f:
+                    if self.total is not None:
+                        f.truncate(self.total)
+        except BaseException:
+            response.close()
+            raise
+
+        self.downloaded = resume_from
+        if self.total == resume_from:
+            response.close()
+            return resume_from
+        end = self.total - 1 if self.total is not None else float('inf')
+        first = self.scheduler.add(Segment(resume_from, end))
+        workers = [threading.Thread(target=self._work, args=(first, response), daemon=True)]
+        if self.ranged:
+            workers += [threading.Thread(target=self._work, daemon=True)
+                        for _ in range(self.connections - 1)]
+        for worker in workers:
+            worker.start()
+
+        try:
+            while True:
+                alive = [worker for worker in workers if worker.is_alive()]
+                if not alive:
+                    break
+                alive[0].join(self.report_interval)
+                if self._errors:
+                    raise SegmentError(str(self._errors[0])) from self._errors[0]
+                if self.progress is not None:
+                    self.progress(self.downloaded, self.total)
+        finally:
+            self._stop.set()
+            for worker in workers:
+                worker.join()
+            complete = self.scheduler.contiguous(default=self.downloaded)
+            if self.total is not None and complete < self.total:
+                with open(self.path, 'r+b') as f:
+                    f.truncate(complete)
+        if self._errors:
+            raise SegmentError(str(self._errors[0])) from self._errors[0]
+        if self.total is not None and self.downloaded != self.total:
+            raise SegmentError(f'Downloaded {self.downloaded} of {self.total} bytes')
+        return self.downloaded
+
+    def _open(self, start: int, end: Optional[int]):
+        with self._lock:
+            self.requests += 1
+        return self.open_range(start, end)
+
+    def _open_file(self) -> IO[bytes]:
+        if self.storage is not None:
+            return self.storage.open(self.path, 'r+b')
+        return open(self.path, 'r+b')
+
+    @staticmethod
+    def _parse_probe(response, start: int = 0) -> tuple:
+        """Return (ranges supported, total size) from the first response."""
+        status = getattr(response, 'status', 200)
+        if status == 206:
+            match = _CONTENT_RANGE.match(response.headers.get('Content-Range') or '')
+            if match and match.group(3) != '*' and int(match.group(1)) == start:
+                return True, int(match.group(3))
+        length = response.headers.get('Content-Length')
+        return False, int(length) if status == 200 and length and length.isdigit() else None
+
+    def _work(self, segment: Optional[Segment] = None, response=None) -> None:
+        try:
+            with self._open_file() as f:
+                while not self._stop.is_set():
+                    if segment is None:
+                        segment = self.scheduler.steal()
+                        if segment is None:
+                            return
+                    self._fetch(f, segment, response)
+                    segment, response = None, None
+        except BaseException as e:
+            self._errors.append(e)
+            self._stop.set()
+
+    def _fetch(self, f, segment: Segment, response) -> None:
+        """Download a segment, reopening the range after transient errors."""
+        attempt = 0
+        while True:
+            try:
+                if response is None:
+                    response = self._open(segment.pos, segment.end)
+                    if getattr(response, 'status', 200) != 206:
+                        raise SegmentError(f'Server ignored range request ({response.status})')
+                self._copy(f, segment, response)
+                return
+            except (OSError, SegmentError) as e:
+                attempt += 1
+                if attempt > self.retries or not self.ranged or self._stop.is_set():
+                    self.scheduler.release(segment, failed=True)
+                    raise
+                with self._lock:
+                    self.retried += 1
+                time.sleep(0.2 * attempt)
+            finally:
+                if response is not None:
+                    response.close()
+                    response = None
+
+    def _copy(self, f, segment: Segment, response) -> None:
+        f.seek(segment.pos)
+        while segment.pos <= segment.end and not self._stop.is_set():
+            data = response.read(self.chunk_size)
+            if not data:
+                if segment.end == float('inf'):
+                    self.scheduler.advance(segment, 0)
+                    self.scheduler.release(segment)
+                    return
+                raise SegmentError(f'Connection closed with {segment.remaining} bytes left')
+            size = self.scheduler.advance(segment, len(data))
+            f.write(data[:size])
+            with self._lock:
+                self.downloaded += size
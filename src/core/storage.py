@@ -0,0 +1,258 @@
+"""
+Disk write path for downloads.
+
+Media files are written through Storage instead of yt-dlp's own file
+handling:
+
+- Output files get a large write buffer (1 MiB by default rather than
+  Python's 8 KiB), so network drives see a few large writes instead of
+  many small ones.
+- When the final size is known, the file's blocks are reserved with
+  fallocate() before the first byte arrives. A full disk then fails the
+  download at its start rather than gigabytes in, and the file is laid
+  out contiguously.
+- Temporary files (.part, -FragN) live next to their destination, never in
+  a temp directory, so finishing a download is a rename within one
+  filesystem instead of a copy.
+- Before a job downloads, its estimated size is checked against the free
+  space left after what running downloads still need. Jobs that do not
+  fit raise InsufficientSpace, which the download queue turns into a
+  deferral.
+"""
+import ctypes
+import errno
+import os
+import shutil
+import sys
+import threading
+from typing import Any, Dict, IO, List, Optional
+
+from src.core.progress import format_bytes
+
+DEFAULT_BUFFER_SIZE = 1024 * 1024
+# Free space never handed out to downloads
+DEFAULT_MIN_FREE = 100 * 1024 * 1024
+
+# fallocate() mode that reserves blocks without changing the file size
+_FALLOC_FL_KEEP_SIZE = 1
+# Filesystems without native preallocation
+_UNSUPPORTED = (errno.EOPNOTSUPP, errno.ENOSYS, errno.EINVAL, errno.EPERM)
+
+
+class InsufficientSpace(Exception):
+    """Raised when a download does not fit in the free disk space.
+
+    Not an OSError, so yt-dlp's downloaders let it through instead of
+    reporting it as a failed download.
+
+    Attributes:
+        path: Directory the download was going to
+        needed: Bytes the download needs
+        available: Bytes it could have had
+    """
+
+    def __init__(self, path: str, needed: int, available: int):
+        super().__init__(f'Not enough disk space in {path}: '
+                         f'{format_bytes(needed)} needed, {format_bytes(max(0, available))} free')
+        self.path = path
+        self.needed = needed
+        self.available = available
+
+
+def _load_fallocate():
+    if not sys.platform.startswith('linux'):
+        return None
+    try:
+        fallocate = ctypes.CDLL(None, use_errno=True).fallocate
+    except (OSError, AttributeError):
+        return None
+    fallocate.argtypes = [ctypes.c_int, ctypes.c_int, ctypes.c_int64, ctypes.c_int64]
+    fallocate.restype = ctypes.c_int
+    return fallocate
+
+
+_fallocate = _load_fallocate()
+
+
+def preallocate(f: IO[bytes], size: int, keep_size: bool = True) -> bool:
+    """Reserve disk blocks for the first size bytes of an open file.
+
+    Linux's fallocate() is used directly: posix_fallocate() grows the file,
+    which would make yt-dlp resume from the wrong offset, and where the
+    filesystem cannot preallocate, glibc emulates it by writing every
+    block, doubling the I/O on network drives.
+
+    Args:
+        f: File opened for writing
+        size: Bytes to reserve from the start of the file
+        keep_size: Leave the file size alone; False also extends the file
+            to size, for writers that fill in ranges out of order
+
+    Returns:
+        bool: False if the platform or filesystem cannot preallocate; the
+            file is then extended (keep_size False) or left alone
+
+    Raises:
+        InsufficientSpace: If the disk is too full for size bytes
+    """
+    if size <= 0:
+        return False
+    if _fallocate is not None:
+        f.flush()
+        if _fallocate(f.fileno(), _FALLOC_FL_KEEP_SIZE if keep_size else 0, 0, size) == 0:
+            return True
+        error = ctypes.get_errno()
+        if error == errno.ENOSPC:
+            directory = os.path.dirname(os.path.abspath(f.name))
+            raise InsufficientSpace(directory, size, shutil.disk_usage(directory).free)
+        if error not in _UNSUPPORTED:
+            raise OSError(error, os.strerror(error), f.name)
+    if not keep_size:
+        # Sparse: reserves the size but not the blocks
+        f.truncate(size)
+    return False
+
+
+def estimated_size(info: Dict[str, Any]) -> Optional[int]:
+    """Bytes a processed info dict will download, from exact or approximate
+    format sizes; None if a format's size is unknown."""
+    total = 0
+    for fmt in info.get('requested_formats') or [info]:
+        size = fmt.get('filesize') or fmt.get('filesize_approx')
+        if not size:
+            return None
+        total += int(size)
+    return total
+
+
+class Reservation:
+    """Free space admitted for one download, held until released.
+
+    What the download has written or preallocated no longer counts as
+    reserved, since the free space already reflects it.
+    """
+
+    def __init__(self, storage: 'Storage', device: int, size: int):
+        self.storage = storage
+        self.device = device
+        self.size = size
+        # Per file, as merged formats are downloaded to separate files
+        self._preallocated: Dict[str, int] = {}
+        self._written: Dict[str, int] = {}
+
+    @property
+    def outstanding(self) -> int:
+        """Bytes still to come out of the free space."""
+        paths = set(self._preallocated) | set(self._written)
+        used = sum(max(self._preallocated.get(p, 0), self._written.get(p, 0)) for p in paths)
+        return max(0, self.size - used)
+
+    def preallocated(self, path: str, size: int) -> None:
+        """Account blocks reserved for a file."""
+        self._preallocated[path] = size
+
+    def progress(self, d: Dict[str, Any]) -> None:
+        """Account bytes written, from a yt-dlp progress hook call."""
+        path = d.get('tmpfilename') or d.get('filename')
+        if path and d.get('downloaded_bytes') is not None:
+            self._written[path] = d['downloaded_bytes']
+
+    def release(self) -> None:
+        self.storage._release(self)
+
+
+class Storage:
+    """Opens download files and admits downloads by free space. Thread safe."""
+
+    def __init__(self, buffer_size: int = DEFAULT_BUFFER_SIZE, preallocate: bool = True,
+                 min_free: int = DEFAULT_MIN_FREE):
+        """
+        Args:
+            buffer_size: Write buffer of every output file, in bytes
+            preallocate: Reserve blocks for files whose size is known
+            min_free: Free space kept back from downloads, in bytes
+        """
+        self.buffer_size = buffer_size
+        self.preallocate = preallocate
+        self.min_free = min_free
+        self._reservations: List[Reservation] = []
+        self._lock = threading.Lock()
+
+    def open(self, path: str, mode: str = 'wb', size: Optional[int] = None,
+             reservation: Optional[Reservation] = None, extend: bool = False) -> IO[bytes]:
+        """Open a file for writing with the configured buffer.
+
+        Args:
+            path: File to open
+            mode: Binary open mode, e.g. 'wb', 'ab' or 'r+b'
+            size: Final size, if known exactly; its blocks are reserved
+                without changing the file size
+            reservation: Credited with the preallocated bytes
+            extend: Also set the file size to size, for writers that fill
+                in ranges out of order
+
+        Raises:
+            InsufficientSpace: If size bytes do not fit
+        """
+        f = open(path, mode, buffering=self.buffer_size)
+        try:
+            if size and self.preallocate:
+                if preallocate(f, size, keep_size=not extend) and reservation is not None:
+                    reservation.preallocated(path, size)
+            elif size and extend:
+                f.truncate(size)
+        except BaseException:
+            f.close()
+            raise
+        return f
+
+    def free_space(self, path: str) -> int:
+        """Free bytes on the filesystem holding path, which need not exist yet."""
+        return shutil.disk_usage(_existing_parent(path)).free
+
+    def admit(self, path: str, size: Optional[int]) -> Reservation:
+        """Claim free space for a download into a directory.
+
+        Args:
+            path: Destination directory; it need not exist yet
+            size: Bytes the download will write, or None if unknown, in
+                which case only the min_free margin is checked
+
+        Returns:
+            Reservation: Release it when the download has finished
+
+        Raises:
+            InsufficientSpace: If the download does not fit next to the
+                downloads already admitted to that filesystem
+        """
+        existing = _existing_parent(path)
+        device = os.stat(existing).st_dev
+        size = size or 0
+        with self._lock:
+            claimed = sum(r.outstanding for r in self._reservations if r.device == device)
+            available = shutil.disk_usage(existing).free - claimed - self.min_free
+            if size > available or available < 0:
+                raise InsufficientSpace(path, size, available)
+            reservation = Reservation(self, device, size)
+            self._reservations.append(reservation)
+        return reservation
+
+    def reserved(self) -> int:
+        """Bytes admitted downloads are still expected to write."""
+        with self._lock:
+            return sum(r.outstanding for r in self._reservations)
+
+    def _release(self, reservation: Reservation) -> None:
+        with self._lock:
+            if reservation in self._reservations:
+                self._reservations.remove(reservation)
+
+
+def _existing_parent(path: str) -> str:
+    path = os.path.abspath(path)
+    while not os.path.exists(path):
+        parent = os.path.dirname(path)
+        if parent == path:
+            break
+        path = parent
+    return path
@@ -0,0 +1,222 @@
+"""
+Streaming output: downloads written to a pipe, descriptor or callback.
+
+A streamed download never touches the disk. yt-dlp's downloaders write the
+media bytes to a StreamSink as they arrive (see the streaming downloaders
+in src/core/ydl.py); HLS/DASH fragments are held in memory until they are
+appended instead of being written to -FragN files. Separate video and
+audio formats are fed to ffmpeg over pipes and muxed on the fly into a
+container that needs no seeking: fragmented MP4, WebM or Matroska.
+"""
+import os
+import subprocess
+import sys
+import threading
+from typing import Any, BinaryIO, Callable, List, Optional, Union
+
+from src.core.audio import ffmpeg_available
+
+StreamTarget = Union[int, str, 'os.PathLike[str]', BinaryIO, Callable[[bytes], Any]]
+
+# ffmpeg output options for each merged container; others become Matroska
+_CONTAINERS = {
+    'mp4': ['-f', 'mp4', '-movflags', 'frag_keyframe+empty_moov+default_base_moof'],
+    'webm': ['-f', 'webm'],
+}
+_MATROSKA = ['-f', 'matroska']
+
+_READ_SIZE = 64 * 1024
+
+
+def can_mux(ffmpeg_location: Optional[str] = None) -> bool:
+    """Whether merged formats can be streamed.
+
+    ffmpeg reads each format from its own pipe, which needs descriptor
+    inheritance; elsewhere streams fall back to single-file formats.
+    """
+    return os.name == 'posix' and ffmpeg_available(ffmpeg_location)
+
+
+class StreamSink:
+    """Destination of streamed downloads. Thread safe.
+
+    Attributes:
+        name: Shown in place of a filename, e.g. '<stdout>' or the pipe path
+        bytes_written: Total bytes written so far
+    """
+
+    def __init__(self, target: StreamTarget):
+        """
+        Args:
+            target: '-' for stdout; an int or 'fd:N' for an open file
+                descriptor, which is left open; a path, typically a named
+                pipe, opened on the first write; a binary file object; or
+                a callable receiving each chunk
+        """
+        self.bytes_written = 0
+        self._lock = threading.Lock()
+        self._path: Optional[str] = None
+        self._file: Optional[BinaryIO] = None
+        if isinstance(target, str) and target.startswith('fd:'):
+            target = int(target[3:])
+        if isinstance(target, int):
+            self.name = f'<fd {target}>'
+            self._write = lambda data, fd=target: _write_all(fd, data)
+        elif target == '-':
+            self.name = '<stdout>'
+            self._file = sys.stdout.buffer
+            self._write = self._file.write
+        elif isinstance(target, (str, os.PathLike)):
+            self.name = self._path = os.fspath(target)
+            self._write = self._write_path
+        elif hasattr(target, 'write'):
+            self.name = str(getattr(target, 'name', '<stream>'))
+            self._file = target
+            self._write = target.write
+        elif callable(target):
+            self.name = '<callback>'
+            self._write = target
+        else:
+            raise TypeError(f'Cannot stream to {target!r}')
+
+    def write(self, data: bytes) -> int:
+        """Write a chunk; chunks from concurrent writers are never interleaved."""
+        with self._lock:
+            self._write(data)
+            self.bytes_written += len(data)
+        return len(data)
+
+    def flush(self) -> None:
+        with self._lock:
+            if self._file is not None:
+                self._file.flush()
+
+    def view(self) -> 'SinkView':
+        """A file object writing to the sink, for downloaders that close
+        their output when they finish."""
+        return SinkView(self)
+
+    def close(self) -> None:
+        """Flush, and close the file if the sink opened it."""
+        with self._lock:
+            if self._file is not None:
+                self._file.flush()
+                if self._path is not None:
+                    self._file.close()
+                    self._file = None
+
+    def _write_path(self, data: bytes) -> None:
+        if self._file is None:
+            # Blocks until a named pipe has a reader
+            self._file = open(self._path, 'wb')
+        self._file.write(data)
+
+
+class SinkView:
+    """File object over a StreamSink; closing it leaves the sink open."""
+
+    def __init__(self, sink: StreamSink):
+        self.sink = sink
+        self.name = sink.name
+        self.closed = False
+
+    def write(self, data: bytes) -> int:
+        return self.sink.write(data)
+
+    def flush(self) -> None:
+        self.sink.flush()
+
+    def close(self) -> None:
+        self.closed = True
+
+
+def _write_all(fd: int, data: bytes) -> None:
+    view = memoryview(data)
+    while view:
+        view = view[os.write(fd, view):]
+
+
+class StreamMuxer:
+    """ffmpeg process muxing formats written to `inputs` into one stream.
+
+    Write each format to its input and close it at the end of the format;
+    the muxed stream is copied to the sink as ffmpeg produces it.
+    """
+
+    def __init__(self, executable: str, ext: str, sink: StreamSink, count: int):
+        """
+        Args:
+            executable: ffmpeg binary
+            ext: Extension yt-dlp chose for the merged file; mp4 and webm
+                keep their container, anything else becomes Matroska
+            sink: Receives the muxed stream
+            count: Number of formats
+        """
+        self.sink = sink
+        self.error: Optional[BaseException] = None
+        pipes = [os.pipe() for _ in range(count)]
+        args = [executable, '-hide_banner', '-loglevel', 'error', '-nostdin']
+        for read_fd, _ in pipes:
+            args += ['-i', f'pipe:{read_fd}']
+        for index in range(count):
+            args += ['-map', str(index)]
+        args += ['-c', 'copy', *_CONTAINERS.get(ext, _MATROSKA), 'pipe:1']
+        try:
+            self._process = subprocess.Popen(
+                args, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                pass_fds=[read_fd for read_fd, _ in pipes])
+        except BaseException:
+            for read_fd, write_fd in pipes:
+                os.close(read_fd)
+                os.close(write_fd)
+            raise
+        self.inputs: List[BinaryIO] = []
+        for read_fd, write_fd in pipes:
+            os.close(read_fd)
+            self.inputs.append(open(write_fd, 'wb'))
+        self._stderr = b''
+        self._threads = [
+            threading.Thread(target=self._pump, name='stream-mux', daemon=True),
+            threading.Thread(target=self._read_stderr, name='stream-mux-log', daemon=True),
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def abort(self) -> None:
+        """Stop ffmpeg, e.g. because a format failed to download."""
+        self._process.kill()
+
+    def finish(self) -> None:
+        """Wait for ffmpeg to write the rest of the stream.
+
+        Raises:
+            OSError: If ffmpeg or the sink failed
+        """
+        for stream in self.inputs:
+            try:
+                stream.close()
+            except OSError:
+                pass
+        returncode = self._process.wait()
+        for thread in self._threads:
+            thread.join()
+        if self.error is not None:
+            raise self.error
+        if returncode:
+            message = self._stderr.decode(errors='replace').strip().splitlines()
+            raise OSError(f"ffmpeg exited with code {returncode}"
+                          + (f": {message[-1]}" if message else ''))
+
+    def _pump(self) -> None:
+        try:
+            while True:
+                data = self._process.stdout.read1(_READ_SIZE)
+                if not data:
+                    break
+                self.sink.write(data)
+        except BaseException as e:
+            self.error = e
+            self._process.kill()
+
+    def _read_stderr(self) -> None:
+        self._stderr = self._process.stderr.read()
@@ -0,0 +1,476 @@
+"""
+yt-dlp integration points.
+
+create_ydl() builds the YoutubeDL subclass used for every job. The classes
+are defined on first use so importing this module does not load yt-dlp.
+"""
+import functools
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from src.core.bandwidth import BandwidthLimiter, NORMAL
+from src.core.download_queue import host_key
+from src.core.fragment_tuner import FragmentTuner
+from src.core.metrics import JobTrace
+from src.core.postprocess import DEFERRED_KEY
+from src.core.segmented import SegmentedDownload
+from src.core.storage import Reservation, Storage, estimated_size
+from src.core.stream import StreamMuxer, StreamSink
+
+# Info dict key holding merged formats while they are streamed
+_STREAM_FORMATS = '__stream_formats'
+
+
+def create_ydl(params: Dict[str, Any], auto_init: bool = True,
+               fragment_tuner: Optional[FragmentTuner] = None,
+               bandwidth: Optional[BandwidthLimiter] = None,
+               storage: Optional[Storage] = None) -> 'yt_dlp.YoutubeDL':
+    """Create a YoutubeDL instance with Vidleech's downloader extensions.
+
+    Extra params understood on top of yt-dlp's own:
+        segmented_connections: Download plain HTTP(S) formats over this many
+            ranged connections (1 keeps yt-dlp's single-stream downloader)
+        defer_postprocessing: Record post-processing (merging, fixups,
+            conversions) under the download's DEFERRED_KEY instead of
+            running it, for a PostProcessPool to run afterwards
+        bandwidth_class: Priority class the instance's reads are charged to
+            in the bandwidth limiter
+
+    Setting the instance's stream_sink to a StreamSink makes downloads to
+    the '-' output template write there instead of to stdout, without
+    temporary files; merged formats are muxed on the fly by ffmpeg.
+
+    Setting the instance's reservations to a list makes every video admit
+    its estimated size with the storage before downloading, appending the
+    Reservation to the list; InsufficientSpace is raised if it does not fit.
+
+    Setting the instance's trace to a JobTrace records the select, download,
+    rename and postprocess spans of its downloads and the bytes, retries
+    and HTTP responses of its requests.
+
+    Args:
+        params: YoutubeDL options
+        auto_init: Passed to YoutubeDL; False skips registering the
+            built-in extractors
+        fragment_tuner: Chooses concurrent_fragment_downloads per host for
+            HLS/DASH formats when the option is not set explicitly
+        bandwidth: Shared limiter every response body read is charged to
+        storage: Opens the files HTTP and fragment downloads write, with
+            its write buffer and preallocation
+
+    Returns:
+        yt_dlp.YoutubeDL: The new instance
+    """
+    ydl = _classes()['YoutubeDL'](params, auto_init=auto_init)
+    ydl.fragment_tuner = fragment_tuner
+    ydl.bandwidth = bandwidth
+    ydl.storage = storage
+    return ydl
+
+
+@functools.lru_cache(maxsize=None)
+def _classes() -> Dict[str, type]:
+    from yt_dlp import YoutubeDL
+    from yt_dlp.downloader import get_suitable_downloader
+    from yt_dlp.downloader.common import FileDownloader
+    from yt_dlp.downloader.fragment import FragmentFD
+    from yt_dlp.downloader.http import HttpFD
+    from yt_dlp.networking import Request
+    from yt_dlp.networking.exceptions import HTTPError
+    from yt_dlp.postprocessor import FFmpegPostProcessor
+    from yt_dlp.utils import DownloadError, determine_protocol
+    from yt_dlp.utils.networking import HTTPHeaderDict
+
+    class SegmentedFD(FileDownloader):
+        """Fetches a progressive HTTP(S) format over several ranged connections."""
+
+        @staticmethod
+        def can_download(info_dict: Dict[str, Any]) -> bool:
+            return (determine_protocol(info_dict) in ('http', 'https')
+                    and not info_dict.get('is_live')
+                    and not info_dict.get('request_data'))
+
+        def real_download(self, filename: str, info_dict: Dict[str, Any]) -> bool:
+            tmpfilename = self.temp_name(filename)
+            # Disable compression so byte offsets match the file
+            headers = HTTPHeaderDict({'Accept-Encoding': 'identity'}, info_dict.get('http_headers'))
+
+            def open_range(start, end):
+                byte_range = f"bytes={start}-{'' if end is None else end}"
+                request = Request(info_dict['url'], headers=HTTPHeaderDict(headers, {'Range': byte_range}))
+                return self.ydl.urlopen(request)
+
+            started = time.time()
+
+            def progress(downloaded, total):
+                elapsed = time.time() - started
+                speed = (downloaded - resume_from) / elapsed if elapsed > 0 else None
+                self._hook_progress({
+                    'status': 'downloading',
+                    'downloaded_bytes': downloaded,
+                    'total_bytes': total,
+                    'tmpfilename': tmpfilename,
+                    'filename': filename,
+                    'speed': speed,
+                    'eta': (total - downloaded) / speed if total and speed else None,
+                    'elapsed': elapsed,
+                    'ctx_id': info_dict.get('ctx_id'),
+                }, info_dict)
+
+            self.report_destination(filename)
+            reservations = self.ydl.reservations
+            download = SegmentedDownload(
+                open_range, tmpfilename,
+                connections=self.params.get('segmented_connections') or 1,
+                progress=progress,
+                storage=self.ydl.storage,
+                reservation=reservations[-1] if reservations else None
+            )
+            resume_from = 0
+            if self.params.get('continuedl', True) and os.path.isfile(tmpfilename):
+                # Interrupted downloads leave a complete prefix behind
+                resume_from = os.path.getsize(tmpfilename)
+            try:
+                size = download.run(resume_from)
+            finally:
+                if self.ydl.trace is not None:
+                    self.ydl.trace.retry(download.retried)
+            self.try_rename(tmpfilename, filename)
+            self._hook_progress({
+                'status': 'finished',
+                'downloaded_bytes': size,
+                'total_bytes': size,
+                'filename': filename,
+                'elapsed': time.time() - started,
+                'ctx_id': info_dict.get('ctx_id'),
+            }, info_dict)
+            return True
+
+    class StorageFD:
+        """Mixin opening the output file through the instance's Storage."""
+        _final_size = None
+
+        def real_download(self, filename, info_dict):
+            # Approximate sizes are too coarse to preallocate
+            self._final_size = info_dict.get('filesize')
+            return super().real_download(filename, info_dict)
+
+        def sanitize_open(self, filename, open_mode):
+            if filename == '-' or open_mode not in ('wb', 'ab'):
+                return super().sanitize_open(filename, open_mode)
+            reservations = self.ydl.reservations
+            try:
+                stream = self.ydl.storage.open(filename, open_mode, self._final_size,
+                                               reservations[-1] if reservations else None)
+            except OSError:
+                # yt-dlp retries names the filesystem rejects, sanitized
+                return super().sanitize_open(filename, open_mode)
+            return stream, filename
+
+    @functools.lru_cache(maxsize=None)
+    def storage_fd(fd_class: type) -> type:
+        return type(f'Storage{fd_class.__name__}', (StorageFD, fd_class), {})
+
+    class StreamingFD:
+        """Mixin writing the '-' output to `stream` instead of stdout."""
+        stream = None
+
+        def sanitize_open(self, filename, open_mode):
+            if filename == '-':
+                return self.stream, filename
+            return super().sanitize_open(filename, open_mode)
+
+    class StreamingFragmentFD(StreamingFD):
+        """Mixin keeping fragments in memory instead of -FragN files."""
+
+        def _prepare_frag_download(self, ctx):
+            self._fragments = {}
+            return super()._prepare_frag_download(ctx)
+
+        def _download_fragment(self, ctx, frag_url, info_dict, headers=None, request_data=None):
+            name = '%s-Frag%d' % (ctx['tmpfilename'], ctx['fragment_index'])
+            request = Request(frag_url, data=request_data, headers=headers or info_dict.get('http_headers'))
+            response = self.ydl.urlopen(request)
+            try:
+                data = response.read()
+            finally:
+                response.close()
+            # Concurrent downloads hand fragments over by name
+            self._fragments[name] = data
+            ctx['fragment_filename_sanitized'] = name
+            ctx['dl']._hook_progress({
+                'status': 'finished',
+                'downloaded_bytes': len(data),
+                'total_bytes': len(data),
+                'filename': name,
+                'ctx_id': ctx.get('ctx_id'),
+            }, {'url': frag_url})
+            return True
+
+        def _read_fragment(self, ctx):
+            return self._fragments.pop(ctx.get('fragment_filename_sanitized'), None)
+
+        def _append_fragment(self, ctx, frag_content):
+            ctx['dest_stream'].write(frag_content)
+            ctx['dest_stream'].flush()
+            del ctx['fragment_filename_sanitized']
+
+    @functools.lru_cache(maxsize=None)
+    def streaming_fd(fd_class: type) -> type:
+        mixin = StreamingFragmentFD if issubclass(fd_class, FragmentFD) else StreamingFD
+        return type(f'Streaming{fd_class.__name__}', (mixin, fd_class), {})
+
+    class VidleechYDL(YoutubeDL):
+        fragment_tuner: Optional[FragmentTuner] = None
+        bandwidth: Optional[BandwidthLimiter] = None
+        stream_sink: Optional[StreamSink] = None
+        storage: Optional[Storage] = None
+        reservations: Optional[List[Reservation]] = None
+        trace: Optional[JobTrace] = None
+        _selecting = None
+
+        def urlopen(self, req):
+            trace = self.trace
+            try:
+                response = super().urlopen(req)
+            except HTTPError as e:
+                if trace is not None:
+                    trace.http_response(e.status)
+                raise
+            if trace is not None:
+                trace.http_response(response.status)
+            if self.bandwidth is None and trace is None:
+                return response
+            # Every downloader reads through urlopen responses, so this
+            # charges and counts plain, segmented and fragment downloads alike
+            limiter = self.bandwidth
+            priority = self.params.get('bandwidth_class') or NORMAL
+            read = response.read
+
+            def counted_read(amt=None):
+                data = read(amt)
+                if limiter is not None:
+                    limiter.acquire(len(data), priority)
+                if trace is not None:
+                    trace.add_bytes(len(data))
+                return data
+
+            response.read = counted_read
+            return response
+
+        def process_video_result(self, info_dict, download=True):
+            if self.trace is None:
+                return super().process_video_result(info_dict, download)
+            # Format selection runs until process_info() takes over
+            self._selecting = self.trace.begin('select')
+            try:
+                return super().process_video_result(info_dict, download)
+            finally:
+                self._selecting.close()
+                self._selecting = None
+
+        def process_info(self, info_dict):
+            if self._selecting is not None:
+                self._selecting.close()
+            if self.storage is not None and self.reservations is not None and self.stream_sink is None:
+                self._admit(info_dict)
+            formats = info_dict.get('requested_formats') if self.stream_sink is not None else None
+            if not formats:
+                return super().process_info(info_dict)
+            # yt-dlp hands merged formats to a single dl() call only when its
+            # ffmpeg downloader takes them, which it looks for on PATH alone,
+            # and otherwise streams them one after another. Passed off as one
+            # format they reach dl() together, to be muxed there.
+            del info_dict['requested_formats']
+            info_dict['url'] = '\n'.join(f['url'] for f in formats)
+            info_dict[_STREAM_FORMATS] = formats
+            try:
+                return super().process_info(info_dict)
+            finally:
+                info_dict.pop(_STREAM_FORMATS, None)
+                info_dict['requested_formats'] = formats
+
+        def _admit(self, info_dict):
+            """Claim disk space for a video before it is downloaded."""
+            size = estimated_size(info_dict)
+            if size and (info_dict.get('requested_formats') or self._pps['post_process']):
+                # Merges and conversions write their output next to the
+                # downloaded files before deleting them
+                size *= 2
+            directory = os.path.dirname(self.prepare_filename(info_dict)) or '.'
+            self.reservations.append(self.storage.admit(directory, size))
+
+        def post_process(self, filename, info, files_to_move=None):
+            if not (self.params.get('defer_postprocessing') and (
+                    info.get('__postprocessors') or self._pps['post_process'] or self._pps['after_move'])):
+                if self.trace is None:
+                    return super().post_process(filename, info, files_to_move)
+                with self.trace.span('postprocess'):
+                    return super().post_process(filename, info, files_to_move)
+            info['filepath'] = filename
+            info[DEFERRED_KEY] = {
+                'filename': filename,
+                'files_to_move': files_to_move or {},
+                'postprocessors': [pp.pp_key() for pp in info.pop('__postprocessors', None) or []],
+            }
+            return info
+
+        def dl(self, name, info, subtitle=False, test=False):
+            if self.trace is None or test:
+                return self._dl(name, info, subtitle, test)
+            with self.trace.span('download'):
+                return self._dl(name, info, subtitle, test)
+
+        def _dl(self, name, info, subtitle, test):
+            if subtitle or test or not info.get('url'):
+                return super().dl(name, info, subtitle, test)
+            if name == '-':
+                if self.stream_sink is None:
+                    return super().dl(name, info, subtitle, test)
+                if info.get(_STREAM_FORMATS):
+                    return self._stream_merged(info)
+                return self._stream_format(info, self.stream_sink.view(), self._progress_hooks)
+            connections = self.params.get('segmented_connections') or 1
+            if connections > 1 and SegmentedFD.can_download(info):
+                return self._run_downloader(SegmentedFD(self, self.params), name, info)
+            fd_class = get_suitable_downloader(info, self.params)
+            if fd_class is None or not issubclass(fd_class, (HttpFD, FragmentFD)):
+                return super().dl(name, info, subtitle, test)
+            if self.storage is not None:
+                fd_class = storage_fd(fd_class)
+            if (self.fragment_tuner is not None and issubclass(fd_class, FragmentFD)
+                    and not self.params.get('concurrent_fragment_downloads')):
+                return self._tuned_fragment_download(fd_class, name, info)
+            return self._run_downloader(fd_class(self, self.params), name, info)
+
+        def _run_downloader(self, fd, name, info, hooks=None):
+            for ph in self._progress_hooks if hooks is None else hooks:
+                fd.add_progress_hook(ph)
+            if self.trace is not None:
+                self._trace_downloader(fd, self.trace)
+            new_info = self._copy_infodict(info)
+            if new_info.get('http_headers') is None:
+                new_info['http_headers'] = self._calc_headers(new_info)
+            return fd.download(name, new_info)
+
+        @staticmethod
+        def _trace_downloader(fd, trace):
+            """Record a downloader's retries and final renames in a trace."""
+            report_retry, try_rename = fd.report_retry, fd.try_rename
+
+            def traced_report_retry(err, count, retries, *args, **kwargs):
+                # Called once more when giving up
+                if count <= retries:
+                    trace.retry()
+                return report_retry(err, count, retries, *args, **kwargs)
+
+            def traced_try_rename(old_filename, new_filename):
+                with trace.span('rename'):
+                    return try_rename(old_filename, new_filename)
+
+            fd.report_retry = traced_report_retry
+            fd.try_rename = traced_try_rename
+
+        def _stream_format(self, info, stream, hooks):
+            """Download a single format into a file object."""
+            fd_class = get_suitable_downloader(info, self.params)
+            if fd_class is None or not issubclass(fd_class, (HttpFD, FragmentFD)):
+                raise DownloadError(f"{info.get('protocol')} formats cannot be streamed")
+            fd = streaming_fd(fd_class)(self, self.params)
+            fd.stream = stream
+            return self._run_downloader(fd, '-', info, hooks)
+
+        def _stream_merged(self, info):
+            """Download the requested formats concurrently, each into its own
+            ffmpeg input, and stream the muxed result."""
+            formats = info[_STREAM_FORMATS]
+            ffmpeg = FFmpegPostProcessor(self)
+            if not ffmpeg.available:
+                raise DownloadError('Streaming merged formats needs ffmpeg, which was not found')
+            muxer = StreamMuxer(ffmpeg.executable, info['ext'], self.stream_sink, len(formats))
+            hooks = self._merged_progress_hooks(info, len(formats))
+            errors = []
+
+            def feed(index):
+                format_info = {key: value for key, value in info.items() if key != _STREAM_FORMATS}
+                format_info.update(formats[index])
+                try:
+                    success, _ = self._stream_format(format_info, muxer.inputs[index], [hooks[index]])
+                    if not success:
+                        raise DownloadError(f"Format {formats[index]['format_id']} did not download")
+                except BaseException as e:
+                    errors.append(e)
+                    muxer.abort()
+                finally:
+                    try:
+                        muxer.inputs[index].close()
+                    except OSError:
+                        pass
+
+            threads = [threading.Thread(target=feed, args=(index,), name='stream-feed', daemon=True)
+                       for index in range(1, len(formats))]
+            for thread in threads:
+                thread.start()
+            feed(0)
+            for thread in threads:
+                thread.join()
+            try:
+                muxer.finish()
+            except OSError as e:
+                if not errors:
+                    raise DownloadError(f'Muxing the stream failed: {e}') from e
+            if errors:
+                raise errors[0]
+            return True, True
+
+        def _merged_progress_hooks(self, info, count):
+            """Hooks combining the progress of concurrently streamed formats."""
+            states = [{} for _ in range(count)]
+            lock = threading.Lock()
+
+            def hook(index, d):
+                with lock:
+                    states[index] = d
+                    totals = [s.get('total_bytes') or s.get('total_bytes_estimate') for s in states]
+                    combined = {
+                        'status': ('finished' if all(s.get('status') == 'finished' for s in states)
+                                   else 'downloading'),
+                        'downloaded_bytes': sum(s.get('downloaded_bytes') or 0 for s in states),
+                        'total_bytes': sum(totals) if all(totals) else None,
+                        'filename': '-',
+                        'tmpfilename': '-',
+                        'info_dict': info,
+                    }
+                for ph in self._progress_hooks:
+                    ph(combined)
+
+            return [functools.partial(hook, index) for index in range(count)]
+
+        def _tuned_fragment_download(self, fd_class, name, info):
+            """Download fragments at the tuner's level and report the outcome."""
+            tuner = self.fragment_tuner
+            host = host_key(info.get('webpage_url') or info['url'])
+            level = tuner.level(host)
+            fd = fd_class(self, {**self.params, 'concurrent_fragment_downloads': level})
+            outcome = {'errors': 0, 'throttled': False}
+            report_retry = fd.report_retry
+
+            def counting_report_retry(err, *args, **kwargs):
+                outcome['errors'] += 1
+                outcome['throttled'] |= getattr(err, 'status', None) == 429
+                return report_retry(err, *args, **kwargs)
+
+            fd.report_retry = counting_report_retry
+            started = time.perf_counter()
+            result = self._run_downloader(fd, name, info)
+            elapsed = time.perf_counter() - started
+            success, real_download = result
+            if real_download and (success or outcome['errors']):
+                size = os.path.getsize(name) if success and os.path.exists(name) else 0
+                tuner.record(host, level, size / elapsed if elapsed > 0 else 0.0,
+                             errors=outcome['errors'], throttled=outcome['throttled'])
+            return result
+
+    return {'YoutubeDL': VidleechYDL, 'SegmentedFD': SegmentedFD}
@@ -0,0 +1,150 @@
+"""
+Pool of reusable YoutubeDL instances.
+
+Building a YoutubeDL registers every extractor and sets up its request
+director, HTTP handlers and cookie jar, which takes on the order of 100 ms;
+throwing it away after each job also discards extractor instances and,
+with the requests handler, kept-alive connections. YDLPool keeps finished
+instances and hands them to the next job with the same options profile.
+
+An instance is leased by one job (and so one worker thread) at a time.
+Per-job progress and postprocessor hooks are attached for the lease and
+removed when it ends. Instances whose job raised an unexpected error are
+closed rather than reused, since they may be in the middle of a request;
+errors that are ordinary job outcomes, such as a skipped or cancelled
+download, return the instance to the pool.
+"""
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, List, Optional
+
+# Options that differ per job without changing how the instance is built
+_JOB_HOOKS = ('progress_hooks', 'postprocessor_hooks')
+
+
+def options_profile(params: Dict[str, Any]) -> Hashable:
+    """Hashable form of YoutubeDL options, ignoring per-job hooks."""
+    return _freeze({key: value for key, value in params.items() if key not in _JOB_HOOKS})
+
+
+def _freeze(value: Any) -> Hashable:
+    if isinstance(value, dict):
+        return tuple(sorted((str(key), _freeze(item)) for key, item in value.items()))
+    if isinstance(value, (list, tuple, set, frozenset)):
+        items = tuple(_freeze(item) for item in value)
+        return tuple(sorted(items, key=repr)) if isinstance(value, (set, frozenset)) else items
+    try:
+        hash(value)
+    except TypeError:
+        return repr(value)
+    return value
+
+
+class YDLLease:
+    """Context manager for one checked-out instance.
+
+    Leaving the block returns the instance to the pool. A lease that is
+    never exited hands the instance over to the caller for good, who must
+    close it.
+    """
+
+    def __init__(self, pool: 'YDLPool', key: Hashable, ydl: 'yt_dlp.YoutubeDL',
+                 params: Dict[str, Any]):
+        self.pool = pool
+        self.key = key
+        self.ydl = ydl
+        self._progress_hooks = list(params.get('progress_hooks') or [])
+        self._postprocessor_hooks = list(params.get('postprocessor_hooks') or [])
+        for hook in self._progress_hooks:
+            ydl.add_progress_hook(hook)
+        for hook in self._postprocessor_hooks:
+            ydl.add_postprocessor_hook(hook)
+
+    def __enter__(self) -> 'yt_dlp.YoutubeDL':
+        return self.ydl
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        ydl = self.ydl
+        for hook in self._progress_hooks:
+            ydl._progress_hooks.remove(hook)
+        for hook in self._postprocessor_hooks:
+            ydl._postprocessor_hooks.remove(hook)
+        if exc_type is None or self.pool.reusable(exc):
+            self.pool._release(self.key, ydl)
+        else:
+            ydl.close()
+
+
+class YDLPool:
+    """Idle YoutubeDL instances keyed by options profile. Thread safe."""
+
+    def __init__(self, factory: Callable[[Dict[str, Any]], 'yt_dlp.YoutubeDL'], max_idle: int = 8,
+                 reusable: Optional[Callable[[BaseException], bool]] = None):
+        """
+        Args:
+            factory: Creates an instance from options without job hooks
+            max_idle: Instances kept between jobs; the least recently used
+                are closed beyond that, and 0 disables reuse
+            reusable: Tells whether an instance whose job raised an error can
+                still be reused; by default none can
+        """
+        self.factory = factory
+        self.max_idle = max_idle
+        self.reusable = reusable or (lambda error: False)
+        self.created = 0
+        self._idle: 'OrderedDict[Hashable, List[Any]]' = OrderedDict()
+        self._idle_count = 0
+        self._lock = threading.Lock()
+
+    def checkout(self, params: Dict[str, Any]) -> YDLLease:
+        """Lease an instance configured with params.
+
+        Returns:
+            YDLLease: Use as `with pool.checkout(params) as ydl:`
+        """
+        key = options_profile(params)
+        ydl = self._take(key)
+        if ydl is None:
+            ydl = self.factory({k: v for k, v in params.items() if k not in _JOB_HOOKS})
+            with self._lock:
+                self.created += 1
+        return YDLLease(self, key, ydl, params)
+
+    def close(self) -> None:
+        """Close every idle instance."""
+        with self._lock:
+            idle = [ydl for instances in self._idle.values() for ydl in instances]
+            self._idle.clear()
+            self._idle_count = 0
+        for ydl in idle:
+            ydl.close()
+
+    def _take(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            instances = self._idle.get(key)
+            if not instances:
+                return None
+            ydl = instances.pop()
+            if not instances:
+                del self._idle[key]
+            self._idle_count -= 1
+        # Counters checked against options such as max_downloads
+        ydl._num_downloads = 0
+        ydl._download_retcode = 0
+        return ydl
+
+    def _release(self, key: Hashable, ydl: Any) -> None:
+        evicted = []
+        with self._lock:
+            self._idle.setdefault(key, []).append(ydl)
+            self._idle.move_to_end(key)
+            self._idle_count += 1
+            while self._idle_count > self.max_idle:
+                oldest = next(iter(self._idle))
+                instances = self._idle[oldest]
+                evicted.append(instances.pop(0))
+                if not instances:
+                    del self._idle[oldest]
+                self._idle_count -= 1
+        for instance in evicted:
+            instance.close()
@@ -0,0 +1,116 @@
+"""
+Table model exposing the download history to Qt views.
+"""
+import time
+from typing import Any, Dict, List, Optional
+
+from PyQt6.QtCore import QAbstractTableModel, QModelIndex, Qt
+
+from src.core.history import DownloadHistory, HistoryEntry
+
+
+class HistoryTableModel(QAbstractTableModel):
+    """Newest-first view of a DownloadHistory that loads rows as they are scrolled to.
+
+    Only the pages the view has asked for are held in memory; views call
+    fetchMore() when the user scrolls near the end of the loaded rows.
+    """
+
+    COLUMNS = ["Title", "Format", "Platform", "Completed"]
+
+    def __init__(self, history: DownloadHistory, format_labels: Optional[Dict[str, str]] = None,
+                 page_size: int = 200, parent=None):
+        """
+        Args:
+            history: The history to show
+            format_labels: Display names for format selections
+            page_size: Rows loaded per fetch
+        """
+        super().__init__(parent)
+        self.history = history
+        self.format_labels = format_labels or {}
+        self.page_size = page_size
+        self.query = ''
+        self._entries: List[HistoryEntry] = []
+        self._exhausted = False
+        self.fetchMore()
+
+    def rowCount(self, parent=QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self._entries)
+
+    def columnCount(self, parent=QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self.COLUMNS)
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if role == Qt.ItemDataRole.DisplayRole and orientation == Qt.Orientation.Horizontal:
+            return self.COLUMNS[section]
+        return None
+
+    def data(self, index: QModelIndex, role=Qt.ItemDataRole.DisplayRole) -> Any:
+        entry = self.entry_at(index.row())
+        if entry is None:
+            return None
+        if role == Qt.ItemDataRole.DisplayRole:
+            column = index.column()
+            if column == 0:
+                return entry.title or entry.filename
+            if column == 1:
+                return self._format_label(entry)
+            if column == 2:
+                return entry.platform
+            if column == 3:
+                return time.strftime('%Y-%m-%d %H:%M', time.localtime(entry.completed))
+        elif role == Qt.ItemDataRole.ToolTipRole:
+            return (f"URL: {entry.url}\nFormat: {self._format_label(entry)}\n"
+                    f"Saved to: {entry.path}")
+        elif role == Qt.ItemDataRole.UserRole:
+            return entry.path
+        return None
+
+    def canFetchMore(self, parent=QModelIndex()) -> bool:
+        return not parent.isValid() and not self._exhausted
+
+    def fetchMore(self, parent=QModelIndex()) -> None:
+        if parent.isValid() or self._exhausted:
+            return
+        before = self._entries[-1].id if self._entries else None
+        entries = self.history.page(self.query, before=before, limit=self.page_size)
+        self._exhausted = len(entries) < self.page_size
+        if entries:
+            first = len(self._entries)
+            self.beginInsertRows(QModelIndex(), first, first + len(entries) - 1)
+            self._entries.extend(entries)
+            self.endInsertRows()
+
+    def entry_at(self, row: int) -> Optional[HistoryEntry]:
+        """Return the entry shown in a row."""
+        if 0 <= row < len(self._entries):
+            return self._entries[row]
+        return None
+
+    def set_query(self, query: str) -> None:
+        """Show only entries whose title matches a search, from the first page."""
+        self.beginResetModel()
+        self.query = query
+        self._entries = []
+        self._exhausted = False
+        self.endResetModel()
+        self.fetchMore()
+
+    def refresh(self) -> None:
+        """Show entries added to the history since the model was filled."""
+        if self.query:
+            # New downloads may not match; reload the search from the top
+            self.set_query(self.query)
+            return
+        if not self._entries:
+            self.set_query('')
+            return
+        entries = self.history.newer(self._entries[0].id)
+        if entries:
+            self.beginInsertRows(QModelIndex(), 0, len(entries) - 1)
+            self._entries[:0] = entries
+            self.endInsertRows()
+
+    def _format_label(self, entry: HistoryEntry) -> Optional[str]:
+        return self.format_labels.get(entry.format_selection, entry.format_selection)
@@ -3,15 +3,73 @@ from pathlib import Path
 from PyQt6.QtWidgets import (
     QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, 
     QLineEdit, QPushButton, QProgressBar, QComboBox,
-    QLabel, QFileDialog, QMessageBox, QFrame, QSizePolicy,
-    QListWidget, QListWidgetItem, QToolButton, QMenu
+    QLabel, QMessageBox, QFrame, QSizePolicy,
+    QToolButton, QMenu,
+    QTableView, QHeaderView, QAbstractItemView
 )
-from PyQt6.QtCore import Qt, QSize
-from PyQt6.QtGui import QIcon, QPalette, QColor, QFont, QPixmap, QAction
+from PyQt6.QtCore import Qt, QSize, QTimer, QUrl, pyqtSignal
+from PyQt6.QtGui import QIcon, QPalette, QColor, QFont, QPixmap, QAction, QDesktopServices
+from src.core.archive import DownloadArchive
+from src.core.bandwidth import BandwidthLimiter
 from src.core.downloader import VideoDownloader
-from src.gui.platforms_dialog import PlatformsDialog
+from src.core.download_queue import DownloadQueue, FINISHED_STATES, JobState
+from src.core.engine import DownloadEngine
+from src.core.extractor_index import load_default_index, loaded_index
+from src.core.fragment_tuner import FragmentTuner
+from src.core.history import DownloadHistory
+from src.core.journal import JobJournal
+from src.core.metadata_cache import MetadataCache
+from src.core.playlist import PlaylistExpander
+from src.core.postprocess import PostProcessPool
+from src.gui.history_model import HistoryTableModel
+from src.gui.qt_downloader import QtVideoDownloader
+from src.gui.queue_model import QueueTableModel
+from src.utils.url_utils import is_valid_url
+
+MAX_CONCURRENT_DOWNLOADS = 3
+MAX_DOWNLOADS_PER_HOST = 2
+
+# Format combo labels and the format selections they map to
+FORMAT_CHOICES = {
+    "Best": "best",
+    "HD (1080p)": "hd",
+    "SD (480p)": "sd",
+    "Audio Only": "audio"
+}
+
+# Audio codec and bitrate combo labels for "Audio Only" downloads
+AUDIO_FORMAT_CHOICES = {
+    "Original": "best",
+    "MP3": "mp3",
+    "M4A (AAC)": "m4a",
+    "Opus": "opus",
+    "FLAC": "flac",
+    "WAV": "wav",
+}
+AUDIO_QUALITY_CHOICES = {
+    "Default quality": None,
+    "Best (VBR)": "0",
+    "320 kbps": "320",
+    "256 kbps": "256",
+    "192 kbps": "192",
+    "128 kbps": "128",
+}
+
+# Speed limit combo labels and the total bytes per second they allow
+SPEED_LIMITS = {
+    "Unlimited": None,
+    "10 MB/s": 10 * 1024 * 1024,
+    "5 MB/s": 5 * 1024 * 1024,
+    "2 MB/s": 2 * 1024 * 1024,
+    "1 MB/s": 1024 * 1024,
+    "500 KB/s": 500 * 1024,
+}
+
 
 class MainWindow(QMainWindow):
+    # Emitted from the loader thread once URL hints can be shown
+    extractor_index_loaded = pyqtSignal()
+
     def __init__(self):
         super().__init__()
         self.setWindowTitle("Vidleech")
@@ -170,6 +228,14 @@ class MainWindow(QMainWindow):
         url_layout.addWidget(clear_btn)
         content_layout.addLayout(url_layout)
 
+        # Which extractor will handle the URL, checked offline as it is typed
+        self.url_hint = QLabel("")
+        self.url_hint.setContentsMargins(85, 0, 0, 0)
+        self.url_hint.setStyleSheet("color: #6c757d; font-size: 12px;")
+        self.url_input.textChanged.connect(self.update_url_hint)
+        self.extractor_index_loaded.connect(lambda: self.update_url_hint(self.url_input.text()))
+        content_layout.addWidget(self.url_hint)
+
         # Format selection
         format_layout = QHBoxLayout()
         format_label = QLabel("Format:")
@@ -178,7 +244,24 @@ class MainWindow(QMainWindow):
         self.format_combo.addItems(["Best", "HD (1080p)", "SD (480p)", "Audio Only"])
         format_layout.addWidget(format_label)
         format_layout.addWidget(self.format_combo)
+        # Conversion settings, shown for audio downloads only
+        self.audio_format_combo = QComboBox()
+        self.audio_format_combo.addItems(list(AUDIO_FORMAT_CHOICES))
+        self.audio_format_combo.setToolTip("Audio codec; Original keeps the source stream unconverted")
+        self.audio_quality_combo = QComboBox()
+        self.audio_quality_combo.addItems(list(AUDIO_QUALITY_CHOICES))
+        self.audio_format_combo.currentTextChanged.connect(self.update_audio_options)
+        self.format_combo.currentTextChanged.connect(self.update_audio_options)
+        format_layout.addWidget(self.audio_format_combo)
+        format_layout.addWidget(self.audio_quality_combo)
+        self.update_audio_options()
         format_layout.addStretch()
+        # Caps all downloads together; takes effect on running jobs too
+        speed_label = QLabel("Speed limit:")
+        self.speed_combo = QComboBox()
+        self.speed_combo.addItems(list(SPEED_LIMITS))
+        format_layout.addWidget(speed_label)
+        format_layout.addWidget(self.speed_combo)
         content_layout.addLayout(format_layout)
 
         # Output directory selection
@@ -239,49 +322,117 @@ class MainWindow(QMainWindow):
         progress_layout.addWidget(self.status_label)
         
         content_layout.addWidget(progress_frame)
+
+        # Download queue section
+        queue_label = QLabel("Download Queue")
+        queue_label.setFont(QFont(queue_label.font().family(), 12, QFont.Weight.Bold))
+        content_layout.addWidget(queue_label)
+
+        self.queue_view = QTableView()
+        self.queue_view.setMinimumHeight(120)
+        self.queue_view.setAlternatingRowColors(True)
+        self.queue_view.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
+        self.queue_view.verticalHeader().setVisible(False)
+        self.queue_view.setContextMenuPolicy(Qt.ContextMenuPolicy.CustomContextMenu)
+        self.queue_view.customContextMenuRequested.connect(self.show_queue_menu)
+        content_layout.addWidget(self.queue_view)
         
-        # Recent downloads section
+        # Download history section
+        history_header = QHBoxLayout()
         recent_label = QLabel("Recent Downloads")
         recent_label.setFont(QFont(recent_label.font().family(), 12, QFont.Weight.Bold))
-        content_layout.addWidget(recent_label)
-        
-        self.downloads_list = QListWidget()
-        self.downloads_list.setMinimumHeight(150)
-        self.downloads_list.setAlternatingRowColors(True)
-        self.downloads_list.setStyleSheet("""
-            QListWidget {
-                border: 1px solid #3d3d3d;
-                border-radius: 4px;
-                background-color: #363636;
-                alternate-background-color: #2b2b2b;
-            }
-            QListWidget::item {
-                padding: 8px;
-                border-bottom: 1px solid #3d3d3d;
-            }
-            QListWidget::item:selected {
-                background-color: #0d6efd;
-            }
-        """)
+        history_header.addWidget(recent_label)
+        history_header.addStretch()
+        self.history_search = QLineEdit()
+        self.history_search.setPlaceholderText("Search history...")
+        self.history_search.setClearButtonEnabled(True)
+        self.history_search.setMaximumWidth(300)
+        history_header.addWidget(self.history_search)
+        content_layout.addLayout(history_header)
+
+        self.history_view = QTableView()
+        self.history_view.setMinimumHeight(150)
+        self.history_view.setAlternatingRowColors(True)
+        self.history_view.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
+        self.history_view.verticalHeader().setVisible(False)
         # Connect double-click event to open file
-        self.downloads_list.itemDoubleClicked.connect(self.open_downloaded_file)
-        content_layout.addWidget(self.downloads_list)
+        self.history_view.doubleClicked.connect(self.open_downloaded_file)
+        content_layout.addWidget(self.history_view)
         
         layout.addLayout(content_layout)
 
-        # Initialize downloader
-        self.downloader = VideoDownloader()
-        self.downloader.progress.connect(self.update_progress)
-        self.downloader.error.connect(self.show_error)
-        self.downloader.complete.connect(self.download_complete)
-        
         # Initialize state
         self.is_downloading = False
-        self.current_download = None
+        self.finished_jobs = set()  # ids of jobs whose outcome was handled
         self.dark_mode = True  # Start with dark mode by default
 
+        # Opened by open_stores() after the first paint
+        self.stores_scheduled = False
+        self.downloader = None
+        self.engine = None
+        self.queue = None
+        self.history = None
+        self.journal = None
+        self.download_btn.setEnabled(False)
+
+    def open_stores(self):
+        """Open the caches, archive, history and job journal and start the queue.
+
+        Called once the window has been painted: the stores are SQLite
+        files, and the archive may rebuild its Bloom filter, so opening
+        them any earlier would delay the first paint.
+        """
+        self.downloader = QtVideoDownloader(
+            VideoDownloader(metadata_cache=MetadataCache.default(), fragment_tuner=FragmentTuner.default(),
+                            archive=DownloadArchive.default(), bandwidth=BandwidthLimiter(),
+                            postprocess=PostProcessPool()),
+            self
+        )
+        self.downloader.error.connect(self.show_error)
+        self.speed_combo.currentTextChanged.connect(
+            lambda label: self.downloader.core.bandwidth.set_rate(SPEED_LIMITS[label]))
+        self.engine = DownloadEngine(self.downloader, max_workers=MAX_CONCURRENT_DOWNLOADS,
+                                     parent=self)
+
+        # Jobs run on the engine's thread pool, several at a time
+        self.queue = DownloadQueue(self.downloader.run_job, max_concurrent=MAX_CONCURRENT_DOWNLOADS,
+                                   max_per_host=MAX_DOWNLOADS_PER_HOST,
+                                   submit=self.engine.pool.start)
+        # Playlist and channel URLs are split into one job per entry
+        self.downloader.core.playlist_expander = PlaylistExpander(
+            self.queue, archive=self.downloader.core.archive)
+        # Attached before the queue model so a finished job is in the history
+        # by the time the window hears about it
+        self.history = DownloadHistory.default()
+        self.history.attach(self.queue)
+        labels = {selection: label for label, selection in FORMAT_CHOICES.items()}
+        self.history_model = HistoryTableModel(self.history, labels, parent=self)
+        self.history_view.setModel(self.history_model)
+        self.history_view.horizontalHeader().setSectionResizeMode(0, QHeaderView.ResizeMode.Stretch)
+        self.history_search.textChanged.connect(self.history_model.set_query)
+        self.queue_model = QueueTableModel(self.queue, self)
+        self.queue_model.jobs_changed.connect(self.on_jobs_changed)
+        self.queue_view.setModel(self.queue_model)
+        self.queue_view.horizontalHeader().setSectionResizeMode(0, QHeaderView.ResizeMode.Stretch)
+
+        # Unfinished jobs survive crashes and restarts; continue them now
+        self.journal = JobJournal.default()
+        self.journal.attach(self.queue)
+        self.journal.restore(self.queue, resume_paused=True)
+        self.download_btn.setEnabled(True)
+        # Building the index can take seconds, so it never happens on this thread
+        load_default_index(lambda index: self.extractor_index_loaded.emit())
+
+    def paintEvent(self, event):
+        super().paintEvent(event)
+        if not self.stores_scheduled:
+            self.stores_scheduled = True
+            QTimer.singleShot(0, self.open_stores)
+
     def show_platforms(self):
         """Show the supported platforms dialog."""
+        # Rarely opened, so it is only imported on first use
+        from src.gui.platforms_dialog import PlatformsDialog
         dialog = PlatformsDialog(self)
         dialog.exec()
     
@@ -359,7 +510,7 @@ class MainWindow(QMainWindow):
                 QProgressBar::chunk {
                     background-color: #0d6efd;
                 }
-                QListWidget {
+                QListWidget, QTableView {
                     border: 1px solid #3d3d3d;
                     border-radius: 4px;
                     background-color: #363636;
@@ -454,7 +605,7 @@ class MainWindow(QMainWindow):
                 QProgressBar::chunk {
                     background-color: #0d6efd;
                 }
-                QListWidget {
+                QListWidget, QTableView {
                     border: 1px solid #ced4da;
                     border-radius: 4px;
                     background-color: #ffffff;
@@ -490,6 +641,7 @@ class MainWindow(QMainWindow):
 
     def browse_directory(self):
         """Open file dialog to select output directory."""
+        from PyQt6.QtWidgets import QFileDialog
         dir_path = QFileDialog.getExistingDirectory(
             self, "Select Output Directory",
             self.dir_input.text(),
@@ -498,12 +650,41 @@ class MainWindow(QMainWindow):
         if dir_path:
             self.dir_input.setText(dir_path)
 
+    def update_url_hint(self, text: str):
+        """Show which site the entered URL belongs to."""
+        url = text.strip()
+        index = loaded_index()
+        if not url or index is None:
+            # Without the index the hint is shown once it has loaded
+            self.url_hint.setText("")
+            return
+        extractor = index.match(url)
+        if extractor is not None:
+            self.url_hint.setText(f"Supported: {extractor.description or extractor.name}")
+        elif is_valid_url(url):
+            self.url_hint.setText("No site-specific support; will be tried as a direct or embedded video")
+        else:
+            self.url_hint.setText("Not a valid URL")
+
+    def update_audio_options(self):
+        """Show the audio conversion settings when downloading audio only."""
+        audio = FORMAT_CHOICES[self.format_combo.currentText()] == "audio"
+        self.audio_format_combo.setVisible(audio)
+        # Copying the original stream has no bitrate to choose
+        converting = AUDIO_FORMAT_CHOICES[self.audio_format_combo.currentText()] not in ("best", "flac", "wav")
+        self.audio_quality_combo.setVisible(audio and converting)
+
     def start_download(self):
         """Start downloading the video."""
         url = self.url_input.text().strip()
         if not url:
             self.show_error("Please enter a video URL")
             return
+        # Until the index has loaded, yt-dlp decides whether it takes the URL
+        index = loaded_index()
+        if not is_valid_url(url) and index is not None and not index.is_supported(url):
+            self.show_error("Please enter a valid video URL")
+            return
 
         output_path = self.dir_input.text()
         if not os.path.exists(output_path):
@@ -513,35 +694,104 @@ class MainWindow(QMainWindow):
                 self.show_error(f"Could not create output directory: {str(e)}")
                 return
 
-        format_map = {
-            "Best": "best",
-            "HD (1080p)": "hd",
-            "SD (480p)": "sd",
-            "Audio Only": "audio"
-        }
-        format_selection = format_map[self.format_combo.currentText()]
+        format_selection = FORMAT_CHOICES[self.format_combo.currentText()]
 
-        self.download_btn.setEnabled(False)
+        self.queue.add(
+            url, output_path, format_selection,
+            audio_format=AUDIO_FORMAT_CHOICES[self.audio_format_combo.currentText()],
+            audio_quality=AUDIO_QUALITY_CHOICES[self.audio_quality_combo.currentText()]
+        )
         self.cancel_btn.setEnabled(True)
-        self.progress.setValue(0)
-        self.status_label.setText("Starting download...")
         self.is_downloading = True
-        self.current_download = {
-            "url": url,
-            "format": self.format_combo.currentText(),
-            "path": output_path
-        }
-        self.downloader.download(url, output_path, format_selection)
-    
+
     def cancel_download(self):
-        """Cancel the current download."""
-        if self.is_downloading:
-            # Currently there's no direct way to cancel a download in yt-dlp
-            # This is a placeholder for future implementation
-            self.status_label.setText("Cancelling download...")
-            self.download_btn.setEnabled(True)
-            self.cancel_btn.setEnabled(False)
-            self.is_downloading = False
+        """Cancel the selected queue jobs, or every active job if none is selected."""
+        job_ids = self.selected_job_ids()
+        if not job_ids:
+            self.queue.cancel_all()
+        for job_id in job_ids:
+            self.queue.cancel(job_id)
+        self.status_label.setText("Cancelling download...")
+
+    def selected_job_ids(self):
+        """Ids of the jobs selected in the queue view."""
+        if self.queue is None:
+            return []
+        rows = {index.row() for index in self.queue_view.selectionModel().selectedRows()}
+        return [self.queue_model.job_at(row).id for row in sorted(rows)]
+
+    def show_queue_menu(self, pos):
+        """Context menu for pausing, resuming and reordering queue jobs."""
+        job_ids = self.selected_job_ids()
+        if not job_ids:
+            return
+        menu = QMenu(self)
+        menu.addAction("Pause", lambda: [self.queue.pause_job(j) for j in job_ids])
+        menu.addAction("Resume", lambda: [self.queue.resume_job(j) for j in job_ids])
+        menu.addAction("Cancel", lambda: [self.queue.cancel(j) for j in job_ids])
+        menu.addSeparator()
+        menu.addAction("Move to Top", lambda: [self.queue.move(j, 0) for j in reversed(job_ids)])
+        menu.addAction("Raise Priority", lambda: [
+            self.queue.set_priority(j, self.queue.get(j).priority + 1) for j in job_ids])
+        menu.addAction("Lower Priority", lambda: [
+            self.queue.set_priority(j, self.queue.get(j).priority - 1) for j in job_ids])
+        menu.exec(self.queue_view.viewport().mapToGlobal(pos))
+
+    def on_jobs_changed(self, job_ids):
+        """Reflect a batch of queue job changes in the progress area and history."""
+        for job_id in job_ids:
+            job = self.queue.get(job_id)
+            if job is not None:
+                self.on_job_changed(job)
+
+        self.is_downloading = bool(self.queue.running() or self.queue.processing()
+                                   or self.queue.pending())
+        self.cancel_btn.setEnabled(self.is_downloading)
+
+    def on_job_changed(self, job):
+        """Reflect one queue job's state in the progress area and history."""
+        if job.state in (JobState.RUNNING, JobState.PROCESSING):
+            self.update_progress(job.progress, job.status)
+        elif job.state in FINISHED_STATES and job.id in self.finished_jobs:
+            # Already handled; later notifications only update the status
+            if job.playlist:
+                self.status_label.setText(job.status)
+        elif job.state == JobState.DONE and job.playlist:
+            self.finished_jobs.add(job.id)
+            self.status_label.setText(job.status)
+        elif job.state == JobState.DONE:
+            self.finished_jobs.add(job.id)
+            self.download_complete(job)
+        elif job.state == JobState.FAILED:
+            self.finished_jobs.add(job.id)
+            self.show_error(job.error or "Download failed")
+        elif job.state == JobState.SKIPPED:
+            self.finished_jobs.add(job.id)
+            self.progress.setValue(0)
+            self.status_label.setText(f"Already downloaded: {job.url}")
+        elif job.state == JobState.CANCELLED:
+            self.finished_jobs.add(job.id)
+            self.progress.setValue(0)
+            self.status_label.setText(job.status)
+        elif job.state in (JobState.PAUSED, JobState.DEFERRED):
+            self.progress.setValue(0)
+            self.status_label.setText(job.status)
+
+    def closeEvent(self, event):
+        """Pause running downloads so they resume on the next start."""
+        if self.queue is None:
+            super().closeEvent(event)
+            return
+        self.queue.pause()
+        for job in self.queue.running():
+            self.queue.pause_job(job.id)
+        self.engine.wait_for_done(5000)
+        # Lets merges that are under way finish
+        self.downloader.core.postprocess.close()
+        # Saves the archive's Bloom filter so the next start need not rebuild it
+        self.downloader.core.archive.save()
+        self.downloader.core.close()
+        super().closeEvent(event)
 
     def update_progress(self, percent: float, status: str):
         """Update the progress bar and status label."""
@@ -550,63 +800,32 @@ class MainWindow(QMainWindow):
 
     def show_error(self, message: str):
         """Show error message."""
-        self.download_btn.setEnabled(True)
-        self.cancel_btn.setEnabled(False)
-        self.is_downloading = False
         self.status_label.setText("Error")
         QMessageBox.critical(self, "Error", message)
 
-    def open_downloaded_file(self, item):
+    def open_downloaded_file(self, index):
         """Open the downloaded file or its containing folder."""
-        # Extract the file path from the tooltip
-        tooltip = item.toolTip()
-        path_line = next((line for line in tooltip.split('\n') if line.startswith('Saved to:')), None)
-        
-        if path_line:
-            file_path = path_line.replace('Saved to:', '').strip()
-            
-            # Check if the file exists
-            if os.path.exists(file_path):
-                # On Windows, use the default file association to open the file
-                os.startfile(file_path)
+        file_path = index.data(Qt.ItemDataRole.UserRole)
+        if not file_path:
+            return
+
+        # Check if the file exists
+        if os.path.exists(file_path):
+            # Open with the default application for the file type
+            QDesktopServices.openUrl(QUrl.fromLocalFile(file_path))
+        else:
+            # If file doesn't exist, try to open the containing folder
+            folder_path = os.path.dirname(file_path)
+            if os.path.exists(folder_path):
+                QDesktopServices.openUrl(QUrl.fromLocalFile(folder_path))
             else:
-                # If file doesn't exist, try to open the containing folder
-                folder_path = os.path.dirname(file_path)
-                if os.path.exists(folder_path):
-                    os.startfile(folder_path)
-                else:
-                    QMessageBox.warning(self, "File Not Found", 
-                                       f"The file or folder no longer exists:\n{file_path}")
-
-    def download_complete(self, filename=""):
+                QMessageBox.warning(self, "File Not Found",
+                                   f"The file or folder no longer exists:\n{file_path}")
+
+    def download_complete(self, job):
         """Handle download completion."""
-        self.download_btn.setEnabled(True)
-        self.cancel_btn.setEnabled(False)
-        self.is_downloading = False
+        self.progress.setValue(100)
         self.status_label.setText("Download complete!")
-        
-        # Add to recent downloads list
-        if self.current_download:
-            path = self.current_download['path']
-            
-            # Use the actual filename if provided, otherwise use a default
-            if not filename:
-                format_ext = ".mp3" if self.current_download['format'] == "Audio Only" else ".mp4"
-                filename = f"video{format_ext}"  # Default filename
-            
-            # Create full path to the file
-            full_path = os.path.join(path, filename)
-            
-            # Create list item with the actual filename
-            item_text = f"{filename} - {self.current_download['format']}"
-            item = QListWidgetItem(item_text)
-            item.setToolTip(f"URL: {self.current_download['url']}\nFormat: {self.current_download['format']}\nSaved to: {full_path}")
-            # Store the full path as item data for easy access
-            item.setData(Qt.ItemDataRole.UserRole, full_path)
-            self.downloads_list.insertItem(0, item)
-            
-            # Limit list to 10 items
-            if self.downloads_list.count() > 10:
-                self.downloads_list.takeItem(self.downloads_list.count() - 1)
-        
-        # No popup message - just update the status label
+
+        # The history recorded the job already; show it
+        self.history_model.refresh()
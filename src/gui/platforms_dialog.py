@@ -9,12 +9,18 @@ from PyQt6.QtWidgets import (
     QVBoxLayout,
     QHBoxLayout,
     QLabel,
+    QLineEdit,
+    QListWidget,
     QPushButton,
     QScrollArea,
     QWidget,
     QFrame,
     QGridLayout,
 )
+from src.core.extractor_index import default_index
+
+# Search results shown at once; narrower searches show the rest
+MAX_SEARCH_RESULTS = 500
 
 class PlatformsDialog(QDialog):
     """Dialog showing all supported platforms."""
@@ -56,12 +62,20 @@ class PlatformsDialog(QDialog):
         # Description
         desc = QLabel(
             "Vidleech supports downloading from many platforms through yt-dlp. "
-            "Below is a list of popular supported sites. For a complete list, click the button at the bottom."
+            "Below is a list of popular supported sites. Search to find any of the others, "
+            "or paste a URL to check whether it is supported."
         )
         desc.setWordWrap(True)
         desc.setStyleSheet("font-size: 14px;")
         layout.addWidget(desc)
         
+        # Search over every extractor, answered offline from the extractor index
+        self.search_input = QLineEdit()
+        self.search_input.setPlaceholderText("Search all supported sites, or paste a URL to check it")
+        self.search_input.setClearButtonEnabled(True)
+        self.search_input.textChanged.connect(self.update_search)
+        layout.addWidget(self.search_input)
+        
         # Separator
         separator = QFrame()
         separator.setFrameShape(QFrame.Shape.HLine)
@@ -145,6 +159,15 @@ class PlatformsDialog(QDialog):
         # Add container to scroll area
         scroll.setWidget(container)
         layout.addWidget(scroll)
+        self.popular_scroll = scroll
+        
+        # Search results replace the popular sites while searching
+        self.results_label = QLabel()
+        self.results_label.hide()
+        layout.addWidget(self.results_label)
+        self.results_list = QListWidget()
+        self.results_list.hide()
+        layout.addWidget(self.results_list)
         
         # Buttons row
         buttons_layout = QHBoxLayout()
@@ -225,6 +248,42 @@ class PlatformsDialog(QDialog):
                 }
             """)
     
+    def update_search(self, text):
+        """Show the extractors matching a search, or the one handling a URL."""
+        text = text.strip()
+        searching = bool(text)
+        self.popular_scroll.setVisible(not searching)
+        self.results_label.setVisible(searching)
+        self.results_list.setVisible(searching)
+        self.results_list.clear()
+        if not searching:
+            return
+        
+        index = default_index()
+        if '://' in text:
+            extractor = index.match(text)
+            if extractor is None:
+                self.results_label.setText(
+                    "No site-specific extractor for this URL; it will be tried as a direct or embedded video."
+                )
+                return
+            self.results_label.setText("This URL is supported by:")
+            matches = [extractor]
+        else:
+            matches = index.search(text, limit=MAX_SEARCH_RESULTS + 1)
+            shown = min(len(matches), MAX_SEARCH_RESULTS)
+            more = "+" if len(matches) > MAX_SEARCH_RESULTS else ""
+            self.results_label.setText(f"{shown}{more} matching sites")
+            matches = matches[:MAX_SEARCH_RESULTS]
+        
+        for extractor in matches:
+            label = extractor.name
+            if extractor.description and extractor.description != extractor.name:
+                label += f" - {extractor.description}"
+            if not extractor.working:
+                label += " (currently broken)"
+            self.results_list.addItem(label)
+    
     def open_full_list(self):
         """Open the full list of supported sites in browser."""
         webbrowser.open("https://github.com/yt-dlp/yt-dlp/blob/master/supportedsites.md")
@@ -0,0 +1,67 @@
+"""
+Qt adapter for the core VideoDownloader.
+
+The core downloader publishes plain callbacks from worker threads; this
+wrapper re-emits them as signals so widgets receive them through queued
+connections on the GUI thread.
+"""
+from typing import Any, Callable, Dict, List, Optional
+
+from PyQt6.QtCore import QObject, pyqtSignal
+
+from src.core.cancel import CancelToken
+from src.core.downloader import VideoDownloader
+from src.core.format_planner import FormatPlan
+from src.core.records import VideoRecord
+
+
+class QtVideoDownloader(QObject):
+    progress = pyqtSignal(float, str)
+    error = pyqtSignal(str)
+    complete = pyqtSignal(str)  # Emits the filename
+    cancelled = pyqtSignal()
+    progress_batch = pyqtSignal(list)  # ProgressSnapshot objects, one batch per interval
+
+    def __init__(self, downloader: Optional[VideoDownloader] = None, parent: Optional[QObject] = None):
+        """
+        Args:
+            downloader: Core downloader to wrap; a default one is created if omitted
+            parent: Optional Qt parent
+        """
+        super().__init__(parent)
+        self.core = downloader or VideoDownloader()
+        self.core.progress.connect(self.progress.emit)
+        self.core.error.connect(self.error.emit)
+        self.core.complete.connect(self.complete.emit)
+        self.core.cancelled.connect(self.cancelled.emit)
+        self.core.progress_batch.connect(self.progress_batch.emit)
+
+    def download(self, url: str, output_path: str, format_selection: str = 'best',
+                 cancel_token: Optional[CancelToken] = None, connections: int = 1) -> None:
+        """Download a video; results arrive through the signals."""
+        self.core.download(url, output_path, format_selection, cancel_token, connections)
+
+    def fetch(self, url: str, output_path: str, format_selection: str = 'best',
+              cancel_token: Optional[CancelToken] = None,
+              progress_callback: Optional[Callable] = None, connections: int = 1) -> str:
+        """Download a video and return its filename; see VideoDownloader.fetch."""
+        return self.core.fetch(url, output_path, format_selection, cancel_token, progress_callback,
+                               connections)
+
+    def run_job(self, job: Any, report: Callable[..., None]) -> str:
+        """DownloadQueue runner; see VideoDownloader.run_job."""
+        return self.core.run_job(job, report)
+
+    def get_video_info(self, url: str) -> Optional[Dict[str, Any]]:
+        """Get video information without downloading."""
+        return self.core.get_video_info(url)
+
+    def get_video_record(self, url: str) -> Optional[VideoRecord]:
+        """Get compact video information without downloading."""
+        return self.core.get_video_record(url)
+
+    def plan_formats(self, url: str, format_selection: str = 'best',
+                     max_size: Optional[int] = None, prefer_copy: bool = False,
+                     audio_format: str = 'best') -> List[FormatPlan]:
+        """Rank download formats with predicted sizes; see VideoDownloader.plan_formats."""
+        return self.core.plan_formats(url, format_selection, max_size, prefer_copy, audio_format)
@@ -0,0 +1,92 @@
+"""
+Table model exposing the download queue to Qt views.
+"""
+import threading
+from typing import Any, List, Optional, Set
+
+from PyQt6.QtCore import QAbstractTableModel, QModelIndex, Qt, pyqtSignal
+
+from src.core.download_queue import DownloadJob, DownloadQueue
+
+
+class QueueTableModel(QAbstractTableModel):
+    """Read-only view of a DownloadQueue, one row per job."""
+
+    # Emitted on the GUI thread with the ids of every job changed since the
+    # last batch
+    jobs_changed = pyqtSignal(list)
+    # Queue listeners run on worker threads; this signal hops to the GUI
+    # thread and is only posted when no batch is already pending
+    _flush_requested = pyqtSignal()
+
+    COLUMNS = ["URL", "Host", "Status", "Progress", "Priority"]
+
+    def __init__(self, queue: DownloadQueue, parent=None):
+        super().__init__(parent)
+        self.queue = queue
+        self._rows: List[int] = [job.id for job in queue.jobs()]
+        self._dirty: Set[int] = set()
+        self._dirty_lock = threading.Lock()
+        self._flush_requested.connect(self._flush)
+        queue.add_listener(self._on_job_changed)
+
+    def rowCount(self, parent=QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self._rows)
+
+    def columnCount(self, parent=QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self.COLUMNS)
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if role == Qt.ItemDataRole.DisplayRole and orientation == Qt.Orientation.Horizontal:
+            return self.COLUMNS[section]
+        return None
+
+    def data(self, index: QModelIndex, role=Qt.ItemDataRole.DisplayRole) -> Any:
+        job = self.job_at(index.row())
+        if job is None:
+            return None
+        if role == Qt.ItemDataRole.DisplayRole:
+            column = index.column()
+            if column == 0:
+                return job.filename or job.url
+            if column == 1:
+                return job.host
+            if column == 2:
+                return job.status
+            if column == 3:
+                return f"{job.progress:.0f}%"
+            if column == 4:
+                return job.priority
+        elif role == Qt.ItemDataRole.ToolTipRole:
+            return job.error or job.url
+        elif role == Qt.ItemDataRole.UserRole:
+            return job.id
+        return None
+
+    def job_at(self, row: int) -> Optional[DownloadJob]:
+        """Return the job shown in a row."""
+        if 0 <= row < len(self._rows):
+            return self.queue.get(self._rows[row])
+        return None
+
+    def _on_job_changed(self, job: DownloadJob) -> None:
+        with self._dirty_lock:
+            first = not self._dirty
+            self._dirty.add(job.id)
+        if first:
+            self._flush_requested.emit()
+
+    def _flush(self) -> None:
+        with self._dirty_lock:
+            job_ids = sorted(self._dirty)
+            self._dirty.clear()
+        for job_id in job_ids:
+            if job_id in self._rows:
+                row = self._rows.index(job_id)
+                self.dataChanged.emit(self.index(row, 0), self.index(row, len(self.COLUMNS) - 1))
+            elif self.queue.get(job_id) is not None:
+                row = len(self._rows)
+                self.beginInsertRows(QModelIndex(), row, row)
+                self._rows.append(job_id)
+                self.endInsertRows()
+        self.jobs_changed.emit(job_ids)
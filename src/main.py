@@ -2,12 +2,17 @@
 """
 Vidleech - A modern GUI video downloader powered by yt-dlp
 """
+import multiprocessing
+import time
+
+_STARTED = time.perf_counter()
+
 import sys
 from pathlib import Path
 
 from PyQt6.QtWidgets import QApplication
 from PyQt6.QtGui import QIcon
-from PyQt6.QtCore import QSize
+from PyQt6.QtCore import QSize, QTimer
 
 import os
 import sys
@@ -15,6 +20,7 @@ import sys
 # Add the project root to Python path
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
+from src.core.downloader import preload_backend
 from src.gui.main_window import MainWindow
 
 def main():
@@ -33,10 +39,18 @@ def main():
     
     # Create and show the main window
     window = MainWindow()
+    if os.environ.get("VIDLEECH_STARTUP_PROBE"):
+        from src.utils.startup import install_first_paint_probe
+        install_first_paint_probe(app, window, _STARTED)
     window.show()
     
+    # Load yt-dlp once the window is up instead of before the first paint
+    QTimer.singleShot(0, preload_backend)
+    
     # Start the event loop
     sys.exit(app.exec())
 
 if __name__ == "__main__":
+    # Post-processing workers are spawned processes; frozen builds need this
+    multiprocessing.freeze_support()
     main()
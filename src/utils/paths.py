@@ -0,0 +1,25 @@
+"""
+Locations for files Vidleech keeps between runs.
+"""
+import os
+import sys
+from pathlib import Path
+
+
+def app_data_dir() -> Path:
+    """Get the per-user directory for caches, databases and settings.
+
+    The VIDLEECH_HOME environment variable overrides the platform default.
+
+    Returns:
+        Path: Existing directory path
+    """
+    override = os.environ.get('VIDLEECH_HOME')
+    if override:
+        path = Path(override)
+    elif sys.platform == 'win32':
+        path = Path(os.environ.get('APPDATA', Path.home())) / 'Vidleech'
+    else:
+        path = Path(os.environ.get('XDG_DATA_HOME', Path.home() / '.local' / 'share')) / 'vidleech'
+    path.mkdir(parents=True, exist_ok=True)
+    return path
@@ -0,0 +1,92 @@
+"""
+Startup measurement helpers.
+
+Used by the startup benchmark (benchmarks.components), the startup tests
+and the VIDLEECH_STARTUP_PROBE mode of src/main.py.
+"""
+import json
+import os
+import re
+import subprocess
+import sys
+import time
+from typing import Dict, Tuple
+
+_IMPORTTIME_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+def parse_importtime(stderr: str) -> Dict[str, Tuple[int, int]]:
+    """Parse `python -X importtime` output.
+
+    Args:
+        stderr: Text written to stderr by the interpreter
+
+    Returns:
+        Dict[str, Tuple[int, int]]: Module name -> (self, cumulative) microseconds
+    """
+    modules = {}
+    for match in _IMPORTTIME_LINE.finditer(stderr):
+        modules[match.group(4)] = (int(match.group(1)), int(match.group(2)))
+    return modules
+
+
+def measure_imports(module: str, cwd: str = '.') -> Dict[str, Tuple[int, int]]:
+    """Import a module in a fresh interpreter with -X importtime.
+
+    Args:
+        module: Dotted module name to import
+        cwd: Working directory for the child interpreter
+
+    Returns:
+        Dict[str, Tuple[int, int]]: Parsed import times, see parse_importtime
+    """
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=cwd, capture_output=True, text=True, check=True
+    )
+    return parse_importtime(result.stderr)
+
+
+def run_first_paint_probe(root: str) -> Dict[str, object]:
+    """Start the app offscreen in probe mode and wait for its report.
+
+    Args:
+        root: Checkout containing src/main.py
+
+    Returns:
+        Dict[str, object]: The report printed by install_first_paint_probe
+    """
+    env = dict(os.environ, QT_QPA_PLATFORM='offscreen', VIDLEECH_STARTUP_PROBE='1')
+    result = subprocess.run(
+        [sys.executable, os.path.join(root, 'src', 'main.py')],
+        cwd=root, env=env, capture_output=True, text=True, timeout=60
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def install_first_paint_probe(app, window, started: float) -> None:
+    """Print startup timings as JSON once the window has painted, then quit.
+
+    Args:
+        app: The running QApplication
+        window: The main window being shown
+        started: time.perf_counter() value taken when main.py started
+    """
+    from PyQt6.QtCore import QEvent, QObject, QTimer
+
+    class _Probe(QObject):
+        def eventFilter(self, obj, event):
+            if event.type() == QEvent.Type.Paint:
+                window.removeEventFilter(self)
+                report = {
+                    'first_paint_ms': round((time.perf_counter() - started) * 1000, 1),
+                    'yt_dlp_loaded': 'yt_dlp.YoutubeDL' in sys.modules,
+                    'stores_open': getattr(window, 'queue', None) is not None,
+                    'pid': os.getpid(),
+                }
+                print(json.dumps(report), flush=True)
+                QTimer.singleShot(0, app.quit)
+            return False
+
+    window._startup_probe = _Probe(window)
+    window.installEventFilter(window._startup_probe)
@@ -1,9 +1,39 @@
 """
 URL validation and platform detection utilities.
 """
+import os
 import re
-from typing import Optional
-from urllib.parse import urlparse
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+from urllib.parse import urlparse, urlunparse, parse_qsl, urlencode
+
+# Query parameters that only track the visitor and never change the video
+TRACKING_PARAMS = {'fbclid', 'gclid', 'si', 'feature', 'igshid', 'ref', 'ref_src'}
+
+# Domains of the common video platforms; subdomains match too
+_PLATFORM_DOMAINS = {
+    'youtube.com': 'youtube',
+    'youtu.be': 'youtube',
+    'vimeo.com': 'vimeo',
+    'dailymotion.com': 'dailymotion',
+    'facebook.com': 'facebook',
+    'twitter.com': 'twitter',
+    'instagram.com': 'instagram',
+    'tiktok.com': 'tiktok',
+}
+
+# Scheme and network location, split the way urlparse() splits them
+_URL_PREFIX = re.compile(r'([A-Za-z][A-Za-z0-9+.-]*)://([^/?#]+)')
+_LEADING_JUNK = ''.join(map(chr, range(33)))
+_DEFAULT_PORTS = {'http': '80', 'https': '443'}
+
+# Batches of this many URLs or more go to a process pool in classify_many()
+PARALLEL_THRESHOLD = 50_000
+
+
+class UrlClass(NamedTuple):
+    """Result of classifying a URL."""
+    platform: Optional[str]
+    host: str  # Lowercase host name, with the port unless it is the default
 
 def is_valid_url(url: str) -> bool:
     """Check if a URL is valid.
@@ -20,6 +50,76 @@ def is_valid_url(url: str) -> bool:
     except:
         return False
 
+def canonicalize_url(url: str) -> str:
+    """Normalize a URL so equivalent links compare equal.
+
+    Lowercases the scheme and host, drops default ports, fragments and
+    tracking parameters, and sorts the remaining query parameters.
+
+    Args:
+        url: The URL to normalize
+
+    Returns:
+        str: Canonical form of the URL, or the input unchanged if invalid
+    """
+    if not is_valid_url(url):
+        return url
+    parts = urlparse(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or '').lower()
+    if parts.port and (scheme, parts.port) not in (('http', 80), ('https', 443)):
+        host = f"{host}:{parts.port}"
+    query = sorted(
+        (key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if key not in TRACKING_PARAMS and not key.startswith('utm_')
+    )
+    return urlunparse((scheme, host, parts.path or '/', parts.params, urlencode(query), ''))
+
+def classify_url(url: str) -> Optional[UrlClass]:
+    """Detect the platform and host of a URL in a single parse.
+
+    Accepts the same URLs as is_valid_url(): a scheme followed by a
+    non-empty network location.
+
+    Args:
+        url: The URL to classify
+
+    Returns:
+        Optional[UrlClass]: Platform (None if unknown) and host, or None
+        if the URL is invalid
+    """
+    match = _URL_PREFIX.match(url.lstrip(_LEADING_JUNK))
+    if match is None:
+        return None
+    return _classify_netloc(match.group(2), match.group(1).lower())
+
+def classify_many(urls: Iterable[str], processes: Optional[int] = None) -> List[Optional[UrlClass]]:
+    """Classify many URLs, e.g. a pasted list.
+
+    Hosts repeat heavily in real lists, so each network location is
+    classified once per batch. Batches of at least PARALLEL_THRESHOLD URLs
+    are split across a process pool when more than one CPU is available.
+
+    Args:
+        urls: URLs to classify
+        processes: Worker processes; None uses one per CPU, 1 stays in
+            this process
+
+    Returns:
+        List[Optional[UrlClass]]: Results in input order, as classify_url()
+    """
+    urls = urls if isinstance(urls, list) else list(urls)
+    if processes is None:
+        processes = os.cpu_count() or 1
+    if processes > 1 and len(urls) >= PARALLEL_THRESHOLD:
+        from concurrent.futures import ProcessPoolExecutor
+
+        size = -(-len(urls) // (processes * 4))
+        chunks = [urls[start:start + size] for start in range(0, len(urls), size)]
+        with ProcessPoolExecutor(processes) as executor:
+            return [result for chunk in executor.map(_classify_chunk, chunks) for result in chunk]
+    return _classify_chunk(urls)
+
 def get_platform(url: str) -> Optional[str]:
     """Detect the platform from a video URL.
     
@@ -29,27 +129,48 @@ def get_platform(url: str) -> Optional[str]:
     Returns:
         Optional[str]: Platform name if detected, None otherwise
     """
-    if not is_valid_url(url):
-        return None
-        
-    # Common video platforms and their URL patterns
-    platforms = {
-        'youtube': r'(?:youtube\.com|youtu\.be)',
-        'vimeo': r'vimeo\.com',
-        'dailymotion': r'dailymotion\.com',
-        'facebook': r'facebook\.com',
-        'twitter': r'twitter\.com',
-        'instagram': r'instagram\.com',
-        'tiktok': r'tiktok\.com'
-    }
-    
-    domain = urlparse(url).netloc.lower()
-    
-    for platform, pattern in platforms.items():
-        if re.search(pattern, domain):
-            return platform
-            
-    return None
+    result = classify_url(url)
+    return result.platform if result is not None else None
+
+def _classify_chunk(urls: List[str]) -> List[Optional[UrlClass]]:
+    prefix, junk = _URL_PREFIX.match, _LEADING_JUNK
+    seen: Dict[Tuple[str, str], Optional[UrlClass]] = {}
+    results = []
+    for url in urls:
+        match = prefix(url.lstrip(junk))
+        if match is None:
+            results.append(None)
+            continue
+        key = match.group(2, 1)
+        if key not in seen:
+            seen[key] = _classify_netloc(key[0], key[1].lower())
+        results.append(seen[key])
+    return results
+
+def _classify_netloc(netloc: str, scheme: str) -> Optional[UrlClass]:
+    host = netloc.rpartition('@')[2].lower()
+    if host.startswith('['):
+        host, bracket, port = host.partition(']')
+        if not bracket:
+            # urlparse rejects an unterminated IPv6 address
+            return None
+        host += bracket
+        port = port[1:]
+    else:
+        host, _, port = host.partition(':')
+    if port and _DEFAULT_PORTS.get(scheme) != port:
+        canonical = f"{host}:{port}"
+    else:
+        canonical = host
+    # Walk the host's suffixes from longest to shortest, e.g.
+    # m.youtube.com, youtube.com, com
+    suffix = host
+    while suffix:
+        platform = _PLATFORM_DOMAINS.get(suffix)
+        if platform is not None:
+            return UrlClass(platform, canonical)
+        suffix = suffix.partition('.')[2]
+    return UrlClass(None, canonical)
 
 def get_supported_platforms() -> list[str]:
     """Get a list of supported video platforms.
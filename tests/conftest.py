@@ -0,0 +1,306 @@
+"""
+Shared fixtures for the test suite.
+
+Provides a local HTTP stand-in for video hosts so downloads can be exercised
+end to end through yt-dlp without touching the network.
+"""
+import os
+import re
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+# Keep caches and databases created by the app out of the user's profile
+os.environ.setdefault("VIDLEECH_HOME", tempfile.mkdtemp(prefix="vidleech-test-"))
+
+
+class MediaServer:
+    """Serves synthetic media files from memory.
+
+    Attributes:
+        files: Mapping of request path to (payload, content type)
+        chunk_size: Bytes written per socket send
+        chunk_delay: Seconds slept between chunks, per connection
+        support_ranges: Whether Range requests are honoured
+        latency: Seconds slept before answering each request
+        failures: Mapping of path to status codes answered, one per request,
+            before the file is served
+        requests: Log of (method, path, range header) tuples
+        max_in_flight: Most requests being answered at the same time
+    """
+
+    def __init__(self):
+        self.files = {}
+        self.chunk_size = 64 * 1024
+        self.chunk_delay = 0.0
+        self.support_ranges = True
+        self.latency = 0.0
+        self.failures = {}
+        self.requests = []
+        self.connections = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._in_flight_lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._make_handler())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address
+        return f"http://{host}:{port}"
+
+    def url(self, path: str) -> str:
+        return f"{self.base_url}{path}"
+
+    def add(self, path: str, payload: bytes, content_type: str = "video/mp4") -> str:
+        self.files[path] = (payload, content_type)
+        return self.url(path)
+
+    def add_hls(self, name: str, segments: int, segment_size: int = 16 * 1024) -> str:
+        """Serve an HLS media playlist of synthetic .ts segments.
+
+        Returns:
+            str: URL of the playlist
+        """
+        lines = ["#EXTM3U", "#EXT-X-VERSION:3", "#EXT-X-TARGETDURATION:2", "#EXT-X-MEDIA-SEQUENCE:0"]
+        for index in range(segments):
+            # 0x47 is the MPEG-TS sync byte
+            self.add(f"/{name}/seg{index}.ts", b"\x47" + os.urandom(segment_size - 1), "video/mp2t")
+            lines += ["#EXTINF:2.0,", f"seg{index}.ts"]
+        lines.append("#EXT-X-ENDLIST")
+        return self.add(f"/{name}/index.m3u8", "\n".join(lines).encode(), "application/vnd.apple.mpegurl")
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def setup(self):
+                super().setup()
+                server.connections += 1
+
+            def log_message(self, *args):
+                pass
+
+            def do_HEAD(self):
+                self._track(head=True)
+
+            def do_GET(self):
+                self._track(head=False)
+
+            def _track(self, head):
+                with server._in_flight_lock:
+                    server.in_flight += 1
+                    server.max_in_flight = max(server.max_in_flight, server.in_flight)
+                try:
+                    self._serve(head)
+                finally:
+                    with server._in_flight_lock:
+                        server.in_flight -= 1
+
+            def _serve(self, head):
+                path = self.path.split("?", 1)[0]
+                range_header = self.headers.get("Range")
+                server.requests.append((self.command, path, range_header))
+                if server.latency:
+                    time.sleep(server.latency)
+                if server.failures.get(path):
+                    self.send_response(server.failures[path].pop(0))
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                if path not in server.files:
+                    self.send_response(404)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                payload, content_type = server.files[path]
+                start, end = 0, len(payload) - 1
+                status = 200
+                match = re.match(r"bytes=(\d+)-(\d*)", range_header or "")
+                if match and server.support_ranges:
+                    start = int(match.group(1))
+                    if match.group(2):
+                        end = min(int(match.group(2)), end)
+                    if start > end:
+                        self.send_response(416)
+                        self.send_header("Content-Range", f"bytes */{len(payload)}")
+                        self.send_header("Content-Length", "0")
+                        self.end_headers()
+                        return
+                    status = 206
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(end - start + 1))
+                if server.support_ranges:
+                    self.send_header("Accept-Ranges", "bytes")
+                if status == 206:
+                    self.send_header("Content-Range", f"bytes {start}-{end}/{len(payload)}")
+                self.end_headers()
+                if head:
+                    return
+                try:
+                    offset = start
+                    while offset <= end:
+                        chunk = payload[offset:min(offset + server.chunk_size, end + 1)]
+                        self.wfile.write(chunk)
+                        offset += len(chunk)
+                        if server.chunk_delay:
+                            time.sleep(server.chunk_delay)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+
+        return Handler
+
+
+@pytest.fixture
+def media_server():
+    """A running MediaServer, shut down after the test."""
+    server = MediaServer()
+    server.start()
+    yield server
+    server.stop()
+
+
+class FakeSite:
+    """A fake video site: a yt-dlp extractor backed by a MediaServer.
+
+    URLs of the form <base>/watch/<id> resolve to a video with a 360p mp4
+    and a 720p webm format, a 1080p video-only mp4, plus audio-only opus and
+    AAC streams whose first line names their codec. `calls` counts
+    extractions.
+
+    <base>/channel/<name> is a paged playlist of `channel_size` videos,
+    `page_size` per page; `pages` logs the page numbers as they are fetched
+    and `page_delay` slows each page down.
+    """
+
+    def __init__(self, server: MediaServer):
+        import os
+        from yt_dlp.extractor.common import InfoExtractor
+
+        self.server = server
+        self.calls = 0
+        self.channel_size = 10
+        self.page_size = 3
+        self.page_delay = 0.0
+        self.pages = []
+        server.add("/low.mp4", os.urandom(1000))
+        server.add("/high.webm", os.urandom(3000), content_type="video/webm")
+        server.add("/video.mp4", os.urandom(4000))
+        server.add("/audio.webm", b"codec=opus\n" + os.urandom(2000), content_type="audio/webm")
+        server.add("/audio.m4a", b"codec=aac\n" + os.urandom(1500), content_type="audio/mp4")
+        site = self
+
+        class CountingIE(InfoExtractor):
+            IE_NAME = "counting"
+            _VALID_URL = r"https?://127\.0\.0\.1:\d+/watch/(?P<id>\w+)"
+
+            def _real_extract(self, url):
+                site.calls += 1
+                video_id = self._match_id(url)
+                return {
+                    "id": video_id,
+                    "title": f"Clip {video_id}",
+                    "duration": 10,
+                    "formats": [
+                        {"format_id": "low", "url": server.url("/low.mp4"), "ext": "mp4",
+                         "height": 360, "vcodec": "avc1", "acodec": "mp4a"},
+                        {"format_id": "high", "url": server.url("/high.webm"), "ext": "webm",
+                         "height": 720, "vcodec": "vp9", "acodec": "opus"},
+                        {"format_id": "video", "url": server.url("/video.mp4"), "ext": "mp4",
+                         "height": 1080, "vcodec": "avc1", "acodec": "none"},
+                        {"format_id": "audio-opus", "url": server.url("/audio.webm"), "ext": "webm",
+                         "vcodec": "none", "acodec": "opus", "abr": 160},
+                        {"format_id": "audio-aac", "url": server.url("/audio.m4a"), "ext": "m4a",
+                         "vcodec": "none", "acodec": "mp4a.40.2", "abr": 128},
+                    ],
+                }
+
+        class ChannelIE(InfoExtractor):
+            IE_NAME = "counting:channel"
+            _VALID_URL = r"https?://127\.0\.0\.1:\d+/channel/(?P<id>\w+)"
+
+            def _real_extract(self, url):
+                from yt_dlp.utils import OnDemandPagedList
+
+                name = self._match_id(url)
+
+                def fetch_page(page):
+                    site.pages.append(page)
+                    time.sleep(site.page_delay)
+                    first = page * site.page_size
+                    for index in range(first, min(first + site.page_size, site.channel_size)):
+                        video_id = f"{name}{index}"
+                        yield self.url_result(site.watch_url(video_id), CountingIE, video_id)
+
+                return self.playlist_result(OnDemandPagedList(fetch_page, site.page_size), name, name)
+
+        self.ie_class = CountingIE
+        self.ie_classes = [CountingIE, ChannelIE]
+
+    def watch_url(self, video_id: str) -> str:
+        return self.server.url(f"/watch/{video_id}")
+
+    def channel_url(self, name: str) -> str:
+        return self.server.url(f"/channel/{name}")
+
+    def downloader(self, **kwargs):
+        """A VideoDownloader whose YoutubeDL instances know this site."""
+        from src.core.downloader import VideoDownloader
+        from src.core.ydl import create_ydl
+
+        ie_classes = self.ie_classes
+
+        class SiteDownloader(VideoDownloader):
+            def _create_ydl(self, ydl_opts):
+                ydl = create_ydl(ydl_opts, auto_init=False, fragment_tuner=self.fragment_tuner,
+                                 bandwidth=self.bandwidth, storage=self.storage)
+                for ie_class in ie_classes:
+                    ydl.add_info_extractor(ie_class())
+                return ydl
+
+        return SiteDownloader(**kwargs)
+
+
+@pytest.fixture
+def fake_site(media_server):
+    """A FakeSite served by the media_server fixture."""
+    return FakeSite(media_server)
+
+
+@pytest.fixture(scope="session")
+def qapp():
+    """A QCoreApplication for tests that need a Qt event loop."""
+    from PyQt6.QtCore import QCoreApplication
+    app = QCoreApplication.instance() or QCoreApplication([])
+    yield app
+
+
+@pytest.fixture
+def wait_until(qapp):
+    """Pump the Qt event loop until predicate() is true or timeout expires."""
+    return lambda predicate, timeout=10.0: _wait_until(qapp, predicate, timeout)
+
+
+def _wait_until(app, predicate, timeout: float) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        app.processEvents()
+        if predicate():
+            return True
+        time.sleep(0.005)
+    return False
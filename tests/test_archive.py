@@ -0,0 +1,134 @@
+"""
+Tests for the download archive and duplicate skipping.
+"""
+from src.core.archive import BloomFilter, DownloadArchive
+from src.core.download_queue import DownloadQueue, JobState
+from src.core.playlist import PlaylistExpander
+
+
+def test_bloom_filter_has_no_false_negatives():
+    bloom = BloomFilter(1000, error_rate=0.01)
+    keys = [f"youtube:{i}" for i in range(1000)]
+    for key in keys:
+        bloom.add(key)
+    assert all(key in bloom for key in keys)
+    false_positives = sum(f"vimeo:{i}" in bloom for i in range(10000))
+    assert false_positives < 300
+
+    restored = BloomFilter(1000, 0.01, bloom.to_bytes())
+    assert all(key in restored for key in keys)
+
+
+def test_archive_persists_and_catches_up(tmp_path):
+    path = tmp_path / "archive.sqlite"
+    archive = DownloadArchive(path, capacity=100)
+    assert archive.add("youtube:a")
+    assert not archive.add("youtube:a")
+    archive.close()
+
+    # Rows written by another process after the filter was saved
+    other = DownloadArchive(path, capacity=100)
+    other._bloom_path = None
+    for i in range(150):
+        other.add(f"vimeo:{i}")
+
+    reopened = DownloadArchive(path, capacity=100)
+    assert "youtube:a" in reopened
+    assert "vimeo:149" in reopened
+    assert "youtube:b" not in reopened
+    assert reopened.contains_many(["youtube:a", "vimeo:3", "dailymotion:x"]) == {"youtube:a", "vimeo:3"}
+    # Grew past its initial capacity without losing keys
+    assert reopened._bloom.capacity >= 151
+
+
+def test_keys_added_by_another_process_are_seen(tmp_path):
+    path = tmp_path / "archive.sqlite"
+    gui, cli = DownloadArchive(path), DownloadArchive(path)
+    assert "youtube:a" not in gui
+
+    cli.add("youtube:a")
+    assert "youtube:a" in gui
+    assert gui.contains_many(["youtube:a"]) == {"youtube:a"}
+    gui.close()
+    cli.close()
+
+
+def test_lookups_query_the_table_only_after_external_changes(tmp_path):
+    path = tmp_path / "archive.sqlite"
+    gui, cli = DownloadArchive(path), DownloadArchive(path)
+    statements = []
+    gui._db.set_trace_callback(statements.append)
+
+    assert "youtube:x" not in gui
+    assert gui.contains_many(["youtube:y"]) == set()
+    assert not [sql for sql in statements if "FROM archive" in sql]
+
+    cli.add("youtube:x")
+    assert "youtube:x" in gui
+    assert [sql for sql in statements if "WHERE id >" in sql]
+    gui.close()
+    cli.close()
+
+
+def test_checking_a_long_playlist(tmp_path):
+    archive = DownloadArchive(tmp_path / "archive.sqlite")
+    with archive._lock:
+        archive._db.execute("""
+            INSERT INTO archive (key)
+            WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < 200000)
+            SELECT 'youtube:' || i FROM n
+        """)
+    archive = DownloadArchive(tmp_path / "archive.sqlite")
+    playlist = [f"youtube:{i}" for i in range(150000, 250000)]
+
+    found = archive.contains_many(playlist)
+    assert found == {f"youtube:{i}" for i in range(150000, 200001)}
+
+
+def test_duplicate_is_skipped_before_extraction(fake_site, tmp_path):
+    archive = DownloadArchive()
+    downloader = fake_site.downloader(archive=archive)
+    queue = DownloadQueue(downloader.run_job, submit=lambda fn: fn())
+
+    first = queue.add(fake_site.watch_url("abc"), str(tmp_path))
+    assert first.state == JobState.DONE
+    assert "counting:abc" in archive
+    calls = fake_site.calls
+
+    again = queue.add(fake_site.watch_url("abc") + "?t=30", str(tmp_path))
+    assert again.state == JobState.SKIPPED
+    assert again.status == "Already downloaded"
+    assert fake_site.calls == calls
+
+
+class _CountingArchive(DownloadArchive):
+    def __init__(self):
+        super().__init__()
+        self.checks = []
+
+    def contains_many(self, keys):
+        keys = list(keys)
+        self.checks.append(keys)
+        return super().contains_many(keys)
+
+
+def test_playlist_expansion_skips_archived_entries(fake_site, tmp_path):
+    fake_site.channel_size = 4
+    archive = _CountingArchive()
+    archive.add("counting:chan1")
+    archive.add("counting:chan3")
+    downloader = fake_site.downloader(archive=archive)
+    queue = DownloadQueue(downloader.run_job)
+    downloader.playlist_expander = PlaylistExpander(queue, archive=archive)
+
+    playlist = queue.add(fake_site.channel_url("chan"), str(tmp_path))
+    assert queue.wait(timeout=30)
+
+    entries = [job for job in queue.jobs() if job.id != playlist.id]
+    assert sorted(job.url for job in entries) == [fake_site.watch_url("chan0"),
+                                                  fake_site.watch_url("chan2")]
+    assert playlist.status == "Playlist: 2 entries queued, 2 already downloaded"
+    # One lookup for the whole page
+    assert archive.checks == [["counting:chan0", "counting:chan1", "counting:chan2", "counting:chan3"]]
+    assert {"counting:chan0", "counting:chan2"} <= archive.contains_many(
+        ["counting:chan0", "counting:chan2"])
@@ -0,0 +1,158 @@
+"""
+Tests for audio extraction, using a stand-in ffmpeg on synthetic media.
+"""
+import json
+import os
+import sys
+
+import pytest
+
+from src.core.audio import (FFmpegNotFound, audio_format_selector, audio_postprocessor,
+                            parse_audio_quality)
+from src.core.download_queue import DownloadQueue, JobState
+from src.core.postprocess import PostProcessPool
+
+# Behaves like ffmpeg/ffprobe for yt-dlp's FFmpegExtractAudio: media files
+# start with a "codec=<name>" line, which ffprobe reports and ffmpeg
+# rewrites. Transcodes burn the CPU seconds given in the "cost" file, and
+# every conversion is logged to calls.jsonl.
+FAKE_FFMPEG = '''#!{python}
+import json, os, sys, time
+here = os.path.dirname(os.path.abspath(__file__))
+name = os.path.basename(sys.argv[0])
+args = sys.argv[1:]
+if args and args[0] in ('-bsfs', '-version'):
+    print(name + ' version 6.1 Copyright (c) synthetic')
+    sys.exit(0)
+strip = lambda path: path[5:] if path.startswith('file:') else path
+if name == 'ffprobe':
+    with open(strip(args[-1]), 'rb') as f:
+        codec = f.readline().decode().strip().partition('=')[2]
+    print('[STREAM]\\ncodec_name=' + codec + '\\ncodec_type=audio\\n[/STREAM]')
+    sys.exit(0)
+source, target = strip(args[args.index('-i') + 1]), strip(args[-1])
+acodec = args[len(args) - 1 - args[::-1].index('-acodec') + 1] if '-acodec' in args else 'pcm_s16le'
+with open(source, 'rb') as f:
+    codec = f.readline().decode().strip().partition('=')[2]
+    payload = f.read()
+if acodec != 'copy':
+    with open(os.path.join(here, 'cost')) as f:
+        deadline = time.process_time() + float(f.read())
+    while time.process_time() < deadline:
+        pass
+    codec = {{'libmp3lame': 'mp3', 'libopus': 'opus', 'libvorbis': 'vorbis'}}.get(acodec, acodec)
+with open(target, 'wb') as f:
+    f.write(('codec=' + codec + '\\n').encode() + payload)
+with open(os.path.join(here, 'calls.jsonl'), 'a') as f:
+    f.write(json.dumps({{'acodec': acodec, 'args': args, 'pid': os.getppid()}}) + '\\n')
+'''
+
+
+class FakeFFmpeg:
+    def __init__(self, directory):
+        self.location = str(directory)
+        directory.mkdir()
+        for name in ('ffmpeg', 'ffprobe'):
+            path = directory / name
+            path.write_text(FAKE_FFMPEG.format(python=sys.executable))
+            path.chmod(0o755)
+        self.set_cost(0.0)
+
+    def set_cost(self, seconds: float) -> None:
+        with open(os.path.join(self.location, 'cost'), 'w') as f:
+            f.write(str(seconds))
+
+    def calls(self):
+        path = os.path.join(self.location, 'calls.jsonl')
+        if not os.path.exists(path):
+            return []
+        with open(path) as f:
+            return [json.loads(line) for line in f]
+
+
+@pytest.fixture
+def fake_ffmpeg(tmp_path):
+    return FakeFFmpeg(tmp_path / 'ffmpeg-bin')
+
+
+def test_settings():
+    assert parse_audio_quality('192K') == '192'
+    assert parse_audio_quality('0') == '0'
+    assert parse_audio_quality('best') is None
+    for text in ('5K', 'loud', '192.5'):
+        with pytest.raises(ValueError):
+            parse_audio_quality(text)
+    assert audio_format_selector('m4a') == 'bestaudio[acodec^=mp4a]/bestaudio/best'
+    assert audio_format_selector('wav') == 'bestaudio/best'
+    with pytest.raises(ValueError):
+        audio_postprocessor('mp4')
+
+
+def test_matching_codec_is_copied(fake_site, fake_ffmpeg, tmp_path):
+    downloader = fake_site.downloader(ffmpeg_location=fake_ffmpeg.location)
+    output = tmp_path / 'out'
+    # The AAC stream is picked over the better opus one and is already m4a
+    assert downloader.fetch(fake_site.watch_url('a1'), str(output), 'audio',
+                            audio_format='m4a') == 'Clip a1.m4a'
+    assert fake_ffmpeg.calls() == []
+    # Opus moves from its webm container without being re-encoded
+    assert downloader.fetch(fake_site.watch_url('a2'), str(output), 'audio',
+                            audio_format='opus') == 'Clip a2.opus'
+    [call] = fake_ffmpeg.calls()
+    assert call['acodec'] == 'copy'
+    assert sorted(os.listdir(output)) == ['Clip a1.m4a', 'Clip a2.opus']
+    downloader.close()
+
+
+def test_transcode_reports_the_converted_file(fake_site, fake_ffmpeg, tmp_path):
+    downloader = fake_site.downloader(ffmpeg_location=fake_ffmpeg.location)
+    output = tmp_path / 'out'
+    assert downloader.fetch(fake_site.watch_url('b1'), str(output), 'audio', audio_format='mp3',
+                            audio_quality='192') == 'Clip b1.mp3'
+    [call] = fake_ffmpeg.calls()
+    assert call['acodec'] == 'libmp3lame'
+    assert call['args'][call['args'].index('-b:a') + 1] == '192.0k'
+    # The downloaded opus stream is replaced by the conversion
+    assert os.listdir(output) == ['Clip b1.mp3']
+    assert (output / 'Clip b1.mp3').read_bytes().startswith(b'codec=mp3\n')
+    downloader.close()
+
+
+def test_without_ffmpeg(fake_site, tmp_path):
+    missing = tmp_path / 'no-ffmpeg'
+    missing.mkdir()
+    downloader = fake_site.downloader(ffmpeg_location=str(missing))
+    with pytest.raises(FFmpegNotFound):
+        downloader.fetch(fake_site.watch_url('c1'), str(tmp_path), 'audio', audio_format='mp3')
+    # The original stream needs no conversion
+    assert downloader.fetch(fake_site.watch_url('c1'), str(tmp_path), 'audio') == 'Clip c1.webm'
+    downloader.close()
+
+
+def _download_album(downloader, fake_site, output, tracks):
+    queue = DownloadQueue(downloader.run_job, max_concurrent=1)
+    jobs = [queue.add(fake_site.watch_url(f'track{n}'), str(output), 'audio', audio_format='mp3')
+            for n in range(tracks)]
+    assert queue.wait(timeout=180)
+    assert [job.filename for job in jobs] == [f'Clip track{n}.mp3' for n in range(tracks)], \
+        [job.error for job in jobs if job.state != JobState.DONE]
+
+
+def test_album_transcodes_in_worker_processes(fake_site, fake_ffmpeg, tmp_path):
+    tracks = 3
+    inline = fake_site.downloader(ffmpeg_location=fake_ffmpeg.location)
+    pool = PostProcessPool(workers=2)
+    pool.start(wait=True)
+    pooled = fake_site.downloader(ffmpeg_location=fake_ffmpeg.location, postprocess=pool)
+
+    _download_album(inline, fake_site, tmp_path / 'inline', tracks)
+    inline_calls = len(fake_ffmpeg.calls())
+    assert {call['pid'] for call in fake_ffmpeg.calls()} == {os.getpid()}
+    _download_album(pooled, fake_site, tmp_path / 'pooled', tracks)
+
+    pool_pids = {call['pid'] for call in fake_ffmpeg.calls()[inline_calls:]}
+    assert os.getpid() not in pool_pids
+    assert sorted(os.listdir(tmp_path / 'pooled')) == [f'Clip track{n}.mp3' for n in range(tracks)]
+    pool.close()
+    inline.close()
+    pooled.close()
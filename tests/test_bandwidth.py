@@ -0,0 +1,110 @@
+"""
+Tests for the shared bandwidth limiter.
+"""
+import os
+import threading
+import time
+from datetime import datetime, time as clock_time
+
+import pytest
+
+from src.core.bandwidth import (
+    BULK, INTERACTIVE, BandwidthLimiter, ScheduleRule, parse_rate, parse_schedule_rule,
+    priority_class,
+)
+from src.core.downloader import VideoDownloader
+
+KB = 1024
+
+
+def test_parse_rate_and_schedule():
+    assert parse_rate("500K") == 500 * KB
+    assert parse_rate("2.5MB/s") == 2.5 * KB * KB
+    assert parse_rate("unlimited") is None
+    with pytest.raises(ValueError):
+        parse_rate("fast")
+
+    rule = parse_schedule_rule("22:00-06:00=10M")
+    assert rule == ScheduleRule(clock_time(22), clock_time(6), 10 * KB * KB)
+    assert rule.covers(clock_time(23, 30)) and rule.covers(clock_time(5))
+    assert not rule.covers(clock_time(12))
+    assert [priority_class(p) for p in (2, 0, -1)] == [INTERACTIVE, "normal", BULK]
+
+
+def test_schedule_overrides_rate_during_its_window():
+    moment = datetime(2024, 5, 6, 10, 0)
+    limiter = BandwidthLimiter(rate=None, now=lambda: moment,
+                               schedule=[parse_schedule_rule("09:00-18:00=1M")])
+    assert limiter.current_rate() == KB * KB
+    moment = datetime(2024, 5, 6, 19, 0)
+    assert limiter.current_rate() is None
+
+
+def test_caps_throughput_and_follows_rate_changes():
+    limiter = BandwidthLimiter(rate=200 * KB, burst=0.1)
+    started = time.perf_counter()
+    for _ in range(16):
+        limiter.acquire(16 * KB)
+    # 256 KiB at 200 KiB/s, less the 20 KiB burst
+    assert time.perf_counter() - started > 1.0
+
+    limiter.set_rate(1 * KB)
+    done = threading.Event()
+
+    def pull():
+        for _ in range(3):
+            limiter.acquire(16 * KB)
+        done.set()
+
+    worker = threading.Thread(target=pull)
+    worker.start()
+    time.sleep(0.2)
+    assert not done.is_set()
+    limiter.set_rate(None)
+    assert done.wait(2.0)
+    worker.join()
+
+
+def test_priority_classes_share_by_weight():
+    limiter = BandwidthLimiter(rate=4096 * KB, burst=0.001)
+    granted = []
+    lock = threading.Lock()
+
+    def pull(priority):
+        while True:
+            limiter.acquire(8 * KB, priority)
+            with lock:
+                if len(granted) >= 200:
+                    return
+                granted.append(priority)
+
+    workers = [threading.Thread(target=pull, args=(p,)) for p in (INTERACTIVE, BULK)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+    # While both wait, reads are granted 4:1 as the default weights say
+    assert 2.5 < granted.count(INTERACTIVE) / granted.count(BULK) < 6
+
+
+class _CountingLimiter(BandwidthLimiter):
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.acquired = 0
+
+    def acquire(self, size, priority="normal"):
+        self.acquired += max(0, size)
+        super().acquire(size, priority)
+
+
+@pytest.mark.parametrize("connections", [1, 4])
+def test_downloads_draw_from_the_shared_cap(media_server, tmp_path, connections):
+    url = media_server.add("/capped.mp4", os.urandom(512 * KB))
+    limiter = _CountingLimiter(rate=512 * KB, burst=0.1)
+    downloader = VideoDownloader(bandwidth=limiter)
+
+    filename = downloader.fetch(url, str(tmp_path), connections=connections)
+
+    assert (tmp_path / filename).stat().st_size == 512 * KB
+    assert limiter.acquired >= 512 * KB
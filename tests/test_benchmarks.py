@@ -0,0 +1,108 @@
+"""
+Tests for the offline benchmark suite: the media farm, a tiny run and the
+comparison against a baseline.
+"""
+import copy
+import json
+import urllib.error
+import urllib.request
+
+import pytest
+
+from benchmarks.__main__ import main
+from benchmarks.compare import compare
+from benchmarks.components import postprocess
+from benchmarks.farm import MediaFarm, NetworkProfile
+from benchmarks.suite import SCENARIOS, run_suite
+
+
+@pytest.fixture
+def farm():
+    with MediaFarm() as farm:
+        yield farm
+
+
+def test_farm_serves_ranges_and_injects_failures(farm):
+    url = farm.add_progressive('clip', 4096)
+    request = urllib.request.Request(url, headers={'Range': 'bytes=100-199'})
+    with urllib.request.urlopen(request) as response:
+        assert response.status == 206
+        assert response.headers['Content-Range'] == 'bytes 100-199/4096'
+        assert len(response.read()) == 100
+
+    farm.set_profile(NetworkProfile(error_rate=1.0))
+    with pytest.raises(urllib.error.HTTPError) as error:
+        urllib.request.urlopen(url)
+    assert error.value.code == 503
+    # Manifests and pages are never failed
+    page = farm.add_page('page', 2, 1024)
+    with urllib.request.urlopen(page) as response:
+        assert b'video1.mp4' in response.read()
+
+    records = farm.take_requests()
+    assert [(r.status, r.injected) for r in records] == [(206, None), (503, 'error'), (200, None)]
+    assert farm.take_requests() == []
+
+
+def test_run_records_metrics_per_job(tmp_path):
+    scenarios = [s for s in SCENARIOS if s.name in ('progressive', 'hls', 'playlist')]
+    results = run_suite(scenarios, repeat=1, warmup=0, scale=0.01, workdir=str(tmp_path))
+
+    assert json.loads(json.dumps(results)) == results
+    assert results['settings'] == {'repeat': 1, 'warmup': 0, 'scale': 0.01}
+    assert set(results['scenarios']) == {'progressive', 'hls', 'playlist'}
+    for name, scenario in results['scenarios'].items():
+        job, = scenario['jobs']
+        assert job['ok'], job['error']
+        assert job['bytes'] > 0 and job['throughput'] > 0
+        assert job['ttfb'] is not None and job['ttfb'] <= job['seconds']
+        assert job['cpu_seconds'] >= 0
+        assert scenario['summary']['failures'] == 0
+        assert scenario['summary']['throughput'] == job['throughput']
+    playlist = results['scenarios']['playlist']
+    assert playlist['config']['videos'] == 5
+    assert playlist['jobs'][0]['bytes'] >= 5 * 20 * 1024
+    # Downloads are cleaned up
+    assert list(tmp_path.iterdir()) == []
+
+
+def _results(**summary):
+    base = {'failures': 0, 'throughput': 10e6, 'ttfb': 0.2, 'cpu_seconds': 1.0, 'peak_rss': 100e6}
+    base.update(summary)
+    return {'scenarios': {'hls': {'summary': base}}}
+
+
+def test_compare_flags_regressions_beyond_tolerance():
+    baseline = _results()
+    assert not any(c.regressed for c in compare(baseline, copy.deepcopy(baseline)))
+
+    slower = compare(baseline, _results(throughput=8e6, ttfb=0.22))
+    assert {c.metric for c in slower if c.regressed} == {'throughput'}
+    # Within the absolute slack despite a large relative change
+    assert not any(c.regressed for c in compare(_results(ttfb=0.01), _results(ttfb=0.03)))
+    failing = compare(baseline, _results(failures=1))
+    assert [c.metric for c in failing if c.regressed] == ['failures']
+
+
+def test_compare_command_exit_code(tmp_path, capsys):
+    baseline, current = tmp_path / 'baseline.json', tmp_path / 'current.json'
+    baseline.write_text(json.dumps(_results()))
+    current.write_text(json.dumps(_results(cpu_seconds=1.5)))
+
+    assert main(['compare', str(baseline), str(baseline)]) == 0
+    assert main(['compare', str(baseline), str(current)]) == 1
+    assert 'REGRESSION' in capsys.readouterr().err
+
+
+def test_component_benchmarks_report_figures(capsys):
+    results = postprocess(jobs=1, latency=0.0, cpu_seconds=0.05)
+    assert results['jobs'] == 1
+    assert results['inline_seconds'] > 0 and results['pipelined_seconds'] > 0
+
+    assert main(['components', '-b', 'classify']) == 0
+    output = capsys.readouterr()
+    figures = json.loads(output.out)['classify']
+    assert figures['urls'] == 100_000 and figures['urls_per_second'] > 0
+    assert output.err.startswith('classify: ')
+    with pytest.raises(SystemExit):
+        main(['components', '-b', 'no-such-benchmark'])
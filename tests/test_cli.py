@@ -0,0 +1,122 @@
+"""
+Tests for the headless command line interface.
+"""
+import json
+import os
+import signal
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+from src import cli
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def _events(output: str):
+    return [json.loads(line) for line in output.splitlines() if line.strip()]
+
+
+def test_batch_reports_json_lines(media_server, tmp_path, capsys):
+    """Every URL is downloaded and reported; the summary closes the stream."""
+    urls = [media_server.add(f"/clip{i}.mp4", os.urandom(200 * 1024)) for i in range(3)]
+
+    code = cli.main(urls + ["-o", str(tmp_path), "-j", "2", "--no-cache"])
+
+    events = _events(capsys.readouterr().out)
+    assert code == cli.EXIT_OK
+    done = [e for e in events if e["event"] == "done"]
+    assert sorted(e["url"] for e in done) == sorted(urls)
+    assert all((tmp_path / e["filename"]).stat().st_size == 200 * 1024 for e in done)
+    assert events[-1] == {"event": "summary", "total": 3, "queued": 0, "running": 0,
+                          "processing": 0, "paused": 0, "deferred": 0, "done": 3, "failed": 0,
+                          "cancelled": 0, "skipped": 0}
+
+
+def test_exit_codes_distinguish_partial_and_total_failure(media_server, tmp_path, capsys):
+    good = media_server.add("/good.mp4", os.urandom(1024))
+    missing = media_server.url("/missing.mp4")
+
+    assert cli.main([good, missing, "-o", str(tmp_path), "--no-cache"]) == cli.EXIT_PARTIAL
+    assert cli.main([missing, "-o", str(tmp_path), "--no-cache"]) == cli.EXIT_FAILED
+    failed = [e for e in _events(capsys.readouterr().out) if e["event"] == "failed"]
+    assert len(failed) == 2 and all(e["error"] for e in failed)
+
+
+def test_urls_from_file(media_server, tmp_path, capsys):
+    url = media_server.add("/listed.mp4", os.urandom(1024))
+    listing = tmp_path / "urls.txt"
+    listing.write_text(f"# queued by cron\n\n{url}\n")
+    out = tmp_path / "out"
+
+    assert cli.main(["--input", str(listing), "-o", str(out), "--no-cache"]) == cli.EXIT_OK
+    assert [p.name for p in out.iterdir()] == ["listed.mp4"]
+
+
+def test_stream_to_stdout(media_server, tmp_path, capsysbinary):
+    """Media goes to stdout in queue order and events move to stderr."""
+    payloads = [os.urandom(50 * 1024) for _ in range(3)]
+    urls = [media_server.add(f"/streamed{i}.mp4", payload) for i, payload in enumerate(payloads)]
+
+    assert cli.main(urls + ["--stream", "-", "-o", str(tmp_path), "--no-cache", "--no-archive"]) == cli.EXIT_OK
+    captured = capsysbinary.readouterr()
+    assert captured.out == b"".join(payloads)
+    done = [e for e in _events(captured.err.decode()) if e["event"] == "done"]
+    assert [(e["url"], e["filename"]) for e in done] == [(url, "<stdout>") for url in urls]
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_supported_only_skips_unknown_sites(media_server, tmp_path, capsys):
+    """Direct links only the generic extractor would try are not queued."""
+    url = media_server.add("/direct.mp4", os.urandom(1024))
+
+    assert cli.main([url, "--supported-only", "-o", str(tmp_path), "--no-cache"]) == cli.EXIT_OK
+    events = _events(capsys.readouterr().out)
+    assert events[0] == {"event": "unsupported", "url": url}
+    assert events[-1]["total"] == 0
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_usage_errors(capsys):
+    with pytest.raises(SystemExit) as exc:
+        cli.main(["--watch", "somewhere", "http://example.com/v.mp4"])
+    assert exc.value.code == cli.EXIT_USAGE
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="POSIX signals")
+def test_daemon_watches_directory_and_stops_on_sigterm(media_server, tmp_path):
+    url = media_server.add("/dropped.mp4", os.urandom(64 * 1024))
+    watch = tmp_path / "inbox"
+    watch.mkdir()
+    out = tmp_path / "out"
+
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "src.cli", "--daemon", "--watch", str(watch),
+         "-o", str(out), "--no-cache"],
+        cwd=ROOT, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, text=True
+    )
+    try:
+        # Write then rename so the daemon never sees a half-written file
+        pending = watch / "batch.tmp"
+        pending.write_text(url + "\n")
+        pending.rename(watch / "batch.urls")
+
+        events = []
+        deadline = time.monotonic() + 30
+        while time.monotonic() < deadline and not any(e["event"] == "done" for e in events):
+            events.append(json.loads(proc.stdout.readline()))
+        assert any(e["event"] == "done" for e in events)
+
+        proc.send_signal(signal.SIGTERM)
+        rest, _ = proc.communicate(timeout=30)
+    finally:
+        if proc.poll() is None:
+            proc.kill()
+
+    assert proc.returncode == cli.EXIT_OK
+    assert _events(rest)[-1]["event"] == "summary"
+    assert (watch / "batch.urls.done").exists()
+    assert (out / "dropped.mp4").stat().st_size == 64 * 1024
@@ -0,0 +1,177 @@
+"""
+Tests for the multi-job download queue.
+"""
+import threading
+import time
+from concurrent.futures import Future
+
+from src.core.cancel import DownloadCancelled
+from src.core.download_queue import DownloadQueue, JobState
+from src.core.storage import InsufficientSpace
+
+
+class RecordingRunner:
+    """Runner that blocks until released and records concurrency."""
+
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.lock = threading.Lock()
+        self.active = {}
+        self.max_active = 0
+        self.max_per_host = {}
+        self.started = []
+
+    def __call__(self, job, report):
+        with self.lock:
+            self.started.append(job.url)
+            self.active[job.id] = job.host
+            self.max_active = max(self.max_active, len(self.active))
+            count = sum(1 for host in self.active.values() if host == job.host)
+            self.max_per_host[job.host] = max(self.max_per_host.get(job.host, 0), count)
+        try:
+            deadline = time.monotonic() + self.delay
+            while time.monotonic() < deadline:
+                if job.cancel_token.cancelled:
+                    raise DownloadCancelled('cancelled')
+                report(50.0, 'Downloading...')
+                time.sleep(0.01)
+            return job.url.rsplit('/', 1)[-1] + '.mp4'
+        finally:
+            with self.lock:
+                del self.active[job.id]
+
+
+def test_respects_global_and_per_host_limits():
+    """No more than N jobs overall and M per host run at once."""
+    runner = RecordingRunner(delay=0.05)
+    queue = DownloadQueue(runner, max_concurrent=3, max_per_host=1)
+    for i in range(4):
+        queue.add(f"https://www.youtube.com/watch?v={i}", "/tmp")
+        queue.add(f"https://vimeo.com/{i}", "/tmp")
+        queue.add(f"https://example.org/{i}", "/tmp")
+    assert queue.wait(timeout=10)
+
+    assert runner.max_active <= 3
+    assert all(count == 1 for count in runner.max_per_host.values())
+    assert set(runner.max_per_host) == {"youtube", "vimeo", "example.org"}
+    assert all(job.state == JobState.DONE for job in queue.jobs())
+
+
+def test_priority_and_reordering():
+    """Higher priority starts first; move() reorders within a priority."""
+    runner = RecordingRunner()
+    queue = DownloadQueue(runner, max_concurrent=1, max_per_host=1)
+    queue.pause()
+    low = queue.add("https://example.org/low", "/tmp")
+    first = queue.add("https://example.org/first", "/tmp")
+    high = queue.add("https://example.org/high", "/tmp", priority=5)
+    queue.move(first.id, 0)
+    assert [job.id for job in queue.pending()] == [high.id, first.id, low.id]
+
+    queue.resume()
+    assert queue.wait(timeout=10)
+    assert runner.started == [
+        "https://example.org/high", "https://example.org/first", "https://example.org/low"
+    ]
+
+
+def test_pause_and_resume_running_job():
+    """Pausing a running job keeps it resumable; cancelling finishes it."""
+    runner = RecordingRunner(delay=5)
+    queue = DownloadQueue(runner, max_concurrent=2)
+    job = queue.add("https://example.org/a", "/tmp")
+    other = queue.add("https://example.net/b", "/tmp")
+    deadline = time.monotonic() + 5
+    while len(runner.active) < 2 and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    queue.pause_job(job.id)
+    queue.cancel(other.id)
+    assert queue.wait(timeout=5)
+    assert job.state == JobState.PAUSED
+    assert job.cancel_token.discard_partial is False
+    assert other.state == JobState.CANCELLED
+
+    runner.delay = 0
+    queue.resume_job(job.id)
+    assert queue.wait(timeout=5)
+    assert job.state == JobState.DONE
+    assert job.filename == "a.mp4"
+
+
+def test_failures_are_recorded():
+    def failing(job, report):
+        raise RuntimeError("boom")
+
+    queue = DownloadQueue(failing)
+    job = queue.add("https://example.org/x", "/tmp")
+    assert queue.wait(timeout=5)
+    assert job.state == JobState.FAILED
+    assert job.error == "boom"
+
+
+def test_jobs_without_disk_space_are_deferred():
+    """A deferred job is retried when another job finishes and on a timer."""
+    free = {"space": 0}
+
+    def runner(job, report):
+        if job.url.endswith("big") and free["space"] < 100:
+            raise InsufficientSpace("/tmp", 100, free["space"])
+        time.sleep(0.05)
+        free["space"] += 60
+        return job.url.rsplit("/", 1)[-1] + ".mp4"
+
+    queue = DownloadQueue(runner, max_concurrent=1, defer_interval=0.2)
+    big = queue.add("https://example.org/big", "/tmp", priority=1)
+    small = [queue.add(f"https://example.org/small{i}", "/tmp") for i in range(2)]
+    assert queue.wait(timeout=5)
+    # Retried after the first small job, done after the second
+    assert [job.state for job in small] == [JobState.DONE, JobState.DONE]
+    assert big.state == JobState.DONE
+
+    free["space"] = 0
+    other = queue.add("https://example.org/other-big", "/tmp")
+    assert queue.wait(timeout=5)
+    assert other.state == JobState.DEFERRED
+    assert other.status.startswith("Deferred: Not enough disk space in /tmp")
+    free["space"] = 100
+    deadline = time.monotonic() + 5
+    while other.state != JobState.DONE and time.monotonic() < deadline:
+        time.sleep(0.02)
+    assert other.state == JobState.DONE
+
+
+def test_overlapping_jobs_fill_every_slot():
+    """Latency-bound jobs overlap up to the worker count."""
+    runner = RecordingRunner(delay=0.2)
+    queue = DownloadQueue(runner, max_concurrent=4, max_per_host=4)
+    jobs = [queue.add(f"https://example.org/{i}", "/tmp") for i in range(8)]
+    assert queue.wait(timeout=10)
+    assert runner.max_active == 4
+    assert all(job.state == JobState.DONE for job in jobs)
+
+
+def test_post_processing_frees_the_download_slot():
+    """A runner that returns a Future hands its slot to the next job."""
+    futures = {}
+
+    def runner(job, report):
+        futures[job.url] = Future()
+        return futures[job.url]
+
+    queue = DownloadQueue(runner, max_concurrent=1)
+    first = queue.add("https://vimeo.com/1", "/tmp")
+    second = queue.add("https://vimeo.com/2", "/tmp")
+    third = queue.add("https://vimeo.com/3", "/tmp")
+    assert queue.processing() == [first, second, third]
+    assert not queue.running()
+    assert first.state == JobState.PROCESSING
+    assert not queue.wait(timeout=0.05)
+
+    futures[first.url].set_result("1.mp4")
+    futures[second.url].set_exception(RuntimeError("ffmpeg failed"))
+    queue.cancel(third.id)
+    assert queue.wait(timeout=5)
+    assert (first.state, first.filename) == (JobState.DONE, "1.mp4")
+    assert (second.state, second.error) == (JobState.FAILED, "ffmpeg failed")
+    assert third.state == JobState.CANCELLED
@@ -0,0 +1,96 @@
+"""
+Tests for the thread pool download engine.
+"""
+import os
+import threading
+
+from src.core.downloader import VideoDownloader
+from src.core.engine import DownloadEngine
+from src.gui.qt_downloader import QtVideoDownloader
+
+
+def _collect(downloader):
+    events = {"progress": [], "complete": [], "error": [], "cancelled": 0}
+
+    def on_progress(percent, status):
+        events["progress"].append(percent)
+
+    def on_cancelled():
+        events["cancelled"] += 1
+
+    downloader.progress.connect(on_progress)
+    downloader.complete.connect(events["complete"].append)
+    downloader.error.connect(events["error"].append)
+    downloader.cancelled.connect(on_cancelled)
+    return events
+
+
+def test_download_runs_off_gui_thread(qapp, wait_until, media_server, tmp_path):
+    """The job completes on a pool thread and reports back through signals."""
+    url = media_server.add("/clip.mp4", os.urandom(512 * 1024))
+    downloader = QtVideoDownloader(VideoDownloader())
+    events = _collect(downloader)
+    engine = DownloadEngine(downloader)
+
+    worker_threads = set()
+    original = downloader.download
+
+    def recording_download(*args, **kwargs):
+        worker_threads.add(threading.get_ident())
+        return original(*args, **kwargs)
+
+    downloader.download = recording_download
+    engine.submit(url, str(tmp_path))
+
+    assert wait_until(lambda: events["complete"] or events["error"])
+    assert not events["error"], events["error"]
+    assert threading.get_ident() not in worker_threads
+    assert events["progress"][-1] == 100
+    assert os.path.getsize(tmp_path / events["complete"][0]) == 512 * 1024
+    assert engine.wait_for_done(5000)
+    assert engine.active_count() == 0
+
+
+def test_cancel_aborts_and_removes_partial_files(qapp, wait_until, media_server, tmp_path):
+    """Cancelling stops yt-dlp mid-transfer and cleans up .part files."""
+    media_server.chunk_size = 16 * 1024
+    media_server.chunk_delay = 0.02
+    url = media_server.add("/big.mp4", os.urandom(8 * 1024 * 1024))
+    downloader = QtVideoDownloader(VideoDownloader())
+    events = _collect(downloader)
+    engine = DownloadEngine(downloader)
+
+    job_id = engine.submit(url, str(tmp_path))
+    assert wait_until(lambda: len(events["progress"]) > 2)
+    engine.cancel(job_id)
+
+    assert wait_until(lambda: events["cancelled"] or events["complete"])
+    assert events["cancelled"] == 1
+    assert not events["complete"]
+    assert engine.wait_for_done(5000)
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_event_loop_stays_responsive(qapp, wait_until, media_server, tmp_path):
+    """Timer events keep being handled while a download is running."""
+    from PyQt6.QtCore import QTimer
+
+    media_server.chunk_delay = 0.01
+    url = media_server.add("/stream.mp4", os.urandom(2 * 1024 * 1024))
+    downloader = QtVideoDownloader(VideoDownloader())
+    events = _collect(downloader)
+    engine = DownloadEngine(downloader)
+
+    # Progress reports and completions seen by the time of each tick
+    ticks = []
+    timer = QTimer()
+    timer.setInterval(5)
+    timer.timeout.connect(lambda: ticks.append((len(events["progress"]), len(events["complete"]))))
+    timer.start()
+    engine.submit(url, str(tmp_path))
+    assert wait_until(lambda: events["complete"] or events["error"], timeout=30)
+    timer.stop()
+
+    assert not events["error"], events["error"]
+    running = [tick for tick in ticks if tick[0] and not tick[1]]
+    assert len(running) > 1
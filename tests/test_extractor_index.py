@@ -0,0 +1,116 @@
+"""
+Tests for the offline extractor index.
+"""
+import subprocess
+import sys
+import threading
+from pathlib import Path
+
+import pytest
+from yt_dlp.extractor import gen_extractor_classes
+from yt_dlp.extractor.common import InfoExtractor
+
+from src.core import extractor_index
+from src.core.extractor_index import ExtractorIndex, pattern_keys
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def test_pattern_keys():
+    assert pattern_keys(r'https?://(?:www\.)?example\.com/v/(?P<id>\d+)')['hosts'] == {'example.com'}
+    # Subdomains matched by a pattern only count as whole labels
+    assert pattern_keys(r'https?://[a-z]+tube\.org/(?P<id>\d+)')['hosts'] == {'org'}
+    assert pattern_keys(r'https?://(?:foo|bar)\.tv/(?P<id>\d+)')['hosts'] == {'foo.tv', 'bar.tv'}
+    assert pattern_keys(r'https?://(?:www\.)?dailymotion\.[a-z]{2,3}/x')['labels'] == {'dailymotion'}
+    assert pattern_keys(r':ytfav(?:ou?rite)?s?')['firsts'] == {':'}
+    assert pattern_keys(r'(?P<id>[\w-]{11})')['bare'] == {''}
+    assert pattern_keys(r'https?://[^/]+/Mediasite/(?P<id>\d+)')['firsts'] == {'h'}
+    assert pattern_keys(r'.+') is None
+
+
+@pytest.fixture(scope='module')
+def ie_classes():
+    return list(gen_extractor_classes())
+
+
+@pytest.fixture(scope='module')
+def index(ie_classes):
+    return ExtractorIndex.build(ie_classes)
+
+
+def test_match_agrees_with_yt_dlp(index, ie_classes):
+    """The index picks what yt-dlp's own scan picks for the extractors' test URLs.
+
+    Extractors that narrow their pattern with a custom suitable() can
+    differ in which one is named, never in whether the URL is supported.
+    """
+    extractors = [ie for ie in ie_classes if ie.ie_key() != 'Generic']
+    custom = {ie.ie_key() for ie in extractors if 'suitable' in vars(ie)}
+    urls = [case['url'] for ie in extractors
+            for case in ie.get_testcases(include_onlymatching=True) if 'url' in case][::8]
+    urls += ['https://example.com/clip.mp4', 'ytsearch5:cats', 'dQw4w9WgXcQ']
+    for url in urls:
+        expected = next((ie.ie_key() for ie in extractors if ie.suitable(url)), None)
+        found = index.match(url)
+        assert (found is None) == (expected is None), url
+        if found is not None and found.key != expected:
+            assert found.key in custom, url
+    assert index.match('https://example.com/clip.mp4') is None
+    assert index.match('https://m.youtube.com/watch?v=dQw4w9WgXcQ').key == 'Youtube'
+
+
+def test_lookup_tries_few_patterns(ie_classes):
+    """A lookup compiles and tries the patterns for the URL's host, not all."""
+    index = ExtractorIndex.build(ie_classes)
+    urls = [case['url'] for ie in ie_classes
+            for case in ie.get_testcases(include_onlymatching=True) if 'url' in case][:2000]
+    for url in urls:
+        index.match(url)
+    assert max(len(index._candidates(url)) for url in urls) < len(index._patterns) // 20
+    assert sum(compiled is not None for compiled in index._compiled) < len(index._patterns) // 2
+
+
+def test_saved_index_answers_without_loading_yt_dlp(index, tmp_path):
+    path = tmp_path / 'index.json'
+    index.save(path)
+    script = (
+        'import sys\n'
+        'from src.core.extractor_index import ExtractorIndex\n'
+        f'index = ExtractorIndex.load({str(path)!r})\n'
+        'assert index.match("https://vimeo.com/123").key == "Vimeo"\n'
+        'assert index.search("dailymotion")\n'
+        'print(sorted(m for m in sys.modules if m.startswith("yt_dlp")))\n'
+    )
+    result = subprocess.run([sys.executable, '-c', script], cwd=str(ROOT), capture_output=True,
+                            text=True, timeout=120)
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip() == '[]'
+
+
+def test_custom_extractors():
+    class ClipIE(InfoExtractor):
+        IE_DESC = 'Clip site'
+        _VALID_URL = r'https?://(?:www\.)?clips\.example/(?P<id>\d+)'
+
+    class ClipSearchIE(InfoExtractor):
+        _VALID_URL = r'clipsearch:(?P<query>.+)'
+
+    index = ExtractorIndex.build([ClipIE, ClipSearchIE])
+    assert index.match('https://www.clips.example/42').key == 'Clip'
+    assert index.match('clipsearch:cats').key == 'ClipSearch'
+    assert index.match('https://clips.example.org/42') is None
+    assert [info.key for info in index.search('clip site')] == ['Clip']
+
+
+def test_loaded_index_does_not_wait_for_the_loader(index, monkeypatch):
+    release = threading.Event()
+    monkeypatch.setattr(extractor_index, '_default', None)
+    monkeypatch.setattr(extractor_index, '_load_default', lambda: release.wait(5) and index)
+    loaded = []
+
+    thread = extractor_index.load_default_index(loaded.append)
+    assert extractor_index.loaded_index() is None
+    release.set()
+    thread.join(5)
+    assert loaded == [index]
+    assert extractor_index.loaded_index() is index
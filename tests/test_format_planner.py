@@ -0,0 +1,108 @@
+"""
+Tests for local format planning with size prediction and budgets.
+"""
+import os
+
+import pytest
+
+from src import cli
+from src.core.format_planner import NoFormatFits, choose_format, merge_ext, plan_formats
+from src.core.metadata_cache import MetadataCache
+from src.core.records import FormatRecord, VideoRecord
+
+MB = 1000 * 1000
+
+
+def _record():
+    return VideoRecord.from_info({
+        'id': 'v',
+        'duration': 100,
+        'formats': [
+            {'format_id': '18', 'ext': 'mp4', 'height': 360, 'vcodec': 'avc1.42001E',
+             'acodec': 'mp4a.40.2', 'filesize': 8 * MB},
+            {'format_id': '137', 'ext': 'mp4', 'height': 1080, 'vcodec': 'avc1.640028',
+             'acodec': 'none', 'tbr': 4000},
+            {'format_id': '248', 'ext': 'webm', 'height': 1080, 'vcodec': 'vp9',
+             'acodec': 'none', 'filesize_approx': 40 * MB},
+            {'format_id': '247', 'ext': 'webm', 'height': 720, 'vcodec': 'vp9',
+             'acodec': 'none', 'filesize': 20 * MB},
+            {'format_id': '140', 'ext': 'm4a', 'vcodec': 'none', 'acodec': 'mp4a.40.2',
+             'abr': 128, 'filesize': 1600 * 1000},
+            {'format_id': '251', 'ext': 'webm', 'vcodec': 'none', 'acodec': 'opus', 'abr': 160},
+            {'format_id': '999', 'ext': 'mp4', 'height': 2160, 'vcodec': 'av01.0.12M.08',
+             'acodec': 'none'},
+        ],
+    }, 'https://example.com/v')
+
+
+def test_plans_rank_by_quality_and_predict_sizes():
+    plans = plan_formats(_record())
+    best = plans[0]
+    # The 2160p stream has no size but still ranks first without a budget
+    assert best.format_ids == '999+251' and best.size is None
+    assert [plan.format_ids for plan in plans[1:4]] == ['999+140', '248+251', '248+140']
+
+    vp9 = plans[2]
+    assert (vp9.ext, vp9.stream_copy, vp9.merged) == ('webm', True, True)
+    # Estimate plus opus 160 KBit/s for 100 s
+    assert vp9.size == 40 * MB + 2 * MB and not vp9.size_exact
+
+    avc = next(plan for plan in plans if plan.format_ids == '137+140')
+    assert avc.size == 50 * MB + 1600 * 1000 and avc.ext == 'mp4'
+    mixed = next(plan for plan in plans if plan.format_ids == '137+251')
+    assert (mixed.ext, mixed.stream_copy) == ('mkv', False)
+
+
+def test_budgets_and_selections():
+    record = _record()
+    assert choose_format(record, max_size=30 * MB).format_ids == '247+251'
+    assert choose_format(record, max_size=21600 * 1000).format_ids == '247+140'
+    assert choose_format(record, max_size=MB) is None
+    assert choose_format(record, 'sd').format_ids == '18'
+    assert choose_format(record, merge=False).format_ids == '18'
+    assert choose_format(record, 'audio').format_ids == '251'
+    audio = choose_format(record, 'audio', prefer_copy=True, audio_format='m4a')
+    assert audio.format_ids == '140' and audio.stream_copy
+
+    # VP9 with AAC only merges into MKV
+    aac_only = VideoRecord('u', formats=tuple(
+        fmt for fmt in record.formats if fmt.format_id in ('137', '248', '140')))
+    assert choose_format(aac_only).format_ids == '248+140'
+    assert choose_format(aac_only, prefer_copy=True).format_ids == '137+140'
+
+
+def test_merge_containers():
+    def fmt(ext, vcodec='none', acodec='none'):
+        return FormatRecord('x', ext=ext, vcodec=vcodec, acodec=acodec)
+
+    assert merge_ext(fmt('mp4', vcodec='avc1.4d401f'), fmt('m4a', acodec='mp4a.40.2')) == 'mp4'
+    assert merge_ext(fmt('mp4', vcodec='av01.0.05M.08'), fmt('webm', acodec='opus')) == 'webm'
+    # Unknown codecs fall back to the extensions
+    assert merge_ext(fmt('mp4', vcodec='unknown'), fmt('m4a', acodec='unknown')) == 'mp4'
+    assert merge_ext(fmt('webm', vcodec='vp9'), fmt('m4a', acodec='mp4a.40.2')) == 'mkv'
+
+
+def test_downloader_plans_from_one_extraction(fake_site, tmp_path):
+    downloader = fake_site.downloader(metadata_cache=MetadataCache())
+    url = fake_site.watch_url('abc')
+
+    plans = downloader.plan_formats(url, 'audio')
+    assert [(plan.format_ids, plan.size) for plan in plans] == [
+        ('audio-opus', 200000), ('audio-aac', 160000)]
+    assert downloader.plan_formats(url, 'audio', max_size=180000)[0].format_ids == 'audio-aac'
+    assert fake_site.calls == 1
+
+    filename = downloader.fetch(url, str(tmp_path), 'audio', max_size=180000)
+    assert filename == 'Clip abc.m4a'
+    assert (tmp_path / filename).read_bytes().startswith(b'codec=aac')
+    # Video formats of the fake site have no size to predict
+    with pytest.raises(NoFormatFits):
+        downloader.fetch(url, str(tmp_path), max_size=10 * MB)
+
+
+def test_cli_max_size(fake_site, tmp_path, capsys, monkeypatch):
+    monkeypatch.setattr(cli, 'VideoDownloader', lambda **kwargs: fake_site.downloader(**kwargs))
+    code = cli.main([fake_site.watch_url('abc'), '-o', str(tmp_path), '--no-cache', '--no-archive',
+                     '-f', 'audio', '--max-size', '180K'])
+    assert code == cli.EXIT_OK
+    assert os.listdir(tmp_path) == ['Clip abc.m4a']
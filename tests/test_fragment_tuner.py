@@ -0,0 +1,60 @@
+"""
+Tests for parallel fragment downloads and the AIMD fragment tuner.
+"""
+import json
+
+from src.core.downloader import VideoDownloader
+from src.core.fragment_tuner import FragmentTuner
+
+
+def test_aimd_rules():
+    tuner = FragmentTuner(initial=4, maximum=6)
+    assert tuner.level("cdn") == 4
+    assert tuner.record("cdn", 4, 1000.0) == 5  # First measurement: probe upwards
+    assert tuner.record("cdn", 5, 1500.0) == 6
+    assert tuner.record("cdn", 6, 2000.0) == 6  # Capped at maximum
+    assert tuner.record("cdn", 6, 2010.0) == 6  # Within tolerance: hold
+    assert tuner.record("cdn", 6, 1000.0) == 5  # Worse: step back
+    assert tuner.record("cdn", 5, 1000.0, throttled=True) == 2
+    assert tuner.record("cdn", 2, 1000.0, errors=3) == 1
+    assert tuner.record("cdn", 1, 1000.0, errors=1) == 1  # Never below minimum
+    assert tuner.level("other") == 4
+
+
+def test_levels_persist_per_host(tmp_path):
+    path = tmp_path / "levels.json"
+    FragmentTuner(path).record("youtube", 4, 1000.0)
+    assert json.loads(path.read_text())["youtube"]["level"] == 5
+    assert FragmentTuner(path).level("youtube") == 5
+
+    path.write_text("not json")
+    assert FragmentTuner(path).level("youtube") == 4
+
+
+def test_parallel_fragments_overlap(media_server, tmp_path):
+    media_server.latency = 0.1
+    url = media_server.add_hls("show", segments=20)
+
+    in_flight = {}
+    for level in (1, 4):
+        media_server.max_in_flight = 0
+        filename = VideoDownloader().fetch(url, str(tmp_path / str(level)), concurrent_fragments=level)
+        in_flight[level] = media_server.max_in_flight
+        assert (tmp_path / str(level) / filename).stat().st_size == 20 * 16 * 1024
+    assert in_flight == {1: 1, 4: 4}
+
+
+def test_tuner_ramps_up_and_backs_off_on_429(media_server, tmp_path):
+    media_server.latency = 0.02
+    url = media_server.add_hls("show", segments=12)
+    tuner = FragmentTuner(tmp_path / "levels.json", initial=2)
+    downloader = VideoDownloader(fragment_tuner=tuner)
+    host = media_server.base_url.split("//")[1]
+
+    downloader.fetch(url, str(tmp_path / "a"))
+    assert tuner.level(host) == 3
+
+    media_server.failures["/show/seg3.ts"] = [429]
+    downloader.fetch(url, str(tmp_path / "b"))
+    assert tuner.level(host) == 1
+    assert FragmentTuner(tmp_path / "levels.json").level(host) == 1
@@ -0,0 +1,96 @@
+"""
+Tests for the persistent download history and its table model.
+"""
+import pytest
+from PyQt6.QtCore import Qt
+
+from src.core.download_queue import DownloadQueue, JobState
+from src.core.history import DownloadHistory
+from src.gui.history_model import HistoryTableModel
+
+HISTORY_ROWS = 500_000
+
+
+@pytest.fixture(scope="module")
+def big_history(tmp_path_factory):
+    path = tmp_path_factory.mktemp("history") / "history.sqlite"
+    history = DownloadHistory(path)
+    # Generated inside SQLite; inserting from Python would dominate the run
+    history._db.execute(f"""
+        INSERT INTO downloads (url, path, title, video_id, extractor, platform,
+                               format_selection, completed)
+        WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < {HISTORY_ROWS})
+        SELECT 'https://example.com/watch/' || i, '/downloads/' || i || '.mp4',
+               'clip ' || i || CASE i % 4 WHEN 0 THEN ' music live' WHEN 1 THEN ' cat video'
+                                          WHEN 2 THEN ' tutorial' ELSE ' news' END,
+               'v' || i, 'Generic', CASE i % 3 WHEN 0 THEN 'youtube' ELSE 'vimeo' END,
+               'best', 1.7e9 + i
+        FROM n
+    """)
+    history.close()
+    return path
+
+
+def _runner(job, report):
+    job.title, job.video_id, job.extractor = "Big Buck Bunny", "bbb", "Generic"
+    return "bunny.mp4"
+
+
+def test_records_finished_jobs_once(tmp_path):
+    history = DownloadHistory()
+    queue = DownloadQueue(_runner, submit=lambda fn: fn())
+    history.attach(queue)
+
+    job = queue.add("https://www.youtube.com/watch?v=bbb", str(tmp_path), "hd")
+    assert job.state == JobState.DONE
+    queue.report_progress(job.id, 100.0, "Download complete!")
+
+    [entry] = history.page()
+    assert (entry.title, entry.video_id, entry.extractor) == ("Big Buck Bunny", "bbb", "Generic")
+    assert entry.path == str(tmp_path / "bunny.mp4")
+    assert (entry.platform, entry.format_selection) == ("youtube", "hd")
+    assert history.lookup(url=job.url) == [entry]
+    assert history.lookup(video_id="bbb", extractor="Generic") == [entry]
+
+
+def test_search_and_keyset_pages():
+    history = DownloadHistory()
+    for i in range(5):
+        history.add(f"https://example.com/{i}", f"/d/{i}.mp4", title=f"Cats compilation {i}",
+                    platform="vimeo" if i % 2 else "youtube", completed=1000.0 + i)
+    history.add("https://example.com/dog", "/d/dog.mp4", title="Dog tricks")
+
+    assert [e.title for e in history.page("dog")] == ["Dog tricks"]
+    # The last word is a prefix, as the user is typing
+    first = history.page("cats comp", limit=2)
+    assert [e.title for e in first] == ["Cats compilation 4", "Cats compilation 3"]
+    rest = history.page("cats comp", before=first[-1].id)
+    assert [e.title for e in rest] == ["Cats compilation 2", "Cats compilation 1",
+                                       "Cats compilation 0"]
+    assert [e.title for e in history.page("cat", platform="vimeo")] == \
+        ["Cats compilation 3", "Cats compilation 1"]
+    assert [e.title for e in history.since(1003.0)] == \
+        ["Cats compilation 3", "Cats compilation 4", "Dog tricks"]
+    assert history.page('"unbalanced* OR') == []
+
+
+def test_model_loads_rows_on_demand(qapp, big_history):
+    history = DownloadHistory(big_history)
+    model = HistoryTableModel(history, page_size=100)
+
+    assert model.rowCount() == 100
+    assert model.data(model.index(0, 0)) == f"clip {HISTORY_ROWS} music live"
+    assert model.canFetchMore()
+    model.fetchMore()
+    assert model.rowCount() == 200
+    assert model.entry_at(199).id == HISTORY_ROWS - 199
+
+    model.set_query("cat vid")
+    assert model.rowCount() == 100
+    assert all("cat video" in model.entry_at(row).title for row in range(100))
+
+    model.set_query("")
+    history.add("https://example.com/new", "/downloads/new.mp4", title="Newest")
+    model.refresh()
+    assert model.entry_at(0).title == "Newest"
+    assert model.data(model.index(0, 0), role=Qt.ItemDataRole.UserRole) == "/downloads/new.mp4"
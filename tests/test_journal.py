@@ -0,0 +1,124 @@
+"""
+Tests for the crash-safe job journal.
+"""
+import os
+import signal
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+from src import cli
+from src.core.download_queue import DownloadQueue, JobState
+from src.core.journal import JobJournal
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def _idle_runner(job, report):
+    report(10.0, "Downloading...", downloaded_bytes=100, total_bytes=1000,
+           part_file="/tmp/clip.mp4.part", format_ids="137+140")
+    return "clip.mp4"
+
+
+def test_records_unfinished_jobs_and_drops_finished(tmp_path):
+    journal = JobJournal(tmp_path / "jobs.sqlite", checkpoint_interval=0)
+    queue = DownloadQueue(_idle_runner, max_concurrent=1, submit=lambda fn: None)
+    journal.attach(queue)
+
+    job = queue.add("https://example.com/v", str(tmp_path), "hd", connections=4)
+    other = queue.add("https://example.com/w", str(tmp_path))
+    queue.report_progress(job.id, 10.0, "Downloading...", downloaded_bytes=100, total_bytes=1000,
+                          part_file="/tmp/v.part", format_ids="137+140")
+    queue.cancel(other.id)
+
+    rows = JobJournal(tmp_path / "jobs.sqlite").unfinished()
+    assert len(rows) == 1
+    assert rows[0]["url"] == "https://example.com/v"
+    assert rows[0]["state"] == "running"
+    assert (rows[0]["downloaded_bytes"], rows[0]["total_bytes"]) == (100, 1000)
+    assert (rows[0]["part_file"], rows[0]["format_ids"], rows[0]["connections"]) == \
+        ("/tmp/v.part", "137+140", 4)
+
+
+def test_restore_requeues_with_resolved_formats(tmp_path):
+    path = tmp_path / "jobs.sqlite"
+    first = JobJournal(path, checkpoint_interval=0)
+    queue = DownloadQueue(_idle_runner, max_concurrent=1, submit=lambda fn: None)
+    first.attach(queue)
+    running = queue.add("https://example.com/a", str(tmp_path))
+    paused = queue.add("https://example.com/b", str(tmp_path))
+    queue.report_progress(running.id, 50.0, "Downloading...", downloaded_bytes=500,
+                          total_bytes=1000, format_ids="22")
+    queue.pause_job(paused.id)
+
+    started = []
+    journal = JobJournal(path)
+    restored_queue = DownloadQueue(_idle_runner, submit=started.append)
+    journal.attach(restored_queue)
+    restored = journal.restore(restored_queue)
+
+    assert [(j.url, j.state) for j in restored] == [
+        ("https://example.com/a", JobState.RUNNING), ("https://example.com/b", JobState.PAUSED)]
+    assert restored[0].format_ids == "22"
+    assert restored[0].progress == 50.0
+    # Restored jobs keep updating their original rows
+    for fn in started:
+        fn()
+    assert [row["url"] for row in journal.unfinished()] == ["https://example.com/b"]
+
+
+def test_audio_settings_are_restored(tmp_path):
+    path = tmp_path / "jobs.sqlite"
+    journal = JobJournal(path)
+    queue = DownloadQueue(_idle_runner, submit=lambda fn: None)
+    journal.attach(queue)
+    queue.add("https://example.com/a", "/tmp", "audio", audio_format="mp3", audio_quality="192")
+    queue.add("https://example.com/b", "/tmp", "audio")
+    journal.close()
+
+    journal = JobJournal(path)
+    restored = journal.restore(DownloadQueue(_idle_runner, submit=lambda fn: None))
+    assert [(job.audio_format, job.audio_quality) for job in restored] == [("mp3", "192"),
+                                                                           ("best", None)]
+    journal.close()
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="POSIX signals")
+def test_resume_after_crash_continues_from_offset(media_server, tmp_path, monkeypatch, capsys):
+    monkeypatch.setenv("VIDLEECH_HOME", str(tmp_path / "home"))
+    payload = os.urandom(4 * 1024 * 1024)
+    url = media_server.add("/long.mp4", payload)
+    media_server.chunk_size = 16 * 1024
+    media_server.chunk_delay = 0.01
+    out = tmp_path / "out"
+
+    proc = subprocess.Popen([sys.executable, "-m", "src.cli", url, "-o", str(out), "--no-cache"],
+                            cwd=ROOT, stdout=subprocess.DEVNULL)
+    part = out / "long.mp4.part"
+    try:
+        deadline = time.monotonic() + 30
+        while time.monotonic() < deadline:
+            rows = JobJournal.default("cli-jobs.sqlite").unfinished()
+            if rows and rows[0]["downloaded_bytes"] > 512 * 1024:
+                break
+            time.sleep(0.05)
+        # Simulate a crash: no shutdown handlers run
+        proc.send_signal(signal.SIGKILL)
+        proc.wait(timeout=10)
+    finally:
+        if proc.poll() is None:
+            proc.kill()
+    offset = part.stat().st_size
+    assert 0 < offset < len(payload)
+
+    media_server.chunk_delay = 0
+    requests_before = len(media_server.requests)
+    assert cli.main(["--resume", "-o", str(out), "--no-cache"]) == cli.EXIT_OK
+
+    assert (out / "long.mp4").read_bytes() == payload
+    ranges = [r[2] for r in media_server.requests[requests_before:] if r[2]]
+    assert ranges and int(ranges[-1].split("=")[1].rstrip("-")) >= offset - 64 * 1024
+    assert JobJournal.default("cli-jobs.sqlite").unfinished() == []
@@ -0,0 +1,116 @@
+"""
+Tests for the persistent extraction cache.
+"""
+import time
+
+from src.core import metadata_cache
+from src.core.metadata_cache import MetadataCache
+
+
+def _info(video_id='abc', size=1):
+    return {
+        'id': video_id,
+        'title': f'Video {video_id}',
+        'duration': 42,
+        'extractor_key': 'Youtube',
+        'webpage_url': f'https://www.youtube.com/watch?v={video_id}',
+        'formats': [
+            {'format_id': str(i), 'url': f'https://cdn.example/{video_id}/{i}?sig=x' + 'y' * size,
+             'http_headers': {'User-Agent': 'ua'}, 'height': 360 + i, 'ext': 'mp4'}
+            for i in range(3)
+        ],
+        '__post_extractor': object(),
+    }
+
+
+def test_roundtrip_and_counters(tmp_path):
+    cache = MetadataCache(tmp_path / 'cache.sqlite')
+    assert cache.get('https://www.youtube.com/watch?v=abc') is None
+    cache.put('https://youtu.be/abc', _info())
+
+    # Hits under both the entered URL and the canonical page URL,
+    # regardless of tracking parameters
+    info = cache.get('https://www.youtube.com/watch?v=abc&utm_source=x')
+    assert info['title'] == 'Video abc'
+    assert info['formats'][0]['url'].startswith('https://cdn.example/abc/0')
+    assert '__post_extractor' not in info
+    assert cache.get('https://youtu.be/abc') is not None
+    assert cache.stats()['hits'] == 2
+    assert cache.stats()['misses'] == 1
+
+    # Survives reopening
+    cache.close()
+    assert MetadataCache(tmp_path / 'cache.sqlite').get('https://youtu.be/abc')['id'] == 'abc'
+
+
+def test_field_classes_expire_independently(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(metadata_cache.time, 'time', lambda: now[0])
+    cache = MetadataCache(ttls={'urls': 10, 'formats': 100, 'stable': 1000})
+    cache.put('https://youtu.be/abc', _info())
+
+    now[0] += 50
+    assert cache.get('https://youtu.be/abc') is None
+    info = cache.get('https://youtu.be/abc', playable=False)
+    assert [f['height'] for f in info['formats']] == [360, 361, 362]
+    assert all('url' not in f and 'http_headers' not in f for f in info['formats'])
+
+    now[0] += 100
+    info = cache.get('https://youtu.be/abc', playable=False)
+    assert info['title'] == 'Video abc' and 'formats' not in info
+
+    now[0] += 1000
+    assert cache.get('https://youtu.be/abc', playable=False) is None
+
+
+def test_urls_are_stored_apart_and_unserializable_values_skipped():
+    info = _info()
+    info['subtitles'] = {'en': [{'ext': 'vtt', 'url': 'https://cdn.example/en.vtt'}]}
+    info['formats'].append({'format_id': 'dash', 'url': 'https://cdn.example/dash.mpd',
+                            'fragments': lambda ctx: iter(()), 'height': 1080})
+    info['_format_sort_fields'] = ('res', 'br')
+    info['thumbnail_generator'] = object()
+
+    classes = metadata_cache.split_info(info)
+    assert classes['urls']['formats'][0] == {'url': info['formats'][0]['url'],
+                                             'http_headers': {'User-Agent': 'ua'}}
+    assert classes['urls']['subtitles'] == {'en': [{'url': 'https://cdn.example/en.vtt'}]}
+    assert 'thumbnail_generator' not in classes['stable']
+
+    cache = MetadataCache()
+    cache.put('https://youtu.be/abc', info)
+    cached = cache.get('https://youtu.be/abc')
+    # The format with a generated fragment list is left out, not broken
+    assert [f['format_id'] for f in cached['formats']] == ['0', '1', '2']
+    assert cached['formats'] == info['formats'][:3]
+    assert cached['subtitles'] == info['subtitles']
+    assert cached['_format_sort_fields'] == ['res', 'br']
+
+
+def test_lru_eviction_respects_size_cap():
+    cache = MetadataCache()
+    cache.put('https://example.com/a', {**_info('a'), 'webpage_url': 'https://example.com/a'})
+    entry_size = cache.total_bytes()
+    cache.max_bytes = entry_size * 3
+    cache.put('https://example.com/b', {**_info('b'), 'webpage_url': 'https://example.com/b'})
+    cache.put('https://example.com/c', {**_info('c'), 'webpage_url': 'https://example.com/c'})
+    time.sleep(0.01)
+    cache.get('https://example.com/a')  # a becomes most recently used
+    cache.put('https://example.com/d', {**_info('d'), 'webpage_url': 'https://example.com/d'})
+
+    assert cache.total_bytes() <= cache.max_bytes
+    assert cache.get('https://example.com/b') is None
+    assert cache.get('https://example.com/a') is not None
+    assert cache.get('https://example.com/d') is not None
+
+
+def test_downloader_reuses_cached_extraction(fake_site, tmp_path):
+    """Info lookups and downloads after the first cost no extraction."""
+    downloader = fake_site.downloader(metadata_cache=MetadataCache())
+    url = fake_site.watch_url('abc')
+
+    info = downloader.get_video_info(url)
+    assert info['format_id'] == 'high'
+    assert downloader.get_video_info(url)['title'] == 'Clip abc'
+    assert downloader.fetch(url, str(tmp_path)) == 'Clip abc.webm'
+    assert fake_site.calls == 1
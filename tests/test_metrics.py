@@ -0,0 +1,152 @@
+"""
+Tests for per-job spans, counters and their JSON-lines and Prometheus export.
+"""
+import json
+import os
+import urllib.request
+
+import pytest
+
+from src import cli
+from src.core.downloader import VideoDownloader
+from src.core.metrics import COMPLETED, FAILED, JobTrace, Metrics
+from src.core.ydl import _classes
+
+
+class Cause(Exception):
+    pass
+
+
+class Wrapped(Exception):
+    """Carries its cause like yt-dlp's DownloadError."""
+
+    def __init__(self, cause):
+        super().__init__(f'ERROR: {cause}')
+        self.exc_info = (type(cause), cause, None)
+
+
+def test_trace_spans_and_counters():
+    trace = JobTrace('http://example.com/v', job_id=7)
+    with trace.span('extract'):
+        pass
+    download = trace.begin('download')
+    with trace.span('rename'):
+        pass
+    trace.add_bytes(100)
+    trace.retry()
+    trace.http_response(200)
+    trace.http_response(206)
+    trace.http_response(503)
+    trace.finish(FAILED, Wrapped(Cause('reset')))
+
+    assert download.end is not None
+    record = trace.to_dict()
+    assert list(record['phases']) == ['extract', 'download', 'rename']
+    assert [span['phase'] for span in record['spans']] == ['extract', 'download', 'rename']
+    assert record['spans'][0]['start'] <= record['spans'][1]['start']
+    assert record['http'] == {'2xx': 2, '5xx': 1}
+    assert (record['bytes'], record['retries'], record['job_id']) == (100, 1, 7)
+    assert (record['outcome'], record['error_type']) == (FAILED, 'Cause')
+    assert record['error'] == 'ERROR: reset'
+
+
+def test_prometheus_export_aggregates_finished_jobs(tmp_path):
+    metrics = Metrics(buckets=(1.0, 10.0))
+    finished = []
+    metrics.add_sink(finished.append)
+    first = metrics.start('a')
+    running = metrics.start('b')
+    with first.span('download'):
+        first.add_bytes(2048)
+        first.http_response(404)
+    metrics.finish(first, FAILED, Cause('gone'))
+
+    text = metrics.prometheus()
+    assert finished == [first]
+    assert 'vidleech_jobs_running 1\n' in text
+    assert 'vidleech_jobs_total{outcome="failed"} 1\n' in text
+    assert 'vidleech_job_errors_total{type="Cause"} 1\n' in text
+    assert 'vidleech_received_bytes_total 2048\n' in text
+    assert 'vidleech_http_responses_total{class="4xx"} 1\n' in text
+    assert 'vidleech_phase_seconds_bucket{phase="download",le="1"} 1\n' in text
+    assert 'vidleech_phase_seconds_count{phase="download"} 1\n' in text
+    assert '# TYPE vidleech_phase_seconds histogram\n' in text
+
+    metrics.finish(running)
+    path = tmp_path / 'vidleech.prom'
+    metrics.write_prometheus(str(path))
+    assert 'vidleech_jobs_running 0\n' in path.read_text()
+    assert [p.name for p in tmp_path.iterdir()] == ['vidleech.prom']
+
+    server = metrics.serve(0)
+    try:
+        port = server.server_address[1]
+        with urllib.request.urlopen(f'http://127.0.0.1:{port}/metrics') as response:
+            assert response.headers['Content-Type'].startswith('text/plain')
+            assert 'vidleech_jobs_total{outcome="completed"} 1' in response.read().decode()
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_downloads_record_phases_bytes_and_responses(media_server, tmp_path):
+    url = media_server.add_hls("show", segments=6)
+    media_server.failures["/show/seg2.ts"] = [503]
+    metrics = Metrics()
+    traces = []
+    metrics.add_sink(traces.append)
+    downloader = VideoDownloader(metrics=metrics)
+
+    downloader.fetch(url, str(tmp_path), concurrent_fragments=1)
+    with pytest.raises(Exception):
+        downloader.fetch(media_server.url("/missing.mp4"), str(tmp_path))
+
+    done, failed = traces
+    assert done.outcome == COMPLETED
+    assert list(done.phase_seconds())[:3] == ['extract', 'select', 'download']
+    assert {'rename', 'finalize'} <= set(done.phase_seconds())
+    # The failed fragment is skipped
+    assert done.bytes >= 5 * 16 * 1024
+    assert done.http['5xx'] == 1 and done.http['2xx'] >= 6
+    assert failed.outcome == FAILED
+    assert failed.error_type == 'HTTPError'
+    assert failed.http == {'4xx': 1}
+    assert 'vidleech_jobs_total{outcome="completed"} 1' in metrics.prometheus()
+
+
+def test_downloader_retries_and_renames_are_traced():
+    class Downloader:
+        def report_retry(self, err, count, retries, frag_index=None, fatal=True):
+            reported.append(count)
+
+        def try_rename(self, old, new):
+            renamed.append((old, new))
+
+    reported, renamed = [], []
+    fd, trace = Downloader(), JobTrace('url')
+    _classes()['YoutubeDL']._trace_downloader(fd, trace)
+
+    fd.report_retry(Cause(), 1, 2, frag_index=3)
+    fd.report_retry(Cause(), 2, 2)
+    # Giving up is not a retry
+    fd.report_retry(Cause(), 3, 2, fatal=False)
+    fd.try_rename('a.part', 'a')
+
+    assert reported == [1, 2, 3] and renamed == [('a.part', 'a')]
+    assert trace.retries == 2
+    assert [span.phase for span in trace.spans] == ['rename']
+
+
+def test_cli_exports_metrics(media_server, tmp_path, capsys):
+    url = media_server.add("/clip.mp4", os.urandom(64 * 1024))
+    lines, prom = tmp_path / "jobs.jsonl", tmp_path / "vidleech.prom"
+
+    code = cli.main([url, "-o", str(tmp_path / "out"), "--no-cache",
+                     "--metrics", str(lines), "--prometheus", str(prom)])
+
+    assert code == cli.EXIT_OK
+    record, = [json.loads(line) for line in lines.read_text().splitlines()]
+    assert record['url'] == url and record['outcome'] == COMPLETED
+    assert isinstance(record['job_id'], int)
+    assert record['bytes'] >= 64 * 1024
+    assert 'vidleech_jobs_total{outcome="completed"} 1' in prom.read_text()
@@ -0,0 +1,60 @@
+"""
+Tests for incremental playlist expansion.
+"""
+import threading
+
+from yt_dlp.utils import OnDemandPagedList
+
+from src.core.download_queue import DownloadQueue, JobState
+from src.core.playlist import PlaylistExpander, iter_entries
+
+
+def test_iter_entries_walks_pages_lazily_and_flattens():
+    fetched = []
+
+    def fetch_page(page):
+        fetched.append(page)
+        return [{"_type": "url", "url": f"v{page}-{i}"} for i in range(2)]
+
+    nested = {"_type": "playlist", "entries": [{"_type": "url", "url": "inner"}]}
+    result = {"_type": "playlist", "entries": [nested, {"_type": "url", "url": "outer"}]}
+    assert [e["url"] for e in iter_entries(result)] == ["inner", "outer"]
+
+    paged = {"_type": "playlist", "entries": OnDemandPagedList(fetch_page, 2)}
+    entries = iter_entries(paged)
+    assert next(entries)["url"] == "v0-0"
+    assert fetched == [0]
+
+
+def test_channel_entries_become_jobs_with_bounded_backlog(fake_site, tmp_path):
+    fake_site.channel_size = 12
+    fake_site.page_size = 2
+    fake_site.page_delay = 0.05
+    downloader = fake_site.downloader()
+    queue = DownloadQueue(downloader.run_job, max_concurrent=2)
+    downloader.playlist_expander = PlaylistExpander(queue, max_pending=3)
+
+    lock = threading.Lock()
+    pending = []
+    first_done = []
+
+    def watch(job):
+        with lock:
+            pending.append(sum(1 for j in queue.jobs() if j.state == JobState.QUEUED))
+            if job.state == JobState.DONE and not job.playlist and not first_done:
+                first_done.append(len(fake_site.pages))
+
+    queue.add_listener(watch)
+    playlist = queue.add(fake_site.channel_url("chan"), str(tmp_path))
+    # Waiting on the queue covers entries queued after the playlist job ended
+    assert queue.wait(timeout=30)
+
+    jobs = [job for job in queue.jobs() if job.id != playlist.id]
+    assert playlist.playlist and playlist.state == JobState.DONE
+    assert playlist.status == "Playlist: 12 entries queued"
+    assert len(jobs) == 12
+    assert all(job.state == JobState.DONE for job in jobs)
+    assert len({job.filename for job in jobs}) == 12
+    # Downloads started before the last page was fetched
+    assert first_done[0] < len(fake_site.pages)
+    assert max(pending) <= 3
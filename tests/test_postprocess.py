@@ -0,0 +1,114 @@
+"""
+Tests for running post-processing in a process pool, off the download workers.
+"""
+import multiprocessing
+import os
+import sys
+from concurrent.futures import Future
+from types import SimpleNamespace
+
+import pytest
+
+from src.core.download_queue import DownloadQueue, JobState
+from src.core.postprocess import PostProcessPool
+
+# Stand-in for an ffmpeg conversion: burns CPU for a while, then writes a
+# digest of the downloaded media next to it
+TRANSCODE = '''
+import hashlib, sys, time
+deadline = time.process_time() + float(sys.argv[1])
+while time.process_time() < deadline:
+    pass
+with open(sys.argv[2], 'rb') as f:
+    digest = hashlib.sha1(f.read()).hexdigest()
+with open(sys.argv[2] + '.sha1', 'w') as f:
+    f.write(digest)
+'''
+
+
+def transcode_pp(tmp_path, seconds: float) -> dict:
+    """A yt-dlp Exec post-processor running the synthetic transcode."""
+    script = tmp_path / 'transcode.py'
+    script.write_text(TRANSCODE)
+    return {'key': 'Exec', 'when': 'post_process',
+            'exec_cmd': f'"{sys.executable}" "{script}" {seconds} {{}}'}
+
+
+@pytest.fixture
+def pool():
+    pool = PostProcessPool(workers=1)
+    pool.start(wait=True)
+    yield pool
+    pool.close()
+
+
+def test_fetch_returns_before_post_processing(fake_site, tmp_path, pool):
+    downloader = fake_site.downloader(postprocess=pool, postprocessors=[transcode_pp(tmp_path, 0.5)])
+    output = tmp_path / 'out'
+    result = downloader.fetch(fake_site.watch_url('a1'), str(output), wait=False)
+    assert isinstance(result, Future)
+    # The download is on disk; the conversion runs in the worker process
+    assert os.listdir(output) == ['Clip a1.webm']
+    assert multiprocessing.active_children()
+
+    assert result.result(timeout=60) == 'Clip a1.webm'
+    assert (output / 'Clip a1.webm.sha1').exists()
+    # Without wait=False the caller blocks until post-processing is done
+    assert downloader.fetch(fake_site.watch_url('a2'), str(output)) == 'Clip a2.webm'
+    assert (output / 'Clip a2.webm.sha1').exists()
+    downloader.close()
+
+
+def test_deferred_finalize_leaves_the_pooled_instance_alone(fake_site, tmp_path, pool):
+    downloader = fake_site.downloader(postprocess=pool, postprocessors=[transcode_pp(tmp_path, 0.5)])
+    result = downloader.fetch(fake_site.watch_url('c1'), str(tmp_path), wait=False)
+
+    # The next job leases the same instance while the first is finalized
+    calls = []
+    with downloader.ydl_pool.checkout(downloader.ydl_opts) as ydl:
+        ydl.prepare_filename = lambda *args, **kwargs: calls.append(args)
+        assert result.result(timeout=60) == 'Clip c1.webm'
+        del ydl.prepare_filename
+    assert downloader.ydl_pool.created == 1
+    assert calls == []
+    # Without a written file the name comes from the template, not from ydl
+    job = SimpleNamespace(stream=None, last_filename=None)
+    assert downloader._output_filename({'title': 'Clip'}, job, 'Clip.mp4') == 'Clip.mp4'
+    downloader.close()
+
+
+def test_post_processing_errors_fail_the_job(fake_site, tmp_path, pool):
+    failing = {'key': 'Exec', 'when': 'post_process', 'exec_cmd': f'"{sys.executable}" -c "exit(3)"'}
+    downloader = fake_site.downloader(postprocess=pool, postprocessors=[failing])
+    queue = DownloadQueue(downloader.run_job)
+    job = queue.add(fake_site.watch_url('b1'), str(tmp_path))
+    assert queue.wait(timeout=60)
+    assert job.state == JobState.FAILED
+    assert 'error code 3' in job.error
+    downloader.close()
+
+
+def _run_batch(downloader, fake_site, tmp_path, ids):
+    queue = DownloadQueue(downloader.run_job, max_concurrent=1)
+    states = set()
+    queue.add_listener(lambda job: states.add(job.state))
+    jobs = [queue.add(fake_site.watch_url(video_id), str(tmp_path)) for video_id in ids]
+    assert queue.wait(timeout=120)
+    assert all(job.state == JobState.DONE for job in jobs), [job.error for job in jobs]
+    return states
+
+
+def test_only_pooled_jobs_pass_through_processing(fake_site, tmp_path, pool):
+    postprocessors = [transcode_pp(tmp_path, 0.1)]
+    inline = fake_site.downloader(postprocessors=postprocessors)
+    pipelined = fake_site.downloader(postprocess=pool, postprocessors=postprocessors)
+
+    inline_states = _run_batch(inline, fake_site, tmp_path / 'inline', ['i0', 'i1'])
+    pipelined_states = _run_batch(pipelined, fake_site, tmp_path / 'pipelined', ['p0', 'p1'])
+
+    assert JobState.PROCESSING in pipelined_states
+    assert JobState.PROCESSING not in inline_states
+    assert len(list((tmp_path / 'inline').glob('*.sha1'))) == 2
+    assert len(list((tmp_path / 'pipelined').glob('*.sha1'))) == 2
+    inline.close()
+    pipelined.close()
@@ -0,0 +1,177 @@
+"""
+Tests for the throttled progress pipeline.
+"""
+import time
+
+from PyQt6.QtCore import QObject, Qt, pyqtSignal
+
+from src.core.progress import ProgressAggregator, ProgressTracker
+
+GB = 1024 ** 3
+CHUNK = 64 * 1024
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class FakeTimer:
+    """Holds scheduled flushes until the test fires them."""
+
+    def __init__(self):
+        self.pending = []
+
+    def __call__(self, delay, callback):
+        self.pending.append(callback)
+        return self
+
+    def cancel(self):
+        self.pending.clear()
+
+    def fire(self):
+        callbacks, self.pending = self.pending, []
+        for callback in callbacks:
+            callback()
+
+
+def _hooks(total=GB, chunk=CHUNK, rate=100 * 1024 * 1024, clock=None):
+    """yt-dlp style progress dicts for a download at a constant rate."""
+    downloaded = 0
+    while downloaded < total:
+        downloaded = min(total, downloaded + chunk)
+        if clock is not None:
+            clock.now = downloaded / rate
+        yield {
+            'status': 'downloading',
+            'downloaded_bytes': downloaded,
+            'total_bytes': total,
+        }
+    yield {'status': 'finished', 'downloaded_bytes': total, 'total_bytes': total,
+           'filename': 'video.mp4'}
+
+
+def test_tracker_percent_speed_and_eta():
+    tracker = ProgressTracker('job', window=1.0)
+    for t in range(5):
+        tracker.update({'status': 'downloading', 'downloaded_bytes': t * 1000,
+                        'total_bytes': 10000}, now=float(t))
+    snap = tracker.snapshot
+    assert snap.percent == 40.0
+    assert snap.speed == 1000.0
+    assert snap.eta == 6.0
+
+
+def test_tracker_starts_over_for_the_next_file():
+    """Merged formats download video and audio one after the other."""
+    tracker = ProgressTracker('job', window=10.0)
+    for t in range(5):
+        tracker.update({'status': 'downloading', 'downloaded_bytes': t * 1000,
+                        'total_bytes': 10000, 'filename': 'clip.f137.mp4'}, now=float(t))
+    assert tracker.snapshot.speed == 1000.0
+
+    audio = {'status': 'downloading', 'downloaded_bytes': 100, 'total_bytes': 1000,
+             'filename': 'clip.f140.m4a'}
+    snap = tracker.update(audio, now=5.0)
+    assert snap.speed is None and snap.eta is None
+    assert snap.describe() == 'Starting download...'
+
+    snap = tracker.update(dict(audio, downloaded_bytes=300), now=6.0)
+    assert (snap.speed, snap.eta) == (200.0, 3.5)
+    # A restart of the same file also starts over
+    snap = tracker.update(dict(audio, downloaded_bytes=0), now=7.0)
+    assert snap.speed is None and snap.eta is None
+
+
+def test_tracker_uses_fragments_without_sizes():
+    tracker = ProgressTracker('job')
+    tracker.update({'status': 'downloading', 'downloaded_bytes': 0,
+                    'fragment_index': 0, 'fragment_count': 12}, now=0.0)
+    tracker.update({'status': 'downloading', 'downloaded_bytes': 500,
+                    'fragment_index': 3, 'fragment_count': 12}, now=1.0)
+    assert tracker.snapshot.percent == 25.0
+    assert tracker.snapshot.describe() == 'Downloading... 500.0 B/s (frag 3/12)'
+
+
+def test_aggregator_coalesces_jobs_into_batches():
+    clock = FakeClock()
+    batches = []
+    aggregator = ProgressAggregator(batches.append, rate_hz=10, clock=clock, timer=FakeTimer())
+    for step in range(100):
+        clock.now = step * 0.01
+        for job in ('a', 'b', 'c'):
+            aggregator.update(job, {'status': 'downloading', 'downloaded_bytes': step,
+                                    'total_bytes': 100})
+    # One second of updates at 10 Hz, each batch covering every active job
+    assert len(batches) == 10
+    assert all({s.job for s in batch} == {'a', 'b', 'c'} for batch in batches[1:])
+
+    aggregator.update('a', {'status': 'finished', 'total_bytes': 100, 'filename': 'a.mp4'})
+    final = {s.job: s for s in batches[-1]}
+    assert final['a'].percent == 100.0 and final['a'].status == 'finished'
+
+
+def test_aggregator_flushes_held_back_update_when_hooks_stall():
+    clock, timer = FakeClock(), FakeTimer()
+    batches = []
+    aggregator = ProgressAggregator(batches.append, rate_hz=10, clock=clock, timer=timer)
+    aggregator.update('a', {'status': 'downloading', 'downloaded_bytes': 10, 'total_bytes': 100})
+    clock.now = 0.05
+    aggregator.update('a', {'status': 'downloading', 'downloaded_bytes': 50, 'total_bytes': 100})
+    assert [s.downloaded for batch in batches for s in batch] == [10]
+    assert len(timer.pending) == 1
+
+    # No further hook calls arrive; the timer delivers the held back update
+    clock.now = 0.1
+    timer.fire()
+    assert [s.downloaded for batch in batches for s in batch] == [10, 50]
+    timer.fire()
+    assert len(batches) == 2
+
+    # A flush by a hook call cancels the timer
+    clock.now = 0.15
+    aggregator.update('a', {'status': 'downloading', 'downloaded_bytes': 60, 'total_bytes': 100})
+    clock.now = 0.3
+    aggregator.update('a', {'status': 'downloading', 'downloaded_bytes': 70, 'total_bytes': 100})
+    assert timer.pending == [] and len(batches) == 3
+
+
+def test_aggregator_timer_flushes_by_itself():
+    batches = []
+    aggregator = ProgressAggregator(batches.append, rate_hz=20)
+    aggregator.update('a', {'status': 'downloading', 'downloaded_bytes': 1, 'total_bytes': 9})
+    aggregator.update('a', {'status': 'downloading', 'downloaded_bytes': 2, 'total_bytes': 9})
+    deadline = time.monotonic() + 5
+    while len(batches) < 2 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert [s.downloaded for batch in batches for s in batch] == [1, 2]
+
+
+class _Emitter(QObject):
+    batch = pyqtSignal(list)
+
+
+def _run_engine(app, receiver):
+    emitter = _Emitter()
+    emitter.batch.connect(receiver, Qt.ConnectionType.QueuedConnection)
+    clock = FakeClock()
+    emissions = []
+    aggregator = ProgressAggregator(
+        lambda batch: (emissions.append(batch), emitter.batch.emit(batch)), rate_hz=10, clock=clock,
+        timer=FakeTimer())
+    for d in _hooks(clock=clock):
+        aggregator.update('job', d)
+    app.processEvents()
+    return len(emissions)
+
+
+def test_emissions_per_gb(qapp):
+    """1 GB in 64 KiB chunks at 100 MB/s reaches the window in few batches."""
+    received = []
+    emissions = _run_engine(qapp, lambda *args: received.append(args))
+    # ~10.2 s of simulated transfer at 10 Hz, plus the final flush
+    assert emissions <= 104
+    assert len(received) == emissions
@@ -0,0 +1,74 @@
+"""
+Tests for compact video, format and job records.
+"""
+import dataclasses
+
+import pytest
+
+from benchmarks.memory import bytes_per_job, bytes_per_video, synthetic_info
+from src.core.cancel import CancelToken
+from src.core.download_queue import DownloadJob
+from src.core.metadata_cache import MetadataCache
+from src.core.records import FormatRecord, VideoRecord
+
+
+def test_record_keeps_fields_without_urls():
+    info = synthetic_info(1, formats=8, fragments=3)
+    record = VideoRecord.from_info(info, 'https://example.com/v1')
+
+    assert (record.url, record.id, record.title) == ('https://example.com/v1', 'v0000000001',
+                                                     'Synthetic video 1')
+    assert record.extractor == 'Example' and record.duration == 600.0
+    assert [fmt.format_id for fmt in record.formats] == [f['format_id'] for f in info['formats']]
+    assert record.format_ids == '105+102'
+    # Chosen formats are the records in the format list, not copies
+    assert record.chosen[0] is record.formats[5]
+    assert record.filesize == info['formats'][5]['filesize'] + info['formats'][2]['filesize']
+    assert not any('url' in field.name for field in dataclasses.fields(FormatRecord))
+
+    video, audio = record.chosen
+    assert video.has_video and not video.has_audio
+    assert audio.has_audio and not audio.has_video
+    with pytest.raises(dataclasses.FrozenInstanceError):
+        record.title = 'changed'
+    assert not hasattr(record, '__dict__') and not hasattr(video, '__dict__')
+
+
+def test_format_sizes_fall_back_to_estimates():
+    estimated = FormatRecord.from_format({'format_id': '1', 'filesize_approx': 5000})
+    assert (estimated.filesize, estimated.filesize_exact) == (5000, False)
+    unknown = VideoRecord.from_info({'id': 'x', 'format_id': '1', 'ext': 'mp4'})
+    assert unknown.format_ids == '1' and unknown.filesize is None
+    assert VideoRecord.from_info({'id': 'x'}).format_ids is None
+
+
+def test_downloader_returns_records_and_rehydrates_from_cache(fake_site):
+    downloader = fake_site.downloader(metadata_cache=MetadataCache())
+    url = fake_site.watch_url('abc')
+
+    record = downloader.get_video_record(url)
+    assert record.title == 'Clip abc' and record.url == url
+    assert record.format_ids == 'high'
+    assert {fmt.format_id for fmt in record.formats} == {
+        'low', 'high', 'video', 'audio-opus', 'audio-aac'}
+
+    info = downloader.full_info(record)
+    assert info['id'] == 'abc' and info['formats'][0]['url']
+    assert fake_site.calls == 1
+
+
+def test_jobs_and_tokens_are_compact():
+    job = DownloadJob('https://example.com/v', '/downloads')
+    assert not hasattr(job, '__dict__')
+    with pytest.raises(AttributeError):
+        job.unknown = 1
+
+    token = CancelToken()
+    token.cancel(discard_partial=False)
+    assert token.cancelled and not token.discard_partial
+
+
+def test_memory_benchmark():
+    assert bytes_per_job(500) < 1024
+    sizes = bytes_per_video(3)
+    assert sizes['record_bytes'] * 20 < sizes['info_dict_bytes']
@@ -0,0 +1,157 @@
+"""
+Tests for the multi-connection segmented downloader.
+"""
+import os
+import time
+
+import pytest
+
+from src.core.cancel import CancelToken, DownloadCancelled
+from src.core.downloader import VideoDownloader
+from src.core.segmented import Segment, SegmentError, SegmentedDownload, SegmentScheduler
+
+
+def _throttle(server):
+    # About 1.6 MB/s per connection, like a CDN capping each stream
+    server.chunk_size = 16 * 1024
+    server.chunk_delay = 0.01
+
+
+def _fetch(url, tmp_path, connections):
+    out = tmp_path / f"c{connections}"
+    return out / VideoDownloader().fetch(url, str(out), connections=connections)
+
+
+def test_steal_splits_largest_remaining_range():
+    scheduler = SegmentScheduler(min_split=100)
+    first = scheduler.add(Segment(0, 999))
+    assert scheduler.advance(first, 200) == 200
+
+    second = scheduler.steal()
+    assert (second.pos, second.end) == (600, 999)
+    assert first.end == 599
+    scheduler.advance(second, 100)
+    third = scheduler.steal()
+    assert (third.pos, third.end) == (400, 599)
+    assert first.end == 399
+
+    # The owner can never write past the new end of its range
+    assert scheduler.advance(third, 500) == 200
+    assert scheduler.remaining() == 200 + 300
+    assert scheduler.steal() is not None
+    assert SegmentScheduler(min_split=1000).steal() is None
+
+
+class _Response:
+    """A 206 response that reads slowly and can drop the connection."""
+
+    def __init__(self, payload, start, end, delay, fail_after=None):
+        self.status = 206
+        self.headers = {'Content-Range': f'bytes {start}-{end}/{len(payload)}'}
+        self.data = payload[start:end + 1]
+        self.delay = delay
+        self.fail_after = fail_after
+        self.sent = 0
+
+    def read(self, size):
+        time.sleep(self.delay)
+        if self.fail_after is not None and self.sent >= self.fail_after:
+            raise ConnectionResetError('connection reset')
+        data = self.data[self.sent:self.sent + size]
+        self.sent += len(data)
+        return data
+
+    def close(self):
+        pass
+
+
+def test_failed_range_is_not_kept_in_resumable_prefix(tmp_path):
+    payload = os.urandom(4 * 1024 * 1024)
+
+    def open_range(start, end):
+        end = len(payload) - 1 if end is None else end
+        if start == 0:
+            # The first connection dies after 128 KiB while the second is slow
+            return _Response(payload, start, end, 0.02, fail_after=128 * 1024)
+        return _Response(payload, start, end, 0.05)
+
+    path = tmp_path / "clip.mp4.part"
+    download = SegmentedDownload(open_range, str(path), connections=2, retries=0)
+    with pytest.raises(SegmentError):
+        download.run()
+
+    assert download.requests == 2
+    assert path.stat().st_size == 128 * 1024
+    assert path.read_bytes() == payload[:128 * 1024]
+
+
+def test_parallel_ranges_of_a_throttled_file(media_server, tmp_path):
+    payload = os.urandom(4 * 1024 * 1024)
+    url = media_server.add("/throttled.mp4", payload)
+    _throttle(media_server)
+
+    single = _fetch(url, tmp_path, 1)
+    ranges_before = sum(1 for r in media_server.requests if r[2])
+    segmented = _fetch(url, tmp_path, 4)
+
+    assert single.read_bytes() == payload
+    assert segmented.read_bytes() == payload
+    assert not list(segmented.parent.glob("*.part"))
+    assert sum(1 for r in media_server.requests if r[2]) - ranges_before >= 4
+
+
+def test_falls_back_to_one_stream_without_range_support(media_server, tmp_path):
+    payload = os.urandom(1024 * 1024)
+    url = media_server.add("/plain.mp4", payload)
+    media_server.support_ranges = False
+
+    requests_before = len(media_server.requests)
+    path = _fetch(url, tmp_path, 4)
+
+    assert path.read_bytes() == payload
+    # The generic extractor's probe aside, only the download request was made
+    ranged = [r for r in media_server.requests[requests_before:] if r[2]]
+    assert ranged == [("GET", "/plain.mp4", "bytes=0-")]
+
+
+def test_cancel_removes_partial_file(media_server, tmp_path):
+    url = media_server.add("/cancel.mp4", os.urandom(8 * 1024 * 1024))
+    _throttle(media_server)
+    token = CancelToken()
+    downloader = VideoDownloader()
+
+    def report(snapshot):
+        if snapshot.downloaded > 256 * 1024:
+            token.cancel()
+
+    with pytest.raises(DownloadCancelled):
+        downloader.fetch(url, str(tmp_path), cancel_token=token, progress_callback=report,
+                         connections=4)
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_paused_download_resumes_from_complete_prefix(media_server, tmp_path):
+    payload = os.urandom(4 * 1024 * 1024)
+    url = media_server.add("/pause.mp4", payload)
+    _throttle(media_server)
+    token = CancelToken()
+    downloader = VideoDownloader()
+
+    def report(snapshot):
+        if snapshot.downloaded > 1024 * 1024:
+            token.cancel(discard_partial=False)
+
+    with pytest.raises(DownloadCancelled):
+        downloader.fetch(url, str(tmp_path), cancel_token=token, progress_callback=report,
+                         connections=4)
+    # Holes left by the parallel ranges are cut off
+    offset = (tmp_path / "pause.mp4.part").stat().st_size
+    assert 0 < offset < len(payload)
+    assert (tmp_path / "pause.mp4.part").read_bytes() == payload[:offset]
+
+    media_server.chunk_delay = 0
+    requests_before = len(media_server.requests)
+    filename = downloader.fetch(url, str(tmp_path), connections=4)
+    assert (tmp_path / filename).read_bytes() == payload
+    ranges = [r[2] for r in media_server.requests[requests_before:] if r[2]]
+    assert ranges[0] == f"bytes={offset}-"
@@ -0,0 +1,19 @@
+"""
+Tests that each download job extracts video information exactly once.
+"""
+import os
+
+
+def test_one_extraction_per_job(fake_site, tmp_path):
+    """fetch() extracts once and reports the real output filename."""
+    downloader = fake_site.downloader()
+    for i, video_id in enumerate(['abc', 'def'], start=1):
+        filename = downloader.fetch(fake_site.watch_url(video_id), str(tmp_path))
+        assert fake_site.calls == i
+        # Best format is the webm, so the name must not be guessed as .mp4
+        assert filename == f'Clip {video_id}.webm'
+        assert os.path.getsize(tmp_path / filename) == 3000
+
+    # Only the media itself was fetched over HTTP, once per job
+    media_requests = [path for _, path, _ in fake_site.server.requests]
+    assert media_requests == ['/high.webm', '/high.webm']
@@ -0,0 +1,35 @@
+"""
+Tests for startup: what loads before the window is shown.
+"""
+from pathlib import Path
+
+from src.utils.startup import measure_imports, parse_importtime, run_first_paint_probe
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# Modules that must not load before the window is shown
+LAZY_MODULES = ("yt_dlp", "src.gui.platforms_dialog")
+
+
+def test_parse_importtime():
+    stderr = (
+        "import time: self [us] | cumulative | imported package\n"
+        "import time:       120 |        120 |   zlib\n"
+        "import time:      2000 |       2120 | src.core.metadata_cache\n"
+    )
+    assert parse_importtime(stderr) == {
+        "zlib": (120, 120),
+        "src.core.metadata_cache": (2000, 2120),
+    }
+
+
+def test_main_window_import_defers_heavy_modules():
+    modules = measure_imports("src.gui.main_window", cwd=str(ROOT))
+    assert "src.gui.main_window" in modules
+    assert [name for name in modules if name.startswith(LAZY_MODULES)] == []
+
+
+def test_first_paint_comes_before_yt_dlp_and_the_stores():
+    report = run_first_paint_probe(str(ROOT))
+    assert report["first_paint_ms"] > 0
+    assert not report["yt_dlp_loaded"] and not report["stores_open"]
@@ -0,0 +1,156 @@
+"""
+Tests for streaming downloads to pipes, descriptors and callbacks.
+"""
+import json
+import os
+import sys
+import threading
+
+import pytest
+
+from src.core.downloader import VideoDownloader
+from src.core.stream import StreamSink
+
+# Stands in for ffmpeg muxing pipe inputs: reads every input to the end and
+# writes them to stdout as one "container", logging its arguments
+FAKE_FFMPEG = '''#!{python}
+import json, os, sys, threading
+here = os.path.dirname(os.path.abspath(__file__))
+args = sys.argv[1:]
+if args and args[0] in ('-bsfs', '-version'):
+    print('ffmpeg version 6.1 Copyright (c) synthetic')
+    sys.exit(0)
+inputs = [args[i + 1] for i, arg in enumerate(args) if arg == '-i']
+data = [b''] * len(inputs)
+def read(index):
+    with os.fdopen(int(inputs[index][5:]), 'rb') as f:
+        data[index] = f.read()
+threads = [threading.Thread(target=read, args=(i,)) for i in range(len(inputs))]
+for thread in threads:
+    thread.start()
+for thread in threads:
+    thread.join()
+container = args[args.index('-f') + 1]
+out = sys.stdout.buffer
+out.write(container.encode() + b'\\n')
+for payload in data:
+    out.write(str(len(payload)).encode() + b'\\n' + payload)
+with open(os.path.join(here, 'calls.jsonl'), 'a') as f:
+    f.write(json.dumps(args) + '\\n')
+'''
+
+
+@pytest.fixture
+def fake_ffmpeg(tmp_path):
+    directory = tmp_path / 'ffmpeg-bin'
+    directory.mkdir()
+    for name in ('ffmpeg', 'ffprobe'):
+        path = directory / name
+        path.write_text(FAKE_FFMPEG.format(python=sys.executable))
+        path.chmod(0o755)
+    return directory
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    """An empty working directory, to catch stray temporary files."""
+    path = tmp_path / 'work'
+    path.mkdir()
+    monkeypatch.chdir(path)
+    return path
+
+
+def test_sink_targets(tmp_path):
+    chunks = []
+    sink = StreamSink(chunks.append)
+    sink.write(b'ab')
+    sink.view().close()
+    sink.write(b'c')
+    assert (chunks, sink.bytes_written, sink.name) == ([b'ab', b'c'], 3, '<callback>')
+
+    read_fd, write_fd = os.pipe()
+    sink = StreamSink(f'fd:{write_fd}')
+    sink.write(b'piped')
+    sink.close()
+    os.close(write_fd)
+    with os.fdopen(read_fd, 'rb') as f:
+        assert f.read() == b'piped'
+
+    fifo = tmp_path / 'fifo'
+    os.mkfifo(fifo)
+    received = []
+    reader = threading.Thread(target=lambda: received.append(fifo.read_bytes()))
+    reader.start()
+    sink = StreamSink(fifo)
+    sink.write(b'named ')
+    sink.write(b'pipe')
+    sink.close()
+    reader.join(timeout=10)
+    assert received == [b'named pipe']
+
+    with pytest.raises(TypeError):
+        StreamSink(3.5)
+
+
+def test_progressive_download_streams_without_files(fake_site, media_server, workdir):
+    media_server.chunk_size = 256
+    chunks = []
+    downloader = fake_site.downloader()
+    output = workdir / 'out'
+    assert downloader.fetch(fake_site.watch_url('a1'), str(output), stream=chunks.append) == '<callback>'
+    assert b''.join(chunks) == media_server.files['/high.webm'][0]
+    # Written as the bytes arrive, not in one piece at the end
+    assert len(chunks) > 1
+    assert os.listdir(workdir) == []
+    downloader.close()
+
+
+def test_hls_fragments_stay_in_memory(media_server, workdir):
+    url = media_server.add_hls('show', segments=6, segment_size=4096)
+    expected = b''.join(media_server.files[f'/show/seg{n}.ts'][0] for n in range(6))
+    for fragments in (1, 3):
+        read_fd, write_fd = os.pipe()
+        received = []
+        reader = threading.Thread(target=lambda: received.append(os.fdopen(read_fd, 'rb').read()))
+        reader.start()
+        snapshots = []
+        VideoDownloader().fetch(url, str(workdir), concurrent_fragments=fragments,
+                                progress_callback=snapshots.append, stream=write_fd)
+        os.close(write_fd)
+        reader.join(timeout=10)
+        assert received == [expected]
+        assert snapshots[-1].status == 'finished'
+        assert os.listdir(workdir) == []
+
+
+def test_merged_formats_are_muxed_on_the_fly(fake_site, media_server, fake_ffmpeg, workdir):
+    downloader = fake_site.downloader(ffmpeg_location=str(fake_ffmpeg))
+    sink = StreamSink(workdir.parent / 'stream.bin')
+    snapshots = []
+    assert downloader.fetch(fake_site.watch_url('b1'), str(workdir), 'hd',
+                            progress_callback=snapshots.append, stream=sink) == sink.name
+    sink.close()
+
+    video, audio = media_server.files['/video.mp4'][0], media_server.files['/audio.webm'][0]
+    assert (workdir.parent / 'stream.bin').read_bytes() == (
+        b'matroska\n' + f'{len(video)}\n'.encode() + video + f'{len(audio)}\n'.encode() + audio)
+    with open(fake_ffmpeg / 'calls.jsonl') as f:
+        [args] = [json.loads(line) for line in f]
+    assert args[-1] == 'pipe:1' and args.count('-i') == 2
+    # Progress covers both formats together
+    assert snapshots[-1].status == 'finished'
+    assert snapshots[-1].downloaded == len(video) + len(audio)
+    assert os.listdir(workdir) == []
+    downloader.close()
+
+
+def test_without_ffmpeg_single_file_formats_are_streamed(fake_site, media_server, tmp_path, workdir):
+    missing = tmp_path / 'no-ffmpeg'
+    missing.mkdir()
+    chunks = []
+    downloader = fake_site.downloader(ffmpeg_location=str(missing), stream=chunks.append)
+    downloader.fetch(fake_site.watch_url('c1'), str(workdir), 'hd')
+    assert b''.join(chunks) == media_server.files['/high.webm'][0]
+    with pytest.raises(ValueError):
+        downloader.fetch(fake_site.watch_url('c1'), str(workdir), 'audio', audio_format='mp3')
+    downloader.close()
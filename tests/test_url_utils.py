@@ -2,7 +2,11 @@
 Tests for URL validation and platform detection utilities.
 """
 import pytest
-from src.utils.url_utils import is_valid_url, get_platform
+import random
+
+from src.utils import url_utils
+from src.utils.url_utils import (is_valid_url, get_platform, canonicalize_url, classify_url,
+                                 classify_many, UrlClass)
 
 def test_is_valid_url():
     """Test URL validation."""
@@ -45,3 +49,40 @@ def test_get_platform():
     assert get_platform("https://example.com/video") is None
     assert get_platform("not a url") is None
     assert get_platform("") is None
+
+def test_canonicalize_url():
+    """Test URL canonicalization."""
+    assert canonicalize_url("HTTPS://WWW.YouTube.com:443/watch?v=abc&utm_source=x#t=10") == \
+        "https://www.youtube.com/watch?v=abc"
+    assert canonicalize_url("https://vimeo.com/1?b=2&a=1&fbclid=z") == "https://vimeo.com/1?a=1&b=2"
+    assert canonicalize_url("http://example.com:8080") == "http://example.com:8080/"
+    assert canonicalize_url("not a url") == "not a url"
+
+def test_classify_url():
+    """Platform and host come from one parse; subdomains match, lookalikes do not."""
+    assert classify_url("HTTPS://User@M.YouTube.com:443/watch?v=a") == UrlClass("youtube", "m.youtube.com")
+    assert classify_url("http://127.0.0.1:8080/clip.mp4") == UrlClass(None, "127.0.0.1:8080")
+    assert classify_url("https://[::1]/x") == UrlClass(None, "[::1]")
+    assert classify_url("https://notyoutube.com/watch") == UrlClass(None, "notyoutube.com")
+    for url in ("", "not a url", "http://", "youtube.com", "http://[::1/x"):
+        assert classify_url(url) is None
+        assert not is_valid_url(url)
+
+def test_classify_many_matches_classify_url(monkeypatch):
+    """Batches give the same results in order, in this process or in a pool."""
+    urls = ["https://youtu.be/a", "bad", "https://vimeo.com/1", "https://youtu.be/b",
+            "http://example.com:81/"] * 20
+    expected = [classify_url(url) for url in urls]
+    assert classify_many(iter(urls), processes=1) == expected
+    monkeypatch.setattr(url_utils, "PARALLEL_THRESHOLD", 10)
+    assert classify_many(urls, processes=2) == expected
+
+def test_classify_many_pasted_list():
+    """A pasted list over many hosts gets a result for every URL, in order."""
+    rng = random.Random(1)
+    hosts = ["www.youtube.com", "youtu.be", "vimeo.com", "www.tiktok.com", "cdn{}.example.net"]
+    urls = [f"https://{rng.choice(hosts).format(rng.randrange(500))}/watch?v={i}"
+            for i in range(10_000)]
+    results = classify_many(urls, processes=1)
+    assert len(results) == len(urls) and all(results)
+    assert [result.host for result in results] == [url.split("/")[2] for url in urls]
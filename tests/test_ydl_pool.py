@@ -0,0 +1,134 @@
+"""
+Tests for reusing YoutubeDL instances across jobs.
+"""
+import os
+import threading
+
+import pytest
+
+from src.core.archive import AlreadyDownloaded, DownloadArchive
+from src.core.downloader import VideoDownloader
+from src.core.ydl_pool import YDLPool, options_profile
+
+
+class FakeYDL:
+    def __init__(self, params):
+        self.params = params
+        self.closed = False
+        self._progress_hooks = []
+        self._postprocessor_hooks = []
+
+    def add_progress_hook(self, hook):
+        self._progress_hooks.append(hook)
+
+    def add_postprocessor_hook(self, hook):
+        self._postprocessor_hooks.append(hook)
+
+    def close(self):
+        self.closed = True
+
+
+def test_profile_ignores_job_hooks():
+    base = {'format': 'best', 'http_headers': {'B': '2', 'A': '1'}, 'outtmpl': '%(title)s'}
+    same = dict(base, progress_hooks=[print], http_headers={'A': '1', 'B': '2'})
+    assert options_profile(base) == options_profile(same)
+    assert options_profile(base) != options_profile(dict(base, format='worst'))
+
+
+def test_instances_are_reused_per_profile_with_job_hooks_detached():
+    pool = YDLPool(FakeYDL)
+    first_hook, second_hook = object(), object()
+    with pool.checkout({'format': 'best', 'progress_hooks': [first_hook]}) as ydl:
+        assert ydl._progress_hooks == [first_hook]
+        assert 'progress_hooks' not in ydl.params
+    with pool.checkout({'format': 'best', 'progress_hooks': [second_hook]}) as again:
+        assert again is ydl
+        assert again._progress_hooks == [second_hook]
+    with pool.checkout({'format': 'worst'}) as other:
+        assert other is not ydl
+    assert pool.created == 2
+
+    # Concurrent jobs never share an instance
+    with pool.checkout({'format': 'best'}) as a, pool.checkout({'format': 'best'}) as b:
+        assert a is not b
+
+
+def test_failed_and_evicted_instances_are_closed():
+    pool = YDLPool(FakeYDL, max_idle=1)
+    with pytest.raises(RuntimeError):
+        with pool.checkout({'format': 'best'}) as broken:
+            raise RuntimeError('mid-request')
+    assert broken.closed
+    with pool.checkout({'format': 'best'}) as fresh:
+        assert fresh is not broken
+
+    with pool.checkout({'format': 'worst'}) as newer:
+        pass
+    # Only one idle instance is kept; the least recently used goes
+    assert fresh.closed and not newer.closed
+    pool.close()
+    assert newer.closed
+
+
+def test_job_errors_return_instances_to_the_pool():
+    pool = YDLPool(FakeYDL, reusable=lambda error: isinstance(error, LookupError))
+    with pytest.raises(KeyError):
+        with pool.checkout({'format': 'best'}) as ydl:
+            raise KeyError('skipped')
+    assert not ydl.closed
+    with pytest.raises(RuntimeError):
+        with pool.checkout({'format': 'best'}) as again:
+            raise RuntimeError('mid-request')
+    assert again is ydl and ydl.closed
+    assert pool.created == 1
+
+
+def test_skipped_jobs_leave_the_pool_warm(fake_site, tmp_path):
+    downloader = fake_site.downloader(archive=DownloadArchive())
+    downloader.fetch(fake_site.watch_url('abc'), str(tmp_path))
+    for _ in range(3):
+        with pytest.raises(AlreadyDownloaded):
+            downloader.fetch(fake_site.watch_url('abc'), str(tmp_path))
+    downloader.fetch(fake_site.watch_url('def'), str(tmp_path))
+
+    assert downloader.ydl_pool.created == 1
+    downloader.close()
+
+
+def test_pool_is_thread_safe():
+    pool = YDLPool(FakeYDL, max_idle=4)
+    leased, shared, lock = set(), [], threading.Lock()
+
+    def worker():
+        for _ in range(200):
+            with pool.checkout({'format': 'best'}) as ydl:
+                with lock:
+                    if ydl in leased:
+                        shared.append(ydl)
+                    leased.add(ydl)
+                with lock:
+                    leased.discard(ydl)
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert not shared
+    assert pool.created <= 4
+
+
+def test_warm_pool_builds_one_instance_for_many_jobs(media_server, tmp_path):
+    jobs = 4
+    urls = [media_server.add(f'/clip{i}.mp4', os.urandom(2048)) for i in range(2 * jobs)]
+    fresh = VideoDownloader(pool_size=0)
+    warm = VideoDownloader()
+    for url in urls[:jobs]:
+        fresh.fetch(url, str(tmp_path / 'fresh'))
+    for url in urls[jobs:]:
+        warm.fetch(url, str(tmp_path / 'warm'))
+
+    assert warm.ydl_pool.created == 1
+    assert fresh.ydl_pool.created == jobs
+    assert len(os.listdir(tmp_path / 'warm')) == jobs
+    warm.close()